@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from 'next/server'
 import connectDB from '@/lib/mongodb'
 import { Trip } from '@/models/Trip'
 import { auth } from '@/lib/auth'
+import { invalidateChatTrip } from '@/lib/chat-service'
 
 const ITINERARY_SERVICE_URL =
   process.env.ITINERARY_SERVICE_URL || 'http://127.0.0.1:5001/generate-itinerary'
@@ -165,6 +166,7 @@ export async function POST(
     trip.activities = activities
     trip.status = 'planning'
     await trip.save()
+    invalidateChatTrip(params.id)
 
     return NextResponse.json({
       success: true,
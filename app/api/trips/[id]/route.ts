@@ -2,6 +2,7 @@ import { NextRequest, NextResponse } from 'next/server';
 import connectDB from '@/lib/mongodb';
 import { Trip } from '@/models/Trip';
 import { auth } from '@/lib/auth';
+import { invalidateChatTrip, tripETag } from '@/lib/chat-service';
 
 // GET specific trip
 export async function GET(
@@ -25,7 +26,12 @@ export async function GET(
       return NextResponse.json({ error: 'Trip not found' }, { status: 404 });
     }
 
-    return NextResponse.json(trip);
+    const etag = tripETag(trip);
+    if (request.headers.get('if-none-match') === etag) {
+      return new NextResponse(null, { status: 304, headers: { ETag: etag } });
+    }
+
+    return NextResponse.json(trip, { headers: { ETag: etag } });
   } catch (error) {
     console.error('Error fetching trip:', error);
     return NextResponse.json({ error: 'Failed to fetch trip' }, { status: 500 });
@@ -99,6 +105,7 @@ export async function PUT(
       updateData,
       { new: true }
     );
+    invalidateChatTrip(params.id);
 
     return NextResponse.json(updatedTrip);
   } catch (error) {
@@ -129,6 +136,8 @@ export async function DELETE(
       return NextResponse.json({ error: 'Trip not found' }, { status: 404 });
     }
 
+    invalidateChatTrip(params.id);
+
     return NextResponse.json({ message: 'Trip deleted successfully' });
   } catch (error) {
     console.error('Error deleting trip:', error);
@@ -0,0 +1,391 @@
+"""
+Semantic answer cache for /chat: near-identical destination FAQs ("best time
+to visit Goa", "how to reach Munnar from Kochi") are answered without a Groq
+round-trip.
+
+- question -> normalize (lowercase, punctuation/stopwords hatao, light
+  stemming, chhota synonym map: "get to" ~ "reach", "when" ~ "time")
+- vector = TF-IDF over words + adjacent-word bigrams, sab local (no network,
+  no model). Bigrams order pakadte hain: "Kochi -> Munnar" != "Munnar -> Kochi"
+- index destination-wise partitions me; har partition ka inverted index
+  (term -> entry ids), to cosine sirf shared-term candidates ka nikalta hai
+- hit = cosine >= CHAT_ANSWER_CACHE_THRESHOLD aur numbers exactly same
+  ("3 days in Goa" != "5 days in Goa")
+- TTL + LRU eviction across all destinations
+
+Sirf trip-independent sawaal cache hote hain. Skip: personal ("my", "we"),
+trip-specific ("day 3", dates, itinerary, tomorrow), follow-ups ("that one",
+"also") aur bahut chhote sawaal. Reply bhi check hota hai - trip ki dates,
+"Day 2" ya "your trip" jaisa kuch ho to store nahi hota.
+
+Stats (hit rate, latency + tokens saved) via stats(); entries() / purge()
+admin endpoint ke liye.
+"""
+import itertools
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+log = logging.getLogger("tripmate.answer_cache")
+
+ENABLED = os.getenv("CHAT_ANSWER_CACHE", "1") != "0"
+THRESHOLD = float(os.getenv("CHAT_ANSWER_CACHE_THRESHOLD", "0.82"))
+TTL = float(os.getenv("CHAT_ANSWER_CACHE_TTL", str(24 * 3600)))
+MAX_ENTRIES = int(os.getenv("CHAT_ANSWER_CACHE_MAX_ENTRIES", "5000"))
+
+STOPWORDS = frozenset(
+    "a an the is are was be been am to of in on at for from into and or by with about as "
+    "do does did can could should would will shall may might must i you your any some what "
+    "please tell know give suggest recommend list there here near nearby around like "
+    "whats wheres hows good nice great really very much many".split()
+)
+# trip-independent nahi: user ka apna context / plan
+PERSONAL = frozenset("my our ours we us me mine im ive were id".split())
+TRIP_WORDS = frozenset(
+    "itinerary schedule booked booking reservation today tomorrow tonight yesterday".split()
+)
+# pichle turn pe depend karte hain
+FOLLOW_UPS = frozenset("that those these this them they also else instead above previous again same".split())
+SYNONYMS = {
+    "get": "reach", "getting": "reach", "commute": "reach",
+    "go": "visit", "going": "visit", "explore": "visit", "see": "visit",
+    "when": "time", "season": "time", "month": "time",
+    "eat": "food", "dish": "food", "cuisine": "food",
+    "hotel": "stay", "accommodation": "stay", "homestay": "stay",
+    "cheap": "budget", "affordable": "budget",
+}
+MIN_TERMS = 2
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_DAY_RE = re.compile(r"\bdays?\s*\d|\d{4}-\d{2}-\d{2}")
+_TRIP_REPLY_RE = re.compile(
+    r"\byour\s+(?:trip|itinerary|plan|dates|stay|booking|schedule|budget)\b"
+    r"|\byou(?:'re|\s+are)\s+(?:going|visiting|travell?ing|staying)\b"
+    r"|\bday\s+\d",
+    re.IGNORECASE,
+)
+_ERROR_REPLIES = ("API Error", "Connection error", "An unexpected error", "Sorry, no response")
+
+
+def stem(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    if len(word) > 5 and word.endswith("ing"):
+        word = word[:-3]
+        # swimming -> swim, shopping -> shop
+        return word[:-1] if word[-1] == word[-2] and word[-1] not in "aeiou" else word
+    return word
+
+
+def words(text: str) -> list[str]:
+    return _WORD_RE.findall(str(text or "").lower().replace("'", "").replace("’", ""))
+
+
+def partition_of(destination) -> str:
+    return " ".join(words(destination))
+
+
+def question_terms(question: str) -> tuple[Counter | None, frozenset, str]:
+    """
+    Returns (term counts, numbers, skip reason). Terms None = cache mat karo.
+    """
+    raw = words(question)
+    if _DAY_RE.search(question.lower()):
+        return None, frozenset(), "trip"
+    vocab = set(raw)
+    if vocab & PERSONAL:
+        return None, frozenset(), "personal"
+    if vocab & TRIP_WORDS:
+        return None, frozenset(), "trip"
+    if vocab & FOLLOW_UPS:
+        return None, frozenset(), "followUp"
+
+    numbers = frozenset(w for w in raw if w.isdigit())
+    tokens = []
+    for w in raw:
+        if w in STOPWORDS:
+            continue
+        w = SYNONYMS.get(w, w)
+        w = SYNONYMS.get(stem(w), stem(w))
+        tokens.append(w)
+    if len(set(tokens) - numbers) < MIN_TERMS:
+        return None, numbers, "short"
+    terms = Counter(tokens)
+    terms.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    return terms, numbers, ""
+
+
+def reply_is_generic(reply: str, trip: dict | None) -> bool:
+    """
+    Reply kisi aur trip ko serve karne layak hai? (errors / trip details wale nahi)
+    """
+    if not reply or reply.startswith(_ERROR_REPLIES):
+        return False
+    if _TRIP_REPLY_RE.search(reply):
+        return False
+    for key in ("startDate", "endDate"):
+        value = str((trip or {}).get(key) or "")[:10]
+        if value and value in reply:
+            return False
+    return True
+
+
+class AnswerEntry:
+    __slots__ = ("id", "partition", "question", "terms", "numbers", "reply",
+                 "created_at", "expires_at", "hits", "tokens")
+
+    def __init__(self, entry_id: int, partition: str, question: str, terms: Counter, numbers: frozenset,
+                 reply: str, expires_at: float, tokens: int):
+        self.id = entry_id
+        self.partition = partition
+        self.question = question
+        self.terms = terms
+        self.numbers = numbers
+        self.reply = reply
+        self.created_at = time.time()
+        self.expires_at = expires_at
+        self.hits = 0
+        self.tokens = tokens
+
+    def as_dict(self, now: float) -> dict:
+        return {
+            "id": self.id,
+            "destination": self.partition,
+            "question": self.question,
+            "reply": self.reply,
+            "hits": self.hits,
+            "ageS": round(now - self.created_at, 1),
+            "ttlS": round(max(self.expires_at - now, 0), 1),
+        }
+
+
+class Lookup:
+    """
+    lookup() ka result; miss pe store() isi ko wapas leta hai (features dobara nahi banane).
+    """
+    __slots__ = ("partition", "question", "terms", "numbers", "reason", "entry", "similarity")
+
+    def __init__(self, partition: str, question: str, terms, numbers: frozenset, reason: str):
+        self.partition = partition
+        self.question = question
+        self.terms = terms
+        self.numbers = numbers
+        self.reason = reason
+        self.entry = None
+        self.similarity = 0.0
+
+    @property
+    def cacheable(self) -> bool:
+        return self.terms is not None
+
+
+class AnswerCache:
+    def __init__(self, threshold: float = THRESHOLD, ttl: float = TTL, max_entries: int = MAX_ENTRIES,
+                 enabled: bool = ENABLED):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+
+        self._entries: "OrderedDict[int, AnswerEntry]" = OrderedDict()
+        # partition -> term -> entry ids
+        self._index: dict[str, dict[str, set[int]]] = {}
+        # term -> kitni entries me hai (IDF ke liye, sab partitions)
+        self._df: Counter = Counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.skipped: Counter = Counter()
+        self.stored = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.purged = 0
+        self.similarity_sum = 0.0
+        # EWMA of an upstream /chat answer; har hit itna bachata hai
+        self.avg_upstream_s = 0.0
+        self.saved_s = 0.0
+        self.saved_tokens = 0
+
+    # ---------- public API ----------
+
+    def lookup(self, destination, question: str) -> Lookup:
+        terms, numbers, reason = question_terms(question) if self.enabled else (None, frozenset(), "disabled")
+        result = Lookup(partition_of(destination), question, terms, numbers, reason)
+        with self._lock:
+            if terms is None:
+                self.skipped[reason] += 1
+                return result
+            entry, similarity = self._best_match(result)
+            result.similarity = similarity
+            if entry is None:
+                self.misses += 1
+                return result
+            entry.hits += 1
+            self._entries.move_to_end(entry.id)
+            self.hits += 1
+            self.similarity_sum += similarity
+            self.saved_s += self.avg_upstream_s
+            self.saved_tokens += entry.tokens
+        result.entry = entry
+        return result
+
+    def store(self, lookup: Lookup, reply: str, upstream_seconds: float | None = None, tokens: int = 0,
+              trip: dict | None = None) -> AnswerEntry | None:
+        """
+        Miss ke baad upstream reply rakho (agar sawaal + reply dono trip-independent hain).
+        """
+        if upstream_seconds is not None:
+            with self._lock:
+                self._record_upstream(upstream_seconds)
+        if not lookup.cacheable or lookup.entry is not None:
+            return None
+        if not reply_is_generic(reply, trip):
+            with self._lock:
+                self.rejected += 1
+            return None
+
+        with self._lock:
+            entry = AnswerEntry(next(self._ids), lookup.partition, lookup.question, lookup.terms,
+                                lookup.numbers, reply, time.time() + self.ttl, tokens)
+            self._entries[entry.id] = entry
+            index = self._index.setdefault(entry.partition, {})
+            for term in entry.terms:
+                index.setdefault(term, set()).add(entry.id)
+            self._df.update(entry.terms.keys())
+            self.stored += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def entries(self, destination=None, limit: int = 100) -> list[dict]:
+        now = time.time()
+        partition = partition_of(destination) if destination is not None else None
+        with self._lock:
+            found = [
+                entry.as_dict(now)
+                for entry in reversed(self._entries.values())
+                if partition is None or entry.partition == partition
+            ]
+        return found[:limit]
+
+    def purge(self, destination=None, entry_id: int | None = None) -> int:
+        """
+        Sab (default), ek destination ki, ya ek entry hatao. Returns kitni hati.
+        """
+        partition = partition_of(destination) if destination is not None else None
+        with self._lock:
+            doomed = [
+                entry.id
+                for entry in self._entries.values()
+                if (entry_id is None or entry.id == entry_id)
+                and (partition is None or entry.partition == partition)
+            ]
+            for doomed_id in doomed:
+                self._drop(doomed_id)
+            self.purged += len(doomed)
+        if doomed:
+            log.info("answer cache purged", extra={"entries": len(doomed), "destination": partition})
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "destinations": len(self._index),
+                "hits": self.hits,
+                "misses": self.misses,
+                "skipped": dict(self.skipped),
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "avgHitSimilarity": round(self.similarity_sum / self.hits, 4) if self.hits else None,
+                "stored": self.stored,
+                "rejectedReplies": self.rejected,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "purged": self.purged,
+                "threshold": self.threshold,
+                "avgUpstreamMs": round(self.avg_upstream_s * 1000, 1),
+                "latencySavedMs": round(self.saved_s * 1000, 1),
+                "tokensSaved": self.saved_tokens,
+            }
+
+    # ---------- internals (lock must be held) ----------
+
+    def _idf(self, term: str) -> float:
+        return math.log((1 + len(self._entries)) / (1 + self._df[term])) + 1.0
+
+    def _best_match(self, lookup: Lookup) -> tuple[AnswerEntry | None, float]:
+        index = self._index.get(lookup.partition)
+        if not index:
+            return None, 0.0
+        candidates = set()
+        for term in lookup.terms:
+            candidates.update(index.get(term, ()))
+        if not candidates:
+            return None, 0.0
+
+        idf = {}
+
+        def weight(term: str, count: int) -> float:
+            w = idf.get(term)
+            if w is None:
+                w = idf[term] = self._idf(term)
+            return count * w
+
+        query = {term: weight(term, count) for term, count in lookup.terms.items()}
+        query_norm = math.sqrt(sum(w * w for w in query.values()))
+        now = time.time()
+        best, best_score = None, 0.0
+        for entry_id in candidates:
+            entry = self._entries[entry_id]
+            if entry.expires_at <= now:
+                self._drop(entry_id)
+                self.expirations += 1
+                continue
+            if entry.numbers != lookup.numbers:
+                continue
+            dot = 0.0
+            norm = 0.0
+            for term, count in entry.terms.items():
+                w = weight(term, count)
+                norm += w * w
+                q = query.get(term)
+                if q is not None:
+                    dot += q * w
+            score = dot / (query_norm * math.sqrt(norm))
+            if score > best_score:
+                best, best_score = entry, score
+        if best_score < self.threshold:
+            return None, best_score
+        return best, best_score
+
+    def _drop(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        index = self._index.get(entry.partition, {})
+        for term in entry.terms:
+            ids = index.get(term)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del index[term]
+            self._df[term] -= 1
+            if self._df[term] <= 0:
+                del self._df[term]
+        if not index:
+            self._index.pop(entry.partition, None)
+
+    def _record_upstream(self, seconds: float) -> None:
+        self.avg_upstream_s = seconds if not self.avg_upstream_s else 0.8 * self.avg_upstream_s + 0.2 * seconds
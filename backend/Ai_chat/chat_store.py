@@ -0,0 +1,173 @@
+"""
+Per-session chat history store (replaces the process-global `chat_history` deque).
+
+Each session (sessionId / tripId) gets its own bounded list of turns, so one
+user's messages never end up in another user's prompt.
+
+Backends, picked by CHAT_STORE_URL:
+    memory://              (default) in-process, LRU eviction of idle sessions
+    redis://host:6379/0    any Redis-protocol server, shared across workers/nodes
+    fakeredis://           in-process Redis stand-in for local dev (`pip install fakeredis`)
+
+Turns are stored compactly as a one-letter role + text ("u" / "a"), and
+expanded back to {"role": "user" | "ai", "content": ...} on read. Each
+session can also hold a rolling summary of turns that were compacted away.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+MAX_TURNS = int(os.getenv("CHAT_HISTORY_TURNS", "20"))
+MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "10000"))
+SESSION_IDLE_TTL = int(os.getenv("CHAT_SESSION_TTL", "3600"))
+
+_ROLE_CODES = {"user": "u", "ai": "a"}
+_CODE_ROLES = {"u": "user", "a": "ai"}
+
+
+def _expand(turns) -> list:
+    return [{"role": _CODE_ROLES[code], "content": text} for code, text in turns]
+
+
+class MemoryChatStore:
+    def __init__(self, max_turns: int = MAX_TURNS, max_sessions: int = MAX_SESSIONS, idle_ttl: int = SESSION_IDLE_TTL):
+        self.max_turns = max_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+
+        # session_id -> [last_used, deque[(role_code, text)], summary]
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _live(self, session_id: str):
+        entry = self._sessions.get(session_id)
+        if entry is not None and time.time() - entry[0] > self.idle_ttl:
+            del self._sessions[session_id]
+            self.evictions += 1
+            return None
+        return entry
+
+    def history(self, session_id: str) -> list:
+        with self._lock:
+            entry = self._live(session_id)
+            return _expand(entry[1]) if entry else []
+
+    def summary(self, session_id: str) -> str:
+        with self._lock:
+            entry = self._live(session_id)
+            return entry[2] if entry else ""
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None) or [now, deque(maxlen=self.max_turns), ""]
+            entry[1].append((_ROLE_CODES[role], content))
+            entry[0] = now
+            # most-recently-used session end me
+            self._sessions[session_id] = entry
+            self._evict(now)
+
+    def compact(self, session_id: str, summary: str, keep_last: int) -> None:
+        """
+        Rolling summary save karo aur sirf last `keep_last` turns rakho.
+        """
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            turns = entry[1]
+            while len(turns) > keep_last:
+                turns.popleft()
+            entry[2] = summary
+
+    def clear(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "evictions": self.evictions,
+            }
+
+    def _evict(self, now: float) -> None:
+        # idle sessions (oldest first) aur size limit se upar wale sessions hatao
+        while self._sessions:
+            oldest_id, entry = next(iter(self._sessions.items()))
+            if len(self._sessions) > self.max_sessions or now - entry[0] > self.idle_ttl:
+                del self._sessions[oldest_id]
+                self.evictions += 1
+            else:
+                break
+
+
+class RedisChatStore:
+    """
+    One Redis list per session: RPUSH + LTRIM keeps the last `max_turns`,
+    EXPIRE drops idle sessions (Redis does the LRU/TTL work for us).
+    The rolling summary lives in a sibling string key with the same TTL.
+    """
+
+    def __init__(self, client, max_turns: int = MAX_TURNS, idle_ttl: int = SESSION_IDLE_TTL, prefix: str = "tripmate:chat:"):
+        self.client = client
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    def history(self, session_id: str) -> list:
+        raw = self.client.lrange(self._key(session_id), 0, -1)
+        turns = []
+        for item in raw:
+            if isinstance(item, bytes):
+                item = item.decode("utf-8")
+            turns.append((item[0], item[1:]))
+        return _expand(turns)
+
+    def summary(self, session_id: str) -> str:
+        raw = self.client.get(self._key(session_id) + ":summary")
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return raw or ""
+
+    def append(self, session_id: str, role: str, content: str) -> None:
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.rpush(key, _ROLE_CODES[role] + content)
+        pipe.ltrim(key, -self.max_turns, -1)
+        pipe.expire(key, self.idle_ttl)
+        pipe.expire(key + ":summary", self.idle_ttl)
+        pipe.execute()
+
+    def compact(self, session_id: str, summary: str, keep_last: int) -> None:
+        key = self._key(session_id)
+        pipe = self.client.pipeline()
+        pipe.ltrim(key, -keep_last, -1)
+        pipe.set(key + ":summary", summary, ex=self.idle_ttl)
+        pipe.execute()
+
+    def clear(self, session_id: str) -> None:
+        key = self._key(session_id)
+        self.client.delete(key, key + ":summary")
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+def store_from_env():
+    url = os.getenv("CHAT_STORE_URL", "memory://")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        import redis
+
+        return RedisChatStore(redis.Redis.from_url(url))
+    if url.startswith("fakeredis://"):
+        import fakeredis
+
+        return RedisChatStore(fakeredis.FakeRedis())
+    return MemoryChatStore()
@@ -1,47 +1,107 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import requests
+import hmac
 import os
-from collections import deque
-from datetime import datetime
+import sys
+import json
+import re
+import time
+from datetime import date, datetime
+from functools import lru_cache
+
+# backend/ ko path me daalo taaki shared modules (http_client, ...) import ho sake
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+import llm_backend
+import observability
+import prompt_templates
+import serving
+import upstream_limiter
+from answer_cache import AnswerCache
+from chat_store import store_from_env
+from itinerary_cache import make_cache_key
+from prompt_budget import RECENT_TURNS, assemble_prompt, static_tokens, summarize_turns
+from observability import span
+from single_flight import flight_from_env
+from trip_cache import TripCache
+
+log = observability.setup_logging("chat")
 
 app = Flask(__name__)
 CORS(app)
+observability.instrument_app(app, request)
 
-# Groq API configuration
-GROQ_API_KEY = os.getenv('GROQ_API_KEY')
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = "llama-3.1-8b-instant"  # You can change this to other Groq models
+# LLM backend (Groq by default; LLM_BACKEND=openai / mock, see llm_backend.py).
+# Model badalna ho to LLM_MODEL / GROQ_MODEL env.
+LLM = llm_backend.backend_from_env()
 
 # ✅ NEW: Next.js API ka base URL (trip fetch ke liye)
 TRIP_API_BASE = os.getenv("TRIP_API_BASE", "http://127.0.0.1:3000/api/trips")
 
-# Keep a deque to store the last 20 interactions (user + ai pairs)
-chat_history = deque(maxlen=20)
+# Per-session history (sessionId / tripId), last CHAT_HISTORY_TURNS turns each
+chat_store = store_from_env()
 
-if GROQ_API_KEY:
-    print("✓ Groq API key loaded successfully")
-    print(f"✓ Using model: {GROQ_MODEL}")
+# identical in-flight Groq bodies (double submits, retries) share one call
+chat_flights = flight_from_env("chat", publishable=lambda result: result[0] == 200)
+
+# admission control; chat sabse upar priority pe (itinerary / batch ke saath shared budget)
+llm_limiter = upstream_limiter.limiter_from_env("chat", LLM.model)
+
+# /healthz + /readyz (ready = warm-up done, not draining, LLM key set)
+serving.add_health_routes(app, {"llm": lambda: LLM.configured})
+
+if LLM.configured:
+    log.info("llm backend ready", extra=LLM.describe())
 else:
-    print("✗ WARNING: GROQ_API_KEY not found in environment variables")
+    log.warning(f"{LLM.key_env} not found in environment variables", extra=LLM.describe())
+
+
+# Common ISO timestamps (JS toISOString, Mongo dates): inka formatted date bas
+# pehle 10 chars hain, agar woh valid calendar date ho. Baaki sab full parse.
+_ISO_TIMESTAMP_RE = re.compile(
+    r"(\d{4}-\d{2}-\d{2})"
+    r"(?:T(?:[01]\d|2[0-3]):[0-5]\d(?::[0-5]\d(?:\.\d{3}|\.\d{6})?)?)?"
+    r"(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)?"
+)
+
+
+@lru_cache(maxsize=16384)
+def _is_calendar_date(day: str) -> bool:
+    try:
+        date.fromisoformat(day)
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=4096)
+def _format_date_text(date_text: str) -> str:
+    try:
+        # ISO format handle
+        dt = datetime.fromisoformat(date_text.replace("Z", "+00:00"))
+        return dt.date().isoformat()
+    except ValueError:
+        return date_text
 
 
 def format_date(date_str: str) -> str:
     """
     Helper: ISO ya Date string ko human readable date me convert kare.
+    Sirf calendar date parse hoti hai (memoized), time part regex se validate.
     """
-    try:
-        # ISO format handle
-        dt = datetime.fromisoformat(str(date_str).replace("Z", "+00:00"))
-        return dt.strftime("%Y-%m-%d")
-    except Exception:
-        return str(date_str)
+    date_text = str(date_str)
+    match = _ISO_TIMESTAMP_RE.fullmatch(date_text)
+    if match:
+        day = match.group(1)
+        return day if _is_calendar_date(day) else date_text
+    return _format_date_text(date_text)
 
 
-def build_trip_context(trip: dict | None, activities: list | None) -> str:
+def trip_header_lines(trip: dict | None) -> list[str]:
     """
-    Trip + activities ko ek context string me convert karo
-    jo system prompt me jayega.
+    Trip summary lines (from/to/dates/budget) for the system prompt.
     """
     lines: list[str] = []
 
@@ -61,41 +121,115 @@ def build_trip_context(trip: dict | None, activities: list | None) -> str:
             lines.append(f"- Approx daily budget: ₹{trip['dailyBudget']}")
         lines.append("")  # blank line
 
-    if activities:
-        # Sort by date if available
-        try:
-            sorted_acts = sorted(
-                activities,
-                key=lambda a: a.get("date") or "",
-            )
-        except Exception:
-            sorted_acts = activities
+    return lines
+
+
+def _raw_date_key(act: dict) -> str:
+    date_raw = act.get("date") or ""
+    return date_raw if isinstance(date_raw, str) else str(date_raw)
 
-        lines.append("Planned activities for this trip:")
-        current_date = None
-        day_counter = 1
 
-        for act in sorted_acts:
-            date_raw = act.get("date")
-            date_text = format_date(date_raw) if date_raw else "Unknown date"
+def group_activities_by_day(activities: list | None) -> list[tuple[str, list]]:
+    """
+    Activities ko formatted date se group karo: [(date_text, [activity, ...]), ...].
+    Ek sort (raw date string, C-level) + ek pass; har distinct raw date sirf
+    ek baar parse hoti hai. Missing dates pehle aate hain ("Unknown date").
+    """
+    if not activities:
+        return []
+
+    # dict insertion order = sorted order of each day's first activity
+    groups: dict[str, list] = {}
+    parsed: dict[str, str] = {"": "Unknown date"}
+    for act in sorted(activities, key=_raw_date_key):
+        sort_key = _raw_date_key(act)
+        date_text = parsed.get(sort_key)
+        if date_text is None:
+            date_text = parsed[sort_key] = format_date(sort_key)
+
+        bucket = groups.get(date_text)
+        if bucket is None:
+            groups[date_text] = [act]
+        else:
+            bucket.append(act)
 
-            if date_text != current_date:
-                lines.append(f"\nDay {day_counter} ({date_text}):")
-                current_date = date_text
-                day_counter += 1
+    return list(groups.items())
 
-            name = act.get("name") or act.get("title") or "Activity"
-            location = act.get("location", "")
-            description = act.get("description", "")
 
-            # ek line me compress
-            line = f"- {name}"
-            if location:
-                line += f" at {location}"
-            if description:
-                line += f" | {description}"
+def activity_line(act: dict) -> str:
+    name = act.get("name") or act.get("title") or "Activity"
+    location = act.get("location", "")
+    description = act.get("description", "")
 
-            lines.append(line)
+    # ek line me compress
+    if location and description:
+        return f"- {name} at {location} | {description}"
+    if location:
+        return f"- {name} at {location}"
+    if description:
+        return f"- {name} | {description}"
+    return f"- {name}"
+
+
+def activity_day_blocks(activities: list | None, days: list | None = None) -> list[tuple[str, str]]:
+    """
+    Activities ko day-wise blocks me render karo: [(full, compact), ...].
+    full = ek activity per line (location + description),
+    compact = sirf names, ek line me (token budget tight ho tab).
+    `days` = already grouped output of group_activities_by_day (reuse ke liye).
+    """
+    if days is None:
+        days = group_activities_by_day(activities)
+
+    blocks = []
+    for number, (date_text, acts) in enumerate(days, start=1):
+        heading = f"\nDay {number} ({date_text}):"
+        full = "\n".join([heading] + [activity_line(act) for act in acts])
+        names = "; ".join(act.get("name") or act.get("title") or "Activity" for act in acts)
+        blocks.append((full, f"{heading} {names}"))
+    return blocks
+
+
+_DAY_RANGE_RE = re.compile(r"\bdays?\s*(\d{1,3})(?:\s*(?:-|to|and|&)\s*(?:day\s*)?(\d{1,3}))?", re.IGNORECASE)
+_ISO_DATE_RE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+
+
+def relevant_day_window(question: str, day_dates: list[str], padding: int = 1) -> tuple[int, int] | None:
+    """
+    Sawaal me "day 3", "days 2-4" ya "2024-01-15" ho to sirf un days (+/- padding)
+    ka window (start, end) 0-based inclusive; warna None (poora trip).
+    """
+    if not question or not day_dates:
+        return None
+
+    wanted: list[int] = []
+    for match in _DAY_RANGE_RE.finditer(question):
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) else first
+        wanted.extend((min(first, last) - 1, max(first, last) - 1))
+    if _ISO_DATE_RE.search(question):
+        positions = {date: i for i, date in enumerate(day_dates)}
+        for date in _ISO_DATE_RE.findall(question):
+            if date in positions:
+                wanted.append(positions[date])
+
+    wanted = [i for i in wanted if 0 <= i < len(day_dates)]
+    if not wanted:
+        return None
+    return max(min(wanted) - padding, 0), min(max(wanted) + padding, len(day_dates) - 1)
+
+
+def build_trip_context(trip: dict | None, activities: list | None) -> str:
+    """
+    Trip + activities ko ek context string me convert karo
+    jo system prompt me jayega.
+    """
+    lines = trip_header_lines(trip)
+
+    blocks = activity_day_blocks(activities)
+    if blocks:
+        lines.append("Planned activities for this trip:")
+        lines.extend(full for full, _ in blocks)
 
     if not lines:
         return "No saved trip or activities were provided."
@@ -103,26 +237,365 @@ def build_trip_context(trip: dict | None, activities: list | None) -> str:
     return "\n".join(lines)
 
 
-# ✅ NEW: Next.js API se trip fetch karne ka helper
-def fetch_trip_from_next(trip_id: str) -> dict | None:
+def render_trip(trip_info: dict, activities: list) -> dict:
     """
-    Next.js ki /api/trips/:id se trip + activities leke aata hai.
+    Trip context ko prompt-ready pieces me render karo (ek baar, phir cache):
+    header text + day-wise activity blocks for the token-budgeted assembly.
+    """
+    header_lines = trip_header_lines(trip_info)
+    days = group_activities_by_day(activities)
+    day_blocks = activity_day_blocks(activities, days)
+    if day_blocks:
+        header_lines.append("Planned activities for this trip:")
+    return {
+        "tripInfo": trip_info,
+        "header": "\n".join(header_lines),
+        "dayBlocks": day_blocks,
+        "dayDates": [date_text for date_text, _ in days],
+    }
+
+
+def fetch_trip_conditional(trip_id: str, etag: str | None = None) -> tuple[int, dict | None, str | None]:
+    """
+    Next.js ki /api/trips/:id se trip + activities; etag diya ho to
+    If-None-Match bhejta hai. Returns (status, data, etag); status 0 = error.
     """
     try:
         url = f"{TRIP_API_BASE}/{trip_id}"
-        print("Fetching trip for chat from:", url)
-        resp = requests.get(url, timeout=5)
+        log.debug("fetching trip for chat", extra={"url": url})
+        headers = {"If-None-Match": etag} if etag else {}
+        resp = http_client.session.get(url, headers=headers, timeout=5)
+        if resp.status_code == 304:
+            return 304, None, etag
         resp.raise_for_status()
-        return resp.json()
+        return resp.status_code, resp.json(), resp.headers.get("ETag")
     except Exception as e:
-        print("Error fetching trip from Next.js for chat:", e)
+        log.warning("trip fetch from Next.js failed", extra={"trip_id": trip_id, "error": str(e)})
+        return 0, None, None
+
+
+# ✅ NEW: Next.js API se trip fetch karne ka helper
+def fetch_trip_from_next(trip_id: str) -> dict | None:
+    """
+    Next.js ki /api/trips/:id se trip + activities leke aata hai.
+    """
+    _, data, _ = fetch_trip_conditional(trip_id)
+    return data
+
+
+# 🔹 Base prompt
+# prompts/chat_system.txt: base prompt (static prefix) + trip context + summary
+CHAT_SYSTEM_TEMPLATE = prompt_templates.get("chat_system")
+
+
+def trip_from_next_data(trip_data: dict) -> tuple[dict, list]:
+    """
+    Next.js trip JSON -> (trip summary, activities).
+    """
+    # Trip ka summary
+    trip_info = {
+        "destination": trip_data.get("destination"),
+        "currentLocation": trip_data.get("currentLocation"),
+        "startDate": trip_data.get("startDate"),
+        "endDate": trip_data.get("endDate"),
+        "travelers": trip_data.get("travelers"),
+        "budgetRange": trip_data.get("budgetRange"),
+        "dailyBudget": trip_data.get("dailyBudget"),
+    }
+    # Activities direct DB se
+    return trip_info, trip_data.get("activities", [])
+
+
+def chat_session_id(data: dict, remote_addr: str | None) -> str:
+    """
+    History kis session ki hai: sessionId > tripId > trip._id > client IP.
+    """
+    trip = data.get("trip") or {}
+    for candidate in (data.get("sessionId"), data.get("tripId"), trip.get("_id")):
+        if candidate:
+            return str(candidate)
+    return f"ip:{remote_addr or 'unknown'}"
+
+
+def rolled_history(session_id: str) -> tuple[list, str]:
+    """
+    Last RECENT_TURNS turns raw rakho; usse purane turns rolling summary me
+    fold karke store me compact kar do (summary per session cached rehti hai).
+    """
+    history = chat_store.history(session_id)
+    summary = chat_store.summary(session_id)
+    if len(history) > RECENT_TURNS:
+        old, history = history[:-RECENT_TURNS], history[-RECENT_TURNS:]
+        summary = summarize_turns(summary, old)
+        chat_store.compact(session_id, summary, RECENT_TURNS)
+    return history, summary
+
+
+def build_chat_prompt(session_id: str, rendered: dict, question: str = "") -> tuple[list, dict]:
+    """
+    System prompt + rendered trip context + is session ki history, token budget ke andar.
+    Sawaal kisi specific day/date ka ho to sirf us window ke day blocks jaate hain.
+    Returns (Groq messages, per-section token report).
+    """
+    history, summary = rolled_history(session_id)
+
+    with span("prompt_build"):
+        day_blocks = rendered["dayBlocks"]
+        window = relevant_day_window(question, rendered.get("dayDates") or [])
+        if window:
+            day_blocks = day_blocks[window[0]: window[1] + 1]
+
+        messages, report = assemble_prompt(
+            CHAT_SYSTEM_TEMPLATE,
+            rendered["header"],
+            day_blocks,
+            summary,
+            history,
+        )
+    report["dayWindow"] = [window[0] + 1, window[1] + 1] if window else None
+    return messages, report
+
+
+def render_next_trip(trip_data: dict) -> dict:
+    return render_trip(*trip_from_next_data(trip_data))
+
+
+# Fetched trip JSON + rendered context, per tripId (stale-while-revalidate)
+trip_cache = TripCache(fetch_trip_conditional, render_next_trip)
+
+# Destination FAQs ("best time to visit Goa") ke jawab, semantic match pe (see answer_cache.py)
+answer_cache = AnswerCache()
+
+# answer cache list / purge + trip invalidate ke liye; unset ho to woh routes 404 (CORS khula hai)
+CHAT_ADMIN_TOKEN = os.getenv("CHAT_ADMIN_TOKEN", "")
+
+
+def admin_denied(headers) -> tuple[dict, int] | None:
+    """
+    Admin routes ka guard: `Authorization: Bearer <CHAT_ADMIN_TOKEN>` ya
+    `X-Admin-Token` header. None = allowed, warna (body, status).
+    """
+    if not CHAT_ADMIN_TOKEN:
+        return {"error": "Not found"}, 404
+    auth = headers.get("Authorization", "")
+    token = auth[7:] if auth.startswith("Bearer ") else headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode("utf-8"), CHAT_ADMIN_TOKEN.encode("utf-8")):
+        return {"error": "Unauthorized"}, 401
+    return None
+
+
+def groq_chat_body(messages: list, stream: bool = False) -> dict:
+    return {
+        "model": LLM.model,
+        "messages": messages,
+        "max_tokens": 150,
+        "temperature": 0.7,
+        "stream": stream,
+    }
+
+
+def reply_from_groq(ai_data: dict) -> str:
+    if "choices" in ai_data and len(ai_data["choices"]) > 0:
+        return ai_data["choices"][0]["message"]["content"].strip()
+    return "Sorry, no response from the AI service."
+
+
+def api_error_reply(status_code: int, body_text: str, fallback: str) -> str:
+    """
+    Groq ka non-2xx response -> user ko dikhane layak reply.
+    """
+    try:
+        error_data = json.loads(body_text)
+        error_msg = error_data.get("error", {}).get("message", fallback)
+        return f"API Error: {error_msg}"
+    except Exception:
+        return f"API Error (Status {status_code}): {body_text[:200]}"
+
+
+def chat_flight_key(body: dict) -> str:
+    return make_cache_key(body, LLM.model, "chat")
+
+
+def post_groq_chat(body: dict) -> tuple[int, str]:
+    """
+    Groq call -> (status, body text); plain data taaki single-flight share kar sake.
+    Token usage yahin (leader pe) count hota hai, coalesced followers pe nahi.
+    """
+    with llm_limiter.slot(body) as ticket:
+        with span("upstream_wait"):
+            response = http_client.session.post(
+                LLM.url,
+                headers=LLM.headers(),
+                json=body,
+                timeout=60,
+            )
+        ticket.observe(response.status_code, response.headers.get("Retry-After"))
+        if response.ok:
+            record_chat_usage(response.text, ticket)
+    return response.status_code, response.text
+
+
+def usage_tokens(ai_data: dict) -> int:
+    return (ai_data.get("usage") or {}).get("total_tokens") or 0
+
+
+def record_chat_usage(body_text: str, ticket=None) -> None:
+    try:
+        data = json.loads(body_text)
+    except ValueError:
+        return
+    observability.record_llm_usage(data, LLM.model)
+    if ticket is not None:
+        ticket.record_usage(data)
+
+
+def busy_reply(e: upstream_limiter.Overloaded) -> tuple[dict, dict]:
+    """
+    Admission control ne slot nahi diya: (body, headers) for a 503 + Retry-After,
+    lambe wait ke baad "API Error" nahi.
+    """
+    reply = f"The AI service is busy right now. Please try again in {e.retry_after} seconds."
+    return {"reply": reply}, {"Retry-After": str(e.retry_after)}
+
+
+# ================== STREAMING (SSE) ==================
+
+def wants_sse(data: dict, accept: str) -> bool:
+    """
+    Streaming reply: body me "stream": true, ya Accept: text/event-stream.
+    """
+    return bool(data.get("stream")) or "text/event-stream" in accept
+
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def sse_chunk(raw_line: bytes) -> dict | None:
+    """
+    Upstream SSE line -> chunk dict; "[DONE]" / non-data lines -> None.
+    """
+    line = raw_line.decode("utf-8").strip()
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if payload == "[DONE]":
         return None
+    return json.loads(payload)
+
+
+def chunk_delta(chunk: dict, stats, ticket) -> str:
+    """
+    Ek stream chunk: usage counters / TPM refund / TTFT, aur content delta (ya "").
+    """
+    observability.record_llm_usage(chunk, LLM.model)
+    ticket.record_usage(chunk)
+    stats.usage(chunk)
+    choices = chunk.get("choices") or []
+    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+    if delta:
+        stats.token()
+    return delta or ""
+
+
+def stream_chat(session_id: str, body: dict, remember=None):
+    """
+    SSE events:
+      event: token   data: {"text": "..."}          har upstream delta pe
+      event: done    data: {"reply", "ttftMs", "tokens", "tokensPerSecond", "totalMs"}
+      event: error   data: {"error": "...", "retryAfter"?}
+    Reply history me sirf poora stream complete hone pe jata hai. Client
+    disconnect => generator close => upstream response close (connection
+    drop), to baaki tokens generate/bill nahi hote. `remember(reply, report)`
+    complete stream ke baad (answer cache).
+    """
+    stats = observability.StreamStats(LLM.model)
+    parts = []
+    try:
+        with llm_limiter.slot(body) as ticket, span("upstream_stream"), http_client.session.post(
+            LLM.url,
+            headers=LLM.headers(),
+            json=body,
+            timeout=60,
+            stream=True,
+        ) as response:
+            ticket.observe(response.status_code, response.headers.get("Retry-After"))
+            if not response.ok:
+                status = response.status_code
+                yield sse_event("error", {"error": api_error_reply(status, response.text, f"{status} Error from Groq API")})
+                return
+            for raw_line in response.iter_lines():
+                chunk = sse_chunk(raw_line) if raw_line else None
+                if chunk is None:
+                    continue
+                delta = chunk_delta(chunk, stats, ticket)
+                if delta:
+                    parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+    except GeneratorExit:
+        stats.cancelled()
+        log.info("chat stream cancelled by client", extra={"session": session_id, **stats.finish()})
+        raise
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (stream)", extra={"reason": e.reason})
+        yield sse_event("error", {**busy_reply(e)[0], "retryAfter": e.retry_after})
+        return
+    except requests.exceptions.RequestException as e:
+        log.error("groq chat stream failed", extra={"error": str(e)})
+        yield sse_event("error", {"error": f"Connection error: {str(e)}"})
+        return
+
+    ai_reply = "".join(parts).strip() or "Sorry, no response from the AI service."
+    chat_store.append(session_id, "ai", ai_reply)
+    report = stats.finish()
+    log.info("chat stream finished", extra={"session": session_id, **report})
+    if remember is not None:
+        remember(ai_reply, report)
+    yield sse_event("done", {"reply": ai_reply, **report})
+
+
+SSE_HEADERS = {"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+
+
+# ================== ANSWER CACHE ==================
+
+def lookup_cached_answer(session_id: str, rendered: dict, question: str):
+    """
+    Answer cache lookup; hit pe reply history me bhi jata hai (jaise upstream reply).
+    """
+    with span("answer_cache"):
+        cached = answer_cache.lookup(rendered["tripInfo"].get("destination"), question)
+    if cached.entry is not None:
+        chat_store.append(session_id, "ai", cached.entry.reply)
+        log.info("chat answer cache hit", extra={
+            "session": session_id, "entry": cached.entry.id, "similarity": round(cached.similarity, 3),
+        })
+    return cached
+
+
+def cached_sse_body(reply: str) -> str:
+    # stream client ke liye same events, bas ek hi token event
+    return sse_event("token", {"text": reply}) + sse_event("done", {"reply": reply, "cached": True})
+
+
+def answer_saver(cached, rendered: dict):
+    """
+    stream_chat ka `remember`: poora reply answer cache me (store() khud decide karta hai).
+    """
+    def remember(reply: str, report: dict) -> None:
+        answer_cache.store(cached, reply, report["totalMs"] / 1000, report["tokens"] or 0, rendered["tripInfo"])
+    return remember
+
+
+def missing_key_reply() -> str:
+    return f"LLM API key is not configured. Please set {LLM.key_env} environment variable."
 
 
 @app.route("/chat", methods=["POST"])
 def chat():
     try:
-        data = request.get_json()
+        with span("parse_input"):
+            data = request.get_json()
         if not data:
             return jsonify({"reply": "Invalid request. No data received."}), 400
 
@@ -130,133 +603,161 @@ def chat():
         if not user_message:
             return jsonify({"reply": "Please send a valid message."}), 400
 
-        # 🔹 Pehle try karo tripId se DB/Next se fetch karna
+        # 🔹 Pehle try karo tripId se (cache, warna DB/Next se fetch)
         trip_id = data.get("tripId")
-        trip_info = {}
-        activities = []
-
-        if trip_id:
-            trip_data = fetch_trip_from_next(trip_id)
-            if trip_data:
-                # Trip ka summary
-                trip_info = {
-                    "destination": trip_data.get("destination"),
-                    "currentLocation": trip_data.get("currentLocation"),
-                    "startDate": trip_data.get("startDate"),
-                    "endDate": trip_data.get("endDate"),
-                    "travelers": trip_data.get("travelers"),
-                    "budgetRange": trip_data.get("budgetRange"),
-                    "dailyBudget": trip_data.get("dailyBudget"),
-                }
-                # Activities direct DB se
-                activities = trip_data.get("activities", [])
-        else:
-            # ⚠️ Fallback: agar koi purana client trip/activities body me bhej raha ho to
-            trip_info = data.get("trip") or {}
-            activities = data.get("activities") or []
-
-        # trip context build karo
-        trip_context = build_trip_context(trip_info, activities)
-
-        if not GROQ_API_KEY:
-            print("ERROR: GROQ_API_KEY is not set")
-            return (
-                jsonify(
-                    {
-                        "reply": "Groq API key is not configured. Please set GROQ_API_KEY environment variable."
-                    }
-                ),
-                500,
-            )
-
-        # history me user ka message daal do
-        chat_history.append({"role": "user", "content": user_message})
-
-        # 🔹 Base prompt
-        base_system_prompt = """You are a helpful assistant specialized in trip planning.
-Your job is to answer travel-related questions only and do not answer any other questions.
-Use the user's trip details and planned activities to give personalized answers.
-
-Guidelines:
-- If you are unsure, say: "I'm not sure about that. Please try again."
-- Keep responses short, simple, and clear.
-- Avoid long paragraphs or unnecessary details.
-- Prefer concise bullet-point or one-line answers when suggesting itineraries.
-- Example:
-    Instead of: "Based on your trip details, I recommend spending 7-10 days in Kerala..."
-    You should reply like:
-    - Day 1-2: Cochin
-    - Day 3-4: Munnar
-    - Day 5-6: Thekkady
-    - Day 7-8: Alleppey
-    - Day 9-10: Trivandrum
-- Respond in a single, straightforward sentence when possible.
-"""
-
-        # 🔹 Trip context attach kar diya
-        system_prompt = (
-            base_system_prompt
-            + "\n\nHere is the user's current trip and activities:\n"
-            + trip_context
-        )
 
-        # messages banate hain
-        messages = [{"role": "system", "content": system_prompt}]
-
-        # history add karo
-        for msg in chat_history:
-            role = "assistant" if msg["role"] == "ai" else msg["role"]
-            messages.append({"role": role, "content": msg["content"]})
-
-        # Groq call
-        response = requests.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {GROQ_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": GROQ_MODEL,
-                "messages": messages,
-                "max_tokens": 150,
-                "temperature": 0.7,
-                "stream": False,
-            },
-            timeout=60,
-        )
+        with span("trip_context"):
+            if trip_id:
+                entry = trip_cache.get(trip_id)
+                rendered = entry.rendered if entry else render_trip({}, [])
+            else:
+                # ⚠️ Fallback: agar koi purana client trip/activities body me bhej raha ho to
+                rendered = render_trip(data.get("trip") or {}, data.get("activities") or [])
 
-        response.raise_for_status()
-        ai_data = response.json()
+        if not LLM.configured:
+            log.error(LLM.missing_key_message())
+            return jsonify({"reply": missing_key_reply()}), 500
 
-        if "choices" in ai_data and len(ai_data["choices"]) > 0:
-            ai_reply = ai_data["choices"][0]["message"]["content"].strip()
-        else:
-            ai_reply = "Sorry, no response from the AI service."
+        # history me user ka message daal do
+        session_id = chat_session_id(data, request.remote_addr)
+        chat_store.append(session_id, "user", user_message)
+        stream = wants_sse(data, request.headers.get("Accept", ""))
+
+        # destination FAQ pehle bhi pucha ja chuka? to Groq call hi nahi
+        cached = lookup_cached_answer(session_id, rendered, user_message)
+        if cached.entry is not None:
+            if stream:
+                return Response(cached_sse_body(cached.entry.reply), mimetype="text/event-stream", headers=SSE_HEADERS)
+            return jsonify({"reply": cached.entry.reply, "cached": True})
+
+        # trip context + history token budget ke andar
+        messages, prompt_report = build_chat_prompt(session_id, rendered, user_message)
+        log.info("chat prompt", extra={"prompt_tokens": prompt_report})
+
+        # streaming: tokens as they arrive (no single-flight; stream share nahi hota)
+        if stream:
+            return Response(
+                stream_chat(session_id, groq_chat_body(messages, stream=True), answer_saver(cached, rendered)),
+                mimetype="text/event-stream",
+                headers=SSE_HEADERS,
+            )
 
-        # history me AI ka reply daal do
-        chat_history.append({"role": "ai", "content": ai_reply})
+        # Groq call (same body already in flight => uska result)
+        body = groq_chat_body(messages)
+        started = time.perf_counter()
+        status, body_text = chat_flights.do(chat_flight_key(body), lambda: post_groq_chat(body))
+        upstream_s = time.perf_counter() - started
 
+        if status >= 400:
+            ai_reply = api_error_reply(status, body_text, f"{status} Error from Groq API")
+        else:
+            with span("json_parse"):
+                ai_data = json.loads(body_text)
+                ai_reply = reply_from_groq(ai_data)
+
+            # history me AI ka reply daal do
+            chat_store.append(session_id, "ai", ai_reply)
+            answer_cache.store(cached, ai_reply, upstream_s, usage_tokens(ai_data), rendered["tripInfo"])
+
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded", extra={"reason": e.reason})
+        body, headers = busy_reply(e)
+        return jsonify(body), 503, headers
     except requests.exceptions.RequestException as e:
         if hasattr(e, "response") and e.response is not None:
-            try:
-                error_data = e.response.json()
-                error_msg = error_data.get("error", {}).get("message", str(e))
-                ai_reply = f"API Error: {error_msg}"
-            except Exception:
-                ai_reply = (
-                    f"API Error (Status {e.response.status_code}): "
-                    f"{e.response.text[:200]}"
-                )
+            ai_reply = api_error_reply(e.response.status_code, e.response.text, str(e))
         else:
             ai_reply = f"Connection error: {str(e)}"
     except Exception as e:
-        import traceback
-
-        traceback.print_exc()
+        log.exception("unexpected error in /chat")
         ai_reply = f"An unexpected error occurred: {str(e)}"
 
-    return jsonify({"reply": ai_reply})
+    with span("serialize"):
+        return jsonify({"reply": ai_reply})
+
+
+def preload() -> None:
+    """
+    serve.py master me, fork se pehle: system prompt ka static token estimate
+    cache me (workers copy-on-write share karte hain).
+    """
+    static_tokens(CHAT_SYSTEM_TEMPLATE.static_prefix)
+
+
+def warm_up() -> None:
+    """
+    Har worker me, traffic se pehle: LLM host + Next.js trips API ke connections khol do.
+    """
+    opened = serving.warm_connections(
+        http_client.session,
+        [(serving.models_url(LLM.url), LLM.headers()), (TRIP_API_BASE, {})],
+    )
+    log.info("upstream connections warmed", extra={"requests": opened})
+
+
+@app.route("/upstream-stats", methods=["GET"])
+def upstream_stats():
+    return jsonify(http_client.metrics.snapshot())
+
+
+@app.route("/trips/<trip_id>/invalidate", methods=["POST"])
+def invalidate_trip(trip_id):
+    """
+    Next.js trip edit/delete/itinerary save ke baad call karta hai
+    (CHAT_ADMIN_TOKEN ke saath; bina token ke koi bhi trips evict kar sakta tha).
+    """
+    denied = admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    return jsonify({"invalidated": trip_cache.invalidate(trip_id)})
+
+
+@app.route("/chat/trip-cache-stats", methods=["GET"])
+def trip_cache_stats():
+    return jsonify(trip_cache.stats())
+
+
+@app.route("/chat/answer-cache-stats", methods=["GET"])
+def answer_cache_stats():
+    return jsonify(answer_cache.stats())
+
+
+@app.route("/chat/answer-cache", methods=["GET"])
+def answer_cache_entries():
+    """
+    Admin: cached answers, newest first (?destination=goa&limit=100).
+    """
+    denied = admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    entries = answer_cache.entries(request.args.get("destination"), request.args.get("limit", 100, type=int))
+    return jsonify({"stats": answer_cache.stats(), "entries": entries})
+
+
+@app.route("/chat/answer-cache", methods=["DELETE"])
+def purge_answer_cache():
+    """
+    Admin: sab, ?destination=goa wale, ya ?id=12 wali entry hatao.
+    """
+    denied = admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    purged = answer_cache.purge(request.args.get("destination"), request.args.get("id", type=int))
+    return jsonify({"purged": purged})
+
+
+@app.route("/single-flight-stats", methods=["GET"])
+def single_flight_stats():
+    return jsonify(chat_flights.stats())
+
+
+@app.route("/upstream-limiter-stats", methods=["GET"])
+def upstream_limiter_stats():
+    return jsonify(llm_limiter.stats())
 
 
 if __name__ == "__main__":
+    # Dev server; production: `python serve.py chat` (workers, warm-up, graceful drain)
+    warm_up()
+    serving.mark_ready()
     app.run(debug=True, host="127.0.0.1", port=5000)
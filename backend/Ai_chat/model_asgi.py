@@ -0,0 +1,279 @@
+"""
+ASGI entry point for the chat service.
+
+    cd Ai_chat
+    hypercorn model_asgi:app --bind 127.0.0.1:5000
+
+Same /chat contract as model.py (prompt, context building and the session
+history store are reused from there), but the Next.js trip fetch and the Groq call run on the
+event loop through an aiohttp session instead of blocking a worker thread.
+"""
+import asyncio
+import json
+import time
+
+import aiohttp
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+
+import model as chat_app  # backend/ ko sys.path me daalta hai
+
+import http_client
+import observability
+import serving
+import upstream_limiter
+from observability import span
+
+log = observability.get_logger("chat")
+
+app = cors(Quart(__name__))
+observability.instrument_app(app, request, is_async=True)
+serving.add_health_routes(app, {"llm": lambda: chat_app.LLM.configured}, is_async=True)
+
+upstream: aiohttp.ClientSession | None = None
+
+
+@app.before_serving
+async def open_upstream_session():
+    global upstream
+    upstream = http_client.make_async_session(total_timeout=60)
+    # keep-alive connections pehle se, phir /readyz 200
+    await serving.warm_connections_async(
+        upstream, [(serving.models_url(chat_app.LLM.url), chat_app.LLM.headers()), (chat_app.TRIP_API_BASE, {})]
+    )
+    serving.mark_ready()
+
+
+@app.after_serving
+async def close_upstream_session():
+    await upstream.close()
+
+
+async def fetch_trip_from_next(trip_id: str) -> dict | None:
+    """
+    Async version of model.fetch_trip_from_next (same 5 s budget), fronted by
+    the shared trip cache: fresh/stale entries skip Next.js entirely (stale ones
+    revalidate in the background), misses are fetched here and cached.
+    """
+    entry = chat_app.trip_cache.lookup(trip_id)
+    if entry is not None:
+        return entry.rendered
+
+    generation = chat_app.trip_cache.generation(trip_id)
+    try:
+        url = f"{chat_app.TRIP_API_BASE}/{trip_id}"
+        started = time.perf_counter()
+        async with upstream.get(url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+            if resp.status >= 400:
+                raise RuntimeError(f"{resp.status} {resp.reason}")
+            data = await resp.json(content_type=None)
+            etag = resp.headers.get("ETag")
+        entry = chat_app.trip_cache.put(trip_id, data, etag, time.perf_counter() - started, generation)
+        return entry.rendered
+    except Exception as e:
+        log.warning("trip fetch from Next.js failed", extra={"trip_id": trip_id, "error": str(e)})
+        return None
+
+
+@app.route("/upstream-stats", methods=["GET"])
+async def upstream_stats():
+    return jsonify(http_client.metrics.snapshot())
+
+
+@app.route("/trips/<trip_id>/invalidate", methods=["POST"])
+async def invalidate_trip(trip_id):
+    denied = chat_app.admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    return jsonify({"invalidated": chat_app.trip_cache.invalidate(trip_id)})
+
+
+@app.route("/chat/trip-cache-stats", methods=["GET"])
+async def trip_cache_stats():
+    return jsonify(chat_app.trip_cache.stats())
+
+
+@app.route("/chat/answer-cache-stats", methods=["GET"])
+async def answer_cache_stats():
+    return jsonify(chat_app.answer_cache.stats())
+
+
+@app.route("/chat/answer-cache", methods=["GET"])
+async def answer_cache_entries():
+    denied = chat_app.admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    entries = chat_app.answer_cache.entries(
+        request.args.get("destination"), request.args.get("limit", 100, type=int)
+    )
+    return jsonify({"stats": chat_app.answer_cache.stats(), "entries": entries})
+
+
+@app.route("/chat/answer-cache", methods=["DELETE"])
+async def purge_answer_cache():
+    denied = chat_app.admin_denied(request.headers)
+    if denied:
+        return jsonify(denied[0]), denied[1]
+    purged = chat_app.answer_cache.purge(request.args.get("destination"), request.args.get("id", type=int))
+    return jsonify({"purged": purged})
+
+
+@app.route("/single-flight-stats", methods=["GET"])
+async def single_flight_stats():
+    return jsonify(chat_app.chat_flights.stats())
+
+
+@app.route("/upstream-limiter-stats", methods=["GET"])
+async def upstream_limiter_stats():
+    return jsonify(chat_app.llm_limiter.stats())
+
+
+async def stream_chat_async(session_id: str, body: dict, remember=None):
+    """
+    Async version of model.stream_chat (same SSE events). Client disconnect
+    pe Quart generator cancel karta hai; `async with` upstream connection band
+    kar deta hai, to Groq aage tokens generate nahi karta.
+    """
+    stats = observability.StreamStats(chat_app.LLM.model)
+    parts = []
+    try:
+        async with chat_app.llm_limiter.slot_async(body) as ticket:
+            with span("upstream_stream"):
+                async with upstream.post(chat_app.LLM.url, headers=chat_app.LLM.headers(), json=body) as response:
+                    ticket.observe(response.status, response.headers.get("Retry-After"))
+                    if response.status >= 400:
+                        text = await response.text()
+                        error = chat_app.api_error_reply(response.status, text, f"{response.status} {response.reason}")
+                        yield chat_app.sse_event("error", {"error": error})
+                        return
+                    async for raw_line in response.content:
+                        chunk = chat_app.sse_chunk(raw_line)
+                        if chunk is None:
+                            continue
+                        delta = chat_app.chunk_delta(chunk, stats, ticket)
+                        if delta:
+                            parts.append(delta)
+                            yield chat_app.sse_event("token", {"text": delta})
+    except (asyncio.CancelledError, GeneratorExit):
+        stats.cancelled()
+        log.info("chat stream cancelled by client", extra={"session": session_id, **stats.finish()})
+        raise
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (stream)", extra={"reason": e.reason})
+        yield chat_app.sse_event("error", {**chat_app.busy_reply(e)[0], "retryAfter": e.retry_after})
+        return
+    except (aiohttp.ClientError, TimeoutError) as e:
+        log.error("groq chat stream failed", extra={"error": str(e)})
+        yield chat_app.sse_event("error", {"error": f"Connection error: {str(e)}"})
+        return
+
+    ai_reply = "".join(parts).strip() or "Sorry, no response from the AI service."
+    chat_app.chat_store.append(session_id, "ai", ai_reply)
+    report = stats.finish()
+    log.info("chat stream finished", extra={"session": session_id, **report})
+    if remember is not None:
+        remember(ai_reply, report)
+    yield chat_app.sse_event("done", {"reply": ai_reply, **report})
+
+
+@app.route("/chat", methods=["POST"])
+async def chat():
+    try:
+        with span("parse_input"):
+            data = await request.get_json()
+        if not data:
+            return jsonify({"reply": "Invalid request. No data received."}), 400
+
+        user_message = data.get("message", "").strip()
+        if not user_message:
+            return jsonify({"reply": "Please send a valid message."}), 400
+
+        trip_id = data.get("tripId")
+
+        with span("trip_context"):
+            if trip_id:
+                rendered = await fetch_trip_from_next(trip_id) or chat_app.render_trip({}, [])
+            else:
+                rendered = chat_app.render_trip(data.get("trip") or {}, data.get("activities") or [])
+
+        if not chat_app.LLM.configured:
+            log.error(chat_app.LLM.missing_key_message())
+            return jsonify({"reply": chat_app.missing_key_reply()}), 500
+
+        session_id = chat_app.chat_session_id(data, request.remote_addr)
+        chat_app.chat_store.append(session_id, "user", user_message)
+        stream = chat_app.wants_sse(data, request.headers.get("Accept", ""))
+
+        cached = chat_app.lookup_cached_answer(session_id, rendered, user_message)
+        if cached.entry is not None:
+            if stream:
+                return Response(
+                    chat_app.cached_sse_body(cached.entry.reply),
+                    mimetype="text/event-stream",
+                    headers=chat_app.SSE_HEADERS,
+                )
+            return jsonify({"reply": cached.entry.reply, "cached": True})
+
+        messages, _ = chat_app.build_chat_prompt(session_id, rendered, user_message)
+
+        if stream:
+            return Response(
+                stream_chat_async(
+                    session_id,
+                    chat_app.groq_chat_body(messages, stream=True),
+                    chat_app.answer_saver(cached, rendered),
+                ),
+                mimetype="text/event-stream",
+                headers=chat_app.SSE_HEADERS,
+            )
+
+        groq_body = chat_app.groq_chat_body(messages)
+
+        async def post_groq_chat():
+            async with chat_app.llm_limiter.slot_async(groq_body) as ticket:
+                with span("upstream_wait"):
+                    result = await http_client.async_request(
+                        upstream,
+                        "POST",
+                        chat_app.LLM.url,
+                        headers=chat_app.LLM.headers(),
+                        json=groq_body,
+                    )
+                ticket.observe(result[0], result[3].get("Retry-After"))
+                if result[0] < 400:
+                    chat_app.record_chat_usage(result[1], ticket)
+            # headers JSON me nahi jaate (cross-process single-flight store)
+            return result[:3]
+
+        started = time.perf_counter()
+        status, body, reason = await chat_app.chat_flights.do_async(
+            chat_app.chat_flight_key(groq_body), post_groq_chat
+        )
+        upstream_s = time.perf_counter() - started
+        if status >= 400:
+            return jsonify({"reply": chat_app.api_error_reply(status, body, f"{status} {reason}")})
+        with span("json_parse"):
+            ai_data = json.loads(body)
+            ai_reply = chat_app.reply_from_groq(ai_data)
+
+        chat_app.chat_store.append(session_id, "ai", ai_reply)
+        chat_app.answer_cache.store(
+            cached, ai_reply, upstream_s, chat_app.usage_tokens(ai_data), rendered["tripInfo"]
+        )
+
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded", extra={"reason": e.reason})
+        body, headers = chat_app.busy_reply(e)
+        return jsonify(body), 503, headers
+    except (aiohttp.ClientError, TimeoutError) as e:
+        ai_reply = f"Connection error: {str(e)}"
+    except Exception as e:
+        log.exception("unexpected error in /chat")
+        ai_reply = f"An unexpected error occurred: {str(e)}"
+
+    with span("serialize"):
+        return jsonify({"reply": ai_reply})
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=5000)
@@ -0,0 +1,162 @@
+"""
+Token-budgeted prompt assembly for /chat.
+
+Every /chat call used to send the full base prompt, the full trip context and
+up to 20 raw history turns. This module fits those sections into a token
+budget instead:
+
+- an offline token estimate (no tokenizer download / network)
+- activities rendered per day, compressed (names only) and then cut by day
+  when they don't fit
+- history older than the last CHAT_RECENT_TURNS turns is folded into a rolling
+  summary that is cached per session in the chat store
+- a per-section token report for logging
+
+Config (env):
+    CHAT_PROMPT_TOKEN_BUDGET   prompt-side token budget (default 1500)
+    CHAT_RECENT_TURNS          raw turns kept verbatim (default 6)
+    CHAT_SUMMARY_MAX_TOKENS    cap on the rolling summary (default 200)
+"""
+import os
+import re
+from functools import lru_cache
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("CHAT_PROMPT_TOKEN_BUDGET", "1500"))
+RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
+
+# chat template overhead per message (role header + separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# words, 1-3 digit groups, and every other non-space char (punctuation, ₹, emoji...)
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    BPE-style estimate: one token per word piece, long words split every
+    ~6 chars, digits in groups of 3, punctuation / non-ASCII one each.
+    Llama-3 tokenizer se ~10% ke andar rehta hai for English travel text.
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        if len(piece) > 6 and piece[0].isalpha():
+            count += (len(piece) + 5) // 6
+        else:
+            count += 1
+    return count
+
+
+# system prompt ka static prefix har call pe same hai; uska estimate ek baar
+# (public: serve.py preload fork se pehle isi cache ko bharta hai)
+static_tokens = lru_cache(maxsize=16)(estimate_tokens)
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    first = _SENTENCE_END_RE.split(text, 1)[0]
+    if len(first) > max_chars:
+        first = first[: max_chars - 3].rstrip() + "..."
+    return first
+
+
+def summarize_turns(previous_summary: str, turns: list) -> str:
+    """
+    Rolling extractive summary: har purane turn ki pehli sentence, clipped.
+    Summary SUMMARY_MAX_TOKENS se badi ho to sabse purani lines drop.
+    """
+    lines = [line for line in previous_summary.split("\n") if line] if previous_summary else []
+    for turn in turns:
+        who = "User" if turn["role"] == "user" else "Assistant"
+        lines.append(f"- {who}: {_clip(turn['content'], 120)}")
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > SUMMARY_MAX_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def fit_day_blocks(day_blocks: list, budget: int) -> tuple[str, str]:
+    """
+    day_blocks: [(full_text, compact_text), ...] in day order.
+    Returns (rendered text, mode) where mode is "full" / "compact" / "truncated".
+    """
+    if not day_blocks:
+        return "", "full"
+
+    full = "\n".join(block for block, _ in day_blocks)
+    if estimate_tokens(full) <= budget:
+        return full, "full"
+
+    compact = "\n".join(block for _, block in day_blocks)
+    if estimate_tokens(compact) <= budget:
+        return compact, "compact"
+
+    kept = []
+    used = 0
+    for _, block in day_blocks:
+        cost = estimate_tokens(block)
+        if used + cost > budget:
+            break
+        kept.append(block)
+        used += cost
+    omitted = len(day_blocks) - len(kept)
+    kept.append(f"\n(+{omitted} more days not shown)")
+    return "\n".join(kept), "truncated"
+
+
+def assemble_prompt(
+    system_template,
+    trip_header: str,
+    day_blocks: list,
+    summary: str,
+    recent_turns: list,
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> tuple[list, dict]:
+    """
+    Sections ko budget me fit karke Groq messages + per-section token report
+    return karta hai. Priority: base prompt > trip header > latest turns >
+    summary > activities > older recent turns.
+    `system_template` (prompt_templates.PromptTemplate, slots trip_context +
+    summary): static base prompt pehle, taaki upstream prefix cache lage.
+    """
+    report = {
+        "budget": budget,
+        "system": static_tokens(system_template.static_prefix) + MESSAGE_OVERHEAD_TOKENS,
+        "tripHeader": estimate_tokens(trip_header),
+    }
+
+    summary_text = f"\n\nEarlier in this conversation:\n{summary}" if summary else ""
+    report["summary"] = estimate_tokens(summary_text)
+
+    turns = list(recent_turns)
+    turn_costs = [estimate_tokens(t["content"]) + MESSAGE_OVERHEAD_TOKENS for t in turns]
+
+    fixed = report["system"] + report["tripHeader"] + report["summary"]
+    # budget tight ho to purane recent turns chhodo (latest 2 hamesha rehte hain)
+    while len(turns) > 2 and fixed + sum(turn_costs) > budget:
+        turns.pop(0)
+        turn_costs.pop(0)
+    report["history"] = sum(turn_costs)
+    report["historyTurns"] = len(turns)
+
+    activity_budget = max(budget - fixed - report["history"], 0)
+    activities_text, mode = fit_day_blocks(day_blocks, activity_budget)
+    report["activities"] = estimate_tokens(activities_text)
+    report["activitiesMode"] = mode
+
+    trip_context = "\n".join(part for part in (trip_header, activities_text) if part)
+    if not trip_context:
+        trip_context = "No saved trip or activities were provided."
+
+    system_prompt = system_template.render(trip_context=trip_context, summary=summary_text)
+
+    messages = [{"role": "system", "content": system_prompt}]
+    for msg in turns:
+        role = "assistant" if msg["role"] == "ai" else msg["role"]
+        messages.append({"role": role, "content": msg["content"]})
+
+    report["total"] = report["system"] + report["tripHeader"] + report["summary"] + report["history"] + report["activities"]
+    return messages, report
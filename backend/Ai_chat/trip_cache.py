@@ -0,0 +1,210 @@
+"""
+Per-trip cache for /chat: fetched trip JSON + its rendered prompt context.
+
+Trip data rarely changes inside a conversation, so /chat should not wait on
+Next.js for every message:
+
+- age < TRIP_CACHE_FRESH_TTL        served as-is
+- age < TRIP_CACHE_STALE_TTL        served immediately (stale-while-revalidate),
+                                    a background conditional GET (If-None-Match)
+                                    refreshes it; 304 just bumps the timestamp
+- older / missing                   fetched synchronously
+- invalidate(trip_id)               called when a trip is edited; bumps the
+                                    trip's generation, so a fetch / background
+                                    revalidate that started before it cannot
+                                    write the old trip back
+
+Cache (aur invalidation) per worker process hai: Next.js ka invalidate call
+jis worker pe pahuncha sirf wahi drop karta hai, baaki workers me purana trip
+TRIP_CACHE_FRESH_TTL tak fresh, phir revalidate pe ETag badla milta hai.
+Multi-worker deploys me staleness ki upper bound isliye FRESH_TTL hai.
+
+Stats (hits, stale hits, misses, revalidations, latency saved) via stats().
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger("tripmate.trip_cache")
+
+FRESH_TTL = float(os.getenv("TRIP_CACHE_FRESH_TTL", "30"))
+STALE_TTL = float(os.getenv("TRIP_CACHE_STALE_TTL", "1800"))
+MAX_TRIPS = int(os.getenv("TRIP_CACHE_MAX_TRIPS", "2000"))
+
+
+class TripEntry:
+    __slots__ = ("data", "etag", "rendered", "fetched_at")
+
+    def __init__(self, data: dict, etag: str | None, rendered, fetched_at: float):
+        self.data = data
+        self.etag = etag
+        self.rendered = rendered
+        self.fetched_at = fetched_at
+
+
+class TripCache:
+    def __init__(self, fetcher, render, fresh_ttl: float = FRESH_TTL, stale_ttl: float = STALE_TTL, max_trips: int = MAX_TRIPS):
+        """
+        fetcher(trip_id, etag) -> (status, data | None, etag | None); status 304 = unchanged
+        render(data) -> prompt-ready context (whatever /chat needs), cached with the data
+        """
+        self.fetcher = fetcher
+        self.render = render
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = stale_ttl
+        self.max_trips = max_trips
+
+        self._entries: "OrderedDict[str, TripEntry]" = OrderedDict()
+        self._revalidating: set[str] = set()
+        # trip_id -> invalidate() count; fetch se pehle snapshot, put pe match
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.refreshed = 0
+        self.fetch_errors = 0
+        self.discarded = 0
+        # EWMA of a Next.js fetch; har cache hit itna latency bachata hai
+        self.avg_fetch_s = 0.0
+        self.saved_s = 0.0
+
+    # ---------- public API ----------
+
+    def lookup(self, trip_id: str) -> TripEntry | None:
+        """
+        Cache-only lookup. Fresh/stale entries are returned (stale ones also
+        schedule a background revalidation); None means the caller must fetch.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(trip_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            age = now - entry.fetched_at
+            if age >= self.stale_ttl:
+                del self._entries[trip_id]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(trip_id)
+            self.saved_s += self.avg_fetch_s
+            if age < self.fresh_ttl:
+                self.hits += 1
+                return entry
+
+            self.stale_hits += 1
+            if trip_id not in self._revalidating:
+                self._revalidating.add(trip_id)
+                threading.Thread(
+                    target=self._revalidate,
+                    args=(trip_id, entry.etag, self._generations.get(trip_id, 0)),
+                    daemon=True,
+                ).start()
+            return entry
+
+    def get(self, trip_id: str) -> TripEntry | None:
+        """
+        lookup() + synchronous fetch on miss (Flask path).
+        """
+        entry = self.lookup(trip_id)
+        if entry is not None:
+            return entry
+
+        generation = self.generation(trip_id)
+        started = time.perf_counter()
+        status, data, etag = self.fetcher(trip_id, None)
+        elapsed = time.perf_counter() - started
+        if status != 200 or data is None:
+            with self._lock:
+                self.fetch_errors += 1
+            return None
+        return self.put(trip_id, data, etag, elapsed, generation)
+
+    def generation(self, trip_id: str) -> int:
+        """
+        Fetch shuru karne se pehle lo aur put() ko do.
+        """
+        with self._lock:
+            return self._generations.get(trip_id, 0)
+
+    def put(
+        self, trip_id: str, data: dict, etag: str | None, fetch_seconds: float | None = None, generation: int | None = None
+    ) -> TripEntry:
+        """
+        generation diya ho aur beech me invalidate() hua ho to entry caller ko
+        milti hai par cache me nahi jaati (fetch invalidation se pehle ka tha).
+        """
+        entry = TripEntry(data, etag, self.render(data), time.time())
+        with self._lock:
+            if fetch_seconds is not None:
+                self._record_fetch(fetch_seconds)
+            if generation is not None and generation != self._generations.get(trip_id, 0):
+                self.discarded += 1
+                return entry
+            self._entries[trip_id] = entry
+            self._entries.move_to_end(trip_id)
+            while len(self._entries) > self.max_trips:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, trip_id: str) -> bool:
+        with self._lock:
+            self._generations[trip_id] = self._generations.get(trip_id, 0) + 1
+            return self._entries.pop(trip_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "trips": len(self._entries),
+                "hits": self.hits,
+                "staleHits": self.stale_hits,
+                "misses": self.misses,
+                "hitRate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "revalidatedNotModified": self.not_modified,
+                "revalidatedChanged": self.refreshed,
+                "fetchErrors": self.fetch_errors,
+                "discardedAfterInvalidate": self.discarded,
+                "avgFetchMs": round(self.avg_fetch_s * 1000, 1),
+                "latencySavedMs": round(self.saved_s * 1000, 1),
+            }
+
+    # ---------- internals ----------
+
+    def _record_fetch(self, seconds: float) -> None:
+        # lock must be held
+        self.avg_fetch_s = seconds if not self.avg_fetch_s else 0.8 * self.avg_fetch_s + 0.2 * seconds
+
+    def _revalidate(self, trip_id: str, etag: str | None, generation: int) -> None:
+        try:
+            started = time.perf_counter()
+            status, data, new_etag = self.fetcher(trip_id, etag)
+            elapsed = time.perf_counter() - started
+
+            if status == 304:
+                with self._lock:
+                    self._record_fetch(elapsed)
+                    self.not_modified += 1
+                    entry = self._entries.get(trip_id)
+                    if entry is not None and generation == self._generations.get(trip_id, 0):
+                        entry.fetched_at = time.time()
+            elif status == 200 and data is not None:
+                self.put(trip_id, data, new_etag, elapsed, generation)
+                with self._lock:
+                    self.refreshed += 1
+            else:
+                with self._lock:
+                    self.fetch_errors += 1
+        except Exception as e:
+            log.warning("trip revalidation failed", extra={"trip_id": trip_id, "error": str(e)})
+            with self._lock:
+                self.fetch_errors += 1
+        finally:
+            with self._lock:
+                self._revalidating.discard(trip_id)
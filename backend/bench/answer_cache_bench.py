@@ -0,0 +1,106 @@
+"""
+Chat answer cache on a synthetic FAQ workload (no server, no LLM).
+
+Each destination gets a set of FAQ intents, each asked as several paraphrases,
+plus trip-specific / follow-up questions that must never be served from cache.
+Questions arrive in random order; a miss stores an answer tagged with its
+intent, a hit is checked against the asked intent:
+
+    hit rate     hits / cacheable lookups
+    false hits   hits that returned another intent's answer (should be 0)
+    skipped      questions the cache refused to look up (personal, day 3, ...)
+
+Also times lookup+store per question at the requested cache size.
+
+    cd backend
+    python bench/answer_cache_bench.py --rounds 20 --threshold 0.82
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "Ai_chat"))
+
+from answer_cache import AnswerCache  # noqa: E402
+
+DESTINATIONS = {"Goa": "Mumbai", "Munnar": "Kochi", "Jaipur": "Delhi", "Manali": "Chandigarh"}
+
+INTENTS = {
+    "best-time": ["What is the best time to visit {d}?", "best time to visit {d}",
+                  "When should I visit {d}?", "Which is the best season to visit {d}?"],
+    "reach": ["How to reach {d} from {o}?", "how do I get to {d} from {o}",
+              "How can I reach {d} from {o}", "best way to get to {d} from {o}?"],
+    "reach-back": ["How to reach {o} from {d}?", "how do I get to {o} from {d}"],
+    "food": ["What food should I try in {d}?", "Famous food to try in {d}",
+             "what dishes to eat in {d}?", "Which local cuisine to try in {d}?"],
+    "stay": ["Where to stay in {d}?", "Best area to stay in {d}",
+             "where should I stay in {d}?", "good hotels area in {d} to stay"],
+    "safety": ["Is {d} safe for solo travellers?", "is {d} safe for solo travelers",
+               "How safe is {d} for solo travellers?"],
+    "3-days": ["What to do in {d} in 3 days?", "3 days in {d} what to do", "things to do in {d} in 3 days"],
+    "5-days": ["What to do in {d} in 5 days?", "5 days in {d} what to do"],
+}
+UNCACHEABLE = ["What should we do on day 2?", "Can you change my itinerary?", "What about that one?",
+               "Is it going to rain tomorrow in {d}?", "Suggest something for our anniversary dinner"]
+
+
+def workload(rounds: int, rng: random.Random) -> list:
+    questions = []
+    for _ in range(rounds):
+        for d, o in DESTINATIONS.items():
+            for intent, phrasings in INTENTS.items():
+                questions.append((d, intent, rng.choice(phrasings).format(d=d, o=o)))
+            questions.append((d, None, rng.choice(UNCACHEABLE).format(d=d)))
+    rng.shuffle(questions)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.82)
+    parser.add_argument("--fill", type=int, default=2000, help="unrelated entries pre-loaded (index size)")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache = AnswerCache(threshold=args.threshold, max_entries=args.fill + 1000, enabled=True)
+    for i in range(args.fill):
+        d = rng.choice(list(DESTINATIONS))
+        filler = cache.lookup(d, f"question {i} about place{i} and topic{i % 97} in {d}")
+        cache.store(filler, f"filler {i}")
+
+    questions = workload(args.rounds, rng)
+    answers = {}
+    false_hits = []
+    started = time.perf_counter()
+    for d, intent, question in questions:
+        found = cache.lookup(d, question)
+        if found.entry is not None:
+            if answers.get(found.entry.id) != intent:
+                false_hits.append((question, found.entry.question, round(found.similarity, 3)))
+            continue
+        entry = cache.store(found, f"answer for {intent}", upstream_seconds=0.8, tokens=700)
+        if entry is not None:
+            answers[entry.id] = intent
+    elapsed = time.perf_counter() - started
+
+    stats = cache.stats()
+    cacheable = stats["hits"] + stats["misses"] - args.fill
+    print(f"{len(questions)} questions, {len(DESTINATIONS)} destinations, {len(INTENTS)} intents, "
+          f"threshold {args.threshold}, {args.fill} filler entries")
+    print(f"hit rate: {stats['hits'] / max(cacheable, 1):.1%} of cacheable lookups "
+          f"({stats['hits']} hits, {stats['misses'] - args.fill} misses), skipped {stats['skipped']}")
+    print(f"false hits: {len(false_hits)}")
+    for asked, matched, similarity in false_hits[:10]:
+        print(f"  {asked!r} -> {matched!r} ({similarity})")
+    print(f"stored answers: {stats['stored'] - args.fill}, latency saved (0.8 s/call): {stats['latencySavedMs'] / 1000:.1f} s, "
+          f"tokens saved: {stats['tokensSaved']}")
+    print(f"lookup+store: {elapsed / len(questions) * 1e6:.1f} us/question")
+
+
+if __name__ == "__main__":
+    main()
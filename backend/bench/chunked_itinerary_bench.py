@@ -0,0 +1,135 @@
+"""
+Single-shot vs chunked itinerary generation, wall clock per trip length.
+
+A local stub Groq server answers like a model that streams at a fixed token
+rate: latency = --first-token + output tokens / --tokens-per-s, with
+~--day-tokens output tokens per generated day (skeleton days are cheap).
+Each trip length is generated through the Flask app both ways:
+
+    cd backend
+    python bench/chunked_itinerary_bench.py --days 2,7,14 --tokens-per-s 250
+
+No network / Groq key needed; GROQ_API_URL is pointed at the stub.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SINGLE_RE = re.compile(r"Create a detailed (\d+)-day")
+BATCH_RE = re.compile(r"Generate ONLY days (\d+) to (\d+)")
+OUTLINE_RE = re.compile(r"Number of Days: (\d+)")
+
+
+def fake_day(n: int) -> dict:
+    return {
+        "day": n,
+        "date": "2024-01-15",
+        "activities": [
+            {
+                "time": f"{h}:00 AM",
+                "type": "activity",
+                "title": f"Stop {h}",
+                "location": "Baga Beach",
+                "description": "Walk",
+                "estimatedCost": "₹200 per person",
+                "duration": "1 hour",
+            }
+            for h in (8, 10, 11)
+        ],
+    }
+
+
+def make_handler(first_token: float, tokens_per_s: float, day_tokens: int):
+    class StubGroq(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            prompt = body["messages"][-1]["content"]
+
+            if m := BATCH_RE.search(prompt):
+                first, last = int(m.group(1)), int(m.group(2))
+                content = {"itinerary": [fake_day(n) for n in range(first, last + 1)]}
+                tokens = day_tokens * (last - first + 1)
+            elif m := SINGLE_RE.search(prompt):
+                days = int(m.group(1))
+                content = {
+                    "itinerary": [fake_day(n) for n in range(1, days + 1)],
+                    "totalEstimatedCost": "₹0",
+                    "transportation": {},
+                }
+                # 4000-token cap: lambe trips yahin kat jaate
+                tokens = min(day_tokens * days, body.get("max_tokens", 4000))
+            else:
+                days = int(OUTLINE_RE.search(prompt).group(1))
+                content = {
+                    "days": [{"day": n, "theme": "Beaches", "area": "North Goa"} for n in range(1, days + 1)],
+                    "accommodation": "Midrange hotel in Calangute",
+                    "transportation": {"toDestination": {"mode": "train"}, "fromDestination": {"mode": "train"}},
+                }
+                tokens = 60 + 25 * days
+
+            time.sleep(first_token + tokens / tokens_per_s)
+            payload = json.dumps({"choices": [{"message": {"content": json.dumps(content)}}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return StubGroq
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="2,7,14")
+    parser.add_argument("--first-token", type=float, default=0.3)
+    parser.add_argument("--tokens-per-s", type=float, default=250)
+    parser.add_argument("--day-tokens", type=int, default=450)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.first_token, args.tokens_per_s, args.day_tokens))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["GROQ_API_URL"] = f"http://127.0.0.1:{server.server_port}/openai/v1/chat/completions"
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+    os.environ["ITINERARY_CACHE_SIZE"] = "0"
+    import iternary_ai
+
+    client = iternary_ai.app.test_client()
+    print(f"{'days':<6} {'single_s':<10} {'chunked_s':<10} {'single_days':<12} chunked_days")
+    for days in [int(d) for d in args.days.split(",")]:
+        row = []
+        for chunked in (False, True):
+            payload = {
+                "destination": "Goa",
+                "currentLocation": "Mumbai",
+                "startDate": "2024-01-15",
+                "endDate": f"2024-01-{14 + days:02d}",
+                "travelers": 2,
+                "chunked": chunked,
+                "refresh": True,
+            }
+            t0 = time.perf_counter()
+            resp = client.post("/generate-itinerary", json=payload)
+            elapsed = time.perf_counter() - t0
+            got = len(resp.get_json()["itinerary"]["itinerary"]) if resp.status_code == 200 else resp.status_code
+            row.append((elapsed, got))
+        print(f"{days:<6} {row[0][0]:<10.2f} {row[1][0]:<10.2f} {row[0][1]!s:<12} {row[1][1]}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cost aggregation over a synthetic nightly batch output.
+
+    legacy     the old per-activity loop (one regex search per cost string,
+               totals only, no budget check)
+    per-trip   itinerary_costs.cost_summary called once per itinerary
+    batch      itinerary_costs.summarize_batch over the whole output at once
+
+Also checks that the batch and per-trip results are identical.
+
+    cd backend
+    python bench/cost_bench.py --itineraries 2000 --repeat 5
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import itinerary_costs
+
+TYPES = ["transportation", "activity", "meal", "meal", "activity", "accommodation"]
+COSTS = ["₹{n} per person", "₹{n}", "₹{n}-{m} per person", "Free", "Rs. {n} pp", "₹{n} for 2 people", "varies"]
+
+_LEGACY_NUMBER_RE = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def legacy_total(days: list, travelers) -> str:
+    # pre-itinerary_costs itinerary_chunks.total_estimated_cost, kept as the baseline
+    try:
+        people = max(int(float(travelers)), 1)
+    except (TypeError, ValueError):
+        people = 1
+    total = 0.0
+    for day in days:
+        for act in day.get("activities", []):
+            text = str(act.get("estimatedCost") or "")
+            match = _LEGACY_NUMBER_RE.search(text)
+            if not match:
+                continue
+            amount = float(match.group().replace(",", ""))
+            total += amount * people if "per person" in text.lower() else amount
+    return f"₹{int(round(total))}"
+
+
+def random_itinerary(rng: random.Random) -> tuple[list, dict]:
+    days = []
+    for d in range(1, rng.randint(2, 10) + 1):
+        activities = []
+        for _ in range(rng.randint(4, 7)):
+            n = rng.randrange(0, 4000, 50)
+            activities.append({
+                "type": rng.choice(TYPES),
+                "estimatedCost": rng.choice(COSTS).format(n=n, m=n + 500),
+            })
+        days.append({"day": d, "activities": activities})
+    trip = {
+        "travelers": rng.randint(1, 6),
+        "daily_budget": rng.choice([0, 1750, 3500, 6000]),
+        "budget_range": rng.choice(["budget", "midrange", "luxury", "custom"]),
+    }
+    return days, trip
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itineraries", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    batch = [random_itinerary(rng) for _ in range(args.itineraries)]
+    n_days = sum(len(days) for days, _ in batch)
+    n_acts = sum(len(day["activities"]) for days, _ in batch for day in days)
+
+    batched = itinerary_costs.summarize_batch(batch)
+    per_trip = [itinerary_costs.cost_summary(days, trip) for days, trip in batch]
+    if batched != per_trip:
+        sys.exit("batch and per-trip summaries differ")
+
+    timings = {
+        "legacy": best_of(args.repeat, lambda: [legacy_total(days, trip["travelers"]) for days, trip in batch]),
+        "per-trip": best_of(args.repeat, lambda: [itinerary_costs.cost_summary(d, t) for d, t in batch]),
+        "batch": best_of(args.repeat, lambda: itinerary_costs.summarize_batch(batch)),
+    }
+
+    over = sum(1 for s in batched if s["overBudgetDays"])
+    print(f"{args.itineraries} itineraries, {n_days} days, {n_acts} activities")
+    print(f"over budget: {over} itineraries, {sum(len(s['overBudgetDays']) for s in batched)} days")
+    for name, seconds in timings.items():
+        print(f"{name:>9}: {seconds * 1000:8.1f} ms  ({n_acts / seconds / 1e6:5.2f} M activities/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+Async itinerary jobs: web-side latency, worker pool throughput, dedupe, crash recovery.
+
+Runs bench/mock_llm_server.py, a worker pool (`python itinerary_jobs.py worker`)
+as a subprocess, and the Flask app in-process:
+
+    sync          how long /generate-itinerary holds a web thread per trip
+    enqueue       POST /generate-itinerary/jobs latency (202) -- the web-side cost now
+    drain         --trips jobs (every --dup'th one a duplicate payload) until all
+                  finished; LLM calls vs unique trips, callbacks received
+    crash         pool is SIGKILLed while jobs are running, restarted, and every
+                  job must still finish (leases expire after --visibility s)
+
+    cd backend
+    python bench/job_queue_bench.py --trips 24 --processes 2 --threads 4
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "bench"))
+
+WORK_DIR = tempfile.mkdtemp(prefix="job-queue-")
+os.environ.setdefault("LLM_BACKEND", "mock")
+os.environ["ITINERARY_JOBS_DB"] = os.path.join(WORK_DIR, "jobs.db")
+os.environ["DESTINATION_INDEX_PATH"] = os.path.join(WORK_DIR, "destinations.idx")
+os.environ["DESTINATION_INDEX_LEARN"] = "0"
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["LOG_SAMPLE_RATE"] = "0"
+# callback receiver isi machine pe hai
+os.environ["ITINERARY_JOBS_CALLBACK_HOSTS"] = "127.0.0.1"
+os.environ["ITINERARY_JOBS_CALLBACK_PRIVATE"] = "1"
+
+from mock_llm_server import MockLLMServer  # noqa: E402
+
+DESTINATIONS = ["Goa", "Jaipur", "Manali", "Kochi", "Udaipur", "Rishikesh", "Varanasi", "Shillong",
+                "Hampi", "Ooty", "Leh", "Pondicherry", "Darjeeling", "Gokarna", "Mysore", "Amritsar"]
+
+
+class Callbacks(BaseHTTPRequestHandler):
+    received = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            self.received.append(body["jobId"])
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def payload(n: int, days: int = 3, refresh: bool = False) -> dict:
+    return {
+        "destination": DESTINATIONS[n % len(DESTINATIONS)], "currentLocation": "Delhi",
+        "startDate": "2025-03-10", "endDate": f"2025-03-{9 + days:02d}", "travelers": 1 + n // len(DESTINATIONS),
+        "budgetRange": "midrange", "interests": ["food"], "refresh": refresh,
+    }
+
+
+def start_pool(args) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "itinerary_jobs.py", "worker", "--processes", str(args.processes),
+         "--threads", str(args.threads)],
+        cwd=BACKEND_DIR, env={**os.environ, "ITINERARY_JOBS_POLL": "0.1", "LOG_LEVEL": "ERROR"},
+        start_new_session=True,
+    )
+
+
+def kill_pool(pool: subprocess.Popen, sig=signal.SIGKILL) -> None:
+    # process group: parent + forked children ek saath
+    os.killpg(pool.pid, sig)
+    pool.wait()
+
+
+def wait_all(client, ids: list, timeout: float) -> tuple[dict, float]:
+    started = time.perf_counter()
+    states = {}
+    while time.perf_counter() - started < timeout:
+        states = {job_id: client.get(f"/generate-itinerary/jobs/{job_id}").get_json() for job_id in ids}
+        if all(s["state"] in ("succeeded", "failed") for s in states.values()):
+            break
+        time.sleep(0.2)
+    return states, time.perf_counter() - started
+
+
+def enqueue(client, specs: list, callback: str) -> tuple[list, list]:
+    ids, latencies = [], []
+    for spec in specs:
+        started = time.perf_counter()
+        resp = client.post("/generate-itinerary/jobs", json={**spec, "callbackUrl": callback})
+        latencies.append((time.perf_counter() - started) * 1000)
+        assert resp.status_code == 202, resp.get_data(as_text=True)
+        ids.append(resp.get_json()["jobId"])
+    return ids, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=24)
+    parser.add_argument("--dup", type=int, default=4, help="every N-th trip repeats the previous payload")
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--visibility", type=float, default=6.0)
+    parser.add_argument("--tokens-per-s", type=float, default=400.0)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    args = parser.parse_args()
+
+    os.environ["ITINERARY_JOBS_VISIBILITY"] = str(args.visibility)
+    srv = MockLLMServer(profile={"ttft": args.ttft, "tokens_per_s": args.tokens_per_s}).start()
+    os.environ["LLM_BASE_URL"] = srv.url
+    hook = ThreadingHTTPServer(("127.0.0.1", 0), Callbacks)
+    threading.Thread(target=hook.serve_forever, daemon=True).start()
+    callback = f"http://127.0.0.1:{hook.server_address[1]}/done"
+
+    import iternary_ai
+    import itinerary_jobs
+
+    client = iternary_ai.app.test_client()
+
+    started = time.perf_counter()
+    resp = client.post("/generate-itinerary", json=payload(999, refresh=True))
+    sync_s = time.perf_counter() - started
+    assert resp.status_code == 200
+
+    specs, n = [], 0
+    for i in range(args.trips):
+        if i % args.dup != args.dup - 1:
+            n += 1
+        specs.append(payload(n))
+    unique = len({json.dumps(s, sort_keys=True) for s in specs})
+
+    srv.reset_stats()
+    pool = start_pool(args)
+    try:
+        ids, latencies = enqueue(client, specs, callback)
+        states, drain_s = wait_all(client, ids, timeout=300)
+        succeeded = sum(s["state"] == "succeeded" for s in states.values())
+        time.sleep(1)
+        print(f"{args.trips} trips ({unique} unique), pool {args.processes} x {args.threads}, "
+              f"mock LLM {args.tokens_per_s:g} tok/s")
+        print(f"sync /generate-itinerary holds a web thread: {sync_s * 1000:.0f} ms")
+        print(f"enqueue (202): p50 {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms; "
+              f"{len(set(ids))} job ids")
+        print(f"drain: {succeeded}/{len(set(ids))} succeeded in {drain_s:.1f} s "
+              f"({len(set(ids)) / drain_s:.2f} jobs/s), {srv.stats['calls']} LLM calls, "
+              f"{len(Callbacks.received)} callbacks")
+
+        # ---------- crash recovery ----------
+        Callbacks.received.clear()
+        crash_specs = [payload(100 + i, days=4, refresh=True) for i in range(args.processes * args.threads)]
+        crash_ids, _ = enqueue(client, crash_specs, callback)
+        time.sleep(args.ttft + 0.5)
+        running = itinerary_jobs.job_queue.stats()["states"]["running"]
+        kill_pool(pool)
+        print(f"crash: SIGKILLed the pool with {running} jobs running")
+        pool = start_pool(args)
+        states, recover_s = wait_all(client, crash_ids, timeout=300)
+        time.sleep(1)
+        redelivered = sum(s["attempts"] > 1 for s in states.values())
+        done = sum(s["state"] == "succeeded" for s in states.values())
+        print(f"recovery: {done}/{len(crash_ids)} succeeded after restart in {recover_s:.1f} s "
+              f"(visibility {args.visibility:g} s), {redelivered} redelivered, "
+              f"{len(set(Callbacks.received))} callbacks")
+        print(f"queue: {json.dumps(itinerary_jobs.job_queue.stats()['states'])}")
+    finally:
+        kill_pool(pool, signal.SIGTERM)
+        hook.shutdown()
+
+
+if __name__ == "__main__":
+    main()
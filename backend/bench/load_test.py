@@ -0,0 +1,289 @@
+"""
+Load test: Flask vs ASGI entry point against the local mock LLM server.
+
+Starts bench/mock_llm_server.py in-process (LLM_BACKEND=mock, so no network /
+key / paid tokens), spawns the service pointed at it and fires requests --
+closed loop (C in flight) or open loop (--rate requests/s) -- then reports
+throughput, p50/p90/p99 latency, errors by status, the service's peak RSS and
+the mock's call/token counts:
+
+    cd backend
+    python bench/load_test.py --service itinerary --requests 400 --concurrency 200 --profile groq
+    python bench/load_test.py --service chat --flavours asgi --rate 50 --requests 500 --profile flaky
+    python bench/load_test.py --replay recordings.jsonl --profile slow   # recorded real answers
+    python bench/load_test.py --flavours flask,prod --concurrency 50      # debug server vs serve.py
+
+Flavours: flask (dev server), asgi (hypercorn, 1 worker), prod (serve.py:
+gunicorn preload + gthread workers), prod-asgi (serve.py --asgi). startup_s =
+spawn se pehle 200 /readyz tak (import + preload + warm-up).
+
+Itinerary bodies cycle through --distinct destinations with refresh=true, so
+cache / single-flight don't hide the upstream (--distinct 1 to measure them).
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import mock_llm_server  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DESTINATIONS = ["Goa", "Jaipur", "Manali", "Udaipur", "Rishikesh", "Munnar", "Pondicherry", "Varanasi",
+                "Leh", "Hampi", "Darjeeling", "Coorg"]
+
+CHAT_TRIP = {
+    "destination": "Goa",
+    "startDate": "2024-01-15",
+    "endDate": "2024-01-18",
+    "travelers": 2,
+    "budget": "₹30000",
+}
+CHAT_ACTIVITIES = [
+    {"day": 1, "time": "10:00 AM", "title": "Beach walk", "location": "Baga Beach", "type": "activity"},
+    {"day": 2, "time": "09:00 AM", "title": "Old Goa churches", "location": "Old Goa", "type": "activity"},
+]
+
+SERVICES = {
+    "itinerary": {
+        "cwd": BACKEND_DIR,
+        "port": 5001,
+        "flask": [sys.executable, "iternary_ai.py"],
+        "asgi": [sys.executable, "-m", "hypercorn", "iternary_asgi:app", "--bind", "127.0.0.1:5001", "--backlog", "4096"],
+        "prod": [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "itinerary"],
+        "prod-asgi": [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "itinerary", "--asgi"],
+        "path": "/generate-itinerary",
+        "body": {
+            "destination": "Goa",
+            "currentLocation": "Mumbai",
+            "startDate": "2024-01-15",
+            "endDate": "2024-01-15",
+            "refresh": True,  # cache bypass, warna sirf pehli call upstream jayegi
+        },
+    },
+    "chat": {
+        "cwd": os.path.join(BACKEND_DIR, "Ai_chat"),
+        "port": 5000,
+        "flask": [sys.executable, "model.py"],
+        "asgi": [sys.executable, "-m", "hypercorn", "model_asgi:app", "--bind", "127.0.0.1:5000", "--backlog", "4096"],
+        "prod": [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "chat"],
+        "prod-asgi": [sys.executable, os.path.join(BACKEND_DIR, "serve.py"), "chat", "--asgi"],
+        "path": "/chat",
+        "body": {"message": "Best time to visit Goa?", "trip": CHAT_TRIP, "activities": CHAT_ACTIVITIES},
+    },
+}
+
+
+# ================== PAYLOADS ==================
+
+def make_body(service_name: str, service: dict, i: int, distinct: int) -> dict:
+    body = dict(service["body"])
+    if service_name == "itinerary":
+        body["destination"] = DESTINATIONS[i % min(distinct, len(DESTINATIONS))]
+        days = 1 + (i // len(DESTINATIONS)) % min(distinct, 3)
+        body["endDate"] = f"2024-01-{14 + days}"
+    else:
+        body["sessionId"] = f"load-{i % max(distinct, 1)}"
+    return body
+
+
+# ================== LOAD GENERATOR ==================
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def run_load(url: str, service_name: str, service: dict, args) -> dict:
+    """
+    Closed loop (args.rate == 0): `concurrency` requests in flight at a time.
+    Open loop: requests start at args.rate/s regardless of completions
+    (queueing delay latency me dikhta hai), concurrency sirf connection cap.
+    """
+    latencies = []
+    statuses: dict[str, int] = {}
+    sem = asyncio.Semaphore(args.concurrency)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as client:
+        async def one(i: int):
+            body = make_body(service_name, service, i, args.distinct)
+            t0 = time.perf_counter()
+            try:
+                async with client.post(url, json=body) as resp:
+                    await resp.read()
+                    status = str(resp.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - t0)
+            statuses[status] = statuses.get(status, 0) + 1
+
+        async def closed(i: int):
+            async with sem:
+                await one(i)
+
+        started = time.perf_counter()
+        if args.rate:
+            tasks = []
+            for i in range(args.requests):
+                delay = started + i / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(one(i)))
+            await asyncio.gather(*tasks)
+        else:
+            await asyncio.gather(*(closed(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": args.requests,
+        "errors": sum(n for status, n in statuses.items() if status != "200"),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 2),
+        "rps": round(args.requests / elapsed, 1),
+        "p50_s": round(percentile(latencies, 0.50), 3),
+        "p90_s": round(percentile(latencies, 0.90), 3),
+        "p99_s": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def wait_for_ready(port: int, started: float, timeout: float = 60) -> float:
+    """
+    GET /readyz poll karo jab tak 200 na aaye (sab entry points pe hai).
+    Returns process spawn se ready tak ke seconds.
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/readyz", timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter() - started
+        except OSError:
+            pass
+        time.sleep(0.02)
+    raise RuntimeError(f"server on port {port} did not become ready")
+
+
+def group_rss_kb(pgid: int) -> int:
+    """
+    Service ke process group (reloader child / hypercorn workers bhi) ka total VmRSS.
+    """
+    total = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            if os.getpgid(int(pid)) != pgid:
+                continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except (OSError, ValueError):
+            continue
+    return total
+
+
+async def sample_rss(pgid: int, peak: list) -> None:
+    while True:
+        peak[0] = max(peak[0], await asyncio.to_thread(group_rss_kb, pgid))
+        await asyncio.sleep(0.2)
+
+
+async def bench_flavour(service_name: str, flavour: str, args, mock) -> dict:
+    service = SERVICES[service_name]
+    env = dict(os.environ, LLM_BACKEND="mock", LLM_BASE_URL=mock.url, LOG_LEVEL="WARNING")
+    # new session => debug reloader ka child / serve.py workers bhi saath me kill honge
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        service[flavour],
+        cwd=service["cwd"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    peak = [0]
+    sampler = None
+    try:
+        startup = await asyncio.to_thread(wait_for_ready, service["port"], started)
+        await asyncio.sleep(1)
+        idle_rss = group_rss_kb(proc.pid)
+        mock.reset_stats()
+        sampler = asyncio.create_task(sample_rss(proc.pid, peak))
+        url = f"http://127.0.0.1:{service['port']}{service['path']}"
+        result = await run_load(url, service_name, service, args)
+        result["startup_s"] = round(startup, 2)
+        result["rss_idle_mb"] = round(idle_rss / 1024, 1)
+        result["rss_peak_mb"] = round(max(peak[0], idle_rss) / 1024, 1)
+        with mock.lock:
+            result["upstream"] = {k: mock.stats[k] for k in ("calls", "statuses", "peakInFlight",
+                                                            "promptTokens", "completionTokens", "truncated")}
+        return result
+    finally:
+        if sampler:
+            sampler.cancel()
+        os.killpg(proc.pid, signal.SIGTERM)
+        proc.wait()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=sorted(SERVICES), default="itinerary")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0.0, help="open-loop arrivals per second (0 = closed loop)")
+    parser.add_argument("--distinct", type=int, default=12, help="distinct itinerary bodies / chat sessions")
+    parser.add_argument("--mock-port", type=int, default=5900)
+    parser.add_argument("--replay", help="mock server recordings (JSONL)")
+    parser.add_argument("--flavours", default="flask,asgi")
+    parser.add_argument("--json", dest="json_out", help="write results to this file")
+    mock_llm_server.add_profile_args(parser)
+    args = parser.parse_args()
+
+    mock = mock_llm_server.MockLLMServer(
+        "127.0.0.1", args.mock_port, mock_llm_server.profile_from_args(args), args.seed, replay=args.replay
+    ).start()
+    print(f"mock LLM: {mock.url} profile={args.profile} {mock.profile}")
+
+    results = {}
+    try:
+        for flavour in args.flavours.split(","):
+            print(f"--- {args.service} / {flavour} ---")
+            results[flavour] = await bench_flavour(args.service, flavour, args, mock)
+            print(json.dumps(results[flavour], ensure_ascii=False))
+    finally:
+        mock.shutdown()
+
+    print("\nflavour    startup_s  rps      p50_s    p90_s    p99_s    errors  rss_peak_mb  upstream_calls")
+    for flavour, r in results.items():
+        print(f"{flavour:<10} {r['startup_s']:<10} {r['rps']:<8} {r['p50_s']:<8} {r['p90_s']:<8} {r['p99_s']:<8} "
+              f"{r['errors']:<7} {r['rss_peak_mb']:<12} {r['upstream']['calls']}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,455 @@
+"""
+Deterministic local OpenAI-compatible LLM server for offline load tests.
+
+POST .../chat/completions (stream or not) answers like a chat-completions
+server, with `usage` (and Groq-style `x_groq.usage` on the last stream chunk):
+
+- replay: --replay recordings.jsonl; a request whose model + messages hash was
+  recorded gets the recorded content back
+- record: --record recordings.jsonl --upstream URL proxies misses to a real
+  server (key from --upstream-key-env) and appends them to the file
+- synthetic: otherwise a deterministic answer generated from the prompt hash
+  (full itinerary, skeleton, day batch, edited days / activities or chat
+  reply -- whatever the prompt asks for), cut at max_tokens with finish_reason "length" like a real model
+
+Timing / failure profiles (--profile, individual flags override it):
+
+    instant   no delay
+    groq      ~0.25 s to first token, ~750 tokens/s
+    openai    ~0.6 s to first token, ~80 tokens/s
+    slow      ~1.5 s to first token, ~40 tokens/s
+    flaky     groq timing + 5% 429 (Retry-After), 2% 500, 0.5% hung requests
+
+--max-concurrency N answers 429 once N requests are in flight (per-key
+concurrency limit). GET /stats shows calls, statuses, tokens and replay hits;
+POST /stats/reset clears them.
+
+    cd backend
+    python bench/mock_llm_server.py --port 8090 --profile groq
+    LLM_BACKEND=mock LLM_BASE_URL=http://127.0.0.1:8090/v1 python iternary_ai.py
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import request as urlrequest
+
+PROFILES = {
+    "instant": {"ttft": 0.0, "tokens_per_s": 0.0, "jitter": 0.0},
+    "groq": {"ttft": 0.25, "tokens_per_s": 750.0, "jitter": 0.2},
+    "openai": {"ttft": 0.6, "tokens_per_s": 80.0, "jitter": 0.2},
+    "slow": {"ttft": 1.5, "tokens_per_s": 40.0, "jitter": 0.3},
+    "flaky": {"ttft": 0.25, "tokens_per_s": 750.0, "jitter": 0.2,
+              "error_429": 0.05, "error_500": 0.02, "hang": 0.005},
+}
+PROFILE_DEFAULTS = {
+    "ttft": 0.0, "tokens_per_s": 0.0, "jitter": 0.0,
+    "error_429": 0.0, "error_500": 0.0, "hang": 0.0,
+    "hang_seconds": 150.0, "retry_after": 1.0, "max_concurrency": 0,
+}
+
+CHARS_PER_TOKEN = 4
+STREAM_CHUNK_TOKENS = 8
+
+BATCH_RE = re.compile(r"Generate ONLY days (\d+) to (\d+)")
+EDIT_DAYS_RE = re.compile(r"Rewrite ONLY days ([\d, ]+)\.")
+EDIT_ACTIVITIES_RE = re.compile(r"Replace ONLY activities ([\d, ]+) of day \d+\.")
+FULL_RE = re.compile(r"Create a detailed (\d+)-day travel itinerary")
+SKELETON_RE = re.compile(r"Create a short trip outline")
+# destination index: journey / check-in / check-out server splice karta hai, model nahi likhta
+PLANNED_RE = re.compile(r"added by the planner")
+DAYS_RE = re.compile(r"A (\d+)-day trip")
+DEST_RE = re.compile(r'to "([^"]+)"')
+
+SIGHTS = ["Fort", "Old Market", "Lake Promenade", "Museum", "Viewpoint", "Temple", "Spice Garden",
+          "Heritage Walk", "Beach", "Waterfall", "Night Bazaar", "Botanical Garden", "Palace", "Cafe Street"]
+AREAS = ["Old Town", "North Side", "Lakefront", "Hill Area", "Market District", "Riverside"]
+THEMES = ["Heritage", "Food trail", "Nature", "Markets", "Culture", "Slow day", "Adventure"]
+
+
+def retry_after_header(profile: dict) -> str:
+    # RFC 9110: integer seconds (urllib3 rejects "0.5")
+    return str(max(math.ceil(profile["retry_after"]), 0))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(len(text) // CHARS_PER_TOKEN, 1)
+
+
+def request_key(body: dict) -> str:
+    canonical = json.dumps({"model": body.get("model"), "messages": body.get("messages")},
+                           sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ================== SYNTHETIC ANSWERS ==================
+
+def _day(rng: random.Random, n: int, destination: str, total_days: int, planned: bool = False) -> dict:
+    acts = []
+    if n == 1 and planned:
+        acts.append(("11:00 AM", "activity", rng.choice(SIGHTS), f"{rng.choice(AREAS)}, {destination}", "₹300 per person", "2 hours"))
+    elif n == 1:
+        acts.append(("07:00 AM", "transportation", f"Train to {destination}", "Central Station", "₹900 per person", "5 hours"))
+        acts.append(("01:00 PM", "accommodation", "Hotel check-in", f"{rng.choice(AREAS)}, {destination}", "₹2500", "1 hour"))
+    else:
+        acts.append(("08:30 AM", "meal", "Breakfast", f"Cafe in {rng.choice(AREAS)}", "₹250 per person", "1 hour"))
+        acts.append(("10:00 AM", "activity", rng.choice(SIGHTS), f"{rng.choice(AREAS)}, {destination}", "₹300 per person", "2 hours"))
+    acts.append(("01:30 PM", "meal", "Lunch", f"Local thali place, {rng.choice(AREAS)}", "₹350 per person", "1 hour"))
+    acts.append(("03:30 PM", "activity", rng.choice(SIGHTS), f"{rng.choice(AREAS)}, {destination}", "₹200 per person", "2 hours"))
+    if n < total_days:
+        acts.append(("06:30 PM", "activity", rng.choice(SIGHTS), f"{rng.choice(AREAS)}, {destination}", "Free", "1 hour"))
+        acts.append(("08:30 PM", "meal", "Dinner", f"Rooftop restaurant, {rng.choice(AREAS)}", "₹600 per person", "1.5 hours"))
+    elif not planned:
+        acts.append(("06:00 PM", "transportation", "Train back home", "Central Station", "₹900 per person", "5 hours"))
+    return {
+        "day": n,
+        "date": f"2024-01-{min(n, 28):02d}",
+        "activities": [
+            {"time": t, "type": kind, "title": title, "location": loc,
+             "description": f"{title} in {destination}", "estimatedCost": cost, "duration": dur}
+            for t, kind, title, loc, cost, dur in acts
+        ],
+    }
+
+
+def synthetic_content(body: dict) -> str:
+    messages = body.get("messages") or []
+    prompt = messages[-1].get("content", "") if messages else ""
+    rng = random.Random(request_key(body))
+    dest_match = DEST_RE.search(prompt)
+    destination = dest_match.group(1) if dest_match else "Goa"
+    planned = bool(PLANNED_RE.search(prompt))
+    transport = {"toDestination": {"type": "train", "departureTime": "07:00 AM", "arrivalTime": "12:00 PM",
+                                   "estimatedCost": "₹900 per person"},
+                 "fromDestination": {"type": "train", "departureTime": "06:00 PM", "arrivalTime": "11:00 PM",
+                                     "estimatedCost": "₹900 per person"}}
+
+    if m := BATCH_RE.search(prompt):
+        first, last = int(m.group(1)), int(m.group(2))
+        total = int(DAYS_RE.search(prompt).group(1)) if DAYS_RE.search(prompt) else last
+        return json.dumps({"itinerary": [_day(rng, n, destination, total, planned) for n in range(first, last + 1)]},
+                          ensure_ascii=False)
+    if m := EDIT_DAYS_RE.search(prompt):
+        total = int(DAYS_RE.search(prompt).group(1)) if DAYS_RE.search(prompt) else 1
+        days = [int(n) for n in m.group(1).split(",")]
+        return json.dumps({"itinerary": [_day(rng, n, destination, total) for n in days]}, ensure_ascii=False)
+    if m := EDIT_ACTIVITIES_RE.search(prompt):
+        count = len(m.group(1).split(","))
+        return json.dumps({"activities": [
+            {"time": "07:30 PM", "type": "meal", "title": f"Dinner at {rng.choice(AREAS)} dhaba",
+             "location": f"{rng.choice(AREAS)}, {destination}", "description": "Simple local dinner",
+             "estimatedCost": "₹250 per person", "duration": "1 hour"}
+            for _ in range(count)
+        ]}, ensure_ascii=False)
+    if m := FULL_RE.search(prompt):
+        days = int(m.group(1))
+        full = {
+            "itinerary": [_day(rng, n, destination, days, planned) for n in range(1, days + 1)],
+            "totalEstimatedCost": f"₹{rng.randrange(5, 60) * 1000}",
+        }
+        if not planned:
+            full["transportation"] = transport
+        return json.dumps(full, ensure_ascii=False)
+    if SKELETON_RE.search(prompt):
+        days = int(DAYS_RE.search(prompt).group(1)) if DAYS_RE.search(prompt) else 3
+        return json.dumps({
+            "days": [{"day": n, "theme": rng.choice(THEMES), "area": rng.choice(AREAS)} for n in range(1, days + 1)],
+            "accommodation": f"Midrange hotel in {rng.choice(AREAS)}",
+            "transportation": transport,
+        }, ensure_ascii=False)
+    # chat
+    return f"- Visit the {rng.choice(SIGHTS)} in the morning\n- Try street food near the {rng.choice(SIGHTS)}"
+
+
+# ================== SERVER ==================
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, profile: dict | None = None, seed: int = 1,
+                 replay: str | None = None, record: str | None = None, upstream: str | None = None,
+                 upstream_key: str | None = None):
+        self.profile = dict(PROFILE_DEFAULTS, **(profile or {}))
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recordings: dict[str, dict] = {}
+        self.record_path = record
+        self.upstream = upstream
+        self.upstream_key = upstream_key
+        for path in (replay, record):
+            if path and os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            row = json.loads(line)
+                            self.recordings[row["key"]] = row["response"]
+        self.reset_stats()
+        super().__init__((host, port), MockHandler)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def reset_stats(self) -> None:
+        with getattr(self, "lock", threading.Lock()):
+            self.stats = {"calls": 0, "statuses": {}, "streams": 0, "inFlight": 0, "peakInFlight": 0,
+                          "promptTokens": 0, "completionTokens": 0, "replayHits": 0, "recorded": 0,
+                          "truncated": 0, "cancelled": 0}
+
+    def start(self) -> "MockLLMServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def roll(self) -> tuple[str | None, float]:
+        """
+        Is request ka fate (error type ya None) + latency multiplier, seeded RNG se.
+        """
+        p = self.profile
+        with self.lock:
+            x = self.rng.random()
+            jitter = max(1.0 + p["jitter"] * self.rng.gauss(0, 1), 0.1)
+        if x < p["error_429"]:
+            return "429", jitter
+        if x < p["error_429"] + p["error_500"]:
+            return "500", jitter
+        if x < p["error_429"] + p["error_500"] + p["hang"]:
+            return "hang", jitter
+        return None, jitter
+
+    def content_for(self, body: dict) -> str:
+        key = request_key(body)
+        recorded = self.recordings.get(key)
+        if recorded is not None:
+            self.count("replayHits")
+            return recorded["choices"][0]["message"]["content"]
+        if self.upstream:
+            response = self.fetch_upstream(body)
+            with self.lock:
+                self.recordings[key] = response
+                self.stats["recorded"] += 1
+                if self.record_path:
+                    with open(self.record_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({"key": key, "response": response}, ensure_ascii=False) + "\n")
+            return response["choices"][0]["message"]["content"]
+        return synthetic_content(body)
+
+    def fetch_upstream(self, body: dict) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.upstream_key:
+            headers["Authorization"] = f"Bearer {self.upstream_key}"
+        data = json.dumps(dict(body, stream=False)).encode("utf-8")
+        req = urlrequest.Request(self.upstream, data=data, headers=headers, method="POST")
+        with urlrequest.urlopen(req, timeout=120) as resp:
+            return json.loads(resp.read())
+
+    def count(self, field: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[field] += amount
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict | None = None) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _status(self, status: int) -> None:
+        srv = self.server
+        with srv.lock:
+            srv.stats["statuses"][str(status)] = srv.stats["statuses"].get(str(status), 0) + 1
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with self.server.lock:
+                self._send_json(200, dict(self.server.stats, profile=self.server.profile))
+            return
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        srv = self.server
+        body_raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/").endswith("/stats/reset"):
+            srv.reset_stats()
+            self._send_json(200, {"reset": True})
+            return
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+
+        body = json.loads(body_raw)
+        srv.count("calls")
+        with srv.lock:
+            limit = srv.profile["max_concurrency"]
+            over_limit = limit and srv.stats["inFlight"] >= limit
+            if not over_limit:
+                srv.stats["inFlight"] += 1
+                srv.stats["peakInFlight"] = max(srv.stats["peakInFlight"], srv.stats["inFlight"])
+
+        if over_limit:
+            self._status(429)
+            self._send_json(429, {"error": {"message": "Rate limit reached (concurrency)"}},
+                            {"Retry-After": retry_after_header(srv.profile)})
+            return
+        try:
+            self.complete(body)
+        finally:
+            with srv.lock:
+                srv.stats["inFlight"] -= 1
+
+    def complete(self, body: dict) -> None:
+        srv = self.server
+        p = srv.profile
+        fate, jitter = srv.roll()
+        if fate == "429":
+            self._status(429)
+            self._send_json(429, {"error": {"message": "Rate limit reached (injected)"}},
+                            {"Retry-After": retry_after_header(p)})
+            return
+        if fate == "500":
+            time.sleep(p["ttft"] * jitter)
+            self._status(500)
+            self._send_json(500, {"error": {"message": "Internal server error (injected)"}})
+            return
+        if fate == "hang":
+            time.sleep(p["hang_seconds"])
+            self._status(504)
+            self._send_json(504, {"error": {"message": "Gateway timeout (injected)"}})
+            return
+
+        content = srv.content_for(body)
+        finish_reason = "stop"
+        max_tokens = body.get("max_tokens")
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[: max_tokens * CHARS_PER_TOKEN]
+            finish_reason = "length"
+            srv.count("truncated")
+
+        prompt_tokens = sum(estimate_tokens(m.get("content", "")) for m in body.get("messages") or [])
+        completion_tokens = estimate_tokens(content)
+        ttft = p["ttft"] * jitter
+        per_token = 1.0 / p["tokens_per_s"] if p["tokens_per_s"] else 0.0
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "queue_time": 0.0,
+            "prompt_time": round(ttft, 4),
+            "completion_time": round(completion_tokens * per_token, 4),
+        }
+        srv.count("promptTokens", prompt_tokens)
+        srv.count("completionTokens", completion_tokens)
+        completion_id = "mock-" + request_key(body)[:12]
+        model = body.get("model", "mock")
+
+        if not body.get("stream"):
+            time.sleep(ttft + completion_tokens * per_token)
+            self._status(200)
+            self._send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": finish_reason}],
+                "usage": usage,
+            })
+            return
+
+        srv.count("streams")
+        self._status(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(payload) -> None:
+            line = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+            self.wfile.flush()
+
+        time.sleep(ttft)
+        step = STREAM_CHUNK_TOKENS * CHARS_PER_TOKEN
+        try:
+            for i in range(0, len(content), step):
+                piece = content[i: i + step]
+                send_event(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                                       "choices": [{"index": 0, "delta": {"content": piece},
+                                                    "finish_reason": None}]},
+                                      ensure_ascii=False))
+                time.sleep(estimate_tokens(piece) * per_token)
+            send_event(json.dumps({"id": completion_id, "object": "chat.completion.chunk", "model": model,
+                                   "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                                   "x_groq": {"usage": usage}}))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # client (service) ne stream beech me band kiya
+            srv.count("cancelled")
+            self.close_connection = True
+
+
+def profile_from_args(args) -> dict:
+    profile = dict(PROFILES[args.profile])
+    for field in PROFILE_DEFAULTS:
+        value = getattr(args, field, None)
+        if value is not None:
+            profile[field] = value
+    return profile
+
+
+def add_profile_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="groq")
+    parser.add_argument("--ttft", type=float, help="seconds to first token")
+    parser.add_argument("--tokens-per-s", dest="tokens_per_s", type=float, help="0 = no generation delay")
+    parser.add_argument("--jitter", type=float, help="relative stddev of the time to first token")
+    parser.add_argument("--error-429", dest="error_429", type=float, help="fraction of requests answered 429")
+    parser.add_argument("--error-500", dest="error_500", type=float, help="fraction of requests answered 500")
+    parser.add_argument("--hang", type=float, help="fraction of requests that hang --hang-seconds then 504")
+    parser.add_argument("--hang-seconds", dest="hang_seconds", type=float)
+    parser.add_argument("--retry-after", dest="retry_after", type=float)
+    parser.add_argument("--max-concurrency", dest="max_concurrency", type=int, help="429 beyond this many in flight")
+    parser.add_argument("--seed", type=int, default=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--replay", help="JSONL recordings to serve")
+    parser.add_argument("--record", help="append proxied upstream responses to this JSONL file")
+    parser.add_argument("--upstream", help="real chat-completions URL for --record")
+    parser.add_argument("--upstream-key-env", default="GROQ_API_KEY")
+    add_profile_args(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer(
+        args.host, args.port, profile_from_args(args), args.seed,
+        replay=args.replay, record=args.record, upstream=args.upstream,
+        upstream_key=os.getenv(args.upstream_key_env) if args.upstream else None,
+    )
+    print(f"mock LLM server on {server.url} (profile {args.profile}: {server.profile})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
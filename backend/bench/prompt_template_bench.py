@@ -0,0 +1,215 @@
+"""
+Prompt template render time + static prefix stability check.
+
+    legacy    the original f-string user prompt (trip details at the top)
+    template  prompt_templates render of the same prompt (static part first)
+    batch     one chunked day-batch prompt
+    chat      chat system prompt with a rendered trip context
+
+Prefix check: random trips are rendered into full Groq message lists and the
+longest prefix shared by all of them is measured (characters + estimated
+tokens). Upstream prompt caching can only reuse that shared prefix. The check
+fails (exit 1) if any render does not start with the template's static
+prefix, or if day batches of one trip do not share the prefix up to
+"Generate ONLY days".
+
+    cd backend
+    python bench/prompt_template_bench.py --trips 200 --repeat 2000
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "Ai_chat"))
+
+import iternary_ai
+import itinerary_chunks
+import model
+from prompt_budget import estimate_tokens
+
+PLACES = ["Goa", "Manali", "Jaipur", "Munnar", "Leh", "Udaipur", "Rishikesh", "Pondicherry"]
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Chennai", "Kolkata"]
+INTERESTS = ["beaches", "food", "history", "trekking", "nightlife", "shopping", "temples"]
+
+
+def legacy_build_user_prompt(trip: dict) -> str:
+    # pre-template f-string (trip details first), kept as the baseline
+    num_days = trip["num_days"]
+    destination = trip["destination"]
+    current_location = trip["current_location"]
+    start_date = trip["start_date"]
+    end_date = trip["end_date"]
+    travelers = trip["travelers"]
+    daily_budget = trip["daily_budget"]
+    budget_range = trip["budget_range"]
+    interests = trip["interests"]
+    additional_notes = trip["additional_notes"]
+
+    return f"""
+Create a detailed {num_days}-day travel itinerary for a trip from "{current_location}" to "{destination}".
+
+Trip Details:
+- Destination: {destination}
+- Starting Location: {current_location}
+- Start Date: {start_date}
+- End Date: {end_date}
+- Number of Days: {num_days}
+- Number of Travelers: {travelers}
+- Daily Budget: ₹{daily_budget} per person
+- Budget Range: {budget_range}
+- Interests: {", ".join(interests) if interests else "General travel"}
+- Additional Notes: {additional_notes if additional_notes else "None"}
+
+Itinerary requirements:
+
+1. Day 1 (Arrival Day):
+   - Include transportation from {current_location} to {destination} (train/bus/flight) depending on budget.
+   - Specify departure and arrival times.
+   - Include hotel check-in (type = "accommodation").
+   - Plan afternoon/evening activities with specific times.
+   - Include dinner time and location (type = "meal").
+
+2. Middle Days (if any):
+   - Morning activity with specific time.
+   - Breakfast time and location (type = "meal").
+   - Afternoon activity with time.
+   - Lunch time and location (type = "meal").
+   - Evening activity with time.
+   - Dinner time and location (type = "meal").
+   - Activities should be realistic, specific to {destination}, and match the interests and budget.
+
+3. Last Day (Departure Day):
+   - Morning activity if time permits.
+   - Check-out from accommodation (type = "accommodation").
+   - Transportation back to {current_location} with departure and arrival times.
+
+You MUST return a single JSON object with exactly these top-level keys:
+- "itinerary": an array of day objects
+- "totalEstimatedCost": string like "₹5800"
+- "transportation": an object with "toDestination" and "fromDestination"
+
+Each item in "itinerary" must be an object with:
+- "day": integer (1, 2, 3, ...)
+- "date": string in "YYYY-MM-DD" format
+- "activities": array of activity objects
+
+Each activity object must have:
+- "time": "HH:MM AM/PM"
+- "type": one of "transportation", "activity", "meal", "accommodation"
+- "title": short title on one line
+- "location": specific location on one line
+- "description": short description on one line (no line breaks)
+- "estimatedCost": string like "₹XXX per person"
+- "duration": string like "X hours"
+
+Additional rules:
+- All times must be in 12-hour format with AM/PM.
+- Strings must NOT contain newline characters; keep each value on a single line.
+- Do NOT include any extra top-level fields.
+- Return ONLY this JSON object, nothing else.
+"""
+
+
+def random_trip(rng: random.Random) -> dict:
+    start = datetime(2024, 1, 1) + timedelta(days=rng.randrange(365))
+    num_days = rng.randint(1, 12)
+    end = start + timedelta(days=num_days - 1)
+    return {
+        "destination": rng.choice(PLACES),
+        "current_location": rng.choice(CITIES),
+        "start_date": start.strftime("%Y-%m-%d"),
+        "end_date": end.strftime("%Y-%m-%d"),
+        "start": start,
+        "end": end,
+        "num_days": num_days,
+        "travelers": rng.randint(1, 6),
+        "daily_budget": rng.choice([1500, 3000, 6000]),
+        "budget_range": rng.choice(["budget", "midrange", "luxury"]),
+        "interests": rng.sample(INTERESTS, rng.randint(0, 3)),
+        "additional_notes": rng.choice(["", "vegetarian food", "travelling with kids"]),
+    }
+
+
+def prompt_text(messages: list) -> str:
+    # roughly what the server tokenizes: messages in order
+    return "".join(f"<{m['role']}>{m['content']}" for m in messages)
+
+
+def common_prefix(texts: list) -> str:
+    return os.path.commonprefix(texts)
+
+
+def bench(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=repeat, repeat=3)) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trips", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    trips = [random_trip(rng) for _ in range(args.trips)]
+    failures = []
+
+    # ---------- prefix stability ----------
+    def messages(user_prompt: str) -> list:
+        return [
+            {"role": "system", "content": iternary_ai.SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    static = iternary_ai.USER_TEMPLATE.static_prefix
+    renders = [iternary_ai.build_user_prompt(trip) for trip in trips]
+    failures += [f"itinerary render {i} lost the static prefix" for i, r in enumerate(renders) if not r.startswith(static)]
+
+    legacy_shared = common_prefix([prompt_text(messages(legacy_build_user_prompt(t))) for t in trips])
+    shared = common_prefix([prompt_text(messages(r)) for r in renders])
+    total = prompt_text(messages(renders[0]))
+
+    print(f"{'prompt':<10} {'shared_chars':<13} {'shared_tokens':<14} of_prompt")
+    for name, prefix in (("legacy", legacy_shared), ("template", shared)):
+        print(f"{name:<10} {len(prefix):<13} {estimate_tokens(prefix):<14} {len(prefix) / len(total):.0%}")
+
+    # day batches of one trip: everything up to "Generate ONLY days" is shared
+    skeleton = {"days": [{"day": d, "theme": "Beaches", "area": "North"} for d in range(1, 11)], "accommodation": "Hotel"}
+    trip = dict(trips[0], num_days=10)
+    batches = [itinerary_chunks.batch_prompt(trip, skeleton, first, last) for first, last in itinerary_chunks.plan_batches(10)]
+    batch_shared = common_prefix(batches)
+    if len(batch_shared) < batches[0].index("Generate ONLY days"):
+        failures.append("day batches diverge before 'Generate ONLY days'")
+    print(f"{'batches':<10} {len(batch_shared):<13} {estimate_tokens(batch_shared):<14} {len(batch_shared) / len(batches[0]):.0%}")
+
+    rendered = model.render_trip({"destination": "Goa", "startDate": "2024-01-15"}, [
+        {"date": "2024-01-15", "time": "9:00 AM", "title": "Baga Beach", "location": "Baga"}
+    ] * 20)
+    chat_system = model.CHAT_SYSTEM_TEMPLATE
+    if not chat_system.render(trip_context=rendered["header"], summary="").startswith(chat_system.static_prefix):
+        failures.append("chat system prompt lost the static prefix")
+
+    # ---------- render time ----------
+    print()
+    print(f"{'render':<10} us_per_call")
+    rows = [
+        ("legacy", lambda: legacy_build_user_prompt(trip)),
+        ("template", lambda: iternary_ai.build_user_prompt(trip)),
+        ("batch", lambda: itinerary_chunks.batch_prompt(trip, skeleton, 3, 4)),
+        ("chat", lambda: chat_system.render(trip_context=rendered["header"], summary="")),
+    ]
+    for name, fn in rows:
+        print(f"{name:<10} {bench(fn, args.repeat) * 1e6:.2f}")
+
+    if failures:
+        sys.exit("prefix check FAILED:\n" + "\n".join(failures))
+    print("\nprefix check ok")
+
+
+if __name__ == "__main__":
+    main()
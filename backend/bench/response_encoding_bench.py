@@ -0,0 +1,125 @@
+"""
+Itinerary responses: bytes on the wire and serialization time per itinerary size.
+
+Synthetic wrapped itineraries (shape of wrap_itinerary, 4-6 activities/day,
+"₹" costs, repeated types / times / durations) for each --days size, encoded as:
+
+    jsonify       old path: Flask jsonify (stdlib json, ensure_ascii, sort_keys)
+    full          response_encoding.dumps (orjson if installed), UTF-8
+    compact       ?format=compact field-dictionary encoding
+    x gzip / br   each of the above after negotiation (br only if brotli installed)
+
+Times are per response (median of --repeat); "hit" is the cache-hit path
+(envelope() around the stored JSON text, no loads/dumps) and "304" the
+If-None-Match revalidation (hash only, empty body).
+
+    cd backend
+    python bench/response_encoding_bench.py --days 3,7,14,30
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import response_encoding  # noqa: E402
+
+TYPES = ["sightseeing", "food", "activity", "transportation", "accommodation"]
+TIMES = ["08:00 AM", "09:30 AM", "11:00 AM", "01:00 PM", "03:00 PM", "05:30 PM", "08:00 PM"]
+DURATIONS = ["1 hour", "1.5 hours", "2 hours", "3 hours"]
+PLACES = ["Fort Aguada", "Baga Beach", "Old Goa", "Anjuna Market", "Panjim", "Chapora Fort",
+          "Dudhsagar Falls", "Calangute", "Fontainhas", "Palolem Beach", "Mapusa", "Candolim"]
+
+
+def synthetic_itinerary(num_days: int, rng: random.Random) -> dict:
+    days = []
+    for day in range(1, num_days + 1):
+        activities = []
+        for slot in sorted(rng.sample(range(len(TIMES)), rng.randint(4, 6))):
+            place = rng.choice(PLACES)
+            kind = rng.choice(TYPES)
+            activities.append({
+                "time": TIMES[slot],
+                "type": kind,
+                "title": f"{kind.title()} at {place}",
+                "location": f"{place}, Goa",
+                "description": f"Spend time around {place}; local tip #{rng.randint(1, 99)} -- "
+                               f"go early to avoid crowds and carry cash for small stalls.",
+                "estimatedCost": f"₹{rng.randrange(0, 2500, 50)}",
+                "duration": rng.choice(DURATIONS),
+            })
+        days.append({"day": day, "date": f"2025-03-{day:02d}", "title": f"Day {day} in Goa",
+                     "activities": activities})
+    return {
+        "itinerary": days,
+        "totalEstimatedCost": f"₹{num_days * 4200}",
+        "transportation": "Train from Mumbai (~₹1,200)",
+        "costSummary": {"total": num_days * 4200, "currency": "INR",
+                        "perDay": [{"day": d, "total": 4200, "overBudget": False} for d in range(1, num_days + 1)]},
+    }
+
+
+def timed(fn, repeat: int) -> tuple:
+    times, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return result, statistics.median(times) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="3,7,14,30")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    from flask import Flask, jsonify
+
+    app = Flask(__name__)
+    rng = random.Random(7)
+    codings = [None] + list(response_encoding.CODINGS)
+
+    print(f"json backend: {response_encoding.JSON_BACKEND}; codings: {', '.join(response_encoding.CODINGS)} "
+          f"(gzip {response_encoding.GZIP_LEVEL}, br {response_encoding.BROTLI_QUALITY}); median of {args.repeat}")
+    header = f"{'days':>4} {'acts':>4} {'format':<8}" + "".join(f" {c or 'identity':>9}" for c in codings)
+    print(header + f" {'ser ms':>7} {'+gz ms':>7}")
+
+    for num_days in [int(d) for d in args.days.split(",")]:
+        wrapped = synthetic_itinerary(num_days, rng)
+        acts = sum(len(d["activities"]) for d in wrapped["itinerary"])
+        payload = {"success": True, "itinerary": wrapped}
+        assert response_encoding.expand_itinerary(response_encoding.compact_itinerary(wrapped)) == wrapped
+
+        with app.app_context():
+            old, old_ms = timed(lambda: jsonify(payload).get_data(), args.repeat)
+        full, full_ms = timed(lambda: response_encoding.dumps(payload), args.repeat)
+        compact, compact_ms = timed(
+            lambda: response_encoding.dumps({"success": True, "itinerary": response_encoding.compact_itinerary(wrapped)}),
+            args.repeat,
+        )
+        for name, body, ser_ms in (("jsonify", old, old_ms), ("full", full, full_ms), ("compact", compact, compact_ms)):
+            sizes = [len(body)] + [len(response_encoding._compress(body, c)) for c in codings[1:]]
+            _, gz_ms = timed(lambda: gzip.compress(body, compresslevel=response_encoding.GZIP_LEVEL, mtime=0), args.repeat)
+            print(f"{num_days:>4} {acts:>4} {name:<8}" + "".join(f" {s:>9,}" for s in sizes)
+                  + f" {ser_ms:>7.3f} {gz_ms:>7.3f}")
+
+        stored = json.dumps(wrapped, separators=(",", ":"), ensure_ascii=False)
+        _, loads_ms = timed(lambda: response_encoding.dumps({"success": True, "itinerary": json.loads(stored)}), args.repeat)
+        _, hit_ms = timed(lambda: response_encoding.encode(response_encoding.envelope(stored), accept_encoding="gzip"),
+                          args.repeat)
+        etag = response_encoding.encode(full)[2]["ETag"]
+        (_, status, _), nm_ms = timed(lambda: response_encoding.encode(full, if_none_match=etag), args.repeat)
+        assert status == 304
+        print(f"{'':>9} cache hit: loads+dumps {loads_ms:.3f} ms -> envelope+gzip(cached) {hit_ms:.3f} ms; "
+              f"304 revalidation {nm_ms:.3f} ms, 0 body bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Burst of identical /generate-itinerary requests, with and without single-flight.
+
+A local stub Groq server takes --upstream-delay per call and answers 429 once
+more than --rate-limit calls are in flight (like a per-key concurrency limit).
+--processes worker processes (each its own copy of the Flask app, like
+gunicorn workers) fire --burst identical requests each at the same moment:
+
+    cd backend
+    python bench/single_flight_burst.py --processes 4 --burst 25
+
+Modes: "off" (SINGLE_FLIGHT=0), "process" (in-process coalescing only) and
+"shared" (SINGLE_FLIGHT_DB lease file shared by all workers).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STUB_CONTENT = json.dumps({
+    "itinerary": [{"day": 1, "date": "2024-01-15", "activities": []}],
+    "totalEstimatedCost": "₹0",
+    "transportation": {},
+})
+
+
+class StubGroq(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, delay: float, rate_limit: int):
+        self.delay = delay
+        self.rate_limit = rate_limit
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        super().__init__(("127.0.0.1", 0), StubHandler)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        srv = self.server
+        with srv.lock:
+            srv.calls += 1
+            limited = srv.in_flight >= srv.rate_limit
+            if limited:
+                srv.throttled += 1
+            else:
+                srv.in_flight += 1
+
+        if limited:
+            body = b'{"error": {"message": "rate limited"}}'
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            time.sleep(srv.delay)
+            with srv.lock:
+                srv.in_flight -= 1
+            body = json.dumps({"choices": [{"message": {"content": STUB_CONTENT}}]}).encode()
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def worker(env: dict, burst: int, start_at: float, results):
+    os.environ.update(env)
+    sys.stdout = open(os.devnull, "w")  # app ke debug prints band
+    import iternary_ai
+
+    client_app = iternary_ai.app
+    payload = {
+        "destination": "Goa",
+        "currentLocation": "Mumbai",
+        "startDate": "2024-01-15",
+        "endDate": "2024-01-15",
+        "refresh": True,
+    }
+
+    def one(_):
+        return client_app.test_client().post("/generate-itinerary", json=payload).status_code
+
+    time.sleep(max(start_at - time.time(), 0))
+    with ThreadPoolExecutor(max_workers=burst) as pool:
+        statuses = list(pool.map(one, range(burst)))
+    results.put(statuses)
+
+
+def run_mode(mode: str, args, url: str) -> tuple[int, int]:
+    env = {
+        "GROQ_API_URL": url,
+        "GROQ_API_KEY": "bench",
+        "ITINERARY_CACHE_SIZE": "0",
+        "UPSTREAM_RETRIES": "0",
+        "SINGLE_FLIGHT": "0" if mode == "off" else "1",
+    }
+    lease_db = None
+    if mode == "shared":
+        lease_db = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+        env["SINGLE_FLIGHT_DB"] = lease_db
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    start_at = time.time() + 2.0  # sab workers import kar lein, phir ek saath burst
+    procs = [ctx.Process(target=worker, args=(env, args.burst, start_at, results)) for _ in range(args.processes)]
+    for p in procs:
+        p.start()
+    statuses = []
+    for _ in procs:
+        statuses.extend(results.get())
+    for p in procs:
+        p.join()
+    if lease_db:
+        os.unlink(lease_db)
+    return len(statuses), sum(1 for s in statuses if s != 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--burst", type=int, default=25)
+    parser.add_argument("--upstream-delay", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=int, default=3)
+    parser.add_argument("--modes", default="off,process,shared")
+    args = parser.parse_args()
+
+    print(f"{'mode':<9} {'requests':<9} {'failed':<7} {'upstream_calls':<15} 429s")
+    for mode in args.modes.split(","):
+        server = StubGroq(args.upstream_delay, args.rate_limit)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/openai/v1/chat/completions"
+
+        total, failed = run_mode(mode, args, url)
+        print(f"{mode:<9} {total:<9} {failed:<7} {server.calls:<15} {server.throttled}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
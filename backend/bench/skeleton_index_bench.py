@@ -0,0 +1,154 @@
+"""
+Destination skeleton index: LLM tokens / calls / wall time with and without it.
+
+Every (destination, origin) route in data/destinations.json plus a few
+destinations that are not in the index is generated through the Flask app
+against bench/mock_llm_server.py, once with the index off and once on:
+
+    completion   model output tokens (journey, check-in/out and
+                 "transportation" are spliced by the server when the route is known)
+    calls        LLM calls (chunked trips skip the skeleton call on known routes)
+    s/trip       wall time per generation at the mock's token rate
+
+Also times the mmap lookup (facts_for) and a refresh (build) over a synthetic
+learned log of --learned records.
+
+    cd backend
+    python bench/skeleton_index_bench.py --days 3,7 --tokens-per-s 400
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "bench"))
+
+WORK_DIR = tempfile.mkdtemp(prefix="skeleton-index-")
+os.environ.setdefault("LLM_BACKEND", "mock")
+os.environ["DESTINATION_INDEX_PATH"] = os.path.join(WORK_DIR, "destinations.idx")
+os.environ["DESTINATION_INDEX_LEARNED"] = os.path.join(WORK_DIR, "learned.jsonl")
+# bench ke apne runs learned log me na jayein (mock ke generic "Fort" / "Museum")
+os.environ["DESTINATION_INDEX_LEARN"] = "0"
+# AIMD latency baseline dono runs me alag seekhta; yahan sirf model-side fark naapna hai
+os.environ["UPSTREAM_LIMITER"] = "0"
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["LOG_SAMPLE_RATE"] = "0"
+
+from mock_llm_server import MockLLMServer  # noqa: E402
+
+UNINDEXED = [("Shillong", "Guwahati"), ("Gokarna", "Bangalore"), ("Ooty", "Chennai")]
+
+
+def trips(seed: dict, days: list) -> list:
+    out = []
+    for entry in seed["destinations"]:
+        for origin in entry["routes"]:
+            out.append((entry["destination"], origin.title()))
+    out += UNINDEXED
+    return [(d, o, n) for d, o in out for n in days]
+
+
+def payload(destination: str, origin: str, num_days: int, budget: str) -> dict:
+    return {
+        "destination": destination, "currentLocation": origin,
+        "startDate": "2025-03-10", "endDate": f"2025-03-{9 + num_days:02d}",
+        "travelers": 2, "budgetRange": budget, "interests": ["history", "food"],
+        "refresh": True,
+    }
+
+
+def run(client, srv, index, specs: list, budget: str) -> dict:
+    """
+    Har trip off aur on dono, baari-baari (order / warm-up bias na ho).
+    """
+    totals = {mode: {"failed": 0, "calls": 0, "prompt": 0, "completion": 0, "times": []} for mode in ("off", "on")}
+    for destination, origin, num_days in specs:
+        for mode, total in totals.items():
+            index.enabled = mode == "on"
+            srv.reset_stats()
+            started = time.perf_counter()
+            resp = client.post("/generate-itinerary", json=payload(destination, origin, num_days, budget))
+            total["times"].append(time.perf_counter() - started)
+            if resp.status_code != 200 or len(resp.get_json()["itinerary"]["itinerary"]) != num_days:
+                total["failed"] += 1
+            total["calls"] += srv.stats["calls"]
+            total["prompt"] += srv.stats["promptTokens"]
+            total["completion"] += srv.stats["completionTokens"]
+    for total in totals.values():
+        times = total.pop("times")
+        total["s_per_trip"], total["p50"] = statistics.mean(times), statistics.median(times)
+    return totals
+
+
+def learned_log(path: str, count: int, rng: random.Random) -> None:
+    places = [f"Place {i}" for i in range(40)]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            f.write(json.dumps({
+                "ts": i, "destination": rng.choice(["Goa", "Shillong", "Jaipur", "Gokarna"]),
+                "origin": rng.choice(["Mumbai", "Guwahati", "Pune"]), "budgetRange": "midrange",
+                "attractions": [[p, "Town"] for p in rng.sample(places, 6)],
+                "meals": {"lunch": [rng.randrange(300, 700)]},
+                "route": {"mode": "bus", "hours": rng.choice([6, 7, 8]), "cost": rng.randrange(500, 900)},
+                "stay": "Police Bazaar",
+            }) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", default="3,7", help="trip lengths (>= 5 days use chunked mode)")
+    parser.add_argument("--budget", default="midrange")
+    parser.add_argument("--tokens-per-s", type=float, default=400.0)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--lookups", type=int, default=50000)
+    parser.add_argument("--learned", type=int, default=20000, help="synthetic learned records for the refresh timing")
+    args = parser.parse_args()
+
+    srv = MockLLMServer(profile={"ttft": args.ttft, "tokens_per_s": args.tokens_per_s}).start()
+    os.environ["LLM_BASE_URL"] = srv.url
+
+    import destination_index
+    import iternary_ai
+
+    seed = destination_index.load_seed()
+    specs = trips(seed, [int(d) for d in args.days.split(",")])
+    client = iternary_ai.app.test_client()
+    index = destination_index.index
+    index.open()
+
+    results = run(client, srv, index, specs, args.budget)
+
+    print(f"{len(specs)} trips ({args.days} days, {args.budget}), mock LLM {args.tokens_per_s:g} tok/s, "
+          f"ttft {args.ttft:g}s; {len(UNINDEXED) * len(args.days.split(','))} trips not in the index")
+    print(f"{'index':<6} {'failed':>6} {'calls':>6} {'prompt':>8} {'completion':>10} {'s/trip':>7} {'p50':>6}")
+    for mode, r in results.items():
+        print(f"{mode:<6} {r['failed']:>6} {r['calls']:>6} {r['prompt']:>8} {r['completion']:>10} "
+              f"{r['s_per_trip']:>7.2f} {r['p50']:>6.2f}")
+    off, on = results["off"], results["on"]
+    print(f"completion tokens -{1 - on['completion'] / off['completion']:.1%}, "
+          f"LLM calls -{off['calls'] - on['calls']}, wall time -{1 - on['s_per_trip'] / off['s_per_trip']:.1%}")
+    print(f"index stats: {json.dumps(index.stats())}")
+
+    trip = {"destination": "Goa, India", "current_location": "Bombay", "budget_range": "midrange",
+            "num_days": 4, "interests": ["history"]}
+    started = time.perf_counter()
+    for _ in range(args.lookups):
+        destination_index.facts_for(trip)
+    print(f"lookup (facts_for): {(time.perf_counter() - started) / args.lookups * 1e6:.1f} us")
+
+    learned = os.path.join(WORK_DIR, "refresh.jsonl")
+    learned_log(learned, args.learned, random.Random(3))
+    stats = destination_index.build_index(os.path.join(WORK_DIR, "refresh.idx"), learned_path=learned)
+    print(f"refresh over {args.learned} learned records: {stats['buildMs']:.0f} ms, "
+          f"+{stats['learned']['destinations']} destinations, +{stats['learned']['attractions']} attractions, "
+          f"+{stats['learned']['routes']} routes, {stats['bytes']} bytes")
+
+
+if __name__ == "__main__":
+    main()
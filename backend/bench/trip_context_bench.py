@@ -0,0 +1,128 @@
+"""
+Micro-benchmark for the /chat trip context builder (Ai_chat/model.py).
+
+Synthetic trips with 10 / 100 / 10000 activities (spread over ~2 activities
+per day, random ISO timestamps, a few undated rows) are rendered with:
+
+    legacy    the original sort-by-raw-string + per-activity format_date loop
+    build     model.build_trip_context (memoized dates, one-pass grouping)
+    render    model.render_trip (what the trip cache stores)
+    window    build_chat_prompt-style day window for a "day 3" question over
+              an already rendered (trip-cached) context
+
+    cd backend
+    python bench/trip_context_bench.py --sizes 10,100,10000 --repeat 5
+
+The legacy output is checked against build_trip_context before timing, so a
+behaviour change shows up as a failure and a slowdown shows up in the table.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Ai_chat"))
+
+import model
+
+
+def legacy_build_trip_context(trip: dict | None, activities: list | None) -> str:
+    # pre-refactor algorithm, kept here as the regression baseline
+    def format_date(date_str):
+        try:
+            dt = datetime.fromisoformat(str(date_str).replace("Z", "+00:00"))
+            return dt.strftime("%Y-%m-%d")
+        except Exception:
+            return str(date_str)
+
+    lines = model.trip_header_lines(trip)
+    if activities:
+        lines.append("Planned activities for this trip:")
+        sorted_acts = sorted(activities, key=lambda a: a.get("date") or "")
+        current_date = None
+        day_counter = 0
+        for act in sorted_acts:
+            date_raw = act.get("date")
+            date_text = format_date(date_raw) if date_raw else "Unknown date"
+            if date_text != current_date:
+                day_counter += 1
+                current_date = date_text
+                lines.append(f"\nDay {day_counter} ({date_text}):")
+            name = act.get("name") or act.get("title") or "Activity"
+            line = f"- {name}"
+            if act.get("location", ""):
+                line += f" at {act['location']}"
+            if act.get("description", ""):
+                line += f" | {act['description']}"
+            lines.append(line)
+    if not lines:
+        return "No saved trip or activities were provided."
+    return "\n".join(lines)
+
+
+def synthetic_trip(n: int, seed: int = 7) -> tuple[dict, list]:
+    rng = random.Random(seed)
+    days = max(n // 2, 1)
+    start = datetime(2024, 1, 15)
+    trip = {
+        "currentLocation": "Mumbai",
+        "destination": "Goa",
+        "startDate": start.isoformat() + "Z",
+        "endDate": (start + timedelta(days=days)).isoformat() + "Z",
+        "travelers": 2,
+        "budgetRange": "midrange",
+        "dailyBudget": 3500,
+    }
+    activities = []
+    for i in range(n):
+        when = start + timedelta(days=rng.randrange(days), hours=rng.randrange(8, 22))
+        activities.append({
+            "name": f"Activity {i}",
+            "location": rng.choice(["Baga Beach", "Fort Aguada", "Panjim Market", ""]),
+            "description": rng.choice(["Morning walk", "Local seafood lunch", ""]),
+            "date": None if i % 97 == 0 else when.isoformat() + ".000Z",
+        })
+    return trip, activities
+
+
+def bench(fn, repeat: int) -> float:
+    number = 1
+    # chhote inputs ke liye itne loops ki ek run ~0.1 s ho
+    while timeit.timeit(fn, number=number) < 0.1 and number < 100000:
+        number *= 10
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'activities':<11} {'legacy_ms':<11} {'build_ms':<11} {'render_ms':<11} {'window_ms':<11} speedup")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        trip, activities = synthetic_trip(size)
+
+        if legacy_build_trip_context(trip, activities) != model.build_trip_context(trip, activities):
+            sys.exit(f"output mismatch at {size} activities")
+
+        rendered = model.render_trip(trip, activities)
+
+        def window():
+            span = model.relevant_day_window("what is planned on day 3?", rendered["dayDates"])
+            return rendered["dayBlocks"][span[0]: span[1] + 1] if span else rendered["dayBlocks"]
+
+        legacy = bench(lambda: legacy_build_trip_context(trip, activities), args.repeat)
+        build = bench(lambda: model.build_trip_context(trip, activities), args.repeat)
+        render = bench(lambda: model.render_trip(trip, activities), args.repeat)
+        windowed = bench(window, args.repeat)
+        print(
+            f"{size:<11} {legacy * 1000:<11.3f} {build * 1000:<11.3f} {render * 1000:<11.3f} "
+            f"{windowed * 1000:<11.3f} {legacy / build:.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Exercise the shared upstream client (http_client.py) against a local stub.
+
+The stub answers every Nth request with 429 (Retry-After: 0) and the rest with
+a small JSON body, so retries, keep-alive reuse and pool queueing all show up
+in the per-host metrics:
+
+    cd backend
+    python bench/upstream_pool_check.py --requests 200 --threads 16 --fail-every 10
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client
+
+
+def make_handler(fail_every: int, delay: float):
+    counter = itertools.count(1)
+    lock = threading.Lock()
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with lock:
+                n = next(counter)
+            time.sleep(delay)
+            if fail_every and n % fail_every == 0:
+                body = b'{"error": {"message": "rate limited"}}'
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+            else:
+                body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+                self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+class StubServer(ThreadingHTTPServer):
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def run_sync(url: str, total: int, threads: int) -> int:
+    def one(_):
+        resp = http_client.session.post(url, json={"messages": []}, timeout=10)
+        return resp.status_code
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        statuses = list(pool.map(one, range(total)))
+    return sum(1 for s in statuses if s != 200)
+
+
+async def run_async(url: str, total: int) -> int:
+    session = http_client.make_async_session(total_timeout=10)
+    async with session:
+        results = await asyncio.gather(*(
+            http_client.async_request(session, "POST", url, json={"messages": []})
+            for _ in range(total)
+        ))
+    return sum(1 for status, *_ in results if status != 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--fail-every", type=int, default=10)
+    parser.add_argument("--delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    server = StubServer(("127.0.0.1", 0), make_handler(args.fail_every, args.delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/openai/v1/chat/completions"
+
+    t0 = time.perf_counter()
+    failed = run_sync(url, args.requests, args.threads)
+    print(f"sync:  {args.requests} requests in {time.perf_counter() - t0:.2f}s, {failed} failed after retries")
+    print(json.dumps(http_client.metrics.snapshot(), indent=2))
+
+    http_client.metrics = http_client.UpstreamMetrics()
+    t0 = time.perf_counter()
+    failed = asyncio.run(run_async(url, args.requests))
+    print(f"async: {args.requests} requests in {time.perf_counter() - t0:.2f}s, {failed} failed after retries")
+    print(json.dumps(http_client.metrics.snapshot(), indent=2))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,931 @@
+"""
+Precomputed destination skeletons, memory-mapped, prompt banne se pehle consult hote hain.
+
+Popular destinations ke liye model har request pe wahi cheezein dobara likhta
+tha: Goa ke beaches, Mumbai se flight/train, check-in/check-out, "₹250 per
+person" breakfast. Ab yeh sab ek offline-built index me hai:
+
+- entry = canonical attractions (area + time), common origins se transport
+  options (mode, hours, fare), budgetRange ke hisaab se meal / stay price bands
+- build: data/destinations.json (seed) + data/destinations_learned.jsonl
+  (past successful generations) -> data/destinations.idx, atomic replace
+- runtime: file mmap hoti hai (serve.py master preload me, workers pages share
+  karte hain); lookup = hash table pe binary search, entry JSON decode ek baar
+- route known (origin index me hai): Day 1 arrival + check-in, last day
+  check-out + return aur "transportation" server splice karta hai; model sirf
+  destination ke andar ke din bharta hai (kam completion tokens). Chunked mode
+  me skeleton LLM call hi skip: outline index se (pure template fast path)
+- sirf destination known: facts block prompt me, baaki pehle jaisa
+- learning: har fresh generation ke attractions / meal costs / transport ek
+  JSONL line; `build` inhe merge karta hai (DESTINATION_INDEX_MIN_SEEN baar
+  dikhe tabhi). Running workers .idx ka mtime badalte hi remap kar lete hain
+
+Binary layout (little-endian):
+    header  magic "TMDX", format version u32, slot count u32, built_at u64
+    slots   (key hash u64, blob offset u32, blob length u32) x count, hash se sorted
+    blobs   UTF-8 JSON entries (aliases same blob pe point karte hain)
+
+CLI:
+    python destination_index.py build
+    python destination_index.py show goa --from mumbai --budget midrange
+
+Config (env):
+    DESTINATION_INDEX            0 = off (default 1)
+    DESTINATION_INDEX_PATH       built index (default backend/data/destinations.idx)
+    DESTINATION_INDEX_SEED       seed JSON (default backend/data/destinations.json)
+    DESTINATION_INDEX_LEARNED    learned JSONL (default backend/data/destinations_learned.jsonl)
+    DESTINATION_INDEX_LEARN      0 = generations record mat karo (default 1)
+    DESTINATION_INDEX_MIN_SEEN   kitni generations me dikhe to learned fact index me (default 3)
+    DESTINATION_INDEX_RELOAD_S   .idx change check interval, seconds (default 30)
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from statistics import median
+
+import itinerary_costs
+import observability
+import prompt_templates
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+ENABLED = os.getenv("DESTINATION_INDEX", "1") != "0"
+INDEX_PATH = os.getenv("DESTINATION_INDEX_PATH", os.path.join(DATA_DIR, "destinations.idx"))
+SEED_PATH = os.getenv("DESTINATION_INDEX_SEED", os.path.join(DATA_DIR, "destinations.json"))
+LEARNED_PATH = os.getenv("DESTINATION_INDEX_LEARNED", os.path.join(DATA_DIR, "destinations_learned.jsonl"))
+LEARN = os.getenv("DESTINATION_INDEX_LEARN", "1") != "0"
+MIN_SEEN = max(int(os.getenv("DESTINATION_INDEX_MIN_SEEN", "3")), 1)
+RELOAD_SECONDS = float(os.getenv("DESTINATION_INDEX_RELOAD_S", "30"))
+
+MAGIC = b"TMDX"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sIIQ")
+SLOT = struct.Struct("<QII")
+META_KEY = "__meta__"
+
+MAX_ATTRACTIONS = 16
+BUDGET_RANGES = ("budget", "midrange", "luxury")
+MEAL_SLOTS = ("breakfast", "lunch", "dinner")
+
+# route choice: midrange ko 8 ghante se lamba ya ₹6000+ ka safar tabhi jab aur kuch na ho
+MIDRANGE_MAX_HOURS = 8
+MIDRANGE_MAX_FARE = 6000
+
+# station / airport pe kitna pehle pahunchna (last day ka "free until")
+DEPARTURE_BUFFER_MIN = {"flight": 150, "train": 60, "bus": 45, "car": 30}
+DEFAULT_DEPART = {"flight": "08:00 AM", "train": "06:00 AM", "bus": "07:00 AM", "car": "07:00 AM"}
+DEFAULT_RETURN = {"flight": "06:00 PM", "train": "05:00 PM", "bus": "03:00 PM", "car": "02:00 PM"}
+OVERNIGHT_HOURS = 8
+OVERNIGHT_DEPART = "09:00 PM"
+OVERNIGHT_RETURN = "08:00 PM"
+CHECKOUT = "11:00 AM"
+
+FACTS_TEMPLATE = prompt_templates.get("destination_facts")
+
+log = observability.get_logger("destination_index")
+
+
+# ================== KEYS ==================
+
+_KEY_STRIP_RE = re.compile(r"[^a-z0-9 ]+")
+
+
+def key_of(text) -> str:
+    """
+    "Goa, India" / "  GOA " -> "goa". Sirf pehla comma-part (city), punctuation hata ke.
+    """
+    first = str(text or "").split(",")[0].lower().replace("&", " and ")
+    return " ".join(_KEY_STRIP_RE.sub(" ", first).split())
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+# ================== CLOCK ==================
+
+_CLOCK_RE = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([AaPp][Mm])\s*$")
+
+
+def clock_minutes(value: str) -> int:
+    m = _CLOCK_RE.match(value or "")
+    if not m:
+        raise ValueError(f"bad time {value!r}")
+    hour, minute = int(m.group(1)) % 12, int(m.group(2))
+    if m.group(3).upper() == "PM":
+        hour += 12
+    return hour * 60 + minute
+
+
+def clock_text(minutes: int) -> str:
+    minutes %= 24 * 60
+    hour, minute = divmod(minutes, 60)
+    return f"{hour % 12 or 12:02d}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def round_up(minutes: int, step: int = 30) -> int:
+    return -(-minutes // step) * step
+
+
+def hours_text(hours: float) -> str:
+    return f"{hours:g} hour" + ("" if hours == 1 else "s")
+
+
+def rupees(amount: float) -> str:
+    return f"{itinerary_costs.CURRENCY}{int(round(amount)):,}"
+
+
+# ================== BUILD ==================
+
+def load_seed(path: str = SEED_PATH) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def read_learned(path: str = LEARNED_PATH) -> list:
+    """
+    Learned JSONL -> records. Adhi likhi / kharab lines skip (append crash ke baad bhi build chale).
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict) and row.get("destination"):
+                records.append(row)
+    return records
+
+
+def _band(values: list, step: int = 50) -> list:
+    values = sorted(values)
+    low = values[len(values) // 4]
+    high = values[(len(values) * 3) // 4]
+    return [int(round(low / step) * step) or step, int(round(high / step) * step) or step]
+
+
+def merge_learned(destinations: list, records: list, min_seen: int = MIN_SEEN) -> dict:
+    """
+    Learned records seed entries me jodo (in place) + naye destinations banao.
+    Sirf woh facts jo kam se kam min_seen generations me aaye. Returns counts.
+    """
+    by_key = {}
+    for entry in destinations:
+        for name in [entry["destination"], *entry.get("aliases", [])]:
+            by_key.setdefault(key_of(name), entry)
+
+    groups = defaultdict(lambda: {
+        "count": 0, "names": Counter(), "attractions": defaultdict(Counter), "titles": {},
+        "routes": defaultdict(list), "meals": defaultdict(list), "stay": Counter(),
+    })
+    for row in records:
+        dkey = key_of(row["destination"])
+        entry = by_key.get(dkey)
+        group = groups[key_of(entry["destination"]) if entry else dkey]
+        group["count"] += 1
+        group["names"][str(row["destination"]).split(",")[0].strip()] += 1
+        seen = set()
+        for title, location in row.get("attractions") or []:
+            akey = key_of(title)
+            if akey and akey not in seen:
+                seen.add(akey)
+                group["attractions"][akey][key_of(location) and str(location).split(",")[0].strip()] += 1
+                group["titles"].setdefault(akey, str(title).strip())
+        route = row.get("route")
+        if isinstance(route, dict) and route.get("mode") and key_of(row.get("origin")):
+            group["routes"][(key_of(row["origin"]), route["mode"])].append(route)
+        for slot, amounts in (row.get("meals") or {}).items():
+            if slot in MEAL_SLOTS:
+                group["meals"][(row.get("budgetRange") or "midrange", slot)].extend(amounts)
+        if row.get("stay"):
+            group["stay"][str(row["stay"]).split(",")[0].strip()] += 1
+
+    added = {"attractions": 0, "routes": 0, "destinations": 0}
+    for dkey, group in groups.items():
+        entry = by_key.get(dkey)
+        if entry is None:
+            if group["count"] < min_seen:
+                continue
+            entry = {
+                "destination": group["names"].most_common(1)[0][0],
+                "aliases": [],
+                "stayArea": group["stay"].most_common(1)[0][0] if group["stay"] else "",
+                "priceLevel": 1.0,
+                "attractions": [],
+                "routes": {},
+                "learned": True,
+            }
+            meals = {}
+            for (budget, slot), amounts in group["meals"].items():
+                if budget in BUDGET_RANGES and len(amounts) >= min_seen:
+                    meals.setdefault(budget, {})[slot] = _band(amounts)
+            if meals:
+                entry["meals"] = meals
+            destinations.append(entry)
+            by_key[dkey] = entry
+            added["destinations"] += 1
+
+        known = [key_of(a["name"]) for a in entry["attractions"]]
+        popular = sorted(group["attractions"].items(), key=lambda kv: -sum(kv[1].values()))
+        for akey, locations in popular:
+            if len(entry["attractions"]) >= MAX_ATTRACTIONS:
+                break
+            if sum(locations.values()) < min_seen or any(akey in k or k in akey for k in known):
+                continue
+            area = locations.most_common(1)[0][0] or entry.get("stayArea") or entry["destination"]
+            entry["attractions"].append({"name": group["titles"][akey], "area": area, "hours": 2, "tags": []})
+            known.append(akey)
+            added["attractions"] += 1
+
+        for (origin, mode), routes in group["routes"].items():
+            options = entry["routes"].get(origin, [])
+            hours = [r["hours"] for r in routes if r.get("hours")]
+            costs = [r["cost"] for r in routes if r.get("cost")]
+            if len(routes) < min_seen or not hours or not costs or any(o["mode"] == mode for o in options):
+                continue
+            entry["routes"][origin] = options + [{"mode": mode, "hours": round(median(hours) * 4) / 4,
+                                                  "cost": int(round(median(costs) / 50) * 50), "learned": True}]
+            added["routes"] += 1
+    return added
+
+
+def expand_entry(entry: dict, defaults: dict) -> dict:
+    """
+    Seed entry -> runtime entry: har budgetRange ke meal / stay bands (priceLevel
+    se scaled) pehle se computed, plus content version.
+    """
+    level = float(entry.get("priceLevel") or 1.0)
+    meals, stay = {}, {}
+    for budget in BUDGET_RANGES:
+        base = defaults["meals"][budget]
+        learned = (entry.get("meals") or {}).get(budget, {})
+        meals[budget] = {
+            slot: learned.get(slot) or [int(round(v * level / 10) * 10) for v in base[slot]] for slot in MEAL_SLOTS
+        }
+        kind = defaults["stay"][budget]
+        stay[budget] = {"kind": kind["kind"], "night": [int(round(v * level / 100) * 100) for v in kind["night"]]}
+    out = {
+        "destination": entry["destination"],
+        "stayArea": entry.get("stayArea") or "",
+        "attractions": entry.get("attractions") or [],
+        "routes": entry.get("routes") or {},
+        "meals": meals,
+        "stay": stay,
+    }
+    canonical = json.dumps(out, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    out["version"] = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:10]
+    return out
+
+
+def build_index(path: str = INDEX_PATH, seed_path: str = SEED_PATH, learned_path: str = LEARNED_PATH,
+                min_seen: int = MIN_SEEN) -> dict:
+    """
+    Seed + learned -> binary index file (tmp + os.replace, readers kabhi adhi file nahi dekhte).
+    Returns build stats.
+    """
+    started = time.perf_counter()
+    seed = load_seed(seed_path)
+    destinations = [dict(entry) for entry in seed["destinations"]]
+    for entry in destinations:
+        entry["attractions"] = list(entry.get("attractions") or [])
+        entry["routes"] = {key_of(o): list(opts) for o, opts in (entry.get("routes") or {}).items()}
+    records = read_learned(learned_path)
+    added = merge_learned(destinations, records, min_seen)
+
+    blobs = []
+    keyed = {}
+    for entry in destinations:
+        expanded = expand_entry(entry, seed["defaults"])
+        blob_index = len(blobs)
+        blobs.append(json.dumps(expanded, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        for name in [entry["destination"], *entry.get("aliases", [])]:
+            keyed.setdefault(key_of(name), blob_index)
+    meta = {
+        "originAliases": {key_of(k): key_of(v) for k, v in (seed.get("originAliases") or {}).items()},
+        "destinations": len(destinations),
+        "learnedRecords": len(records),
+        "learned": added,
+        "builtAt": int(time.time()),
+    }
+    keyed[META_KEY] = len(blobs)
+    blobs.append(json.dumps(meta, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    slots = {}
+    for key, blob_index in keyed.items():
+        h = key_hash(key)
+        if h in slots and slots[h] != blob_index:
+            log.warning("destination index hash collision, key skipped", extra={"key": key})
+            continue
+        slots[h] = blob_index
+
+    offset = HEADER.size + SLOT.size * len(slots)
+    offsets = []
+    for blob in blobs:
+        offsets.append(offset)
+        offset += len(blob)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(slots), meta["builtAt"]))
+        for h in sorted(slots):
+            f.write(SLOT.pack(h, offsets[slots[h]], len(blobs[slots[h]])))
+        for blob in blobs:
+            f.write(blob)
+    os.replace(tmp, path)
+
+    stats = {
+        "path": path,
+        "destinations": len(destinations),
+        "keys": len(slots) - 1,
+        "bytes": offset,
+        "learnedRecords": len(records),
+        "learned": added,
+        "buildMs": round((time.perf_counter() - started) * 1000, 2),
+    }
+    log.info("destination index built", extra=stats)
+    return stats
+
+
+# ================== RUNTIME ==================
+
+class DestinationIndex:
+    """
+    Read-only mmap view of the built index. Process me ek; fork ke baad mapping
+    (aur page cache) workers share karte hain. Remap sirf file badalne pe.
+    """
+
+    def __init__(self, path: str = INDEX_PATH, enabled: bool = ENABLED, reload_seconds: float = RELOAD_SECONDS,
+                 seed_path: str = SEED_PATH, learned_path: str = LEARNED_PATH):
+        self.path = path
+        self.enabled = enabled
+        self.reload_seconds = reload_seconds
+        self.seed_path = seed_path
+        self.learned_path = learned_path
+        self._lock = threading.Lock()
+        self._opened = False
+        self._map = None
+        self._count = 0
+        self._stamp = None
+        self._checked = 0.0
+        self._decoded = {}
+        self._meta = {}
+        self.lookups = 0
+        self.hits = 0
+        self.route_hits = 0
+        self.template_skeletons = 0
+        self.reloads = 0
+
+    def _stale(self) -> bool:
+        try:
+            built = os.stat(self.path).st_mtime
+        except OSError:
+            return True
+        sources = [p for p in (self.seed_path, self.learned_path) if os.path.exists(p)]
+        return any(os.stat(p).st_mtime > built for p in sources)
+
+    def open(self, rebuild: bool = True) -> bool:
+        """
+        Map the index; missing ya sources se purana ho to pehle build. False = index nahi mila.
+        """
+        with self._lock:
+            self._opened = True
+            if rebuild and os.path.exists(self.seed_path) and self._stale():
+                try:
+                    build_index(self.path, self.seed_path, self.learned_path)
+                except (OSError, ValueError, KeyError) as e:
+                    log.warning("destination index build failed", extra={"error": str(e)})
+            return self._remap()
+
+    def _remap(self) -> bool:
+        self._checked = time.monotonic()
+        try:
+            with open(self.path, "rb") as f:
+                st = os.fstat(f.fileno())
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            log.warning("destination index unavailable", extra={"path": self.path, "error": str(e)})
+            self._map, self._stamp = None, None
+            return False
+        magic, version, count, _ = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            log.warning("destination index has wrong format, ignored", extra={"path": self.path})
+            return False
+        # purana map band nahi karte: in-flight lookups ke paas reference ho sakta hai (GC band karega)
+        self._map, self._count, self._decoded = mapped, count, {}
+        if self._stamp is not None:
+            self.reloads += 1
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        self._meta = self._get(META_KEY) or {}
+        return True
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._checked < self.reload_seconds:
+            return
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                st = os.stat(self.path)
+            except OSError:
+                return
+            if (st.st_mtime_ns, st.st_size) != self._stamp:
+                self._remap()
+
+    def _get(self, key: str) -> dict | None:
+        mapped, count, decoded = self._map, self._count, self._decoded
+        if mapped is None:
+            return None
+        target = key_hash(key)
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            h, offset, length = SLOT.unpack_from(mapped, HEADER.size + mid * SLOT.size)
+            if h < target:
+                lo = mid + 1
+            elif h > target:
+                hi = mid
+            else:
+                entry = decoded.get(offset)
+                if entry is None:
+                    entry = decoded[offset] = json.loads(mapped[offset:offset + length])
+                return entry
+        return None
+
+    def lookup(self, destination: str) -> dict | None:
+        if not self.enabled:
+            return None
+        if not self._opened:
+            self.open()
+        else:
+            self._maybe_reload()
+        self.lookups += 1
+        key = key_of(destination)
+        entry = self._get(key) if key and key != META_KEY else None
+        if entry is not None:
+            self.hits += 1
+        return entry
+
+    def origin_key(self, origin: str) -> str:
+        key = key_of(origin)
+        return self._meta.get("originAliases", {}).get(key, key)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "mapped": self._map is not None,
+            "bytes": len(self._map) if self._map is not None else 0,
+            "keys": max(self._count - 1, 0),
+            "destinations": self._meta.get("destinations", 0),
+            "learnedRecords": self._meta.get("learnedRecords", 0),
+            "builtAt": self._meta.get("builtAt"),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "routeHits": self.route_hits,
+            "templateSkeletons": self.template_skeletons,
+            "reloads": self.reloads,
+        }
+
+
+index = DestinationIndex()
+
+
+# ================== TRIP FACTS ==================
+
+def choose_route(options: list, budget_range: str) -> dict | None:
+    """
+    budget: sabse sasta; luxury: sabse tez; midrange: <= 8 h aur <= ₹6000 me sabse
+    sasta, warna sabse sasta.
+    """
+    if not options:
+        return None
+    if budget_range == "luxury":
+        return min(options, key=lambda o: (o["hours"], o["cost"]))
+    if budget_range != "budget":
+        quick = [o for o in options if o["hours"] <= MIDRANGE_MAX_HOURS and o["cost"] <= MIDRANGE_MAX_FARE]
+        if quick:
+            return min(quick, key=lambda o: (o["cost"], o["hours"]))
+    return min(options, key=lambda o: (o["cost"], o["hours"]))
+
+
+class Leg:
+    """
+    Ek taraf ka safar: depart / arrive clock minutes + din ka offset.
+    """
+    __slots__ = ("mode", "hours", "cost", "note", "depart", "arrive", "days_before", "days_after")
+
+    def __init__(self, route: dict, depart: str, arriving: bool):
+        self.mode = route["mode"]
+        self.hours = float(route["hours"])
+        self.cost = route["cost"]
+        self.note = route.get("note") or ""
+        self.depart = clock_minutes(depart)
+        total = self.depart + round(self.hours * 60)
+        self.arrive = total % (24 * 60)
+        # Day 1 pe pahunchna hai: lamba safar pichhle din(on) shuru hota hai
+        self.days_before = total // (24 * 60) if arriving else 0
+        self.days_after = 0 if arriving else total // (24 * 60)
+
+    def summary(self) -> dict:
+        return {
+            "type": self.mode,
+            "departureTime": clock_text(self.depart),
+            "arrivalTime": clock_text(self.arrive),
+            "duration": hours_text(self.hours),
+            "estimatedCost": f"{rupees(self.cost)} per person",
+        }
+
+
+def _insert_by_time(activities: list, fixed: list) -> list:
+    """
+    Check-in / check-out ko model ki activities me time ke hisaab se rakho
+    (jis activity ka time parse na ho use "pehle ki" maan lo).
+    """
+    out = list(activities)
+    for act in fixed:
+        at = clock_minutes(act["time"])
+        pos = len(out)
+        for i, other in enumerate(out):
+            try:
+                if clock_minutes(other.get("time")) > at:
+                    pos = i
+                    break
+            except (TypeError, ValueError):
+                continue
+        out.insert(pos, act)
+    return out
+
+
+def _day_offset(days: int, before: bool) -> str:
+    if not days:
+        return ""
+    word = "the day before" if before else "the next day"
+    if days > 1:
+        word = f"{days} days {'earlier' if before else 'later'}"
+    return f" ({word})"
+
+
+class DestinationFacts:
+    """
+    Ek trip ke liye resolved facts: index entry + chosen route + budget bands.
+    trip["facts"] me rehta hai (generation paths); normalize_day / prompts yahin se padhte hain.
+    """
+
+    def __init__(self, entry: dict, trip: dict, origin_key: str):
+        self.entry = entry
+        self.budget = trip.get("budget_range") if trip.get("budget_range") in BUDGET_RANGES else "midrange"
+        self.destination = entry["destination"]
+        self.origin = str(trip.get("current_location") or "").split(",")[0].strip()
+        self.num_days = trip["num_days"]
+        self.interests = {key_of(i) for i in trip.get("interests") or []}
+        self.route = choose_route(entry["routes"].get(origin_key) or [], self.budget) if origin_key else None
+        self.meals = entry["meals"][self.budget]
+        self.stay = entry["stay"][self.budget]
+        self.arrival = self.departure = None
+        if self.route:
+            mode = self.route["mode"]
+            overnight = mode in ("bus", "train") and self.route["hours"] >= OVERNIGHT_HOURS
+            self.arrival = Leg(self.route, self.route.get("depart") or (
+                OVERNIGHT_DEPART if overnight else DEFAULT_DEPART[mode]), arriving=True)
+            self.departure = Leg(self.route, self.route.get("returnDepart") or (
+                OVERNIGHT_RETURN if overnight else DEFAULT_RETURN[mode]), arriving=False)
+
+    @property
+    def version(self) -> str:
+        # cache key me: entry content + chosen route (budget / origin se already key me hain)
+        return f"idx-{self.entry['version']}-{self.route['mode'] if self.route else 'none'}"
+
+    # ---------- prompt text ----------
+
+    def stay_text(self) -> str:
+        low, high = self.stay["night"]
+        area = self.entry["stayArea"] or self.entry["destination"]
+        return f"{self.stay['kind']} in {area}, {rupees(low)}-{rupees(high)} per night"
+
+    def meals_text(self) -> str:
+        return ", ".join(
+            f"{slot} {rupees(low)}-{rupees(high)}" for slot, (low, high) in self.meals.items()
+        )
+
+    def ranked_attractions(self) -> list:
+        """
+        Interests se match karne wale areas / attractions pehle (stable, seed order tie-break).
+        """
+        def score(attraction: dict) -> int:
+            return sum(1 for tag in attraction.get("tags") or [] if tag in self.interests)
+
+        areas = {}
+        for a in self.entry["attractions"]:
+            areas.setdefault(a["area"], []).append(a)
+        ordered = sorted(areas.values(), key=lambda group: -max(score(a) for a in group))
+        return [a for group in ordered for a in sorted(group, key=lambda a: -score(a))]
+
+    def prompt_block(self) -> str:
+        lines = []
+        areas = {}
+        for a in self.ranked_attractions():
+            areas.setdefault(a["area"], []).append(f"{a['name']} ({hours_text(a['hours'])})")
+        for area, names in areas.items():
+            lines.append(f"  - {area}: {', '.join(names)}")
+        return FACTS_TEMPLATE.render(
+            attractions="\n".join(lines),
+            stay=self.stay_text(),
+            budget_range=self.budget,
+            meals=self.meals_text(),
+        )
+
+    def plan_from(self) -> int:
+        if self.num_days == 1:
+            return round_up(self.arrival.arrive + 30)
+        return self.checkin_time() + 60
+
+    def checkin_time(self) -> int:
+        return round_up(self.arrival.arrive + 45)
+
+    def free_until(self) -> int:
+        return self.departure.depart - DEPARTURE_BUFFER_MIN.get(self.departure.mode, 60)
+
+    def arrival_text(self) -> str:
+        leg = self.arrival
+        return (f"{leg.mode} from {self.origin} departs {clock_text(leg.depart)}"
+                f"{_day_offset(leg.days_before, True)}, arrives {clock_text(leg.arrive)}")
+
+    def departure_text(self) -> str:
+        leg = self.departure
+        return (f"{leg.mode} back to {self.origin} departs {clock_text(leg.depart)}, "
+                f"arrives {clock_text(leg.arrive)}{_day_offset(leg.days_after, False)}")
+
+    def arrival_rule(self) -> str:
+        checkin = "" if self.num_days == 1 else f"; hotel check-in {clock_text(self.checkin_time())}"
+        return f"- Day 1: {self.arrival_text()}{checkin}. Plan Day 1 from {clock_text(self.plan_from())}."
+
+    def departure_rule(self) -> str:
+        checkout = "" if self.num_days == 1 else f"hotel check-out {CHECKOUT}; "
+        return (f"- Day {self.num_days}: {checkout}{self.departure_text()}. "
+                f"Plan Day {self.num_days} only until {clock_text(self.free_until())}.")
+
+    def planned(self) -> str:
+        return f"{self.arrival_rule()}\n{self.departure_rule()}"
+
+    def meal_rule(self) -> str:
+        return f"- Meal costs per person: {self.meals_text()}."
+
+    # ---------- server-side pieces ----------
+
+    def transportation(self) -> dict | None:
+        if not self.route:
+            return None
+        return {"toDestination": self.arrival.summary(), "fromDestination": self.departure.summary()}
+
+    def _journey(self, leg: Leg, title: str, location: str, description: str) -> dict:
+        return {
+            "time": clock_text(leg.depart if not leg.days_before else leg.arrive),
+            "type": "transportation",
+            "title": title,
+            "location": location,
+            "description": description,
+            "estimatedCost": f"{rupees(leg.cost)} per person",
+            "duration": hours_text(leg.hours),
+        }
+
+    def arrival_activities(self) -> list:
+        leg = self.arrival
+        mode = leg.mode.capitalize()
+        acts = [self._journey(
+            leg, f"{mode} from {self.origin} to {self.destination}", f"{self.origin} to {self.destination}",
+            (leg.note.capitalize() + "; " if leg.note else "") + self.arrival_text(),
+        )]
+        if self.num_days > 1:
+            low, high = self.stay["night"]
+            acts.append({
+                "time": clock_text(self.checkin_time()),
+                "type": "accommodation",
+                "title": f"Check-in: {self.stay['kind']}",
+                "location": f"{self.entry['stayArea'] or self.destination}, {self.destination}",
+                "description": f"{self.stay['kind']} in {self.entry['stayArea'] or self.destination}",
+                "estimatedCost": f"{rupees((low + high) / 2)} per night",
+                "duration": "1 hour",
+            })
+        return acts
+
+    def departure_activities(self) -> list:
+        leg = self.departure
+        acts = []
+        if self.num_days > 1:
+            acts.append({
+                "time": CHECKOUT,
+                "type": "accommodation",
+                "title": "Hotel check-out",
+                "location": f"{self.entry['stayArea'] or self.destination}, {self.destination}",
+                "description": "Check out and leave luggage at the hotel desk",
+                "estimatedCost": "Included",
+                "duration": "30 minutes",
+            })
+        acts.append(self._journey(
+            leg, f"{leg.mode.capitalize()} back to {self.origin}", f"{self.destination} to {self.origin}",
+            (leg.note.capitalize() + "; " if leg.note else "") + self.departure_text(),
+        ))
+        return acts
+
+    def _is_fixed_duplicate(self, act: dict) -> bool:
+        # model ne instructions ke bawajood journey / check-in likh diya: planner wala hi rakho
+        kind = str(act.get("type", "")).lower()
+        text = f"{act.get('title', '')} {act.get('location', '')}".lower()
+        if kind == "accommodation":
+            return True
+        if kind == "transportation":
+            origin = key_of(self.origin)
+            return bool(re.search(r"\b(flight|airport|train|station|bus stand|volvo|return|back to)\b", text)) or (
+                bool(origin) and origin in key_of(text))
+        return False
+
+    def splice(self, activities: list, index: int) -> list:
+        """
+        Raw day activities + planner ke fixed arrival / departure pieces (route known ho tab).
+        """
+        if not self.route or index not in (1, self.num_days):
+            return activities
+        kept = [a for a in activities if isinstance(a, dict) and not self._is_fixed_duplicate(a)]
+        if index == 1:
+            journey, *stay = self.arrival_activities()
+            kept = [journey] + _insert_by_time(kept, stay)
+        if index == self.num_days:
+            *stay, journey = self.departure_activities()
+            kept = _insert_by_time(kept, stay) + [journey]
+        return kept
+
+    def chunk_skeleton(self) -> dict:
+        """
+        Chunked mode ka outline bina LLM call: ranked attractions din-wise (arrival
+        day 2, beech ke din 3, departure day 1), har din ek area ke aas-paas.
+        """
+        attractions = self.ranked_attractions()
+        quotas = [2] + [3] * max(self.num_days - 2, 0) + ([1] if self.num_days > 1 else [])
+        days, pos = [], 0
+        for n, quota in enumerate(quotas, start=1):
+            picked = attractions[pos:pos + quota]
+            pos += quota
+            if picked:
+                theme = ", ".join(a["name"] for a in picked)
+                area = picked[0]["area"]
+            else:
+                theme = "Local markets, cafes and free exploring"
+                area = self.entry["stayArea"] or self.destination
+            days.append({"day": n, "theme": theme, "area": area})
+        index.template_skeletons += 1
+        return {
+            "days": days,
+            "accommodation": self.stay_text(),
+            "transportation": self.transportation() or {},
+        }
+
+
+def facts_for(trip: dict) -> DestinationFacts | None:
+    """
+    Trip -> DestinationFacts, ya None (index off / destination index me nahi).
+    """
+    entry = index.lookup(trip["destination"])
+    if entry is None:
+        return None
+    facts = DestinationFacts(entry, trip, index.origin_key(trip.get("current_location")))
+    if facts.route:
+        index.route_hits += 1
+    return facts
+
+
+# ================== LEARNING ==================
+
+_learn_lock = threading.Lock()
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(h|hr|hrs|hour|hours|m|min|mins|minutes)\b", re.IGNORECASE)
+_GENERIC_RE = re.compile(r"^(free time|leisure|at leisure|relax|rest|explore|check[- ]?(in|out))\b", re.IGNORECASE)
+
+
+def _meal_slot(time_text: str) -> str:
+    try:
+        minutes = clock_minutes(time_text)
+    except ValueError:
+        return "lunch"
+    if minutes < 11 * 60:
+        return "breakfast"
+    return "lunch" if minutes < 16 * 60 else "dinner"
+
+
+def _leg_hours(leg: dict) -> float | None:
+    found = _DURATION_RE.findall(str(leg.get("duration") or ""))
+    if found:
+        return round(sum(float(n) / (1 if u.lower().startswith("h") else 60) for n, u in found), 2)
+    try:
+        span_min = clock_minutes(leg.get("arrivalTime")) - clock_minutes(leg.get("departureTime"))
+    except (TypeError, ValueError):
+        return None
+    return round((span_min % (24 * 60)) / 60, 2) or None
+
+
+def learned_route(transportation) -> dict | None:
+    leg = (transportation or {}).get("toDestination") if isinstance(transportation, dict) else None
+    if not isinstance(leg, dict):
+        return None
+    mode = key_of(leg.get("type") or leg.get("mode"))
+    mode = next((m for m in DEFAULT_DEPART if m in mode), None)
+    cost, _ = itinerary_costs.parse_cost(leg.get("estimatedCost") or leg.get("cost") or "")
+    hours = _leg_hours(leg)
+    if not mode or not hours or not cost:
+        return None
+    return {"mode": mode, "hours": hours, "cost": cost}
+
+
+def generation_record(trip: dict, wrapped: dict) -> dict | None:
+    """
+    Fresh generation -> learned JSONL row (model ke likhe facts hi; planner wale pieces nahi).
+    """
+    days = wrapped.get("itinerary") or []
+    if not days:
+        return None
+    facts = trip.get("facts")
+    attractions, meals, stay = [], defaultdict(list), ""
+    for day in days:
+        for act in day.get("activities") or []:
+            kind = act.get("type")
+            if kind == "activity" and act.get("title") and not _GENERIC_RE.match(act["title"]):
+                attractions.append([act["title"], act.get("location") or ""])
+            elif kind == "meal":
+                amount, per_person = itinerary_costs.parse_cost(act.get("estimatedCost"))
+                if amount and per_person:
+                    meals[_meal_slot(act.get("time"))].append(amount)
+            elif kind == "accommodation" and not stay and not (facts and facts.route):
+                stay = act.get("location") or ""
+    return {
+        "ts": int(time.time()),
+        "destination": trip["destination"],
+        "origin": trip.get("current_location") or "",
+        "budgetRange": trip.get("budget_range") or "midrange",
+        "attractions": attractions,
+        "meals": dict(meals),
+        "route": None if facts and facts.route else learned_route(wrapped.get("transportation")),
+        "stay": stay,
+    }
+
+
+def learn(trip: dict, wrapped: dict, path: str = LEARNED_PATH) -> bool:
+    """
+    Successful generation ko learned log me append (ek write per line; workers ke
+    beech bhi O_APPEND lines mix nahi hoti). Index me `build` ke baad aata hai.
+    """
+    if not LEARN:
+        return False
+    record = generation_record(trip, wrapped)
+    if record is None:
+        return False
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    try:
+        with _learn_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+    except OSError as e:
+        log.warning("destination index learn failed", extra={"error": str(e)})
+        return False
+    return True
+
+
+# ================== CLI ==================
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / inspect the destination skeleton index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="seed + learned generations -> index file")
+    build.add_argument("--min-seen", type=int, default=MIN_SEEN)
+    show = sub.add_parser("show", help="print the facts a trip would get")
+    show.add_argument("destination")
+    show.add_argument("--from", dest="origin", default="")
+    show.add_argument("--budget", default="midrange")
+    show.add_argument("--days", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(json.dumps(build_index(min_seen=args.min_seen), indent=2))
+        return
+    index.open()
+    trip = {"destination": args.destination, "current_location": args.origin,
+            "budget_range": args.budget, "num_days": args.days, "interests": []}
+    facts = facts_for(trip)
+    if facts is None:
+        print(f"{args.destination!r} is not in the index", file=sys.stderr)
+        sys.exit(1)
+    print(facts.prompt_block())
+    if facts.route:
+        print(facts.planned())
+    print(json.dumps(facts.chunk_skeleton(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Shared upstream HTTP client layer (Groq + Next.js calls).
+
+- one pooled, keep-alive `requests.Session` per process (`session`) instead of
+  module-level requests.post/get, which opened a new TCP+TLS connection per call
+- retry with jittered exponential backoff on 429/5xx (Retry-After respected)
+- optional HTTP/2 via urllib3's h2 support (UPSTREAM_HTTP2=1, needs `h2`)
+- per-host metrics: requests, new connections, reuse rate, handshake time,
+  pool queue wait, retries
+
+The ASGI apps use `make_async_session()` (aiohttp with the same per-host
+metrics via trace hooks) plus `async_request()` for the same retry/backoff.
+
+Config (env):
+    UPSTREAM_POOL_HOSTS     number of per-host pools kept (default 10)
+    UPSTREAM_POOL_MAXSIZE   keep-alive connections per host (default 32)
+    UPSTREAM_POOL_BLOCK     1 => wait for a free connection instead of opening extra ones
+    UPSTREAM_RETRIES        retries on 429/5xx/connect errors (default 2)
+    UPSTREAM_BACKOFF        backoff base seconds (default 0.5)
+    UPSTREAM_BACKOFF_MAX    backoff cap seconds (default 8)
+    UPSTREAM_HTTP2          1 => negotiate HTTP/2 where the server supports it
+    UPSTREAM_ASYNC_LIMIT_PER_HOST  max concurrent aiohttp connections per host (0 = no cap)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+POOL_HOSTS = int(os.getenv("UPSTREAM_POOL_HOSTS", "10"))
+POOL_MAXSIZE = int(os.getenv("UPSTREAM_POOL_MAXSIZE", "32"))
+POOL_BLOCK = os.getenv("UPSTREAM_POOL_BLOCK", "0") == "1"
+RETRIES = int(os.getenv("UPSTREAM_RETRIES", "2"))
+BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.5"))
+BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))
+HTTP2 = os.getenv("UPSTREAM_HTTP2", "0") == "1"
+ASYNC_LIMIT_PER_HOST = int(os.getenv("UPSTREAM_ASYNC_LIMIT_PER_HOST", "0"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+# ================== METRICS ==================
+
+class HostStats:
+    __slots__ = ("requests", "connections", "handshake_s", "queue_wait_s", "retries")
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.handshake_s = 0.0
+        self.queue_wait_s = 0.0
+        self.retries = 0
+
+    def as_dict(self) -> dict:
+        reused = max(self.requests - self.connections, 0)
+        return {
+            "requests": self.requests,
+            "newConnections": self.connections,
+            "reuseRate": round(reused / self.requests, 4) if self.requests else 0.0,
+            "avgHandshakeMs": round(1000 * self.handshake_s / self.connections, 2) if self.connections else 0.0,
+            "avgQueueWaitMs": round(1000 * self.queue_wait_s / self.requests, 3) if self.requests else 0.0,
+            "retries": self.retries,
+        }
+
+
+class UpstreamMetrics:
+    def __init__(self):
+        self._hosts: dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, host: str) -> HostStats:
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts.setdefault(host, HostStats())
+        return stats
+
+    def record_request(self, host: str, queue_wait_s: float = 0.0) -> None:
+        with self._lock:
+            stats = self._stats(host)
+            stats.requests += 1
+            stats.queue_wait_s += queue_wait_s
+
+    def record_connect(self, host: str, handshake_s: float) -> None:
+        with self._lock:
+            stats = self._stats(host)
+            stats.connections += 1
+            stats.handshake_s += handshake_s
+
+    def record_retry(self, host: str) -> None:
+        with self._lock:
+            self._stats(host).retries += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {host: stats.as_dict() for host, stats in self._hosts.items()}
+
+
+metrics = UpstreamMetrics()
+
+
+def backoff_delay(attempt: int, retry_after: str | None = None) -> float:
+    """
+    Full jitter: random(0, min(cap, base * 2^attempt)); Retry-After ho to
+    kam se kam utna wait.
+    """
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF * (2 ** attempt)))
+    if retry_after:
+        try:
+            delay = max(delay, min(float(retry_after), BACKOFF_MAX))
+        except ValueError:
+            pass
+    return delay
+
+
+# ================== SYNC (requests / urllib3) ==================
+
+class _MeteredPoolMixin:
+    """
+    Pool-level hooks: _get_conn => queue wait + request count,
+    _new_conn => connect() wrapped to time TCP+TLS handshake.
+    """
+
+    def _get_conn(self, timeout=None):
+        t0 = time.perf_counter()
+        conn = super()._get_conn(timeout=timeout)
+        metrics.record_request(self.host, time.perf_counter() - t0)
+        return conn
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        host = self.host
+        original_connect = conn.connect
+
+        def timed_connect():
+            t0 = time.perf_counter()
+            original_connect()
+            metrics.record_connect(host, time.perf_counter() - t0)
+
+        conn.connect = timed_connect
+        return conn
+
+
+class MeteredHTTPConnectionPool(_MeteredPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class MeteredHTTPSConnectionPool(_MeteredPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class MeteredRetry(Retry):
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None, _stacktrace=None):
+        if _pool is not None:
+            metrics.record_retry(_pool.host)
+        return super().increment(method, url, response, error, _pool, _stacktrace)
+
+
+class MeteredAdapter(HTTPAdapter):
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self.poolmanager = PoolManager(
+            num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs
+        )
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": MeteredHTTPConnectionPool,
+            "https": MeteredHTTPSConnectionPool,
+        }
+
+
+def build_retry() -> Retry:
+    return MeteredRetry(
+        total=RETRIES,
+        connect=RETRIES,
+        read=0,  # read timeout pe retry nahi: model shayad already tokens generate kar chuka hai
+        status=RETRIES,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=None,  # POST bhi retry ho (Groq calls POST hain)
+        backoff_factor=BACKOFF,
+        backoff_max=BACKOFF_MAX,
+        backoff_jitter=BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # last response caller ko milta hai, raise_for_status wahan
+    )
+
+
+def build_session() -> requests.Session:
+    if HTTP2:
+        import urllib3.http2
+
+        urllib3.http2.inject_into_urllib3()
+
+    adapter = MeteredAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+        max_retries=build_retry(),
+    )
+    sess = requests.Session()
+    sess.mount("http://", adapter)
+    sess.mount("https://", adapter)
+    return sess
+
+
+# Process-wide shared session (connection pools are thread-safe)
+session = build_session()
+
+
+def _reset_pools_after_fork() -> None:
+    # pre-fork workers: parent ke open sockets share na ho, child apne connections khole
+    session.close()
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+# ================== ASYNC (aiohttp) ==================
+
+def _trace_config():
+    import aiohttp
+
+    async def on_request_start(session, ctx, params):
+        ctx.host = params.url.host
+        ctx.queued_at = None
+        ctx.queue_wait = 0.0
+        ctx.connect_started = None
+
+    async def on_queued_start(session, ctx, params):
+        ctx.queued_at = time.perf_counter()
+
+    async def on_queued_end(session, ctx, params):
+        if ctx.queued_at is not None:
+            ctx.queue_wait = time.perf_counter() - ctx.queued_at
+
+    async def on_create_start(session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def on_create_end(session, ctx, params):
+        metrics.record_connect(ctx.host, time.perf_counter() - ctx.connect_started)
+
+    async def on_request_end(session, ctx, params):
+        metrics.record_request(ctx.host, ctx.queue_wait)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_queued_start.append(on_queued_start)
+    trace.on_connection_queued_end.append(on_queued_end)
+    trace.on_connection_create_start.append(on_create_start)
+    trace.on_connection_create_end.append(on_create_end)
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+def make_async_session(total_timeout: float):
+    """
+    aiohttp session for the ASGI apps. Event loop pe connections sasti hain,
+    isliye default me koi cap nahi (ASYNC_LIMIT_PER_HOST=0); idle keep-alive
+    connections reuse hote hain.
+    """
+    import aiohttp
+
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=total_timeout, connect=10),
+        connector=aiohttp.TCPConnector(
+            limit=0, limit_per_host=ASYNC_LIMIT_PER_HOST, keepalive_timeout=60
+        ),
+        trace_configs=[_trace_config()],
+    )
+
+
+async def async_request(http, method: str, url: str, **kwargs) -> tuple[int, str, str, dict]:
+    """
+    aiohttp request with the same retry policy as the sync session.
+    Returns (status, body text, reason, headers); the caller decides what
+    non-2xx means (headers se Retry-After limiter / client tak jata hai).
+    """
+    import aiohttp
+    from yarl import URL
+
+    attempt = 0
+    while True:
+        try:
+            async with http.request(method, url, **kwargs) as resp:
+                body = await resp.text()
+                if resp.status not in RETRY_STATUSES or attempt >= RETRIES:
+                    return resp.status, body, resp.reason or "", resp.headers
+                retry_after = resp.headers.get("Retry-After")
+        except aiohttp.ClientConnectionError:
+            if attempt >= RETRIES:
+                raise
+            retry_after = None
+
+        metrics.record_retry(URL(url).host)
+        await asyncio.sleep(backoff_delay(attempt, retry_after))
+        attempt += 1
@@ -1,339 +1,1054 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import requests
 import os
 from datetime import datetime, timedelta
 import json
 
+import destination_index
+import http_client
+import itinerary_batch
+import itinerary_chunks
+import itinerary_costs
+import itinerary_edit
+import itinerary_jobs
+import itinerary_json
+import llm_backend
+import observability
+import prompt_templates
+import response_encoding
+import serving
+import upstream_limiter
+from observability import span
+from itinerary_cache import cache_from_env, make_cache_key
+from json_stream import ArrayItemStreamParser
+from single_flight import flight_from_env
+
+log = observability.setup_logging("itinerary")
+
 app = Flask(__name__)
 CORS(app)
+observability.instrument_app(app, request)
 
-# Groq API configuration
-GROQ_API_KEY = os.getenv(
-    "GROQ_API_KEY",
+# LLM backend (Groq by default; LLM_BACKEND=openai / mock, see llm_backend.py)
+LLM = llm_backend.backend_from_env()
 
-)
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+# Template text ka hash: prompt badalte hi purani cache entries kabhi serve nahi hoti
+PROMPT_VERSION = "itinerary-" + prompt_templates.version_of("itinerary_system", "itinerary_user")
 
+itinerary_cache = cache_from_env()
+# identical in-flight generations share one Groq call (key = cache key)
+itinerary_flights = flight_from_env("itinerary", publishable=lambda result: result[1] == 200)
+# admission control: RPM/TPM buckets + AIMD concurrency (chat ke saath shared budget)
+llm_limiter = upstream_limiter.limiter_from_env("itinerary", LLM.model)
 
-@app.route("/generate-itinerary", methods=["POST"])
-def generate_itinerary():
+# /healthz + /readyz (ready = warm-up done, not draining, LLM key set)
+serving.add_health_routes(app, {"llm": lambda: LLM.configured})
+
+# kitni disk-tier cache entries preload me memory me aaye (serve.py)
+WARM_CACHE_ENTRIES = int(os.getenv("SERVE_WARM_CACHE", "256"))
+
+
+def preload() -> None:
+    """
+    serve.py master me, fork se pehle: disk cache ki nayi entries memory LRU me.
+    Templates import pe hi load ho chuke; workers dono copy-on-write share karte hain.
+    """
+    loaded = itinerary_cache.warm(WARM_CACHE_ENTRIES)
+    # destination index: stale ho to yahin build, phir mmap (workers same pages share karte hain)
+    destination_index.index.open()
+    log.info("preloaded", extra={"cacheEntries": loaded, "templates": len(prompt_templates.TEMPLATES),
+                                 "destinations": destination_index.index.stats()["destinations"]})
+
+
+def warm_up() -> None:
+    """
+    Har worker me, traffic se pehle: LLM host ke keep-alive connections khol do.
+    """
+    opened = serving.warm_connections(http_client.session, [(serving.models_url(LLM.url), LLM.headers())])
+    log.info("upstream connections warmed", extra={"requests": opened})
+
+
+def _norm_text(value) -> str:
+    return " ".join(str(value or "").split()).lower()
+
+
+def _norm_number(value):
     try:
-        if not GROQ_API_KEY:
-            return jsonify({"error": "GROQ_API_KEY is not set"}), 500
-
-        print("=== Itinerary AI API called ===")
-        data = request.get_json()
-        print("Request payload from Next.js:", data)
-
-        # Extract trip information (coming from your Next.js API)
-        destination = data.get("destination", "")
-        current_location = data.get("currentLocation", "")
-        start_date = data.get("startDate", "")
-        end_date = data.get("endDate", "")
-        travelers = data.get("travelers", 1)
-        daily_budget = data.get("dailyBudget", 0)
-        budget_range = data.get("budgetRange", "midrange")
-        interests = data.get("interests", [])
-        additional_notes = data.get("additionalNotes", "")
-
-        if not destination or not start_date or not end_date:
-            return jsonify({
-                "error": "Missing required fields: destination, startDate, endDate"
-            }), 400
-
-        # Parse dates & compute number of days (supports ISO and YYYY-MM-DD)
-        try:
-            if "T" in str(start_date):
-                start = datetime.fromisoformat(str(start_date).replace("Z", "+00:00"))
-            else:
-                start = datetime.strptime(str(start_date)[:10], "%Y-%m-%d")
-
-            if "T" in str(end_date):
-                end = datetime.fromisoformat(str(end_date).replace("Z", "+00:00"))
-            else:
-                end = datetime.strptime(str(end_date)[:10], "%Y-%m-%d")
-
-            num_days = (end - start).days + 1
-        except Exception as e:
-            print(f"Date parsing error: {e}")
-            return jsonify({"error": f"Invalid date format: {str(e)}"}), 400
-
-        # ========== STRICT JSON PROMPT (reduces JSONDecodeError) ==========
-
-        system_prompt = """
-You are an expert travel itinerary planner and a STRICT JSON generator.
-
-Always respond with a single valid JSON object.
-Do NOT include markdown, comments, or any text outside the JSON.
-Do NOT include a top-level "trip" field.
-Use only these top-level keys:
-- "itinerary" (array of days)
-- "totalEstimatedCost" (string)
-- "transportation" (object)
-
-All string values MUST be on a single line (no raw newlines inside strings).
-Use double quotes for all keys and string values.
-Do NOT add trailing commas.
-"""
-
-#         user_prompt = f"""
-# Create a detailed {num_days}-day travel itinerary for a trip from "{current_location}" to "{destination}".
-
-# Trip Details:
-# - Destination: {destination}
-# - Starting Location: {current_location}
-# - Start Date: {start_date}
-# - End Date: {end_date}
-# - Number of Days: {num_days}
-# - Number of Travelers: {travelers}
-# - Daily Budget: ₹{daily_budget} per person
-# - Budget Range: {budget_range}
-# - Interests: {", ".join(interests) if interests else "General travel"}
-# - Additional Notes: {additional_notes if additional_notes else "None"}
-
-# Itinerary requirements:
-
-# 1. Day 1 (Arrival Day):
-#    - Include transportation from {current_location} to {destination} (train/bus/flight) depending on budget.
-#    - Specify departure and arrival times.
-#    - Include hotel check-in (type = "accommodation").
-#    - Plan afternoon/evening activities with specific times.
-#    - Include dinner time and location (type = "meal").
-
-# 2. Middle Days (if any):
-#    - Morning activity with specific time.
-#    - Breakfast time and location (type = "meal").
-#    - Afternoon activity with time.
-#    - Lunch time and location (type = "meal").
-#    - Evening activity with time.
-#    - Dinner time and location (type = "meal").
-#    - Activities should be realistic, specific to {destination}, and match the interests and budget.
-
-# 3. Last Day (Departure Day):
-#    - Morning activity if time permits.
-#    - Check-out from accommodation (type = "accommodation").
-#    - Transportation back to {current_location} with departure and arrival times.
-
-# Return JSON in EXACTLY this structure (keys and types):
-
-# {
-#   "itinerary": [
-#     {
-#       "day": 1,
-#       "date": "YYYY-MM-DD",
-#       "activities": [
-#         {
-#           "time": "HH:MM AM/PM",
-#           "type": "transportation" | "activity" | "meal" | "accommodation",
-#           "title": "Short title on one line",
-#           "location": "Specific location on one line",
-#           "description": "Short description on one line, no line breaks",
-#           "estimatedCost": "₹XXX per person",
-#           "duration": "X hours"
-#         }
-#       ]
-#     }
-#   ],
-#   "totalEstimatedCost": "₹XXXX",
-#   "transportation": {
-#     "toDestination": {
-#       "type": "train" | "bus" | "flight",
-#       "departureTime": "HH:MM AM/PM",
-#       "arrivalTime": "HH:MM AM/PM",
-#       "estimatedCost": "₹XXX per person"
-#     },
-#     "fromDestination": {
-#       "type": "train" | "bus" | "flight",
-#       "departureTime": "HH:MM AM/PM",
-#       "arrivalTime": "HH:MM AM/PM",
-#       "estimatedCost": "₹XXX per person"
-#     }
-#   }
-# }
-
-# Additional rules:
-# - All times must be in 12-hour format with AM/PM.
-# - Strings must NOT contain newline characters; keep each value on a single line.
-# - Do NOT include any extra top-level fields.
-# - Return ONLY this JSON object, nothing else.
-# """
-
-
-        user_prompt = f"""
-Create a detailed {num_days}-day travel itinerary for a trip from "{current_location}" to "{destination}".
-
-Trip Details:
-- Destination: {destination}
-- Starting Location: {current_location}
-- Start Date: {start_date}
-- End Date: {end_date}
-- Number of Days: {num_days}
-- Number of Travelers: {travelers}
-- Daily Budget: ₹{daily_budget} per person
-- Budget Range: {budget_range}
-- Interests: {", ".join(interests) if interests else "General travel"}
-- Additional Notes: {additional_notes if additional_notes else "None"}
-
-Itinerary requirements:
-
-1. Day 1 (Arrival Day):
-   - Include transportation from {current_location} to {destination} (train/bus/flight) depending on budget.
-   - Specify departure and arrival times.
-   - Include hotel check-in (type = "accommodation").
-   - Plan afternoon/evening activities with specific times.
-   - Include dinner time and location (type = "meal").
-
-2. Middle Days (if any):
-   - Morning activity with specific time.
-   - Breakfast time and location (type = "meal").
-   - Afternoon activity with time.
-   - Lunch time and location (type = "meal").
-   - Evening activity with time.
-   - Dinner time and location (type = "meal").
-   - Activities should be realistic, specific to {destination}, and match the interests and budget.
-
-3. Last Day (Departure Day):
-   - Morning activity if time permits.
-   - Check-out from accommodation (type = "accommodation").
-   - Transportation back to {current_location} with departure and arrival times.
-
-You MUST return a single JSON object with exactly these top-level keys:
-- "itinerary": an array of day objects
-- "totalEstimatedCost": string like "₹5800"
-- "transportation": an object with "toDestination" and "fromDestination"
-
-Each item in "itinerary" must be an object with:
-- "day": integer (1, 2, 3, ...)
-- "date": string in "YYYY-MM-DD" format
-- "activities": array of activity objects
-
-Each activity object must have:
-- "time": "HH:MM AM/PM"
-- "type": one of "transportation", "activity", "meal", "accommodation"
-- "title": short title on one line
-- "location": specific location on one line
-- "description": short description on one line (no line breaks)
-- "estimatedCost": string like "₹XXX per person"
-- "duration": string like "X hours"
-
-Additional rules:
-- All times must be in 12-hour format with AM/PM.
-- Strings must NOT contain newline characters; keep each value on a single line.
-- Do NOT include any extra top-level fields.
-- Return ONLY this JSON object, nothing else.
-"""
-
-        # ================== CALL GROQ API ==================
+        num = float(value)
+    except (TypeError, ValueError):
+        return _norm_text(value)
+    return int(num) if num.is_integer() else num
+
+
+def trip_cache_params(data: dict, start: datetime, end: datetime) -> dict:
+    """
+    Normalized trip params jo itinerary output ko affect karte hain.
+    Casing/whitespace/interest order differences same key denge.
+    """
+    return {
+        "destination": _norm_text(data.get("destination")),
+        "currentLocation": _norm_text(data.get("currentLocation")),
+        "startDate": start.date().isoformat(),
+        "endDate": end.date().isoformat(),
+        "travelers": _norm_number(data.get("travelers", 1)),
+        "dailyBudget": _norm_number(data.get("dailyBudget", 0)),
+        "budgetRange": _norm_text(data.get("budgetRange", "midrange")),
+        "interests": sorted({_norm_text(i) for i in (data.get("interests") or []) if _norm_text(i)}),
+        "additionalNotes": _norm_text(data.get("additionalNotes")),
+    }
+
+
+def parse_trip_date(value) -> datetime:
+    """
+    ISO (2024-01-15T00:00:00Z) aur plain YYYY-MM-DD dono support karta hai.
+    """
+    if "T" in str(value):
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d")
+
+
+def parse_trip_request(data: dict) -> dict:
+    """
+    Next.js ka payload -> trip dict (parsed dates + num_days ke saath).
+    Invalid input pe ValueError raise karta hai (message client ko jata hai).
+    """
+    # Extract trip information (coming from your Next.js API)
+    trip = {
+        "destination": data.get("destination", ""),
+        "current_location": data.get("currentLocation", ""),
+        "start_date": data.get("startDate", ""),
+        "end_date": data.get("endDate", ""),
+        "travelers": data.get("travelers", 1),
+        "daily_budget": data.get("dailyBudget", 0),
+        "budget_range": data.get("budgetRange", "midrange"),
+        "interests": data.get("interests", []),
+        "additional_notes": data.get("additionalNotes", ""),
+    }
+
+    if not trip["destination"] or not trip["start_date"] or not trip["end_date"]:
+        raise ValueError("Missing required fields: destination, startDate, endDate")
+
+    # Parse dates & compute number of days (supports ISO and YYYY-MM-DD)
+    try:
+        with span("date_math"):
+            trip["start"] = parse_trip_date(trip["start_date"])
+            trip["end"] = parse_trip_date(trip["end_date"])
+            trip["num_days"] = (trip["end"] - trip["start"]).days + 1
+    except Exception as e:
+        log.info("date parsing error", extra={"error": str(e)})
+        raise ValueError(f"Invalid date format: {str(e)}")
+
+    return trip
+
+
+def attach_destination_facts(trip: dict) -> dict:
+    """
+    Sirf fresh generation paths (single, chunked, batch): index me destination ho to
+    trip["facts"] = DestinationFacts, warna None. Key ka hona = is generation se learn karo.
+    """
+    with span("destination_index"):
+        trip["facts"] = destination_index.facts_for(trip)
+    return trip
+
+
+# ========== STRICT JSON PROMPT (reduces JSONDecodeError) ==========
+
+# prompts/itinerary_*.txt, startup pe ek baar compile; static instructions
+# pehle aur trip details end me, taaki upstream prefix cache lag sake
+SYSTEM_PROMPT = prompt_templates.get("itinerary_system").render()
+USER_TEMPLATE = prompt_templates.get("itinerary_user")
+# route known: journey / check-in / check-out / transportation server bharta hai
+KNOWN_TEMPLATE = prompt_templates.get("itinerary_user_known")
+FACTS_PROMPT_VERSION = "facts-" + prompt_templates.version_of("itinerary_user_known", "destination_facts")
+
+
+def build_user_prompt(trip: dict) -> str:
+    facts = trip.get("facts")
+    if facts and facts.route:
+        return KNOWN_TEMPLATE.render(
+            num_days=trip["num_days"],
+            current_location=trip["current_location"],
+            destination=trip["destination"],
+            trip_details=itinerary_chunks.trip_details(trip),
+            facts=facts.prompt_block(),
+            planned=facts.planned(),
+        )
+    prompt = USER_TEMPLATE.render(
+        num_days=trip["num_days"],
+        current_location=trip["current_location"],
+        destination=trip["destination"],
+        trip_details=itinerary_chunks.trip_details(trip),
+    )
+    return f"{prompt}\n\n{facts.prompt_block()}" if facts else prompt
+
+
+def groq_request_body(trip: dict, stream: bool = False) -> dict:
+    with span("prompt_build"):
+        user_prompt = build_user_prompt(trip)
+    return {
+        "model": LLM.model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ],
+        "max_tokens": 4000,
+        "temperature": 0.7,
+        "stream": stream,
+    }
+
+
+def strip_code_fences(text: str) -> str:
+    # Strip ```json / ``` if the model decides to wrap it anyway
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def normalize_day(day: dict, index: int, trip: dict) -> dict:
+    """
+    Ek model day object ko frontend shape me convert karta hai.
+    `index` 1-based hai; date hamesha start date se compute hoti hai.
+    """
+    # compute date based on start date, regardless of what the model sent
+    day_date = trip["start"] + timedelta(days=index - 1)
+    pretty_date = day_date.strftime("%A, %B %d, %Y")
+
+    activities = day.get("activities", [])
+    facts = trip.get("facts")
+    if facts:
+        # Day 1 / last day: planner ka fixed journey + check-in / check-out
+        activities = facts.splice(activities, index)
+
+    normalized_activities = []
+    for act in activities:
+        normalized_activities.append({
+            "time": act.get("time", "9:00 AM"),
+            "type": act.get("type", "activity"),
+            "title": act.get("title", "Activity"),
+            "location": act.get("location", trip["destination"]),
+            "description": act.get("description", ""),
+            "estimatedCost": act.get("estimatedCost", ""),
+            "duration": act.get("duration", "1 hour"),
+        })
+
+    return {
+        "day": day.get("day", index),
+        "date": pretty_date,
+        "activities": normalized_activities,
+    }
+
+
+def wrap_itinerary(normalized_days: list, itinerary_data: dict, trip: dict) -> dict:
+    # ✅ This is the shape your Next.js route & frontend expect
+    facts = trip.get("facts")
+    wrapped = {
+        "itinerary": normalized_days,                         # array of days
+        "totalEstimatedCost": itinerary_data.get("totalEstimatedCost"),
+        "transportation": itinerary_data.get("transportation") or (facts.transportation() if facts else None),
+    }
+    # activities ke costs se total + costSummary (over-budget days)
+    with span("costs"):
+        wrapped = itinerary_costs.apply_costs(wrapped, trip)
+    # fresh generation (edit nahi): attractions / meal costs / transport learned log me
+    if "facts" in trip:
+        destination_index.learn(trip, wrapped)
+    return wrapped
+
+
+def build_wrapped_itinerary(ai_response: str, trip: dict, continue_missing=None) -> dict:
+    """
+    Model ka (fence-stripped) JSON text -> normalized `wrapped` itinerary.
+    Tolerant parse (repair + schema); truncated / invalid days ho to
+    continue_missing(trip, days, itinerary_data, next_day) se sirf baaki days.
+    Repair ke baad bhi parse na ho to json.JSONDecodeError raise karta hai.
+    """
+    with span("json_parse"):
+        itinerary_data, days, next_day = itinerary_json.parse_itinerary(ai_response, trip["num_days"])
+
+    more = continue_missing(trip, days, itinerary_data, next_day) if next_day and continue_missing else []
+    return wrap_continued_itinerary(days, more, itinerary_data, trip)
+
+
+def wrap_continued_itinerary(days: list, more: list, itinerary_data: dict, trip: dict) -> dict:
+    """
+    Parsed days + continuation days -> wrapped (total saare days se compute hota hai).
+    """
+    with span("normalize"):
+        normalized_days = [
+            normalize_day(day, index, trip) for index, day in enumerate(days + more, start=1)
+        ]
+    return wrap_itinerary(normalized_days, itinerary_data, trip)
+
 
+def continue_itinerary(trip: dict, days: list, itinerary_data: dict, next_day: int) -> list:
+    """
+    "Continue from day N" calls (ITINERARY_CONTINUE_ATTEMPTS tak) -> missing raw days.
+    Fail ho to jitne mile utne hi; poora regeneration nahi.
+    """
+    more = []
+    for _ in range(itinerary_json.CONTINUE_ATTEMPTS):
+        first = next_day
+        log.info("itinerary incomplete, continuing", extra={"from_day": first})
+        itinerary_json.parse_metrics.record("continuations")
+        body = itinerary_chunks.continuation_body(LLM.model, trip, days + more, itinerary_data, first)
         try:
-            response = requests.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json",
-                },
-                json={
-                    "model": GROQ_MODEL,
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt},
-                    ],
-                    "max_tokens": 4000,
-                    "temperature": 0.7,
-                    "stream": False,
-                },
-                timeout=120,
+            _, got, next_day = itinerary_json.parse_itinerary(
+                groq_text_completion(body), trip["num_days"], first
             )
-            response.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"Error calling Groq API: {e}")
-            return jsonify({"error": f"Error calling Groq API: {str(e)}"}), 500
+        except (requests.exceptions.RequestException, itinerary_chunks.RateLimited,
+                upstream_limiter.Overloaded, json.JSONDecodeError) as e:
+            log.warning("continuation failed", extra={"from_day": first, "error": str(e)})
+            itinerary_json.parse_metrics.record("continuation_failures")
+            break
+        if not got:
+            itinerary_json.parse_metrics.record("continuation_failures")
+            break
+        more.extend(chunk_days({"itinerary": got}, first, trip["num_days"]))
+        if next_day is None:
+            break
+    return more
 
-        ai_data = response.json()
-        print("Raw Groq response:", json.dumps(ai_data, indent=2))
 
-        if "choices" not in ai_data or not ai_data["choices"]:
-            return jsonify({"error": "No choices in AI response"}), 500
+def wants_stream(data: dict, accept: str) -> bool:
+    """
+    Streaming mode: body me "stream": true, ya Accept: application/x-ndjson.
+    """
+    if data.get("stream"):
+        return True
+    return "application/x-ndjson" in accept
 
-        ai_response = ai_data["choices"][0]["message"]["content"].strip()
 
-        # Strip ```json / ``` if the model decides to wrap it anyway
-        if ai_response.startswith("```json"):
-            ai_response = ai_response[7:]
-        if ai_response.startswith("```"):
-            ai_response = ai_response[3:]
-        if ai_response.endswith("```"):
-            ai_response = ai_response[:-3]
-        ai_response = ai_response.strip()
+def ndjson_line(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
 
-        # ================== PARSE JSON ==================
 
-        try:
-            itinerary_data = json.loads(ai_response)
-        except json.JSONDecodeError as e:
-            print("=== RAW AI RESPONSE START ===")
-            print(ai_response)
-            print("=== RAW AI RESPONSE END ===")
-            print(f"JSON Parse Error: {e}")
-            return jsonify({
+def iter_groq_stream(response, ticket=None):
+    """
+    Groq (OpenAI-compatible) SSE stream se content deltas yield karta hai.
+    Lines bytes me decode karte hain taaki ₹ jaisa text latin-1 me na bigde.
+    """
+    for raw_line in response.iter_lines():
+        if not raw_line:
+            continue
+        line = raw_line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        # Groq last chunk me x_groq.usage bhejta hai
+        observability.record_llm_usage(chunk, LLM.model)
+        if ticket is not None:
+            ticket.record_usage(chunk)
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+
+def stream_cached_itinerary(wrapped: dict):
+    for day in wrapped.get("itinerary", []):
+        yield ndjson_line({"type": "day", "day": day})
+    yield ndjson_line({"type": "complete", "success": True, "itinerary": wrapped})
+
+
+class StreamedDays:
+    """
+    Stream me aaye days: har day ka number model ke "day" field se (range me ho
+    aur pichhle day se aage), warna array position se -- kitne days bache is se
+    kabhi nahi, taaki ek kharab item baad ke days ki date / number na khiskaye.
+    """
+
+    def __init__(self, trip: dict):
+        self.trip = trip
+        self.parser = ArrayItemStreamParser("itinerary", itinerary_json.load_stream_item)
+        self.days = []
+        self.last_day = 0
+        self.skipped = 0
+
+    def feed(self, delta: str) -> list:
+        added = (self.add(day, position) for position, day in self.parser.feed_indexed(delta))
+        return [day for day in added if day is not None]
+
+    def add(self, day, position: int) -> dict | None:
+        num_days = self.trip["num_days"]
+        if not isinstance(day, dict):
+            self.skipped += 1
+            return None
+        number = day.get("day")
+        if isinstance(number, bool) or not isinstance(number, int) or not self.last_day < number <= num_days:
+            number = position
+        if not self.last_day < number <= num_days:
+            # duplicate / trip se bahar ka day
+            return None
+        self.last_day = number
+        normalized = normalize_day({**day, "day": number}, number, self.trip)
+        self.days.append(normalized)
+        return normalized
+
+    @property
+    def next_day(self) -> int | None:
+        """
+        Continuation yahan se: model ka aakhri emitted day + 1.
+        """
+        return self.last_day + 1 if self.last_day < self.trip["num_days"] else None
+
+    @property
+    def intact(self) -> bool:
+        """
+        Koi item drop nahi hua aur days me gap nahi -- tabhi cache karna safe hai.
+        """
+        return not (self.parser.dropped or self.skipped) and len(self.days) == self.last_day
+
+
+def stream_itinerary(trip: dict, cache_key: str):
+    """
+    NDJSON stream:
+      {"type": "day", "day": {...}}            har day close hote hi
+      {"type": "complete", "success": true, "itinerary": wrapped}
+      {"type": "error", "error": "..."}
+    """
+    streamed = StreamedDays(trip)
+
+    request_body = groq_request_body(trip, stream=True)
+    try:
+        # span me client ko days likhne ka time bhi aata hai
+        with llm_limiter.slot(request_body) as ticket, span("upstream_stream"), http_client.session.post(
+            LLM.url,
+            headers=LLM.headers(),
+            json=request_body,
+            timeout=120,
+            stream=True,
+        ) as response:
+            ticket.observe(response.status_code, response.headers.get("Retry-After"))
+            response.raise_for_status()
+            for delta in iter_groq_stream(response, ticket):
+                for normalized in streamed.feed(delta):
+                    yield ndjson_line({"type": "day", "day": normalized})
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (stream)", extra={"reason": e.reason})
+        yield ndjson_line({"type": "error", **overloaded_response(e)[0]})
+        return
+    except requests.exceptions.RequestException as e:
+        log.error("groq stream failed", extra={"error": str(e)})
+        yield ndjson_line({"type": "error", "error": f"Error calling Groq API: {str(e)}"})
+        return
+
+    ai_response = strip_code_fences(streamed.parser.text)
+    try:
+        itinerary_data, _, _ = itinerary_json.parse_itinerary(ai_response, trip["num_days"])
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (stream)", extra={"error": str(e)})
+        if not streamed.days:
+            yield ndjson_line({
+                "type": "error",
                 "error": "Failed to parse itinerary response from AI",
                 "raw_response": ai_response[:500],
-            }), 500
-
-        # ================== NORMALIZE FOR FRONTEND ==================
-
-        days = itinerary_data.get("itinerary", [])
-        normalized_days = []
-
-        for index, day in enumerate(days, start=1):
-            # compute date based on start date, regardless of what the model sent
-            day_date = start + timedelta(days=index - 1)
-            pretty_date = day_date.strftime("%A, %B %d, %Y")
-
-            normalized_activities = []
-            for act in day.get("activities", []):
-                normalized_activities.append({
-                    "time": act.get("time", "9:00 AM"),
-                    "type": act.get("type", "activity"),
-                    "title": act.get("title", "Activity"),
-                    "location": act.get("location", destination),
-                    "description": act.get("description", ""),
-                    "estimatedCost": act.get("estimatedCost", ""),
-                    "duration": act.get("duration", "1 hour"),
-                })
-
-            normalized_days.append({
-                "day": day.get("day", index),
-                "date": pretty_date,
-                "activities": normalized_activities,
             })
+            return
+        # days already stream ho chuke; sirf tail kharab tha
+        itinerary_data = {}
+
+    # stream beech me kata (token cap): baaki days continuation se
+    if streamed.next_day:
+        more = continue_itinerary(trip, streamed.days, itinerary_data, streamed.next_day)
+        for day in more:
+            normalized = streamed.add(day, day["day"])
+            if normalized is not None:
+                yield ndjson_line({"type": "day", "day": normalized})
+
+    wrapped = wrap_itinerary(streamed.days, itinerary_data, trip)
+    if streamed.days and streamed.intact:
+        itinerary_cache.set(cache_key, wrapped)
+    elif streamed.days:
+        log.warning("streamed itinerary has gaps, not cached", extra={"dropped": streamed.parser.dropped})
+
+    yield ndjson_line({"type": "complete", "success": True, "itinerary": wrapped})
+
+
+# ================== CHUNKED (long trips) ==================
+
+def itinerary_cache_version(chunked: bool, facts=None) -> str:
+    version = PROMPT_VERSION
+    if chunked:
+        version = f"{version}/{itinerary_chunks.CHUNK_PROMPT_VERSION}"
+    if facts:
+        # index entry / chosen route badle (rebuild) to purane itineraries miss
+        version = f"{version}/{FACTS_PROMPT_VERSION}/{facts.version}"
+    return version
+
+
+def groq_text_completion(body: dict) -> str:
+    """
+    Non-streaming Groq call -> fence-stripped message content.
+    429 (retries ke baad bhi) => itinerary_chunks.RateLimited.
+    """
+    with llm_limiter.slot(body) as ticket:
+        with span("upstream_wait"):
+            response = http_client.session.post(
+                LLM.url,
+                headers=LLM.headers(),
+                json=body,
+                timeout=120,
+            )
+        ticket.observe(response.status_code, response.headers.get("Retry-After"))
+        ai_data = response.json() if response.ok else None
+        ticket.record_usage(ai_data)
+    if response.status_code == 429:
+        raise itinerary_chunks.RateLimited(response.headers.get("Retry-After"))
+    response.raise_for_status()
+
+    observability.record_llm_usage(ai_data, LLM.model)
+    choices = ai_data.get("choices") or []
+    if not choices:
+        raise json.JSONDecodeError("No choices in AI response", "", 0)
+    return strip_code_fences(choices[0]["message"]["content"])
+
+
+def groq_json_completion(body: dict) -> dict:
+    """
+    groq_text_completion + tolerant parse (trailing commas, raw newlines, etc. repair).
+    """
+    data, _, _ = itinerary_json.parse_json_tolerant(groq_text_completion(body))
+    return data
+
+
+def chunk_days(batch_data: dict, first: int, last: int) -> list:
+    """
+    Batch response ke days, position se renumber (model 1 se count kar sakta hai).
+    """
+    days = (batch_data.get("itinerary") or [])[: last - first + 1]
+    return [{**day, "day": first + i} for i, day in enumerate(days)]
+
+
+def index_skeleton(trip: dict) -> dict | None:
+    """
+    Pure template fast path: destination + origin dono index me hon to outline
+    index se banta hai, skeleton LLM call nahi.
+    """
+    facts = trip.get("facts")
+    if facts and facts.route:
+        return facts.chunk_skeleton()
+    return None
+
+
+def iter_chunked_itinerary(trip: dict):
+    """
+    Skeleton call, phir day batches bounded pool pe parallel. Yields
+    {"type": "day", ...} events day order me aur end me {"type": "complete", ...}.
+    Groq / JSON errors raise hote hain (caller error response banata hai).
+    """
+    skeleton = index_skeleton(trip) or groq_json_completion(itinerary_chunks.chunk_request_body(
+        LLM.model, itinerary_chunks.skeleton_prompt(trip), itinerary_chunks.SKELETON_MAX_TOKENS
+    ))
+
+    def generate_batch(first: int, last: int) -> list:
+        batch_data = groq_json_completion(itinerary_chunks.chunk_request_body(
+            LLM.model,
+            itinerary_chunks.batch_prompt(trip, skeleton, first, last),
+            itinerary_chunks.batch_max_tokens(first, last),
+        ))
+        return chunk_days(batch_data, first, last)
+
+    normalized_days = []
+    batches = itinerary_chunks.plan_batches(trip["num_days"])
+    for days in itinerary_chunks.run_batches(batches, generate_batch):
+        for day in days:
+            normalized = normalize_day(day, day["day"], trip)
+            normalized_days.append(normalized)
+            yield {"type": "day", "day": normalized}
+
+    wrapped = wrap_itinerary(normalized_days, {"transportation": skeleton.get("transportation")}, trip)
+    yield {"type": "complete", "success": True, "itinerary": wrapped}
+
+
+def generate_chunked_itinerary(trip: dict) -> dict:
+    wrapped = None
+    for event in iter_chunked_itinerary(trip):
+        if event["type"] == "complete":
+            wrapped = event["itinerary"]
+    return wrapped
+
+
+def stream_chunked_itinerary(trip: dict, cache_key: str):
+    try:
+        for event in iter_chunked_itinerary(trip):
+            if event["type"] == "complete" and event["itinerary"]["itinerary"]:
+                itinerary_cache.set(cache_key, event["itinerary"])
+            yield ndjson_line(event)
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (chunked stream)", extra={"reason": e.reason})
+        yield ndjson_line({"type": "error", **overloaded_response(e)[0]})
+    except (requests.exceptions.RequestException, itinerary_chunks.RateLimited) as e:
+        log.error("groq chunked stream failed", extra={"error": str(e)})
+        yield ndjson_line({"type": "error", "error": f"Error calling Groq API: {str(e)}"})
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (chunked)", extra={"error": str(e)})
+        yield ndjson_line({"type": "error", "error": "Failed to parse itinerary response from AI"})
+
+
+def rate_limited_response(retry_after: str | None) -> tuple[dict, int]:
+    """
+    Upstream ne (http_client retries ke baad bhi) 429 diya: client ko bhi 429 +
+    retryAfter, taaki batch / callers back off kar sakein.
+    """
+    return {"error": "Rate limited by Groq API, retry later", "retryAfter": retry_after or "2"}, 429
 
-        # ✅ This is the shape your Next.js route & frontend expect
-        wrapped = {
-            "itinerary": normalized_days,                         # array of days
-            "totalEstimatedCost": itinerary_data.get("totalEstimatedCost"),
-            "transportation": itinerary_data.get("transportation"),
-        }
 
-        print("=== Final wrapped itinerary to Next.js ===")
-        print(json.dumps(wrapped, indent=2))
+def overloaded_response(e: upstream_limiter.Overloaded) -> tuple[dict, int]:
+    """
+    Admission control ne slot nahi diya (queue / RPM / TPM budget): 503 + retryAfter.
+    """
+    return {"error": "The AI service is busy, please retry shortly", "retryAfter": e.retry_after}, 503
 
-        # 🔴 EXACT FORMAT Next.js EXPECTS:
-        # { success: true, itinerary: { itinerary: [...], totalEstimatedCost, transportation } }
-        return jsonify({
+
+def itinerary_cache_key(data: dict, trip: dict, chunked: bool) -> str:
+    return make_cache_key(
+        trip_cache_params(data, trip["start"], trip["end"]),
+        LLM.model,
+        itinerary_cache_version(chunked, trip.get("facts")),
+    )
+
+
+def itinerary_response(trip: dict, chunked: bool, cache_key: str) -> tuple[dict, int]:
+    """
+    Groq call + parse + cache set. Returns (JSON body, status) -- plain data,
+    taaki single-flight followers (dusre workers bhi) wahi response de sakein.
+    """
+    if chunked:
+        try:
+            wrapped = generate_chunked_itinerary(trip)
+        except upstream_limiter.Overloaded as e:
+            log.warning("upstream overloaded (chunked)", extra={"reason": e.reason})
+            return overloaded_response(e)
+        except itinerary_chunks.RateLimited as e:
+            log.warning("groq rate limited (chunked)", extra={"retry_after": e.retry_after})
+            return rate_limited_response(e.retry_after)
+        except requests.exceptions.RequestException as e:
+            log.error("groq call failed (chunked)", extra={"error": str(e)})
+            return {"error": f"Error calling Groq API: {str(e)}"}, 500
+        except json.JSONDecodeError as e:
+            log.warning("itinerary parse failed (chunked)", extra={"error": str(e)})
+            return {"error": "Failed to parse itinerary response from AI"}, 500
+
+        if wrapped["itinerary"]:
+            itinerary_cache.set(cache_key, wrapped)
+        return {
             "success": True,
             "itinerary": wrapped,
-        })
+        }, 200
+
+    # ================== CALL GROQ API ==================
+
+    try:
+        request_body = groq_request_body(trip)
+        with llm_limiter.slot(request_body) as ticket:
+            with span("upstream_wait"):
+                response = http_client.session.post(
+                    LLM.url,
+                    headers=LLM.headers(),
+                    json=request_body,
+                    timeout=120,
+                )
+            ticket.observe(response.status_code, response.headers.get("Retry-After"))
+            ai_data = response.json() if response.ok else None
+            ticket.record_usage(ai_data)
+        if response.status_code == 429:
+            log.warning("groq rate limited", extra={"retry_after": response.headers.get("Retry-After")})
+            return rate_limited_response(response.headers.get("Retry-After"))
+        response.raise_for_status()
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded", extra={"reason": e.reason})
+        return overloaded_response(e)
+    except requests.exceptions.RequestException as e:
+        log.error("groq call failed", extra={"error": str(e)})
+        return {"error": f"Error calling Groq API: {str(e)}"}, 500
+
+    observability.record_llm_usage(ai_data, LLM.model)
+    # payload dumps sirf sampled DEBUG me, serialize listener thread pe
+    log.debug("groq response", extra={"groq_response": ai_data})
+
+    if "choices" not in ai_data or not ai_data["choices"]:
+        return {"error": "No choices in AI response"}, 500
+
+    ai_response = strip_code_fences(ai_data["choices"][0]["message"]["content"])
+
+    # ================== PARSE + NORMALIZE FOR FRONTEND ==================
+
+    try:
+        wrapped = build_wrapped_itinerary(ai_response, trip, continue_itinerary)
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed", extra={"error": str(e), "raw_response": ai_response})
+        return {
+            "error": "Failed to parse itinerary response from AI",
+            "raw_response": ai_response[:500],
+        }, 500
+
+    log.debug("wrapped itinerary", extra={"itinerary": wrapped})
+
+    if wrapped["itinerary"]:
+        itinerary_cache.set(cache_key, wrapped)
+
+    # 🔴 EXACT FORMAT Next.js EXPECTS:
+    # { success: true, itinerary: { itinerary: [...], totalEstimatedCost, transportation } }
+    return {
+        "success": True,
+        "itinerary": wrapped,
+    }, 200
+
+
+@app.route("/generate-itinerary", methods=["POST"])
+def generate_itinerary():
+    try:
+        if not LLM.configured:
+            return jsonify({"error": LLM.missing_key_message()}), 500
+
+        with span("parse_input"):
+            data = request.get_json()
+        log.debug("itinerary request", extra={"payload": data})
+
+        if isinstance(data, dict) and itinerary_jobs.wants_async(request.headers, data):
+            return enqueue_itinerary_job(data)
+
+        try:
+            trip = parse_trip_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        attach_destination_facts(trip)
+
+        stream = wants_stream(data, request.headers.get("Accept", ""))
+        compact = response_encoding.wants_compact(request.args, data)
+        # lambe trips: skeleton + parallel day batches
+        chunked = itinerary_chunks.use_chunked(data, trip["num_days"])
+
+        # ================== CACHE LOOKUP ==================
+
+        cache_key = itinerary_cache_key(data, trip, chunked)
+        # "refresh": true => user ne explicitly naya itinerary maanga hai
+        if not data.get("refresh"):
+            cached = itinerary_cache.get_raw(cache_key)
+            if cached is not None:
+                log.info("itinerary cache hit", extra={"cache_key": cache_key[:12]})
+                if stream:
+                    return Response(
+                        stream_cached_itinerary(json.loads(cached)), mimetype="application/x-ndjson"
+                    )
+                with span("serialize"):
+                    if compact:
+                        return encoded_response({"success": True, "itinerary": json.loads(cached)}, compact=True)
+                    # stored JSON text seedha envelope me, loads + dumps nahi
+                    return encoded_response(response_encoding.envelope(cached))
+
+        if stream:
+            generator = stream_chunked_itinerary if chunked else stream_itinerary
+            return Response(
+                stream_with_context(generator(trip, cache_key)),
+                mimetype="application/x-ndjson",
+                headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+            )
+
+        # ================== SINGLE-FLIGHT ==================
+
+        # same payload pehle se in flight ho (is process ya dusre worker me)
+        # to naya Groq call nahi, uska result share hota hai
+        # refresh: dusre worker ka abhi publish hua (purana) result nahi
+        body, status = itinerary_flights.do(
+            cache_key, lambda: itinerary_response(trip, chunked, cache_key), reuse=not data.get("refresh")
+        )
+        with span("serialize"):
+            return encoded_response(body, status, retry_after_header(body, status), compact)
+
+    except Exception as e:
+        log.exception("unexpected error in /generate-itinerary")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+def encoded_response(payload, status: int = 200, headers: dict | None = None, compact: bool = False) -> Response:
+    """
+    orjson + gzip/br negotiation + content-hash ETag (If-None-Match => 304).
+    """
+    body, status, out = response_encoding.encode(
+        payload,
+        status,
+        accept_encoding=request.headers.get("Accept-Encoding", ""),
+        if_none_match=request.headers.get("If-None-Match", ""),
+        compact=compact,
+        headers=headers,
+    )
+    return Response(body, status=status, headers=out)
+
+
+def retry_after_header(body: dict, status: int) -> dict:
+    if status in (429, 503) and body.get("retryAfter"):
+        return {"Retry-After": str(body["retryAfter"])}
+    return {}
+
+
+# ================== ASYNC JOBS (202 + polling / webhook) ==================
+
+def enqueue_itinerary_job(data: dict):
+    """
+    Payload validate + queue me daalo (same cache key ka active job ho to wahi) -> 202.
+    """
+    try:
+        cache_key, _ = prepare_batch_spec(data)
+        callback = itinerary_jobs.callback_url(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job, created = itinerary_jobs.job_queue.enqueue(cache_key, data, callback)
+    log.info("itinerary job queued", extra={"job": job["id"], "deduplicated": not created})
+    body = itinerary_jobs.accepted_view(job, created)
+    return jsonify(body), 202, {"Location": body["statusUrl"], "Retry-After": str(itinerary_jobs.POLL_HINT_SECONDS)}
+
+
+@app.route("/generate-itinerary/jobs", methods=["POST"])
+def create_itinerary_job():
+    """
+    /generate-itinerary ka async mode: turant 202 + job id, generation worker pool me.
+    """
+    try:
+        if not LLM.configured:
+            return jsonify({"error": LLM.missing_key_message()}), 500
+        with span("parse_input"):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request. No data received."}), 400
+        return enqueue_itinerary_job(data)
+    except Exception as e:
+        log.exception("unexpected error in /generate-itinerary/jobs")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+@app.route("/generate-itinerary/jobs/<job_id>", methods=["GET"])
+def itinerary_job_status(job_id: str):
+    job = itinerary_jobs.job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    body = itinerary_jobs.job_view(job)
+    if job["state"] in itinerary_jobs.ACTIVE:
+        return jsonify(body), 200, {"Retry-After": str(itinerary_jobs.POLL_HINT_SECONDS)}
+    with span("serialize"):
+        return encoded_response(body, compact=response_encoding.wants_compact(request.args))
+
+
+@app.route("/generate-itinerary/job-stats", methods=["GET"])
+def itinerary_job_stats():
+    return jsonify(itinerary_jobs.job_queue.stats())
+
+
+# ================== BATCH (bulk precompute) ==================
+
+def prepare_batch_spec(data: dict) -> tuple[str, tuple]:
+    """
+    Batch spec -> (dedupe key = cache key, prepared args). Invalid => ValueError.
+    """
+    trip = attach_destination_facts(parse_trip_request(data))
+    chunked = itinerary_chunks.use_chunked(data, trip["num_days"])
+    cache_key = itinerary_cache_key(data, trip, chunked)
+    return cache_key, (trip, chunked, cache_key, bool(data.get("refresh")))
+
+
+def generate_batch_item(prepared: tuple, priority: str = "batch") -> tuple[dict, int]:
+    """
+    /generate-itinerary jaisa hi: cache hit, warna single-flight Groq call.
+    """
+    trip, chunked, cache_key, refresh = prepared
+    if not refresh:
+        cached = itinerary_cache.get(cache_key)
+        if cached is not None:
+            return {"success": True, "itinerary": cached, "cached": True}, 200
+    # bulk precompute: chat aur interactive itineraries ke baad
+    with upstream_limiter.priority(priority):
+        return itinerary_flights.do(
+            cache_key, lambda: itinerary_response(trip, chunked, cache_key), reuse=not refresh
+        )
+
+
+def run_itinerary_job(data: dict) -> tuple[dict, int]:
+    """
+    Job worker (itinerary_jobs.py) ka runner: stored payload -> (body, status).
+    User poll kar raha hai, isliye interactive priority (batch nahi).
+    """
+    try:
+        _, prepared = prepare_batch_spec(data)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return generate_batch_item(prepared, priority="itinerary")
+
+
+def read_batch_request(text: str, args) -> tuple[list, str | None, int]:
+    """
+    Batch body + query args -> (specs, checkpoint path, workers). Bad input => ValueError.
+    """
+    try:
+        specs = itinerary_batch.read_specs(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid batch body: {e.msg}")
+    if not isinstance(specs, list) or not specs:
+        raise ValueError("Send a JSON array or NDJSON of trip specs")
+    if len(specs) > itinerary_batch.BATCH_MAX_ITEMS:
+        raise ValueError(f"At most {itinerary_batch.BATCH_MAX_ITEMS} specs per batch")
+    workers = min(args.get("workers", itinerary_batch.BATCH_WORKERS, type=int), itinerary_batch.BATCH_WORKERS)
+    return specs, itinerary_batch.checkpoint_path(args.get("checkpoint")), max(workers, 1)
+
+
+@app.route("/generate-itinerary/batch", methods=["POST"])
+def generate_itinerary_batch():
+    """
+    Trip specs (JSON array / NDJSON) -> NDJSON result lines as items finish + summary.
+    """
+    if not LLM.configured:
+        return jsonify({"error": LLM.missing_key_message()}), 500
+    try:
+        with span("parse_input"):
+            specs, path, workers = read_batch_request(request.get_data(as_text=True), request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    checkpoint = itinerary_batch.Checkpoint(path) if path else None
+    rows = itinerary_batch.run_batch(specs, prepare_batch_spec, generate_batch_item, workers=workers,
+                                     checkpoint=checkpoint)
+    return Response(
+        (ndjson_line(row) for row in rows),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+# ================== PARTIAL EDIT ==================
+
+def prepare_edit(data: dict) -> tuple[dict, itinerary_edit.EditPlan, dict]:
+    """
+    Edit request -> (trip with new dates, plan, itinerary_data). Bad input => ValueError.
+    """
+    trip = parse_trip_request(data)
+    existing = data.get("itinerary")
+    days = itinerary_edit.existing_days(existing)
+    plan = itinerary_edit.plan_edits(trip, days, data.get("edits"), bool(data.get("fixBudget")))
+    itinerary_data = existing if isinstance(existing, dict) else {}
+    return trip, plan, {"transportation": itinerary_data.get("transportation")}
+
+
+def edited_itinerary_response(trip: dict, plan: itinerary_edit.EditPlan, itinerary_data: dict,
+                              new_days: dict, new_activities: dict) -> tuple[dict, int]:
+    """
+    Splice + redate + costs -> same {"success", "itinerary"} shape (+ "edited").
+    """
+    days, report = itinerary_edit.splice(plan, new_days, new_activities)
+    if report["missing"]:
+        log.warning("itinerary edit incomplete", extra={"missing": report["missing"]})
+        return {"error": f"Failed to generate days {report['missing']}, please retry"}, 500
+    with span("normalize"):
+        normalized_days = [normalize_day(day, index, trip) for index, day in enumerate(days, start=1)]
+    wrapped = wrap_itinerary(normalized_days, itinerary_data, trip)
+    report.pop("missing")
+    report["calls"] = plan.calls
+    return {"success": True, "itinerary": wrapped, "edited": report}, 200
+
+
+def edit_itinerary_response(trip: dict, plan: itinerary_edit.EditPlan, itinerary_data: dict) -> tuple[dict, int]:
+    """
+    Sirf affected days (ek call) aur activity-only days (ek call per day) Groq ko.
+    """
+    new_days, new_activities = {}, {}
+    try:
+        if plan.days:
+            data = groq_json_completion(itinerary_edit.days_body(LLM.model, trip, plan, itinerary_data))
+            new_days = itinerary_edit.rewritten_days(data, plan)
+        for day in plan.activities:
+            data = groq_json_completion(itinerary_edit.activities_body(LLM.model, trip, plan, day))
+            new_activities[day] = itinerary_edit.replaced_activities(data, plan, day)
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (edit)", extra={"reason": e.reason})
+        return overloaded_response(e)
+    except itinerary_chunks.RateLimited as e:
+        log.warning("groq rate limited (edit)", extra={"retry_after": e.retry_after})
+        return rate_limited_response(e.retry_after)
+    except requests.exceptions.RequestException as e:
+        log.error("groq call failed (edit)", extra={"error": str(e)})
+        return {"error": f"Error calling Groq API: {str(e)}"}, 500
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (edit)", extra={"error": str(e)})
+        return {"error": "Failed to parse itinerary response from AI"}, 500
+    return edited_itinerary_response(trip, plan, itinerary_data, new_days, new_activities)
+
+
+@app.route("/generate-itinerary/edit", methods=["POST"])
+def edit_itinerary():
+    """
+    Existing itinerary + edits (days / activities / nayi dates) -> sirf woh hissa dobara.
+    """
+    try:
+        if not LLM.configured:
+            return jsonify({"error": LLM.missing_key_message()}), 500
+
+        with span("parse_input"):
+            data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request. No data received."}), 400
+        try:
+            trip, plan, itinerary_data = prepare_edit(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        body, status = edit_itinerary_response(trip, plan, itinerary_data)
+        with span("serialize"):
+            return encoded_response(
+                body, status, retry_after_header(body, status), response_encoding.wants_compact(request.args, data)
+            )
 
     except Exception as e:
-        print(f"Unexpected error in /generate-itinerary: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("unexpected error in /generate-itinerary/edit")
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
 
 
+@app.route("/generate-itinerary/cache-stats", methods=["GET"])
+def itinerary_cache_stats():
+    return jsonify(itinerary_cache.stats())
+
+
+@app.route("/generate-itinerary/parse-stats", methods=["GET"])
+def itinerary_parse_stats():
+    return jsonify(itinerary_json.parse_metrics.snapshot())
+
+
+@app.route("/upstream-stats", methods=["GET"])
+def upstream_stats():
+    return jsonify(http_client.metrics.snapshot())
+
+
+@app.route("/single-flight-stats", methods=["GET"])
+def single_flight_stats():
+    return jsonify(itinerary_flights.stats())
+
+
+@app.route("/upstream-limiter-stats", methods=["GET"])
+def upstream_limiter_stats():
+    return jsonify(llm_limiter.stats())
+
+
+@app.route("/destination-index-stats", methods=["GET"])
+def destination_index_stats():
+    return jsonify(destination_index.index.stats())
+
+
+@app.route("/response-stats", methods=["GET"])
+def response_stats():
+    return jsonify(response_encoding.metrics.snapshot())
+
+
 if __name__ == "__main__":
+    # Dev server; production: `python serve.py itinerary` (workers, warm-up, graceful drain)
+    warm_up()
+    serving.mark_ready()
     # Run on 5001 to match your Next.js fetch URL
     app.run(debug=True, host="127.0.0.1", port=5001)
@@ -0,0 +1,620 @@
+"""
+ASGI entry point for the itinerary service.
+
+    hypercorn iternary_asgi:app --bind 127.0.0.1:5001
+
+Same routes and response shapes as iternary_ai.py (prompt, normalization and
+cache are reused from there), but the Groq call goes through an aiohttp session
+on the event loop, so an in-flight generation does not hold a worker thread.
+Blocking work around it (SQLite cache tier, the destination index learn
+append inside wrap_itinerary) runs via asyncio.to_thread, not on the loop.
+"""
+import asyncio
+import json
+
+import aiohttp
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+
+import http_client
+import iternary_ai as itinerary
+import itinerary_batch
+import itinerary_chunks
+import itinerary_edit
+import itinerary_jobs
+import itinerary_json
+import observability
+import response_encoding
+import serving
+import upstream_limiter
+from observability import span
+
+log = observability.get_logger("itinerary")
+
+app = cors(Quart(__name__))
+observability.instrument_app(app, request, is_async=True)
+serving.add_health_routes(app, {"llm": lambda: itinerary.LLM.configured}, is_async=True)
+
+upstream: aiohttp.ClientSession | None = None
+
+
+@app.before_serving
+async def open_upstream_session():
+    global upstream
+    upstream = http_client.make_async_session(total_timeout=120)
+    # keep-alive connections pehle se, phir /readyz 200
+    await serving.warm_connections_async(
+        upstream, [(serving.models_url(itinerary.LLM.url), itinerary.LLM.headers())]
+    )
+    serving.mark_ready()
+
+
+@app.after_serving
+async def close_upstream_session():
+    await upstream.close()
+
+
+def groq_headers() -> dict:
+    return itinerary.LLM.headers()
+
+
+async def iter_groq_stream_async(response: aiohttp.ClientResponse, ticket=None):
+    async for raw_line in response.content:
+        line = raw_line.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        payload = line[5:].strip()
+        if payload == "[DONE]":
+            break
+        chunk = json.loads(payload)
+        observability.record_llm_usage(chunk, itinerary.LLM.model)
+        if ticket is not None:
+            ticket.record_usage(chunk)
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+
+async def stream_itinerary_async(trip: dict, cache_key: str):
+    streamed = itinerary.StreamedDays(trip)
+
+    request_body = itinerary.groq_request_body(trip, stream=True)
+    try:
+        async with itinerary.llm_limiter.slot_async(request_body) as ticket:
+            with span("upstream_stream"):
+                async with upstream.post(
+                    itinerary.LLM.url,
+                    headers=groq_headers(),
+                    json=request_body,
+                ) as response:
+                    ticket.observe(response.status, response.headers.get("Retry-After"))
+                    response.raise_for_status()
+                    async for delta in iter_groq_stream_async(response, ticket):
+                        for normalized in streamed.feed(delta):
+                            yield itinerary.ndjson_line({"type": "day", "day": normalized})
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (stream)", extra={"reason": e.reason})
+        yield itinerary.ndjson_line({"type": "error", **itinerary.overloaded_response(e)[0]})
+        return
+    except (aiohttp.ClientError, TimeoutError) as e:
+        log.error("groq stream failed", extra={"error": str(e)})
+        yield itinerary.ndjson_line({"type": "error", "error": f"Error calling Groq API: {str(e)}"})
+        return
+
+    ai_response = itinerary.strip_code_fences(streamed.parser.text)
+    try:
+        itinerary_data, _, _ = itinerary_json.parse_itinerary(ai_response, trip["num_days"])
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (stream)", extra={"error": str(e)})
+        if not streamed.days:
+            yield itinerary.ndjson_line({
+                "type": "error",
+                "error": "Failed to parse itinerary response from AI",
+                "raw_response": ai_response[:500],
+            })
+            return
+        itinerary_data = {}
+
+    if streamed.next_day:
+        more = await continue_itinerary_async(trip, streamed.days, itinerary_data, streamed.next_day)
+        for day in more:
+            normalized = streamed.add(day, day["day"])
+            if normalized is not None:
+                yield itinerary.ndjson_line({"type": "day", "day": normalized})
+
+    wrapped = await asyncio.to_thread(itinerary.wrap_itinerary, streamed.days, itinerary_data, trip)
+    if streamed.days and streamed.intact:
+        await asyncio.to_thread(itinerary.itinerary_cache.set, cache_key, wrapped)
+    elif streamed.days:
+        log.warning("streamed itinerary has gaps, not cached", extra={"dropped": streamed.parser.dropped})
+
+    yield itinerary.ndjson_line({"type": "complete", "success": True, "itinerary": wrapped})
+
+
+async def stream_cached_itinerary_async(wrapped: dict):
+    for line in itinerary.stream_cached_itinerary(wrapped):
+        yield line
+
+
+async def groq_text_completion_async(body: dict) -> str:
+    async with itinerary.llm_limiter.slot_async(body) as ticket:
+        with span("upstream_wait"):
+            status, text, reason, headers = await http_client.async_request(
+                upstream, "POST", itinerary.LLM.url, headers=groq_headers(), json=body
+            )
+        ticket.observe(status, headers.get("Retry-After"))
+        ai_data = json.loads(text) if status < 400 else None
+        ticket.record_usage(ai_data)
+    if status == 429:
+        raise itinerary_chunks.RateLimited(headers.get("Retry-After"))
+    if status >= 400:
+        raise aiohttp.ClientError(f"{status} {reason}")
+
+    observability.record_llm_usage(ai_data, itinerary.LLM.model)
+    choices = ai_data.get("choices") or []
+    if not choices:
+        raise json.JSONDecodeError("No choices in AI response", "", 0)
+    return itinerary.strip_code_fences(choices[0]["message"]["content"])
+
+
+async def groq_json_completion_async(body: dict) -> dict:
+    data, _, _ = itinerary_json.parse_json_tolerant(await groq_text_completion_async(body))
+    return data
+
+
+async def continue_itinerary_async(trip: dict, days: list, itinerary_data: dict, next_day: int) -> list:
+    """
+    Async version of iternary_ai.continue_itinerary.
+    """
+    more = []
+    for _ in range(itinerary_json.CONTINUE_ATTEMPTS):
+        first = next_day
+        log.info("itinerary incomplete, continuing", extra={"from_day": first})
+        itinerary_json.parse_metrics.record("continuations")
+        body = itinerary_chunks.continuation_body(itinerary.LLM.model, trip, days + more, itinerary_data, first)
+        try:
+            _, got, next_day = itinerary_json.parse_itinerary(
+                await groq_text_completion_async(body), trip["num_days"], first
+            )
+        except (aiohttp.ClientError, TimeoutError, itinerary_chunks.RateLimited,
+                upstream_limiter.Overloaded, json.JSONDecodeError) as e:
+            log.warning("continuation failed", extra={"from_day": first, "error": str(e)})
+            itinerary_json.parse_metrics.record("continuation_failures")
+            break
+        if not got:
+            itinerary_json.parse_metrics.record("continuation_failures")
+            break
+        more.extend(itinerary.chunk_days({"itinerary": got}, first, trip["num_days"]))
+        if next_day is None:
+            break
+    return more
+
+
+async def iter_chunked_itinerary_async(trip: dict):
+    """
+    Async version of iternary_ai.iter_chunked_itinerary: batches are tasks
+    bounded by a semaphore instead of a thread pool.
+    """
+    # route index me ho to outline wahin se (skeleton call nahi)
+    skeleton = itinerary.index_skeleton(trip) or await groq_json_completion_async(itinerary_chunks.chunk_request_body(
+        itinerary.LLM.model,
+        itinerary_chunks.skeleton_prompt(trip),
+        itinerary_chunks.SKELETON_MAX_TOKENS,
+    ))
+
+    slots = asyncio.Semaphore(itinerary_chunks.CHUNK_WORKERS)
+    gate = itinerary_chunks.RateLimitGate()
+
+    async def generate_batch(first: int, last: int) -> list:
+        body = itinerary_chunks.chunk_request_body(
+            itinerary.LLM.model,
+            itinerary_chunks.batch_prompt(trip, skeleton, first, last),
+            itinerary_chunks.batch_max_tokens(first, last),
+        )
+        async with slots:
+            for n in range(itinerary_chunks.CHUNK_RETRIES + 1):
+                await asyncio.sleep(gate.remaining())
+                try:
+                    return itinerary.chunk_days(await groq_json_completion_async(body), first, last)
+                except itinerary_chunks.RateLimited as e:
+                    if n >= itinerary_chunks.CHUNK_RETRIES:
+                        raise
+                    gate.block(e.retry_after)
+                except json.JSONDecodeError:
+                    if n >= itinerary_chunks.CHUNK_RETRIES:
+                        raise
+        return []
+
+    tasks = [
+        asyncio.create_task(generate_batch(first, last))
+        for first, last in itinerary_chunks.plan_batches(trip["num_days"])
+    ]
+    normalized_days = []
+    try:
+        for task in tasks:
+            for day in await task:
+                normalized = itinerary.normalize_day(day, day["day"], trip)
+                normalized_days.append(normalized)
+                yield {"type": "day", "day": normalized}
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    wrapped = await asyncio.to_thread(
+        itinerary.wrap_itinerary, normalized_days, {"transportation": skeleton.get("transportation")}, trip
+    )
+    yield {"type": "complete", "success": True, "itinerary": wrapped}
+
+
+async def stream_chunked_itinerary_async(trip: dict, cache_key: str):
+    try:
+        async for event in iter_chunked_itinerary_async(trip):
+            if event["type"] == "complete" and event["itinerary"]["itinerary"]:
+                await asyncio.to_thread(itinerary.itinerary_cache.set, cache_key, event["itinerary"])
+            yield itinerary.ndjson_line(event)
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (chunked stream)", extra={"reason": e.reason})
+        yield itinerary.ndjson_line({"type": "error", **itinerary.overloaded_response(e)[0]})
+    except (aiohttp.ClientError, TimeoutError, itinerary_chunks.RateLimited) as e:
+        log.error("groq chunked stream failed", extra={"error": str(e)})
+        yield itinerary.ndjson_line({"type": "error", "error": f"Error calling Groq API: {str(e)}"})
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (chunked)", extra={"error": str(e)})
+        yield itinerary.ndjson_line({"type": "error", "error": "Failed to parse itinerary response from AI"})
+
+
+async def itinerary_response_async(trip: dict, chunked: bool, cache_key: str) -> tuple[dict, int]:
+    """
+    Async version of iternary_ai.itinerary_response (same (body, status) result).
+    """
+    if chunked:
+        wrapped = None
+        try:
+            async for event in iter_chunked_itinerary_async(trip):
+                if event["type"] == "complete":
+                    wrapped = event["itinerary"]
+        except upstream_limiter.Overloaded as e:
+            log.warning("upstream overloaded (chunked)", extra={"reason": e.reason})
+            return itinerary.overloaded_response(e)
+        except itinerary_chunks.RateLimited as e:
+            log.warning("groq rate limited (chunked)", extra={"retry_after": e.retry_after})
+            return itinerary.rate_limited_response(e.retry_after)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            log.error("groq call failed (chunked)", extra={"error": str(e)})
+            return {"error": f"Error calling Groq API: {str(e)}"}, 500
+        except json.JSONDecodeError as e:
+            log.warning("itinerary parse failed (chunked)", extra={"error": str(e)})
+            return {"error": "Failed to parse itinerary response from AI"}, 500
+
+        if wrapped["itinerary"]:
+            await asyncio.to_thread(itinerary.itinerary_cache.set, cache_key, wrapped)
+        return {"success": True, "itinerary": wrapped}, 200
+
+    try:
+        request_body = itinerary.groq_request_body(trip)
+        async with itinerary.llm_limiter.slot_async(request_body) as ticket:
+            with span("upstream_wait"):
+                status, body, reason, headers = await http_client.async_request(
+                    upstream,
+                    "POST",
+                    itinerary.LLM.url,
+                    headers=groq_headers(),
+                    json=request_body,
+                )
+            ticket.observe(status, headers.get("Retry-After"))
+            ai_data = json.loads(body) if status < 400 else None
+            ticket.record_usage(ai_data)
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded", extra={"reason": e.reason})
+        return itinerary.overloaded_response(e)
+    except (aiohttp.ClientError, TimeoutError) as e:
+        log.error("groq call failed", extra={"error": str(e)})
+        return {"error": f"Error calling Groq API: {str(e)}"}, 500
+
+    if status == 429:
+        log.warning("groq rate limited", extra={"retry_after": headers.get("Retry-After")})
+        return itinerary.rate_limited_response(headers.get("Retry-After"))
+    if status >= 400:
+        log.error("groq call failed", extra={"status": status, "reason": reason})
+        return {"error": f"Error calling Groq API: {status} {reason}"}, 500
+
+    observability.record_llm_usage(ai_data, itinerary.LLM.model)
+    log.debug("groq response", extra={"groq_response": ai_data})
+
+    if "choices" not in ai_data or not ai_data["choices"]:
+        return {"error": "No choices in AI response"}, 500
+
+    ai_response = itinerary.strip_code_fences(ai_data["choices"][0]["message"]["content"])
+
+    try:
+        with span("json_parse"):
+            itinerary_data, days, next_day = itinerary_json.parse_itinerary(ai_response, trip["num_days"])
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed", extra={"error": str(e), "raw_response": ai_response})
+        return {
+            "error": "Failed to parse itinerary response from AI",
+            "raw_response": ai_response[:500],
+        }, 500
+
+    more = await continue_itinerary_async(trip, days, itinerary_data, next_day) if next_day else []
+    wrapped = await asyncio.to_thread(itinerary.wrap_continued_itinerary, days, more, itinerary_data, trip)
+    if wrapped["itinerary"]:
+        await asyncio.to_thread(itinerary.itinerary_cache.set, cache_key, wrapped)
+
+    return {
+        "success": True,
+        "itinerary": wrapped,
+    }, 200
+
+
+def encoded_response(payload, status: int = 200, headers: dict | None = None, compact: bool = False) -> Response:
+    body, status, out = response_encoding.encode(
+        payload,
+        status,
+        accept_encoding=request.headers.get("Accept-Encoding", ""),
+        if_none_match=request.headers.get("If-None-Match", ""),
+        compact=compact,
+        headers=headers,
+    )
+    return Response(body, status=status, headers=out)
+
+
+@app.route("/generate-itinerary", methods=["POST"])
+async def generate_itinerary():
+    try:
+        if not itinerary.LLM.configured:
+            return jsonify({"error": itinerary.LLM.missing_key_message()}), 500
+
+        with span("parse_input"):
+            data = await request.get_json()
+        log.debug("itinerary request", extra={"payload": data})
+
+        if isinstance(data, dict) and itinerary_jobs.wants_async(request.headers, data):
+            return await enqueue_itinerary_job(data)
+
+        try:
+            trip = itinerary.parse_trip_request(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        itinerary.attach_destination_facts(trip)
+
+        stream = itinerary.wants_stream(data, request.headers.get("Accept", ""))
+        compact = response_encoding.wants_compact(request.args, data)
+        chunked = itinerary_chunks.use_chunked(data, trip["num_days"])
+
+        cache_key = itinerary.itinerary_cache_key(data, trip, chunked)
+        if not data.get("refresh"):
+            cached = await asyncio.to_thread(itinerary.itinerary_cache.get_raw, cache_key)
+            if cached is not None:
+                if stream:
+                    return Response(
+                        stream_cached_itinerary_async(json.loads(cached)), mimetype="application/x-ndjson"
+                    )
+                with span("serialize"):
+                    if compact:
+                        return encoded_response({"success": True, "itinerary": json.loads(cached)}, compact=True)
+                    return encoded_response(response_encoding.envelope(cached))
+
+        if stream:
+            generator = stream_chunked_itinerary_async if chunked else stream_itinerary_async
+            return Response(
+                generator(trip, cache_key),
+                mimetype="application/x-ndjson",
+                headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+            )
+
+        # same payload already in flight => share its result
+        body, status = await itinerary.itinerary_flights.do_async(
+            cache_key, lambda: itinerary_response_async(trip, chunked, cache_key), reuse=not data.get("refresh")
+        )
+        with span("serialize"):
+            return encoded_response(body, status, itinerary.retry_after_header(body, status), compact)
+
+    except Exception as e:
+        log.exception("unexpected error in /generate-itinerary")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+async def enqueue_itinerary_job(data: dict):
+    try:
+        cache_key, _ = itinerary.prepare_batch_spec(data)
+        callback = itinerary_jobs.callback_url(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    job, created = await asyncio.to_thread(itinerary_jobs.job_queue.enqueue, cache_key, data, callback)
+    log.info("itinerary job queued", extra={"job": job["id"], "deduplicated": not created})
+    body = itinerary_jobs.accepted_view(job, created)
+    return jsonify(body), 202, {"Location": body["statusUrl"], "Retry-After": str(itinerary_jobs.POLL_HINT_SECONDS)}
+
+
+@app.route("/generate-itinerary/jobs", methods=["POST"])
+async def create_itinerary_job():
+    try:
+        if not itinerary.LLM.configured:
+            return jsonify({"error": itinerary.LLM.missing_key_message()}), 500
+        with span("parse_input"):
+            data = await request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request. No data received."}), 400
+        return await enqueue_itinerary_job(data)
+    except Exception as e:
+        log.exception("unexpected error in /generate-itinerary/jobs")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+@app.route("/generate-itinerary/jobs/<job_id>", methods=["GET"])
+async def itinerary_job_status(job_id: str):
+    job = await asyncio.to_thread(itinerary_jobs.job_queue.get, job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job id"}), 404
+    body = itinerary_jobs.job_view(job)
+    if job["state"] in itinerary_jobs.ACTIVE:
+        return jsonify(body), 200, {"Retry-After": str(itinerary_jobs.POLL_HINT_SECONDS)}
+    with span("serialize"):
+        return encoded_response(body, compact=response_encoding.wants_compact(request.args))
+
+
+@app.route("/generate-itinerary/job-stats", methods=["GET"])
+async def itinerary_job_stats():
+    return jsonify(await asyncio.to_thread(itinerary_jobs.job_queue.stats))
+
+
+async def generate_batch_item_async(prepared: tuple) -> tuple[dict, int]:
+    trip, chunked, cache_key, refresh = prepared
+    if not refresh:
+        cached = await asyncio.to_thread(itinerary.itinerary_cache.get, cache_key)
+        if cached is not None:
+            return {"success": True, "itinerary": cached, "cached": True}, 200
+    with upstream_limiter.priority("batch"):
+        return await itinerary.itinerary_flights.do_async(
+            cache_key, lambda: itinerary_response_async(trip, chunked, cache_key), reuse=not refresh
+        )
+
+
+@app.route("/generate-itinerary/batch", methods=["POST"])
+async def generate_itinerary_batch():
+    """
+    Same scheduler as the Flask route (itinerary_batch.run_batch, worker
+    threads); each item's Groq call runs on this event loop via aiohttp.
+    """
+    if not itinerary.LLM.configured:
+        return jsonify({"error": itinerary.LLM.missing_key_message()}), 500
+    try:
+        with span("parse_input"):
+            text = await request.get_data(as_text=True)
+            specs, path, workers = itinerary.read_batch_request(text, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    loop = asyncio.get_running_loop()
+
+    def generate(prepared: tuple) -> tuple[dict, int]:
+        return asyncio.run_coroutine_threadsafe(generate_batch_item_async(prepared), loop).result()
+
+    checkpoint = itinerary_batch.Checkpoint(path) if path else None
+    rows = itinerary_batch.run_batch(specs, itinerary.prepare_batch_spec, generate, workers=workers,
+                                     checkpoint=checkpoint)
+
+    async def stream_rows():
+        try:
+            while (row := await asyncio.to_thread(next, rows, None)) is not None:
+                yield itinerary.ndjson_line(row)
+        finally:
+            # disconnect: generator ka finally queued items cancel karta hai
+            # (next() abhi kisi thread me chal raha ho to close nahi ho sakta)
+            try:
+                rows.close()
+            except ValueError:
+                pass
+
+    return Response(
+        stream_rows(),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
+
+
+async def edit_itinerary_response_async(trip: dict, plan: itinerary_edit.EditPlan,
+                                        itinerary_data: dict) -> tuple[dict, int]:
+    """
+    Async version of iternary_ai.edit_itinerary_response; day aur activity
+    calls concurrently.
+    """
+    async def rewrite_days() -> dict:
+        if not plan.days:
+            return {}
+        data = await groq_json_completion_async(
+            itinerary_edit.days_body(itinerary.LLM.model, trip, plan, itinerary_data)
+        )
+        return itinerary_edit.rewritten_days(data, plan)
+
+    async def replace_activities(day: int) -> dict:
+        data = await groq_json_completion_async(
+            itinerary_edit.activities_body(itinerary.LLM.model, trip, plan, day)
+        )
+        return itinerary_edit.replaced_activities(data, plan, day)
+
+    days = list(plan.activities)
+    try:
+        new_days, *replaced = await asyncio.gather(rewrite_days(), *(replace_activities(d) for d in days))
+    except upstream_limiter.Overloaded as e:
+        log.warning("upstream overloaded (edit)", extra={"reason": e.reason})
+        return itinerary.overloaded_response(e)
+    except itinerary_chunks.RateLimited as e:
+        log.warning("groq rate limited (edit)", extra={"retry_after": e.retry_after})
+        return itinerary.rate_limited_response(e.retry_after)
+    except (aiohttp.ClientError, TimeoutError) as e:
+        log.error("groq call failed (edit)", extra={"error": str(e)})
+        return {"error": f"Error calling Groq API: {str(e)}"}, 500
+    except json.JSONDecodeError as e:
+        log.warning("itinerary parse failed (edit)", extra={"error": str(e)})
+        return {"error": "Failed to parse itinerary response from AI"}, 500
+    return itinerary.edited_itinerary_response(trip, plan, itinerary_data, new_days, dict(zip(days, replaced)))
+
+
+@app.route("/generate-itinerary/edit", methods=["POST"])
+async def edit_itinerary():
+    try:
+        if not itinerary.LLM.configured:
+            return jsonify({"error": itinerary.LLM.missing_key_message()}), 500
+
+        with span("parse_input"):
+            data = await request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid request. No data received."}), 400
+        try:
+            trip, plan, itinerary_data = itinerary.prepare_edit(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        body, status = await edit_itinerary_response_async(trip, plan, itinerary_data)
+        with span("serialize"):
+            return encoded_response(
+                body, status, itinerary.retry_after_header(body, status), response_encoding.wants_compact(request.args, data)
+            )
+
+    except Exception as e:
+        log.exception("unexpected error in /generate-itinerary/edit")
+        return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
+
+
+@app.route("/generate-itinerary/cache-stats", methods=["GET"])
+async def itinerary_cache_stats():
+    return jsonify(await asyncio.to_thread(itinerary.itinerary_cache.stats))
+
+
+@app.route("/generate-itinerary/parse-stats", methods=["GET"])
+async def itinerary_parse_stats():
+    return jsonify(itinerary_json.parse_metrics.snapshot())
+
+
+@app.route("/upstream-stats", methods=["GET"])
+async def upstream_stats():
+    return jsonify(http_client.metrics.snapshot())
+
+
+@app.route("/single-flight-stats", methods=["GET"])
+async def single_flight_stats():
+    return jsonify(itinerary.itinerary_flights.stats())
+
+
+@app.route("/upstream-limiter-stats", methods=["GET"])
+async def upstream_limiter_stats():
+    return jsonify(itinerary.llm_limiter.stats())
+
+
+@app.route("/destination-index-stats", methods=["GET"])
+async def destination_index_stats():
+    return jsonify(itinerary.destination_index.index.stats())
+
+
+@app.route("/response-stats", methods=["GET"])
+async def response_stats():
+    return jsonify(response_encoding.metrics.snapshot())
+
+
+if __name__ == "__main__":
+    app.run(host="127.0.0.1", port=5001)
@@ -0,0 +1,306 @@
+"""
+Bulk itinerary generation (nightly package-tour precompute).
+
+Pehle precompute job har template ke liye /generate-itinerary ek-ek karke
+call karta tha. Yahan poori list ek saath:
+
+- input: JSON array (ya {"specs": [...]}) ya NDJSON, har item wahi payload jo
+  /generate-itinerary leta hai (+ optional "id")
+- dedupe: same cache key (normalized trip + model + prompt version) wale specs
+  ek hi baar generate hote hain; result line me saare indexes / ids
+- bounded worker pool; upstream 429 pe shared RateLimitGate saare workers ko
+  Retry-After tak rokta hai; 429 / 5xx / connection errors per item retry
+  (exponential backoff), 4xx (bad spec) nahi
+- results NDJSON me jaise-jaise finish hon; end me ek summary line
+- checkpoint: har finished result ek append-only NDJSON file me; dubara chalao
+  to successful keys skip (resumed) hote hain, sirf baaki generate hote hain
+- har result ka itinerary.costSummary.overBudgetDays; summary me "overBudget"
+  count. Poora output dobara check: `python itinerary_costs.py results.ndjson`
+
+HTTP: POST /generate-itinerary/batch[?checkpoint=name&workers=N]
+CLI:  python itinerary_batch.py specs.ndjson -o results.ndjson   (output file = checkpoint)
+
+Config (env):
+    ITINERARY_BATCH_WORKERS     max concurrent generations per batch (default 4)
+    ITINERARY_BATCH_RETRIES     extra attempts per item (default 3)
+    ITINERARY_BATCH_BACKOFF     first retry delay in seconds, doubles per attempt (default 2)
+    ITINERARY_BATCH_MAX_ITEMS   max specs per HTTP request (default 1000)
+    ITINERARY_BATCH_DIR         directory for HTTP checkpoints (default ./batch_checkpoints)
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import itinerary_chunks
+
+log = logging.getLogger("tripmate.itinerary_batch")
+
+BATCH_WORKERS = max(int(os.getenv("ITINERARY_BATCH_WORKERS", "4")), 1)
+BATCH_RETRIES = int(os.getenv("ITINERARY_BATCH_RETRIES", "3"))
+BATCH_BACKOFF = float(os.getenv("ITINERARY_BATCH_BACKOFF", "2"))
+BATCH_MAX_ITEMS = int(os.getenv("ITINERARY_BATCH_MAX_ITEMS", "1000"))
+BATCH_DIR = os.getenv("ITINERARY_BATCH_DIR", "batch_checkpoints")
+
+_CHECKPOINT_NAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,100}$")
+
+
+def read_specs(text: str) -> list:
+    """
+    JSON array / {"specs": [...]} / NDJSON -> list of specs. Jo NDJSON line
+    parse na ho woh ValueError ke roop me list me rehti hai (index same rahe).
+    """
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        return json.loads(stripped)
+    if stripped.startswith("{") and "\n" not in stripped.rstrip():
+        data = json.loads(stripped)
+        if isinstance(data.get("specs"), list):
+            return data["specs"]
+        return [data]
+
+    specs = []
+    for n, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            specs.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            specs.append(ValueError(f"line {n}: invalid JSON ({e.msg})"))
+    return specs
+
+
+class BatchItem:
+    __slots__ = ("key", "prepared", "indexes", "ids")
+
+    def __init__(self, key: str, prepared):
+        self.key = key
+        self.prepared = prepared
+        self.indexes: list[int] = []
+        self.ids: list = []
+
+
+def plan_items(specs: list, prepare) -> tuple[list, list]:
+    """
+    prepare(spec) -> (key, prepared), invalid spec pe ValueError.
+    Returns (unique items in input order, error result lines).
+    """
+    items: dict[str, BatchItem] = {}
+    errors = []
+    for index, spec in enumerate(specs):
+        spec_id = spec.get("id") if isinstance(spec, dict) else None
+        try:
+            if isinstance(spec, Exception):
+                raise spec
+            if not isinstance(spec, dict):
+                raise ValueError("spec must be a JSON object")
+            key, prepared = prepare(spec)
+        except ValueError as e:
+            errors.append({"type": "result", "indexes": [index], "ids": [spec_id], "status": 400,
+                           "error": str(e)})
+            continue
+        item = items.get(key)
+        if item is None:
+            item = items[key] = BatchItem(key, prepared)
+        item.indexes.append(index)
+        item.ids.append(spec_id)
+    return list(items.values()), errors
+
+
+class Checkpoint:
+    """
+    Append-only NDJSON of result lines; successful keys resume pe skip.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def done(self) -> dict:
+        finished = {}
+        if not os.path.exists(self.path):
+            return finished
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                # interrupted write ki aadhi line hatao, warna agla append usse chipak jayega
+                f.truncate(data.rfind(b"\n") + 1)
+                data = data[: data.rfind(b"\n") + 1]
+        for line in data.decode("utf-8").splitlines():
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if row.get("type") == "result" and row.get("status") == 200 and row.get("key"):
+                finished[row["key"]] = row
+        return finished
+
+    def record(self, row: dict) -> None:
+        line = json.dumps(row, ensure_ascii=False) + "\n"
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def checkpoint_path(name: str | None) -> str | None:
+    """
+    HTTP ?checkpoint=name -> ITINERARY_BATCH_DIR/name.ndjson (sirf safe names).
+    """
+    if not name:
+        return None
+    if not _CHECKPOINT_NAME_RE.match(name):
+        raise ValueError("checkpoint must match [A-Za-z0-9_.-]{1,100}")
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    return os.path.join(BATCH_DIR, f"{name}.ndjson")
+
+
+def _retry_after(body: dict) -> str | None:
+    value = body.get("retryAfter") if isinstance(body, dict) else None
+    return str(value) if value is not None else None
+
+
+def run_batch(specs: list, prepare, generate, workers: int = BATCH_WORKERS, retries: int = BATCH_RETRIES,
+              checkpoint: Checkpoint | None = None, backoff: float = BATCH_BACKOFF):
+    """
+    generate(prepared) -> (body, status) jaisa /generate-itinerary deta hai.
+    Result lines yield hoti hain jaise-jaise items finish hon, phir summary.
+    """
+    started = time.perf_counter()
+    # pehle padho (aur aadhi line repair karo), phir hi kuch likha jaye
+    finished = checkpoint.done() if checkpoint else {}
+    items, errors = plan_items(specs, prepare)
+    summary = {
+        "type": "summary",
+        "total": len(specs),
+        "unique": len(items),
+        "duplicates": sum(len(item.indexes) - 1 for item in items),
+        "invalid": len(errors),
+        "succeeded": 0,
+        "failed": 0,
+        "resumed": 0,
+        "retries": 0,
+        "throttled": 0,
+        "overBudget": 0,
+    }
+    yield from errors
+
+    pending = []
+    for item in items:
+        row = finished.get(item.key)
+        if row is None:
+            pending.append(item)
+            continue
+        summary["resumed"] += 1
+        yield {**row, "indexes": item.indexes, "ids": item.ids, "resumed": True}
+
+    gate = itinerary_chunks.RateLimitGate()
+    lock = threading.Lock()
+
+    def attempt(item: BatchItem) -> dict:
+        body, status, n = {}, 500, 0
+        for n in range(retries + 1):
+            gate.wait()
+            try:
+                body, status = generate(item.prepared)
+            except Exception as e:
+                log.exception("batch item failed", extra={"key": item.key[:12]})
+                body, status = {"error": f"An unexpected error occurred: {str(e)}"}, 500
+            if status < 500 and status != 429:
+                break
+            if n >= retries:
+                break
+            with lock:
+                summary["retries"] += 1
+            if status in (429, 503):
+                # upstream 429 / apna admission control busy: sab workers ruk jaayein
+                gate.block(_retry_after(body))
+            else:
+                time.sleep(backoff * (2 ** n) * (0.5 + random.random()))
+        return {"type": "result", "key": item.key, "indexes": item.indexes, "ids": item.ids,
+                "status": status, "attempts": n + 1, **body}
+
+    if pending:
+        pool = ThreadPoolExecutor(max_workers=min(workers, len(pending)))
+        futures = {pool.submit(attempt, item) for item in pending}
+        try:
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    row = future.result()
+                    summary["succeeded" if row["status"] == 200 else "failed"] += 1
+                    if ((row.get("itinerary") or {}).get("costSummary") or {}).get("overBudgetDays"):
+                        summary["overBudget"] += 1
+                    if checkpoint:
+                        checkpoint.record(row)
+                    yield row
+        finally:
+            # client disconnect / Ctrl-C: queued items mat chalao
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    summary["throttled"] = gate.throttled
+    summary["elapsed_s"] = round(time.perf_counter() - started, 2)
+    log.info("itinerary batch finished", extra={"summary": summary})
+    yield summary
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate itineraries for a list of trip specs (JSON array or NDJSON)."
+    )
+    parser.add_argument("input", help="specs file, or - for stdin")
+    parser.add_argument("-o", "--output", help="results NDJSON (default stdout); also the checkpoint")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: --output)")
+    parser.add_argument("--fresh", action="store_true", help="ignore / truncate an existing checkpoint")
+    parser.add_argument("--workers", type=int, default=BATCH_WORKERS)
+    parser.add_argument("--retries", type=int, default=BATCH_RETRIES)
+    args = parser.parse_args()
+
+    # app module yahan import: LLM backend, cache, prompts wahi jo server use karta hai
+    import iternary_ai
+
+    if not iternary_ai.LLM.configured:
+        sys.exit(iternary_ai.LLM.missing_key_message())
+
+    if args.input == "-":
+        specs = read_specs(sys.stdin.read())
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            specs = read_specs(f.read())
+
+    checkpoint_file = args.checkpoint or args.output
+    if args.fresh and checkpoint_file and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    checkpoint = Checkpoint(checkpoint_file) if checkpoint_file else None
+    # output hi checkpoint hai to results Checkpoint.record likhta hai
+    writes_output = args.output != checkpoint_file
+
+    out = sys.stdout
+    if args.output and writes_output:
+        out = open(args.output, "w", encoding="utf-8")
+    try:
+        for row in run_batch(specs, iternary_ai.prepare_batch_spec, iternary_ai.generate_batch_item,
+                             workers=max(args.workers, 1), retries=args.retries, checkpoint=checkpoint):
+            if row["type"] == "summary":
+                print(json.dumps(row), file=sys.stderr)
+            elif writes_output:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+            elif "key" not in row:
+                # invalid specs checkpoint me nahi jaate, par output file me dikhne chahiye
+                checkpoint.record(row)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
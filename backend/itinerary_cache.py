@@ -0,0 +1,223 @@
+"""
+Itinerary cache used in front of the Groq call in /generate-itinerary.
+
+Two tiers:
+- in-process LRU with TTL, bounded by entry count and total payload bytes
+- optional SQLite tier (ITINERARY_CACHE_DB) so entries survive restarts
+
+Keys are a sha256 over the normalized trip params + model + prompt version,
+values are the already-normalized `wrapped` itinerary payload.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+def make_cache_key(params: dict, model: str, prompt_version: str) -> str:
+    """
+    Canonical hash: sorted keys + compact separators, so dict ordering
+    or whitespace differences in the request never change the key.
+    """
+    blob = json.dumps(
+        {"params": params, "model": model, "promptVersion": prompt_version},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ItineraryCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 24 * 3600,
+        db_path: str | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, serialized payload)
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._db = None
+        self._db_path = db_path
+        self._inherited = []
+        if db_path:
+            self._connect()
+            after_fork = weakref.WeakMethod(self._reopen_after_fork)
+            os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def _connect(self) -> None:
+        self._db = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS itinerary_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _reopen_after_fork(self) -> None:
+        # parent ka connection child me share nahi karna (SQLite fork-safe nahi);
+        # close bhi nahi - woh parent ki file locks chhed sakta hai, bas reference rakho
+        self._inherited.append(self._db)
+        self._lock = threading.Lock()
+        self._connect()
+
+    # ---------- public API ----------
+
+    def get(self, key: str) -> dict | None:
+        payload = self.get_raw(key)
+        return json.loads(payload) if payload is not None else None
+
+    def get_raw(self, key: str) -> str | None:
+        """
+        Stored compact JSON text as-is -- response layer isse bina parse kiye
+        envelope me daal deta hai.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                self._drop(key)
+                self.expirations += 1
+
+            payload = self._disk_get(key, now)
+            if payload is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                # disk hit ko memory tier me promote karo
+                self._put(key, payload, now + self.ttl_seconds)
+                return payload
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        payload = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._put(key, payload, expires_at)
+            self._disk_set(key, payload, expires_at)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM itinerary_cache WHERE key = ?", (key,))
+                self._db.commit()
+
+    def warm(self, limit: int | None = None) -> int:
+        """
+        Disk tier ki sabse nayi (non-expired) entries memory LRU me load karo.
+        Pre-fork server isse master me chalata hai, workers ko copy-on-write milta hai.
+        Returns kitni entries load hui.
+        """
+        if self._db is None:
+            return 0
+        limit = self.max_entries if limit is None else min(limit, self.max_entries)
+        rows = self._db.execute(
+            "SELECT key, value, expires_at FROM itinerary_cache WHERE expires_at > ?"
+            " ORDER BY expires_at DESC LIMIT ?",
+            (time.time(), limit),
+        ).fetchall()
+        with self._lock:
+            # oldest pehle daalo taaki newest LRU ke end (most recent) pe rahe
+            for key, value, expires_at in reversed(rows):
+                self._put(key, value, expires_at)
+        return len(rows)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "diskTier": self._db is not None,
+            }
+
+    # ---------- internals (lock must be held) ----------
+
+    def _put(self, key: str, payload: str, expires_at: float) -> None:
+        size = len(payload)
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (expires_at, payload)
+        self._bytes += size
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def _disk_get(self, key: str, now: float) -> str | None:
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT value, expires_at FROM itinerary_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._db.execute("DELETE FROM itinerary_cache WHERE key = ?", (key,))
+            self._db.commit()
+            self.expirations += 1
+            return None
+        return row[0]
+
+    def _disk_set(self, key: str, payload: str, expires_at: float) -> None:
+        if self._db is None:
+            return
+        self._db.execute(
+            "INSERT OR REPLACE INTO itinerary_cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, payload, expires_at),
+        )
+        self._db.execute(
+            "DELETE FROM itinerary_cache WHERE expires_at <= ?", (time.time(),)
+        )
+        self._db.commit()
+
+
+def cache_from_env() -> ItineraryCache:
+    return ItineraryCache(
+        max_entries=int(os.getenv("ITINERARY_CACHE_SIZE", "256")),
+        max_bytes=int(os.getenv("ITINERARY_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+        ttl_seconds=float(os.getenv("ITINERARY_CACHE_TTL", str(24 * 3600))),
+        db_path=os.getenv("ITINERARY_CACHE_DB") or None,
+    )
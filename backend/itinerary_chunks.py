@@ -0,0 +1,261 @@
+"""
+Chunked (fan-out / fan-in) itinerary generation for long trips.
+
+Ek 4000-token completion me poora trip maangne se latency num_days ke saath
+badhti hai aur lambe trips token cap pe kat jaate hain. Chunked mode:
+
+1. skeleton call (cheap): har day ka theme/area + to/from transportation
+2. day batches (ITINERARY_CHUNK_DAYS days each) ek bounded worker pool pe
+   concurrently, har batch ko poora skeleton milta hai taaki days repeat na hon
+3. merge: days renumber, normalize; total + budget check itinerary_costs karta hai
+
+Rate limits: http_client already 429 pe retry karta hai; agar phir bhi 429
+aaye to `RateLimitGate` saare workers ko Retry-After tak rok deta hai aur
+batch dobara try hota hai (ITINERARY_CHUNK_RETRIES).
+
+Config (env):
+    ITINERARY_CHUNK_MIN_DAYS   trips with at least this many days use chunked mode (default 5, 0 = never)
+    ITINERARY_CHUNK_DAYS       days per batch (default 2)
+    ITINERARY_CHUNK_WORKERS    concurrent batch calls per request (default 8)
+    ITINERARY_CHUNK_RETRIES    extra attempts per batch after a 429 / bad JSON (default 1)
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import prompt_templates
+import upstream_limiter
+
+CHUNK_MIN_DAYS = int(os.getenv("ITINERARY_CHUNK_MIN_DAYS", "5"))
+CHUNK_DAYS = max(int(os.getenv("ITINERARY_CHUNK_DAYS", "2")), 1)
+CHUNK_WORKERS = max(int(os.getenv("ITINERARY_CHUNK_WORKERS", "8")), 1)
+CHUNK_RETRIES = int(os.getenv("ITINERARY_CHUNK_RETRIES", "1"))
+
+# Cache keys me jata hai (chunked output ka prompt alag hai); template edit => naya version
+CHUNK_PROMPT_VERSION = "chunked-" + prompt_templates.version_of("chunk_system", "chunk_skeleton", "chunk_batch")
+
+SKELETON_MAX_TOKENS = 700
+DAY_MAX_TOKENS = 750
+
+CHUNK_SYSTEM_PROMPT = prompt_templates.get("chunk_system").render()
+SKELETON_TEMPLATE = prompt_templates.get("chunk_skeleton")
+BATCH_TEMPLATE = prompt_templates.get("chunk_batch")
+
+
+def use_chunked(data: dict, num_days: int) -> bool:
+    """
+    Body me "chunked": true/false ho to wahi; warna num_days >= ITINERARY_CHUNK_MIN_DAYS.
+    """
+    if "chunked" in data:
+        return bool(data["chunked"])
+    return CHUNK_MIN_DAYS > 0 and num_days >= CHUNK_MIN_DAYS
+
+
+def plan_batches(num_days: int, size: int = CHUNK_DAYS) -> list[tuple[int, int]]:
+    """
+    [(first_day, last_day), ...] 1-based inclusive.
+    """
+    return [(first, min(first + size - 1, num_days)) for first in range(1, num_days + 1, size)]
+
+
+def trip_details(trip: dict) -> str:
+    interests = trip["interests"]
+    return f"""Trip Details:
+- Destination: {trip["destination"]}
+- Starting Location: {trip["current_location"]}
+- Start Date: {trip["start_date"]}
+- End Date: {trip["end_date"]}
+- Number of Days: {trip["num_days"]}
+- Number of Travelers: {trip["travelers"]}
+- Daily Budget: ₹{trip["daily_budget"]} per person
+- Budget Range: {trip["budget_range"]}
+- Interests: {", ".join(interests) if interests else "General travel"}
+- Additional Notes: {trip["additional_notes"] if trip["additional_notes"] else "None"}"""
+
+
+def skeleton_prompt(trip: dict) -> str:
+    prompt = SKELETON_TEMPLATE.render(
+        num_days=trip["num_days"],
+        current_location=trip["current_location"],
+        destination=trip["destination"],
+        trip_details=trip_details(trip),
+    )
+    # destination index me hai par origin nahi: attractions / bands se outline
+    facts = trip.get("facts")
+    return f"{prompt}\n\n{facts.prompt_block()}" if facts else prompt
+
+
+def batch_prompt(trip: dict, skeleton: dict, first: int, last: int) -> str:
+    """
+    Static schema pehle, phir trip + outline (ek request ke saare batches me
+    same), aur batch-specific days/rules sabse end me -- lamba shared prefix.
+    """
+    num_days = trip["num_days"]
+    destination = trip["destination"]
+    current_location = trip["current_location"]
+
+    outline = "\n".join(
+        f"- Day {d.get('day', i)}: {d.get('theme', '')} ({d.get('area', '')})"
+        for i, d in enumerate(skeleton.get("days") or [], start=1)
+    )
+    rules = []
+    facts = trip.get("facts")
+    # route known: journey + check-in / check-out planner splice karta hai (destination_index)
+    planned = bool(facts and facts.route)
+    if first == 1:
+        rules.append(
+            f"{facts.arrival_rule()} The journey and check-in are added by the planner, do not include them."
+            if planned else
+            f"- Day 1 is the arrival day: transportation from {current_location} to {destination} "
+            f"as in the outline, hotel check-in (type = \"accommodation\"), evening activities and dinner."
+        )
+    if last == num_days:
+        rules.append(
+            f"{facts.departure_rule()} Check-out and the journey back are added by the planner, do not include them."
+            if planned else
+            f"- Day {num_days} is the departure day: morning activity if time permits, check-out "
+            f"(type = \"accommodation\") and transportation back to {current_location}."
+        )
+    rules.append(
+        "- Other days: breakfast, morning activity, lunch, afternoon activity, evening activity, dinner, "
+        "all with specific times and places matching that day's theme and area."
+    )
+    if facts:
+        rules.append(facts.meal_rule())
+
+    return BATCH_TEMPLATE.render(
+        num_days=num_days,
+        current_location=current_location,
+        destination=destination,
+        trip_details=trip_details(trip),
+        outline=outline,
+        accommodation=skeleton.get("accommodation", ""),
+        transportation=json.dumps(skeleton.get("transportation") or {}, ensure_ascii=False),
+        first=first,
+        last=last,
+        rules="\n".join(rules),
+    )
+
+
+def skeleton_from_days(days: list, itinerary_data: dict) -> dict:
+    """
+    Already planned days -> skeleton shape, taaki "continue from day N" request
+    batch_prompt se ban sake (outline = pehle ke days, repeat na ho).
+    """
+    outline = []
+    accommodation = ""
+    for i, day in enumerate(days, start=1):
+        acts = day.get("activities") or []
+        titles = [a.get("title", "") for a in acts if a.get("type") != "meal"][:4]
+        area = next((a.get("location") for a in acts if a.get("location")), "")
+        outline.append({"day": day.get("day", i), "theme": "; ".join(t for t in titles if t), "area": area})
+        if not accommodation:
+            accommodation = next(
+                (f"{a.get('title', '')} ({a.get('location', '')})" for a in acts if a.get("type") == "accommodation"),
+                "",
+            )
+    return {
+        "days": outline,
+        "accommodation": accommodation,
+        "transportation": itinerary_data.get("transportation") or {},
+    }
+
+
+def chunk_request_body(model: str, prompt: str, max_tokens: int, stream: bool = False) -> dict:
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": CHUNK_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "stream": stream,
+    }
+
+
+def batch_max_tokens(first: int, last: int) -> int:
+    return min(4000, 200 + DAY_MAX_TOKENS * (last - first + 1))
+
+
+def continuation_body(model: str, trip: dict, days: list, itinerary_data: dict, next_day: int) -> dict:
+    """
+    Truncated / invalid response ke baad sirf days next_day..num_days ka request.
+    """
+    num_days = trip["num_days"]
+    prompt = batch_prompt(trip, skeleton_from_days(days, itinerary_data), next_day, num_days)
+    return chunk_request_body(model, prompt, batch_max_tokens(next_day, num_days))
+
+
+# ================== FAN-OUT ==================
+
+class RateLimitGate:
+    """
+    Shared cooldown for one request's workers: ek batch ko 429 mila to baaki
+    bhi Retry-After tak naye calls nahi karte.
+    """
+
+    def __init__(self):
+        self._until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def remaining(self) -> float:
+        return max(self._until - time.monotonic(), 0.0)
+
+    def wait(self) -> None:
+        delay = self.remaining()
+        if delay:
+            time.sleep(delay)
+
+    def block(self, retry_after: str | None, default: float = 2.0) -> None:
+        try:
+            delay = float(retry_after) if retry_after else default
+        except ValueError:
+            delay = default
+        with self._lock:
+            self.throttled += 1
+            self._until = max(self._until, time.monotonic() + delay)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: str | None = None):
+        super().__init__("rate limited by upstream")
+        self.retry_after = retry_after
+
+
+def run_batches(batches: list, call, workers: int = CHUNK_WORKERS, retries: int = CHUNK_RETRIES):
+    """
+    call(first, last) -> list of raw day dicts, bounded pool pe concurrently.
+    Results batch order me yield hote hain (pehla batch aate hi stream ho sakta hai
+    jab baaki abhi chal rahe hon). Koi batch fail ho to exception yahin se uthta hai.
+    """
+    gate = RateLimitGate()
+
+    def attempt(first: int, last: int) -> list:
+        for n in range(retries + 1):
+            gate.wait()
+            try:
+                return call(first, last)
+            except RateLimited as e:
+                if n >= retries:
+                    raise
+                gate.block(e.retry_after)
+            except json.JSONDecodeError:
+                if n >= retries:
+                    raise
+        return []
+
+    # request ki priority (e.g. batch precompute) worker threads me bhi
+    attempt = upstream_limiter.bind_priority(attempt)
+    pool = ThreadPoolExecutor(max_workers=min(workers, len(batches)) or 1)
+    futures = [pool.submit(attempt, first, last) for first, last in batches]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
@@ -0,0 +1,259 @@
+"""
+Cost aggregation + budget validation over normalized itineraries.
+
+Model ka `totalEstimatedCost` bharosemand nahi tha (kabhi sirf pehle days ka,
+kabhi per-person aur total mix), aur activities ke "₹XXX per person" kabhi
+jode hi nahi jaate the. Ab har wrapped itinerary ke liye:
+
+1. poore batch pe ek hi pass: har distinct `estimatedCost` string ek baar
+   regex se parse (model same strings baar-baar deta hai), baaki dict lookup;
+   koi flattened columns / per-trip intermediate lists nahi
+2. per-day aur per-trip totals; per-person costs x travelers, baaki as-is
+3. har din ka spend dailyBudget (per person) x travelers se check; dailyBudget
+   na ho to budgetRange ka per-person cap (frontend ke ranges)
+4. over-budget days `costSummary.overBudgetDays` me -- sirf woh days dobara
+   generate karo, poori trip nahi
+
+`totalEstimatedCost` ab yahi computed total hai (koi cost parse na ho tab hi
+model wala string rehta hai).
+
+CLI (nightly bulk output ko re-check karna, ek pass me):
+    python itinerary_costs.py results.ndjson [-o checked.ndjson]
+
+Config (env):
+    ITINERARY_BUDGET_TOLERANCE   overshoot allowed before a day is flagged (default 0.1 = 10%)
+    ITINERARY_BUDGET_EXCLUDE     activity types not counted against the daily budget
+                                 (default "transportation": arrival / departure legs)
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+
+BUDGET_TOLERANCE = float(os.getenv("ITINERARY_BUDGET_TOLERANCE", "0.1"))
+BUDGET_EXCLUDE = frozenset(
+    t.strip().lower() for t in os.getenv("ITINERARY_BUDGET_EXCLUDE", "transportation").split(",") if t.strip()
+)
+
+# per person / day, trip-creation-form ke budgetRanges ke upper ends; luxury = no cap
+BUDGET_RANGE_CAPS = {"budget": 2000.0, "midrange": 4500.0, "luxury": None}
+
+CURRENCY = "₹"
+
+# ek line = ek cost string. Lookaheads per-person / free flags pakadte hain,
+# phir pehla number (range ho to lower end) + optional k / lakh unit.
+_COST_LINE_RE = re.compile(
+    r"^(?=(?P<pp>[^\n]*?(?:per[ \t]*(?:person|head|pax)|/[ \t]*(?:person|head|pax)|\bpp\b|\beach\b))?)"
+    r"(?=(?P<free>[^\n]*?\b(?:free|included|no[ \t]+cost)\b)?)"
+    r"[^\d\n]*(?:(?P<num>\d[\d,]*(?:\.\d+)?)[ \t]*(?P<unit>k\b|lakhs?\b|lacs?\b)?)?[^\n]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+_UNITS = {"k": 1_000.0, "lakh": 100_000.0, "lakhs": 100_000.0, "lac": 100_000.0, "lacs": 100_000.0}
+
+
+def _cost_key(text) -> str:
+    # None / numbers bhi aate hain; summarize_batch aur parse_cost dono yahi key use karte hain
+    return text if isinstance(text, str) else str(text) if text else ""
+
+
+@lru_cache(maxsize=16384)
+def _parse_cost_line(key: str) -> tuple[float, bool, bool]:
+    """
+    Ek cost string -> (amount, per_person, parsed). "Free" -> 0 parsed; jisme
+    number hi na ho woh 0 unparsed. Process-wide cache: har response ka
+    cost_summary bhi wahi "₹500 per person" strings dekhta hai.
+    """
+    m = _COST_LINE_RE.match(key.replace("\r", " ").replace("\n", " "))
+    num = m.group("num")
+    if num:
+        value = float(num.replace(",", ""))
+        unit = m.group("unit")
+        return (value * _UNITS[unit.lower()] if unit else value), bool(m.group("pp")), True
+    return 0.0, bool(m.group("pp")), bool(m.group("free"))
+
+
+def parse_cost(text) -> tuple[float, bool]:
+    """
+    "₹1,200 per person" -> (1200.0, True).
+    """
+    return _parse_cost_line(_cost_key(text))[:2]
+
+
+def travelers_count(value) -> int:
+    try:
+        return max(int(float(value)), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def daily_limit_per_person(trip: dict) -> float | None:
+    """
+    dailyBudget (per person) > 0 ho to wahi, warna budgetRange ka cap.
+    """
+    try:
+        budget = float(trip.get("daily_budget") or 0)
+    except (TypeError, ValueError):
+        budget = 0.0
+    if budget > 0:
+        return budget
+    return BUDGET_RANGE_CAPS.get(str(trip.get("budget_range") or "").strip().lower())
+
+
+def format_amount(amount: float) -> str:
+    return f"{CURRENCY}{int(round(amount))}"
+
+
+def summarize_batch(itineraries: list, tolerance: float = BUDGET_TOLERANCE) -> list:
+    """
+    [(normalized_days, trip), ...] -> har itinerary ka costSummary dict
+    (same order). Ek pass; parse aur type lookups poore batch me shared.
+    """
+    costs = {}  # cost string -> (amount, per_person, parsed)
+    counted_types = {}  # activity type -> budget me count hota hai?
+    summaries = []
+    for days, trip in itineraries:
+        people = travelers_count(trip.get("travelers"))
+        limit = daily_limit_per_person(trip)
+        day_cap = limit * people * (1 + tolerance) if limit is not None else None
+        total = budget_total = 0.0
+        parsed = unparsed = 0
+        per_day, over_days = [], []
+        for index, day in enumerate(days, start=1):
+            day_total = day_budget = 0.0
+            for act in day.get("activities") or []:
+                key = _cost_key(act.get("estimatedCost"))
+                cost = costs.get(key)
+                if cost is None:
+                    cost = costs[key] = _parse_cost_line(key)
+                amount, per_person, ok = cost
+                spend = amount * people if per_person else amount
+                day_total += spend
+                kind = act.get("type") or ""
+                kind = kind if isinstance(kind, str) else str(kind)
+                counted = counted_types.get(kind)
+                if counted is None:
+                    counted = counted_types[kind] = kind.lower() not in BUDGET_EXCLUDE
+                if counted:
+                    day_budget += spend
+                if ok:
+                    parsed += 1
+                else:
+                    unparsed += 1
+
+            number = day.get("day", index)
+            over = day_cap is not None and day_budget > day_cap
+            per_day.append({
+                "day": number,
+                "total": int(round(day_total)),
+                "budgetSpend": int(round(day_budget)),
+                "overBudget": over,
+            })
+            if over:
+                over_days.append(number)
+            total += day_total
+            budget_total += day_budget
+
+        trip_limit = limit * people * len(days) if limit is not None else None
+        trip_over = trip_limit is not None and budget_total > trip_limit * (1 + tolerance)
+        summaries.append({
+            "currency": CURRENCY,
+            "travelers": people,
+            "dailyBudget": trip.get("daily_budget") or 0,
+            "budgetRange": trip.get("budget_range"),
+            "perDay": per_day,
+            "total": int(round(total)),
+            "perPerson": int(round(total / people)),
+            "dailyLimit": int(round(limit * people)) if limit is not None else None,
+            "tripLimit": int(round(trip_limit)) if trip_limit is not None else None,
+            "overBudgetDays": over_days,
+            "withinBudget": None if limit is None else not (over_days or trip_over),
+            "parsedCosts": parsed,
+            "unparsedCosts": unparsed,
+        })
+    return summaries
+
+
+def cost_summary(days: list, trip: dict) -> dict:
+    return summarize_batch([(days, trip)])[0]
+
+
+def apply_costs(wrapped: dict, trip: dict | None, summary: dict | None = None) -> dict:
+    """
+    wrapped itinerary me costSummary + computed totalEstimatedCost. Koi cost
+    parse hi na ho to model ka string rehne do (0 dikhane se behtar).
+    """
+    summary = summary or cost_summary(wrapped.get("itinerary") or [], trip)
+    previous = wrapped.get("costSummary")
+    # re-check pe totalEstimatedCost already computed hai; model ka original pichle summary me
+    model_total = previous.get("modelTotal") if previous else wrapped.get("totalEstimatedCost")
+    if model_total and str(model_total) != format_amount(summary["total"]):
+        summary = {**summary, "modelTotal": model_total}
+    wrapped["costSummary"] = summary
+    if summary["parsedCosts"]:
+        wrapped["totalEstimatedCost"] = format_amount(summary["total"])
+    return wrapped
+
+
+# ================== BULK RE-CHECK ==================
+
+def summary_trip(summary: dict) -> dict:
+    """
+    Pichle costSummary ke inputs -> trip dict (bulk output me trip nahi hota).
+    """
+    return {
+        "travelers": summary.get("travelers", 1),
+        "daily_budget": summary.get("dailyBudget", 0),
+        "budget_range": summary.get("budgetRange"),
+    }
+
+
+def recheck_rows(rows: list, tolerance: float = BUDGET_TOLERANCE) -> dict:
+    """
+    itinerary_batch result rows (in-place) ke costSummary ek batch pass me
+    dobara; returns counts.
+    """
+    targets = [
+        row["itinerary"] for row in rows
+        if row.get("type") == "result" and isinstance(row.get("itinerary"), dict)
+    ]
+    itineraries = [
+        (w.get("itinerary") or [], summary_trip(w.get("costSummary") or {})) for w in targets
+    ]
+    summaries = summarize_batch(itineraries, tolerance)
+    for wrapped, summary in zip(targets, summaries):
+        apply_costs(wrapped, None, summary)
+    return {
+        "type": "summary",
+        "itineraries": len(targets),
+        "days": sum(len(days) for days, _ in itineraries),
+        "overBudget": sum(1 for s in summaries if s["overBudgetDays"]),
+        "overBudgetDays": sum(len(s["overBudgetDays"]) for s in summaries),
+        "unparsedCosts": sum(s["unparsedCosts"] for s in summaries),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute totals and over-budget days for itinerary batch results (NDJSON)."
+    )
+    parser.add_argument("input", help="results NDJSON from itinerary_batch.py, or - for stdin")
+    parser.add_argument("-o", "--output", help="write updated rows here (default: only the summary)")
+    parser.add_argument("--tolerance", type=float, default=BUDGET_TOLERANCE)
+    args = parser.parse_args()
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with source:
+        rows = [json.loads(line) for line in source if line.strip()]
+
+    report = recheck_rows(rows, args.tolerance)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            for row in rows:
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(json.dumps(report), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
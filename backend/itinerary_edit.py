@@ -0,0 +1,319 @@
+"""
+Partial regeneration: ek existing itinerary me sirf chune hue days / activities
+dobara banao.
+
+Pehle "day 3 badlo", "day 2 ka dinner sasta" ya end date ek din aage jaane pe
+bhi poori trip dobara generate hoti thi (~1k prompt + ~3k completion tokens).
+Ab POST /generate-itinerary/edit:
+
+- request: normal trip fields (nayi dates ke saath) + existing "itinerary"
+  (wrapped ya sirf days array) + "edits":
+      {"day": 3, "instruction": "something more relaxed"}      poora day
+      {"day": 2, "activity": 4, "instruction": "cheaper"}       ek activity (0-based index)
+  "fixBudget": true => costSummary ke over-budget days bhi (budget ke hint ke saath)
+- dates badli: din kam hue to naya last day departure day banta hai, zyada hue
+  to purana last day + naye days; sirf start shift hua to bas redate (0 calls)
+- model ko sirf target days + unke neighbours ka ek-line outline + baaki trip
+  ke places ki chhoti list jaati hai; ek call saare whole-day edits ke liye,
+  ek call har us day ke liye jisme sirf activities badalni hain
+- result wapas splice, dates start date se dobara, response wahi
+  {"success", "itinerary"} shape (+ "edited" report)
+
+Config (env):
+    ITINERARY_EDIT_MAX_DAYS        max days rewritten per request (default 7)
+    ITINERARY_EDIT_CONTEXT_PLACES  max titles from other days sent as "do not repeat" (default 30)
+"""
+import os
+
+import itinerary_chunks
+import itinerary_costs
+import itinerary_json
+import prompt_templates
+
+EDIT_MAX_DAYS = int(os.getenv("ITINERARY_EDIT_MAX_DAYS", "7"))
+EDIT_CONTEXT_PLACES = int(os.getenv("ITINERARY_EDIT_CONTEXT_PLACES", "30"))
+
+EDIT_DAYS_TEMPLATE = prompt_templates.get("edit_days")
+EDIT_ACTIVITIES_TEMPLATE = prompt_templates.get("edit_activities")
+
+ACTIVITY_MAX_TOKENS = 120
+MAX_INSTRUCTION_CHARS = 300
+
+
+class EditPlan:
+    """
+    days: day number -> instruction ("" = bas naya plan); activities: day ->
+    {activity index -> instruction}; required: naye days jo bane hi chahiye.
+    """
+    __slots__ = ("base", "days", "activities", "required")
+
+    def __init__(self, base: list):
+        self.base = base
+        self.days: dict[int, str] = {}
+        self.activities: dict[int, dict[int, str]] = {}
+        self.required: set[int] = set()
+
+    def add_day(self, day: int, instruction: str = "") -> None:
+        notes = [n for n in (self.days.get(day), instruction) if n]
+        self.days[day] = " ".join(notes)
+
+    @property
+    def calls(self) -> int:
+        return (1 if self.days else 0) + len(self.activities)
+
+
+def existing_days(value) -> list:
+    """
+    Request ka "itinerary" (wrapped dict ya days array) -> days list. Bad => ValueError.
+    """
+    days = value.get("itinerary") if isinstance(value, dict) else value
+    if not isinstance(days, list) or not days:
+        raise ValueError("Send the existing itinerary (the \"itinerary\" object or its days array)")
+    for day in days:
+        if not isinstance(day, dict) or not isinstance(day.get("activities"), list):
+            raise ValueError("Every itinerary day needs an \"activities\" array")
+    return days
+
+
+def _instruction(edit: dict) -> str:
+    text = edit.get("instruction") or ""
+    if not isinstance(text, str):
+        raise ValueError("\"instruction\" must be a string")
+    return " ".join(text.split())[:MAX_INSTRUCTION_CHARS]
+
+
+def _int_field(edit: dict, field: str):
+    value = edit.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f"\"{field}\" must be an integer")
+    return value
+
+
+def budget_instructions(days: list, trip: dict) -> dict[int, str]:
+    """
+    costSummary ke over-budget days -> {day: "keep it under ₹X" instruction}.
+    """
+    summary = itinerary_costs.cost_summary(days, trip)
+    limit = summary["dailyLimit"]
+    notes = {}
+    for entry in summary["perDay"]:
+        if entry["overBudget"]:
+            notes[entry["day"]] = (
+                f"Cheaper day: keep the day's spend under "
+                f"{itinerary_costs.format_amount(limit)} for {summary['travelers']} travelers "
+                f"(it was {itinerary_costs.format_amount(entry['budgetSpend'])})."
+            )
+    return notes
+
+
+def plan_edits(trip: dict, days: list, edits, fix_budget: bool = False) -> EditPlan:
+    """
+    Existing days + edits + nayi dates -> EditPlan. Invalid edit => ValueError.
+    """
+    num_days = trip["num_days"]
+    old = len(days)
+    plan = EditPlan(days[:num_days])
+
+    if old < num_days:
+        # purana last day departure tha: ab regular day, aur naye days add
+        plan.add_day(old)
+        for n in range(old + 1, num_days + 1):
+            plan.add_day(n)
+            plan.required.add(n)
+    elif old > num_days:
+        plan.add_day(num_days)  # naya departure day
+
+    if edits is None:
+        edits = []
+    if not isinstance(edits, list):
+        raise ValueError("\"edits\" must be an array")
+    for edit in edits:
+        if not isinstance(edit, dict):
+            raise ValueError("Every edit must be an object")
+        day = _int_field(edit, "day")
+        if day is None or not 1 <= day <= num_days:
+            raise ValueError(f"Edit \"day\" must be between 1 and {num_days}")
+        instruction = _instruction(edit)
+        index = _int_field(edit, "activity")
+        if index is None:
+            plan.add_day(day, instruction)
+            continue
+        if day > len(plan.base) or not 0 <= index < len(plan.base[day - 1]["activities"]):
+            raise ValueError(f"Day {day} has no activity {index}")
+        plan.activities.setdefault(day, {})[index] = instruction
+
+    if fix_budget:
+        for day, note in budget_instructions(plan.base, trip).items():
+            plan.add_day(day, note)
+
+    # poora day dobara ban raha hai to uski activity edits usi me
+    for day in list(plan.activities):
+        if day in plan.days:
+            notes = [n for n in plan.activities.pop(day).values() if n]
+            if notes:
+                plan.add_day(day, "Also: " + "; ".join(notes))
+
+    if len(plan.days) > EDIT_MAX_DAYS:
+        raise ValueError(f"At most {EDIT_MAX_DAYS} days can be rewritten per edit; generate the trip instead")
+    return plan
+
+
+# ================== PROMPTS ==================
+
+def trip_line(trip: dict) -> str:
+    """
+    itinerary_chunks.trip_details ka one-line version (edit prompts chhote rahein).
+    """
+    interests = ", ".join(trip["interests"]) if trip["interests"] else "general travel"
+    limit = itinerary_costs.daily_limit_per_person(trip)
+    budget = f"₹{limit:g} per person per day" if limit else "no fixed daily budget"
+    line = (f'A {trip["num_days"]}-day trip from "{trip["current_location"]}" to "{trip["destination"]}", '
+            f'{trip["travelers"]} travelers, {budget} ({trip["budget_range"]}), interests: {interests}')
+    if trip["additional_notes"]:
+        line += f"; notes: {trip['additional_notes']}"
+    return line
+
+
+def day_role(trip: dict, n: int) -> str:
+    if n == 1:
+        return f"arrival day: travel from {trip['current_location']}, check-in, evening activity, dinner"
+    if n == trip["num_days"]:
+        return f"departure day: morning activity, check-out, travel back to {trip['current_location']}"
+    return "full day: breakfast, morning, lunch, afternoon, evening, dinner"
+
+
+def _titles(day: dict) -> list:
+    return [a.get("title", "") for a in day.get("activities") or [] if a.get("type") != "meal" and a.get("title")]
+
+
+def days_prompt(trip: dict, plan: EditPlan, itinerary_data: dict) -> str:
+    """
+    Sirf target days + unke neighbours ka one-line outline + baaki trip ke
+    places (do not repeat), static schema pehle.
+    """
+    targets = sorted(plan.days)
+    skeleton = itinerary_chunks.skeleton_from_days(plan.base, itinerary_data)
+    outline = dict(enumerate(skeleton["days"], start=1))  # position se, client ke "day" pe bharosa nahi
+
+    wanted = {n + step for n in targets for step in (-1, 1)}
+    neighbours = [
+        f"- Day {n}: {outline[n]['theme']} ({outline[n]['area']})"
+        for n in sorted(wanted - set(targets)) if 1 <= n <= len(plan.base) and n in outline
+    ]
+    shown = {t for n in wanted if 1 <= n <= len(plan.base) for t in _titles(plan.base[n - 1])}
+    places = []
+    for n, day in enumerate(plan.base, start=1):
+        if n not in plan.days and n not in wanted:
+            places.extend(t for t in _titles(day) if t not in shown)
+    places = list(dict.fromkeys(places))[:EDIT_CONTEXT_PLACES]
+
+    lines = []
+    for n in targets:
+        line = f"- Day {n} ({day_role(trip, n)})"
+        if n <= len(plan.base) and n not in plan.required:
+            line += f"; replace: {'; '.join(_titles(plan.base[n - 1])[:4]) or 'meals only'}"
+        if plan.days[n]:
+            line += f"; instruction: {plan.days[n]}"
+        lines.append(line)
+
+    return EDIT_DAYS_TEMPLATE.render(
+        trip=trip_line(trip),
+        accommodation=skeleton.get("accommodation") or "as before",
+        neighbours="\n".join(neighbours) or "none",
+        places=", ".join(places) or "none",
+        days=", ".join(str(n) for n in targets),
+        targets="\n".join(lines),
+    )
+
+
+def activities_prompt(trip: dict, plan: EditPlan, day: int) -> str:
+    acts = plan.base[day - 1]["activities"]
+    edits = plan.activities[day]
+    listing = "\n".join(
+        f"{i + 1}. {a.get('time', '')} [{a.get('type', 'activity')}] {a.get('title', '')} "
+        f"({a.get('location', '')}) {a.get('estimatedCost', '')}"
+        for i, a in enumerate(acts)
+    )
+    targets = "\n".join(
+        f"- activity {i + 1}: {edits[i] or 'a different option'}" for i in sorted(edits)
+    )
+    return EDIT_ACTIVITIES_TEMPLATE.render(
+        trip=trip_line(trip),
+        day=day,
+        role=day_role(trip, day),
+        activities=listing,
+        numbers=", ".join(str(i + 1) for i in sorted(edits)),
+        targets=targets,
+    )
+
+
+def days_body(model: str, trip: dict, plan: EditPlan, itinerary_data: dict) -> dict:
+    return itinerary_chunks.chunk_request_body(
+        model,
+        days_prompt(trip, plan, itinerary_data),
+        min(4000, 200 + itinerary_chunks.DAY_MAX_TOKENS * len(plan.days)),
+    )
+
+
+def activities_body(model: str, trip: dict, plan: EditPlan, day: int) -> dict:
+    return itinerary_chunks.chunk_request_body(
+        model,
+        activities_prompt(trip, plan, day),
+        100 + ACTIVITY_MAX_TOKENS * len(plan.activities[day]),
+    )
+
+
+# ================== SPLICE ==================
+
+def rewritten_days(data: dict, plan: EditPlan) -> dict[int, dict]:
+    """
+    Model ke days -> {day number: raw day}. Numbering targets se match na kare
+    to position se; schema-invalid days chhod diye jaate hain.
+    """
+    targets = sorted(plan.days)
+    items = [d for d in (data.get("itinerary") if isinstance(data, dict) else None) or [] if isinstance(d, dict)]
+    numbers = [d.get("day") for d in items]
+    if sorted(n for n in numbers if isinstance(n, int)) != targets[: len(items)] or len(set(numbers)) != len(numbers):
+        numbers = targets[: len(items)]
+
+    days = {}
+    for n, day in zip(numbers, items):
+        if n in plan.days and not itinerary_json.validate_day(day):
+            days[n] = day
+    return days
+
+
+def replaced_activities(data: dict, plan: EditPlan, day: int) -> dict[int, dict]:
+    indexes = sorted(plan.activities[day])
+    items = (data.get("activities") if isinstance(data, dict) else None) or []
+    return {i: act for i, act in zip(indexes, items) if isinstance(act, dict)}
+
+
+def splice(plan: EditPlan, new_days: dict, new_activities: dict) -> tuple[list, dict]:
+    """
+    Base days + naye days / activities -> (raw days renumbered 1..N, report).
+    """
+    num_days = max([len(plan.base), *plan.days])
+    days, report = [], {"days": [], "activities": [], "unchanged": [], "missing": []}
+    for n in range(1, num_days + 1):
+        if n in new_days:
+            days.append({**new_days[n], "day": n})
+            report["days"].append(n)
+            continue
+        if n in plan.required:
+            report["missing"].append(n)
+            continue
+        if n in plan.days:
+            report["unchanged"].append({"day": n})
+        day = plan.base[n - 1]
+        replaced = new_activities.get(n) or {}
+        acts = [replaced.get(i, act) for i, act in enumerate(day["activities"])]
+        for i in sorted(plan.activities.get(n) or {}):
+            if i in replaced:
+                report["activities"].append({"day": n, "activity": i})
+            else:
+                report["unchanged"].append({"day": n, "activity": i})
+        days.append({**day, "activities": acts, "day": n})
+    return days, report
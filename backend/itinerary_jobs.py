@@ -0,0 +1,686 @@
+"""
+Durable background jobs for itinerary generation (202 + polling / webhook).
+
+/generate-itinerary HTTP connection ko 120 s tak pakad ke rakhta hai; worker
+crash ya client disconnect => kaam gaya, aur web threads LLM ka wait karte
+rehte hain. Async mode me:
+
+- POST /generate-itinerary/jobs (ya /generate-itinerary + `Prefer: respond-async`)
+  turant 202 + job id deta hai; job ek SQLite queue (ITINERARY_JOBS_DB) me
+- dedupe: same cache key (normalized trip + model + prompt version) ka job
+  pehle se queued / running ho to wahi job id milta hai (naya callback us job pe jud jata hai)
+- alag worker processes (`python itinerary_jobs.py worker`) job claim karte
+  hain ek visibility timeout (lease) ke saath; worker ke chalte lease heartbeat
+  se badhti rehti hai, worker mar jaye to lease expire hote hi job dobara
+  queue me dikhta hai (max attempts ke baad failed)
+- 5xx / network errors => backoff ke saath retry; upstream 429 / admission 503
+  => Retry-After tak wapas queue, attempt count nahi hota (throughput upstream
+  capacity se limited, connections se nahi)
+- client GET /generate-itinerary/jobs/<id> poll kare, ya job me "callbackUrl"
+  de: finish pe result wahan POST hota hai (durable: callback state bhi
+  SQLite me, fail hone pe retry)
+
+Web process sirf enqueue / status padhta hai; generation worker pool me hota
+hai (wahi cache, single-flight, upstream limiter).
+
+Config (env):
+    ITINERARY_JOBS_DB               SQLite queue file (default itinerary_jobs.db)
+    ITINERARY_JOBS_VISIBILITY       lease seconds before an unacknowledged job is redelivered (default 180)
+    ITINERARY_JOBS_MAX_ATTEMPTS     attempts before a job fails (default 3)
+    ITINERARY_JOBS_BACKOFF          first retry delay in seconds, doubles per attempt (default 5)
+    ITINERARY_JOBS_MAX_THROTTLES    429/503 requeues before a job fails (default 50)
+    ITINERARY_JOBS_RESULT_TTL       seconds finished jobs stay readable (default 86400)
+    ITINERARY_JOBS_PROCESSES        worker processes (default 2)
+    ITINERARY_JOBS_THREADS          concurrent jobs per worker process (default 4)
+    ITINERARY_JOBS_POLL             idle poll interval of a worker, seconds (default 0.5)
+    ITINERARY_JOBS_CALLBACK_HOSTS   comma-separated callback host allowlist (unset = callbacks off)
+    ITINERARY_JOBS_CALLBACK_PRIVATE 1 = allowlisted hosts may resolve to loopback / private
+                                    addresses (internal receivers; default 0)
+    ITINERARY_JOBS_CALLBACK_SECRET  HMAC key; callbacks get X-Tripmate-Signature: sha256=<hex>
+    ITINERARY_JOBS_CALLBACK_RETRIES delivery attempts per callback (default 5)
+    ITINERARY_JOBS_CALLBACK_TIMEOUT seconds per callback POST (default 10)
+"""
+import argparse
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import random
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import weakref
+from urllib.parse import urlparse
+
+import observability
+
+log = observability.get_logger("itinerary_jobs")
+
+JOBS_DB = os.getenv("ITINERARY_JOBS_DB", "itinerary_jobs.db")
+VISIBILITY_SECONDS = float(os.getenv("ITINERARY_JOBS_VISIBILITY", "180"))
+MAX_ATTEMPTS = max(int(os.getenv("ITINERARY_JOBS_MAX_ATTEMPTS", "3")), 1)
+RETRY_BACKOFF = float(os.getenv("ITINERARY_JOBS_BACKOFF", "5"))
+MAX_THROTTLES = int(os.getenv("ITINERARY_JOBS_MAX_THROTTLES", "50"))
+RESULT_TTL = float(os.getenv("ITINERARY_JOBS_RESULT_TTL", str(24 * 3600)))
+WORKER_PROCESSES = max(int(os.getenv("ITINERARY_JOBS_PROCESSES", "2")), 1)
+WORKER_THREADS = max(int(os.getenv("ITINERARY_JOBS_THREADS", "4")), 1)
+POLL_SECONDS = float(os.getenv("ITINERARY_JOBS_POLL", "0.5"))
+CALLBACK_HOSTS = {h.strip().lower() for h in os.getenv("ITINERARY_JOBS_CALLBACK_HOSTS", "").split(",") if h.strip()}
+CALLBACK_PRIVATE = os.getenv("ITINERARY_JOBS_CALLBACK_PRIVATE", "0") == "1"
+CALLBACK_SECRET = os.getenv("ITINERARY_JOBS_CALLBACK_SECRET", "")
+CALLBACK_RETRIES = max(int(os.getenv("ITINERARY_JOBS_CALLBACK_RETRIES", "5")), 1)
+CALLBACK_TIMEOUT = float(os.getenv("ITINERARY_JOBS_CALLBACK_TIMEOUT", "10"))
+
+# client ko poll interval ka hint (Retry-After on 202 / pending status)
+POLL_HINT_SECONDS = 2
+ACTIVE = ("queued", "running")
+
+
+# ================== REQUEST HELPERS ==================
+
+def wants_async(headers, data: dict) -> bool:
+    return "respond-async" in headers.get("Prefer", "").lower() or data.get("async") is True
+
+
+def callback_url(data: dict) -> str | None:
+    """
+    Body ka "callbackUrl" validate karo. Submit endpoint pe auth nahi aur CORS
+    open hai, isliye callbacks tabhi jab ITINERARY_JOBS_CALLBACK_HOSTS set ho
+    aur host usme ho (warna koi bhi worker se internal URLs hit karwa sakta hai).
+    Bad => ValueError.
+    """
+    url = data.get("callbackUrl")
+    if url in (None, ""):
+        return None
+    if not isinstance(url, str):
+        raise ValueError("callbackUrl must be a string")
+    if not CALLBACK_HOSTS:
+        raise ValueError("callbackUrl is not enabled on this server")
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callbackUrl must be an http(s) URL")
+    if parsed.hostname.lower() not in CALLBACK_HOSTS:
+        raise ValueError("callbackUrl host is not allowed")
+    return url
+
+
+def check_callback_address(url: str) -> None:
+    """
+    Har delivery se pehle: host resolve karke loopback / private / link-local /
+    reserved addresses reject (allowlisted naam bhi DNS se andar point kar sakta hai).
+    ValueError => deliver mat karo.
+    """
+    parsed = urlparse(url)
+    if not CALLBACK_HOSTS or (parsed.hostname or "").lower() not in CALLBACK_HOSTS:
+        raise ValueError("callback host is not allowed")
+    if CALLBACK_PRIVATE:
+        return
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, port, proto=socket.IPPROTO_TCP)
+    except socket.gaierror as e:
+        raise ValueError(f"callback host does not resolve: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            raise ValueError(f"callback host resolves to a non-public address ({address})")
+
+
+def retry_delay(attempt: int, retry_after=None) -> float:
+    """
+    Exponential backoff with jitter; Retry-After ho to kam se kam utna.
+    """
+    delay = RETRY_BACKOFF * (2 ** max(attempt - 1, 0)) * (0.5 + random.random())
+    if retry_after is not None:
+        try:
+            delay = max(delay, float(retry_after))
+        except (TypeError, ValueError):
+            pass
+    return delay
+
+
+# ================== STORE ==================
+
+class JobStore:
+    """
+    Jobs ki ek SQLite table: queue + lease + result + callback state.
+    Connection pehli call pe khulta hai (web process jo jobs use nahi karta file nahi banata).
+    """
+
+    def __init__(self, path: str = JOBS_DB, visibility_seconds: float = VISIBILITY_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.path = path
+        self.visibility_seconds = visibility_seconds
+        self.max_attempts = max_attempts
+        self._db = None
+        self._inherited = []
+        self._lock = threading.Lock()
+        after_fork = weakref.WeakMethod(self._reopen_after_fork)
+        os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS itinerary_jobs ("
+                " id TEXT PRIMARY KEY,"
+                " key TEXT NOT NULL,"
+                " state TEXT NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " callbacks TEXT NOT NULL DEFAULT '[]',"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " throttled INTEGER NOT NULL DEFAULT 0,"
+                " available_at REAL NOT NULL,"
+                " owner TEXT,"
+                " lease_until REAL NOT NULL DEFAULT 0,"
+                " status INTEGER,"
+                " result TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " finished_at REAL,"
+                " callback_state TEXT NOT NULL DEFAULT 'none',"
+                " callback_attempts INTEGER NOT NULL DEFAULT 0,"
+                " callback_at REAL NOT NULL DEFAULT 0)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS itinerary_jobs_ready ON itinerary_jobs (state, available_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS itinerary_jobs_key ON itinerary_jobs (key, state)")
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS itinerary_jobs_callbacks ON itinerary_jobs (callback_state, callback_at)"
+            )
+            self._db = db
+        return self._db
+
+    def _reopen_after_fork(self) -> None:
+        # SQLite connection fork ke paar share nahi hota: child pehli call pe naya kholta hai
+        if self._db is not None:
+            self._inherited.append(self._db)
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _transaction(self, fn):
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(db, time.time())
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    # ---------- web side ----------
+
+    def enqueue(self, key: str, payload: dict, callback: str | None = None) -> tuple[dict, bool]:
+        """
+        Returns (job, created). Same key ka active job ho to wahi (callback usme jud jata hai).
+        """
+        def txn(db, now):
+            row = db.execute(
+                "SELECT id, callbacks FROM itinerary_jobs WHERE key = ? AND state IN ('queued', 'running')"
+                " ORDER BY created_at LIMIT 1",
+                (key,),
+            ).fetchone()
+            if row is not None:
+                job_id, callbacks = row[0], json.loads(row[1])
+                if callback and callback not in callbacks:
+                    callbacks.append(callback)
+                    db.execute("UPDATE itinerary_jobs SET callbacks = ? WHERE id = ?", (json.dumps(callbacks), job_id))
+                return job_id, False
+            job_id = uuid.uuid4().hex
+            db.execute(
+                "INSERT INTO itinerary_jobs (id, key, state, payload, callbacks, available_at, created_at, updated_at)"
+                " VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, key, json.dumps(payload, ensure_ascii=False), json.dumps([callback] if callback else []),
+                 now, now, now),
+            )
+            return job_id, True
+
+        job_id, created = self._transaction(txn)
+        return self.get(job_id), created
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT id, state, attempts, throttled, status, result, created_at, updated_at, finished_at,"
+                " callback_state, available_at FROM itinerary_jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0], "state": row[1], "attempts": row[2], "throttled": row[3], "status": row[4],
+            "result": row[5], "createdAt": row[6], "updatedAt": row[7], "finishedAt": row[8],
+            "callback": row[9], "availableAt": row[10],
+        }
+
+    # ---------- worker side ----------
+
+    def claim(self, owner: str) -> dict | None:
+        """
+        Agla visible job (queued aur due, ya running jiski lease expire ho gayi) lease ke saath.
+        """
+        def txn(db, now):
+            while True:
+                row = db.execute(
+                    "SELECT id, key, payload, attempts, state FROM itinerary_jobs"
+                    " WHERE (state = 'queued' AND available_at <= ?) OR (state = 'running' AND lease_until < ?)"
+                    " ORDER BY available_at LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                job_id, key, payload, attempts, state = row
+                if state == "running" and attempts >= self.max_attempts:
+                    # worker har attempt me mara / atka: ab aur nahi
+                    self._finish_row(db, now, job_id, "failed", 500,
+                                     {"error": "Itinerary job timed out (worker lost)"})
+                    continue
+                db.execute(
+                    "UPDATE itinerary_jobs SET state = 'running', owner = ?, lease_until = ?,"
+                    " attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (owner, now + self.visibility_seconds, now, job_id),
+                )
+                return {"id": job_id, "key": key, "payload": json.loads(payload), "attempts": attempts + 1,
+                        "redelivered": state == "running"}
+
+        return self._transaction(txn)
+
+    def extend(self, job_id: str, owner: str) -> bool:
+        """
+        Heartbeat: lease aage badhao. False => lease kisi aur ke paas (redelivered).
+        """
+        with self._lock:
+            cursor = self._conn().execute(
+                "UPDATE itinerary_jobs SET lease_until = ? WHERE id = ? AND owner = ? AND state = 'running'",
+                (time.time() + self.visibility_seconds, job_id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, owner: str, body: dict, status: int) -> str | None:
+        """
+        Worker ka result: 200 => succeeded; 429/503 => wapas queue (attempt wapas);
+        baaki 5xx => retry jab tak attempts bache; warna failed.
+        Returns naya state, ya None agar lease pehle hi chali gayi thi.
+        """
+        def txn(db, now):
+            row = db.execute(
+                "SELECT attempts, throttled FROM itinerary_jobs WHERE id = ? AND owner = ? AND state = 'running'",
+                (job_id, owner),
+            ).fetchone()
+            if row is None:
+                return None
+            attempts, throttled = row
+            retry_after = body.get("retryAfter") if isinstance(body, dict) else None
+            if status in (429, 503) and throttled < MAX_THROTTLES:
+                db.execute(
+                    "UPDATE itinerary_jobs SET state = 'queued', owner = NULL, lease_until = 0,"
+                    " attempts = attempts - 1, throttled = throttled + 1, available_at = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (now + retry_delay(1, retry_after), now, job_id),
+                )
+                return "throttled"
+            if status >= 500 and status not in (429, 503) and attempts < self.max_attempts:
+                db.execute(
+                    "UPDATE itinerary_jobs SET state = 'queued', owner = NULL, lease_until = 0,"
+                    " available_at = ?, updated_at = ? WHERE id = ?",
+                    (now + retry_delay(attempts), now, job_id),
+                )
+                return "retried"
+            state = "succeeded" if status == 200 else "failed"
+            self._finish_row(db, now, job_id, state, status, body)
+            return state
+
+        return self._transaction(txn)
+
+    def _finish_row(self, db, now: float, job_id: str, state: str, status: int, body: dict) -> None:
+        db.execute(
+            "UPDATE itinerary_jobs SET state = ?, status = ?, result = ?, owner = NULL, lease_until = 0,"
+            " finished_at = ?, updated_at = ?,"
+            " callback_state = CASE WHEN callbacks = '[]' THEN 'none' ELSE 'pending' END, callback_at = ?"
+            " WHERE id = ?",
+            (state, status, json.dumps(body, separators=(",", ":"), ensure_ascii=False), now, now, now, job_id),
+        )
+
+    def claim_callback(self) -> dict | None:
+        """
+        Ek pending callback (lease: callback_at aage, taaki dusra worker same na bheje).
+        """
+        def txn(db, now):
+            row = db.execute(
+                "SELECT id, state, status, result, callbacks, callback_attempts FROM itinerary_jobs"
+                " WHERE callback_state = 'pending' AND callback_at <= ? ORDER BY callback_at LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            callbacks = json.loads(row[4])
+            db.execute(
+                "UPDATE itinerary_jobs SET callback_at = ? WHERE id = ?",
+                (now + CALLBACK_TIMEOUT * len(callbacks) + 30, row[0]),
+            )
+            return {"id": row[0], "state": row[1], "status": row[2], "result": row[3], "callbacks": callbacks,
+                    "attempts": row[5]}
+
+        return self._transaction(txn)
+
+    def callback_done(self, job_id: str, remaining: list, attempts: int, refused: bool = False) -> str:
+        if not remaining:
+            state, at = ("failed" if refused else "delivered"), 0
+        elif attempts + 1 >= CALLBACK_RETRIES:
+            state, at = "failed", 0
+        else:
+            state, at = "pending", time.time() + retry_delay(attempts + 1)
+        with self._lock:
+            self._conn().execute(
+                "UPDATE itinerary_jobs SET callback_state = ?, callbacks = ?, callback_attempts = ?,"
+                " callback_at = ? WHERE id = ?",
+                (state, json.dumps(remaining), attempts + 1, at, job_id),
+            )
+        return state
+
+    def purge(self, result_ttl: float = RESULT_TTL) -> int:
+        """
+        RESULT_TTL se purane finished jobs hatao (pending callbacks wale nahi).
+        """
+        with self._lock:
+            cursor = self._conn().execute(
+                "DELETE FROM itinerary_jobs WHERE state IN ('succeeded', 'failed')"
+                " AND finished_at < ? AND callback_state != 'pending'",
+                (time.time() - result_ttl,),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            states = dict(db.execute("SELECT state, COUNT(*) FROM itinerary_jobs GROUP BY state").fetchall())
+            oldest = db.execute(
+                "SELECT MIN(created_at) FROM itinerary_jobs WHERE state = 'queued'"
+            ).fetchone()[0]
+            expired = db.execute(
+                "SELECT COUNT(*) FROM itinerary_jobs WHERE state = 'running' AND lease_until < ?", (now,)
+            ).fetchone()[0]
+            callbacks = dict(db.execute(
+                "SELECT callback_state, COUNT(*) FROM itinerary_jobs WHERE callback_state != 'none'"
+                " GROUP BY callback_state"
+            ).fetchall())
+        return {
+            "path": self.path,
+            "states": {state: states.get(state, 0) for state in ("queued", "running", "succeeded", "failed")},
+            "oldestQueuedAgeS": round(now - oldest, 2) if oldest else 0.0,
+            "expiredLeases": expired,
+            "callbacks": callbacks,
+            "visibilitySeconds": self.visibility_seconds,
+            "maxAttempts": self.max_attempts,
+        }
+
+
+def job_view(job: dict) -> dict:
+    """
+    Store row -> status endpoint body (result finish hone pe hi).
+    """
+    view = {
+        "jobId": job["id"],
+        "state": job["state"],
+        "attempts": job["attempts"],
+        "createdAt": job["createdAt"],
+        "updatedAt": job["updatedAt"],
+    }
+    if job["state"] in ACTIVE:
+        view["statusUrl"] = f"/generate-itinerary/jobs/{job['id']}"
+        return view
+    view["finishedAt"] = job["finishedAt"]
+    view["status"] = job["status"]
+    view["callback"] = job["callback"]
+    result = json.loads(job["result"]) if job["result"] else {}
+    return {**view, "success": job["state"] == "succeeded", **result}
+
+
+def accepted_view(job: dict, created: bool) -> dict:
+    return {
+        "success": True,
+        "jobId": job["id"],
+        "state": job["state"],
+        "deduplicated": not created,
+        "statusUrl": f"/generate-itinerary/jobs/{job['id']}",
+    }
+
+
+# ================== WORKER ==================
+
+class JobWorker:
+    """
+    Ek process me `threads` jobs parallel: claim -> run(payload) -> finish,
+    lease heartbeat ke saath; khaali ho to pending callbacks bhejta hai.
+    """
+
+    def __init__(self, store: JobStore, run, threads: int = WORKER_THREADS, poll_seconds: float = POLL_SECONDS):
+        self.store = store
+        self.run = run
+        self.threads = threads
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {"claimed": 0, "redelivered": 0, "succeeded": 0, "failed": 0, "retried": 0,
+                         "throttled": 0, "leaseLost": 0, "callbacksDelivered": 0, "callbacksFailed": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def stop(self) -> None:
+        self.stopping.set()
+
+    def serve(self) -> None:
+        workers = [threading.Thread(target=self._loop, args=(n,), name=f"job-worker-{n}", daemon=True)
+                   for n in range(self.threads)]
+        for thread in workers:
+            thread.start()
+        last_purge = 0.0
+        while not self.stopping.wait(60):
+            if time.time() - last_purge > 3600:
+                last_purge = time.time()
+                purged = self.store.purge()
+                if purged:
+                    log.info("purged finished jobs", extra={"jobs": purged})
+        for thread in workers:
+            # in-flight job poora hone do; lease expire hone tak na ho to agla worker le lega
+            thread.join()
+        log.info("job worker stopped", extra={"counters": self.counters})
+
+    def _loop(self, n: int) -> None:
+        owner = f"{os.getpid()}-{n}-{uuid.uuid4().hex[:8]}"
+        idle = self.poll_seconds
+        while not self.stopping.is_set():
+            try:
+                job = self.store.claim(owner)
+                if job is not None:
+                    self.process(job, owner)
+                    idle = self.poll_seconds
+                    continue
+                if self.deliver_callbacks():
+                    continue
+            except sqlite3.Error:
+                log.exception("job store error")
+            self.stopping.wait(idle)
+            idle = min(idle * 2, self.poll_seconds * 8)
+
+    def process(self, job: dict, owner: str) -> str | None:
+        self._count("claimed")
+        if job["redelivered"]:
+            self._count("redelivered")
+            log.warning("job lease expired, redelivering", extra={"job": job["id"], "attempt": job["attempts"]})
+
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(self.store.visibility_seconds / 3):
+                if not self.store.extend(job["id"], owner):
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        started = time.perf_counter()
+        try:
+            body, status = self.run(job["payload"])
+        except Exception as e:
+            log.exception("itinerary job failed", extra={"job": job["id"]})
+            body, status = {"error": f"An unexpected error occurred: {str(e)}"}, 500
+        finally:
+            done.set()
+            beat.join()
+
+        state = self.store.finish(job["id"], owner, body, status)
+        self._count("leaseLost" if state is None else state)
+        log.info("itinerary job processed", extra={
+            "job": job["id"], "state": state, "status": status, "attempt": job["attempts"],
+            "seconds": round(time.perf_counter() - started, 3),
+        })
+        return state
+
+    def deliver_callbacks(self) -> bool:
+        job = self.store.claim_callback()
+        if job is None:
+            return False
+        import requests
+
+        body = json.dumps(
+            {"jobId": job["id"], "state": job["state"], "status": job["status"],
+             "success": job["state"] == "succeeded", **json.loads(job["result"] or "{}")},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Tripmate-Job": job["id"]}
+        if CALLBACK_SECRET:
+            digest = hmac.new(CALLBACK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Tripmate-Signature"] = f"sha256={digest}"
+
+        remaining, refused = [], False
+        for url in job["callbacks"]:
+            try:
+                check_callback_address(url)
+            except ValueError as e:
+                # config badli / DNS andar point karta hai: retry se kuch nahi badlega
+                log.warning("job callback refused", extra={"job": job["id"], "url": url, "error": str(e)})
+                refused = True
+                continue
+            try:
+                # redirects nahi: 30x se allowlist / address check bypass na ho
+                response = requests.post(url, data=body, headers=headers, timeout=CALLBACK_TIMEOUT,
+                                         allow_redirects=False)
+                if response.status_code >= 300:
+                    raise requests.exceptions.HTTPError(f"HTTP {response.status_code}")
+            except requests.exceptions.RequestException as e:
+                log.warning("job callback failed", extra={"job": job["id"], "url": url, "error": str(e)})
+                remaining.append(url)
+        state = self.store.callback_done(job["id"], remaining, job["attempts"], refused)
+        self._count("callbacksDelivered" if state == "delivered" else "callbacksFailed")
+        return True
+
+
+# ================== WORKER POOL (CLI) ==================
+
+def _serve_child(threads: int) -> None:
+    import iternary_ai
+
+    iternary_ai.warm_up()
+    worker = JobWorker(job_queue, iternary_ai.run_itinerary_job, threads=threads)
+    signal.signal(signal.SIGTERM, lambda sig, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda sig, frame: worker.stop())
+    log.info("job worker started", extra={"threads": threads, "db": job_queue.path})
+    worker.serve()
+
+
+def run_workers(processes: int = WORKER_PROCESSES, threads: int = WORKER_THREADS) -> None:
+    """
+    serve.py jaisa: app ek baar import + preload, phir fork. Parent supervisor
+    hai: mara hua child dobara start (uska job lease expire pe requeue hota hai),
+    SIGTERM sab children ko forward.
+    """
+    import iternary_ai
+
+    if not iternary_ai.LLM.configured:
+        sys.exit(iternary_ai.LLM.missing_key_message())
+    iternary_ai.preload()
+
+    children = {}
+    stopping = False
+
+    def spawn(slot: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _serve_child(threads)
+            except BaseException:
+                log.exception("job worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = slot
+
+    def stop(sig, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for slot in range(processes):
+        spawn(slot)
+    log.info("job worker pool running", extra={"processes": processes, "threads": threads})
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is not None and not stopping:
+            log.warning("job worker exited, restarting", extra={"pid": pid, "status": status})
+            time.sleep(1)
+            spawn(slot)
+
+
+def queue_from_env() -> JobStore:
+    return JobStore(JOBS_DB)
+
+
+job_queue = queue_from_env()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Itinerary job queue: worker pool and stats.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="run the worker pool")
+    worker.add_argument("--processes", type=int, default=WORKER_PROCESSES)
+    worker.add_argument("--threads", type=int, default=WORKER_THREADS)
+    sub.add_parser("stats", help="print queue counts")
+    purge = sub.add_parser("purge", help="delete finished jobs older than --older-than seconds")
+    purge.add_argument("--older-than", type=float, default=RESULT_TTL)
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        run_workers(max(args.processes, 1), max(args.threads, 1))
+    elif args.command == "stats":
+        print(json.dumps(job_queue.stats(), indent=2))
+    else:
+        print(json.dumps({"purged": job_queue.purge(args.older_than)}))
+
+
+if __name__ == "__main__":
+    main()
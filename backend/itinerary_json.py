@@ -0,0 +1,416 @@
+"""
+Tolerant parse + validate pipeline for the model's itinerary JSON.
+
+Pehle ek `json.loads` fail hote hi 500 jata tha aur user poori 120 s generation
+retry karta tha. Ab:
+
+1. fast path: orjson agar installed ho (`pip install orjson`), warna json
+2. repair: code fences / surrounding prose, raw newlines & control chars
+   inside strings, trailing commas, mismatched closers, aur truncation (last
+   complete value tak cut karke open brackets close)
+3. compiled schema validator (itinerary / day / activity); sirf `itinerary`
+   array missing ho tab hard fail. `totalEstimatedCost` / `transportation`
+   galat type me aaye to coerce (5800 -> "₹5800", null -> {}) + warning;
+   pehle invalid day se aage ke days "missing" maane jaate hain
+4. caller missing days ke liye sirf "continue from day N" re-request karta hai
+   (iternary_ai.build_wrapped_itinerary), poora regeneration nahi
+
+Har failure type ka count / rate `parse_metrics.snapshot()` me.
+
+Config (env):
+    ITINERARY_CONTINUE_ATTEMPTS   "continue from day N" calls per response (default 1, 0 = off)
+"""
+import json
+import logging
+import os
+import threading
+
+from json_stream import ArrayItemStreamParser
+
+log = logging.getLogger("tripmate.itinerary_json")
+
+try:
+    import orjson
+
+    _fast_loads = orjson.loads
+    FAST_JSON = "orjson"
+except ImportError:  # optional dependency
+    _fast_loads = json.loads
+    FAST_JSON = "json"
+
+CONTINUE_ATTEMPTS = int(os.getenv("ITINERARY_CONTINUE_ATTEMPTS", "1"))
+
+
+def loads(text: str):
+    """
+    Fast path. orjson.JSONDecodeError json.JSONDecodeError ka subclass hai.
+    """
+    return _fast_loads(text)
+
+
+# ================== REPAIR ==================
+
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _drop_trailing_comma(out: list) -> bool:
+    i = len(out) - 1
+    while i >= 0 and out[i] in " \t\r\n":
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+        return True
+    return False
+
+
+def repair_json(text: str) -> tuple[str, list[str], int]:
+    """
+    Ek pass me common model mistakes theek karo.
+    Returns (repaired text, fixes applied, cut_depth); cut_depth = truncation
+    cut ke waqt kitne containers open the (0 = truncation nahi).
+    """
+    fixes: list[str] = []
+    start = text.find("{")
+    if start < 0:
+        return text, fixes, 0
+    if text[:start].strip():
+        fixes.append("prose")
+
+    out: list[str] = []
+    stack: list[str] = []
+    in_string = False
+    escape = False
+    # last point where a container closed: (len(out), open closers at that point)
+    safe = None
+    end = start
+
+    for pos in range(start, len(text)):
+        ch = text[pos]
+        end = pos + 1
+
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch < " ":
+                ch = _ESCAPES.get(ch, "\\u%04x" % ord(ch))
+                if "control_chars" not in fixes:
+                    fixes.append("control_chars")
+            out.append(ch)
+            continue
+
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]":
+            if _drop_trailing_comma(out) and "trailing_comma" not in fixes:
+                fixes.append("trailing_comma")
+            expected = stack.pop()
+            if ch != expected and "mismatched_bracket" not in fixes:
+                fixes.append("mismatched_bracket")
+            out.append(expected)
+            if not stack:
+                break
+            safe = (len(out), list(stack))
+            continue
+        out.append(ch)
+
+    if stack:
+        fixes.append("truncated")
+        if safe is None:
+            return "".join(out), fixes, len(stack)
+        cut, open_closers = safe
+        del out[cut:]
+        _drop_trailing_comma(out)
+        out.extend(reversed(open_closers))
+        return "".join(out), fixes, len(open_closers)
+
+    if text[end:].strip():
+        fixes.append("trailing_text")
+    return "".join(out), fixes, 0
+
+
+# ================== SCHEMA ==================
+
+def compile_schema(schema: dict):
+    """
+    Chhota schema subset (type / properties / required / items / enum / minItems)
+    ko ek baar closures me compile karo; validator(value, path) -> [errors].
+    """
+    kind = schema.get("type")
+    checks = []
+
+    if kind == "object":
+        required = tuple(schema.get("required", ()))
+        props = {key: compile_schema(sub) for key, sub in schema.get("properties", {}).items()}
+
+        def check_object(value, path):
+            if not isinstance(value, dict):
+                return [f"{path}: expected object"]
+            errors = [f"{path}.{key}: missing" for key in required if key not in value]
+            for key, validate in props.items():
+                if key in value:
+                    errors.extend(validate(value[key], f"{path}.{key}"))
+            return errors
+
+        checks.append(check_object)
+    elif kind == "array":
+        items = compile_schema(schema["items"]) if "items" in schema else None
+        min_items = schema.get("minItems", 0)
+
+        def check_array(value, path):
+            if not isinstance(value, list):
+                return [f"{path}: expected array"]
+            errors = [f"{path}: expected at least {min_items} items"] if len(value) < min_items else []
+            if items is not None:
+                for i, item in enumerate(value):
+                    errors.extend(items(item, f"{path}[{i}]"))
+            return errors
+
+        checks.append(check_array)
+    elif kind in ("string", "integer"):
+        py_type = str if kind == "string" else int
+
+        def check_scalar(value, path):
+            if not isinstance(value, py_type) or isinstance(value, bool):
+                return [f"{path}: expected {kind}"]
+            return []
+
+        checks.append(check_scalar)
+
+    if "enum" in schema:
+        allowed = frozenset(schema["enum"])
+
+        def check_enum(value, path):
+            return [] if value in allowed else [f"{path}: not one of {sorted(allowed)}"]
+
+        checks.append(check_enum)
+
+    def validate(value, path="$"):
+        for check in checks:
+            errors = check(value, path)
+            if errors:
+                return errors
+        return []
+
+    return validate
+
+
+ACTIVITY_SCHEMA = {
+    "type": "object",
+    "required": ["time", "title"],
+    "properties": {
+        "time": {"type": "string"},
+        "type": {"type": "string", "enum": ["transportation", "activity", "meal", "accommodation"]},
+        "title": {"type": "string"},
+        "location": {"type": "string"},
+        "description": {"type": "string"},
+        "estimatedCost": {"type": "string"},
+        "duration": {"type": "string"},
+    },
+}
+
+DAY_SCHEMA = {
+    "type": "object",
+    "required": ["activities"],
+    "properties": {
+        "activities": {"type": "array", "minItems": 1, "items": {"type": "object"}},
+    },
+}
+
+TRANSPORTATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "toDestination": {"type": "object"},
+        "fromDestination": {"type": "object"},
+    },
+}
+
+# sirf yahi hard requirement; baaki top-level fields coerce_top_level() me
+ITINERARY_SCHEMA = {
+    "type": "object",
+    "required": ["itinerary"],
+    "properties": {
+        "itinerary": {"type": "array"},
+    },
+}
+
+validate_itinerary = compile_schema(ITINERARY_SCHEMA)
+validate_transportation = compile_schema(TRANSPORTATION_SCHEMA)
+validate_day = compile_schema(DAY_SCHEMA)
+validate_activity = compile_schema(ACTIVITY_SCHEMA)
+
+
+# ================== METRICS ==================
+
+class ParseMetrics:
+    FIELDS = (
+        "parsed", "fast_path", "repaired", "unparseable", "schema_invalid",
+        "invalid_days", "invalid_activities", "incomplete", "continuations",
+        "continuation_failures", "stream_items_repaired", "stream_items_dropped",
+        "coerced_fields",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(self.FIELDS, 0)
+        self.fixes: dict[str, int] = {}
+
+    def record(self, *fields: str, fixes: list | None = None, n: int = 1) -> None:
+        with self._lock:
+            for field in fields:
+                self.counts[field] += n
+            for fix in fixes or ():
+                self.fixes[fix] = self.fixes.get(fix, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.counts["parsed"]
+            rate = (lambda n: round(n / total, 4) if total else 0.0)
+            return {
+                "jsonLibrary": FAST_JSON,
+                "responses": total,
+                "counts": dict(self.counts),
+                "rates": {
+                    field: rate(self.counts[field])
+                    for field in ("fast_path", "repaired", "unparseable", "schema_invalid", "incomplete", "continuations")
+                },
+                "fixes": dict(self.fixes),
+                "fixRates": {fix: rate(n) for fix, n in self.fixes.items()},
+            }
+
+
+parse_metrics = ParseMetrics()
+
+
+# ================== PIPELINE ==================
+
+def parse_json_tolerant(text: str, metrics: ParseMetrics | None = parse_metrics) -> tuple[object, list[str], int]:
+    """
+    Fast path, phir repair. Returns (data, fixes, cut_depth).
+    Repair ke baad bhi parse na ho to json.JSONDecodeError.
+    """
+    try:
+        data = loads(text)
+        if metrics:
+            metrics.record("parsed", "fast_path")
+        return data, [], 0
+    except json.JSONDecodeError:
+        pass
+
+    repaired, fixes, cut_depth = repair_json(text)
+    try:
+        data = loads(repaired)
+    except json.JSONDecodeError:
+        if metrics:
+            metrics.record("parsed", "unparseable", fixes=fixes)
+        raise
+    if metrics:
+        metrics.record("parsed", "repaired", fixes=fixes)
+    return data, fixes, cut_depth
+
+
+def load_stream_item(raw: str):
+    """
+    Streamed array item (ek day) ka parse: fast path, phir wahi repair jo poore
+    response pe chalta hai. Per-item counts alag fields me (responses count nahi badhta).
+    """
+    try:
+        return json.loads(raw, strict=False)
+    except json.JSONDecodeError:
+        pass
+    repaired, fixes, _ = repair_json(raw)
+    try:
+        item = loads(repaired)
+    except json.JSONDecodeError:
+        parse_metrics.record("stream_items_dropped")
+        raise
+    parse_metrics.record("stream_items_repaired")
+    return item
+
+
+def usable_days(text: str, data: dict, fixes: list, cut_depth: int, limit: int) -> list:
+    """
+    Schema-valid days ka prefix (max `limit`). Truncation cut kisi day ke andar
+    hua ho to woh adhoora day drop; pehle invalid day pe ruk jaate hain.
+    """
+    days = data["itinerary"][:limit]
+
+    if "truncated" in fixes and cut_depth > 2 and days:
+        stream = ArrayItemStreamParser("itinerary")
+        stream.feed(text)
+        if not stream.done:
+            days = days[:-1]
+
+    valid_days = []
+    for day in days:
+        if validate_day(day):
+            parse_metrics.record("invalid_days")
+            break
+        bad = sum(1 for act in day["activities"] if validate_activity(act))
+        if bad:
+            # normalize_day defaults se bhar deta hai; sirf count
+            parse_metrics.record("invalid_activities", n=bad)
+        valid_days.append(day)
+    return valid_days
+
+
+def coerce_top_level(data: dict) -> list[str]:
+    """
+    Optional top-level fields ko in-place theek karo (request fail nahi hoti):
+    number totalEstimatedCost -> "₹N", koi aur non-string hata do; object na
+    ho to transportation -> {}, galat legs hata do. Returns coerced field paths.
+    """
+    coerced = []
+    total = data.get("totalEstimatedCost")
+    if total is not None and not isinstance(total, str):
+        if isinstance(total, (int, float)) and not isinstance(total, bool):
+            data["totalEstimatedCost"] = f"₹{int(round(total))}"
+        else:
+            del data["totalEstimatedCost"]
+        coerced.append("$.totalEstimatedCost")
+
+    if "transportation" in data:
+        transportation = data["transportation"]
+        if not isinstance(transportation, dict):
+            data["transportation"] = {}
+            coerced.append("$.transportation")
+        elif validate_transportation(transportation):
+            for leg in ("toDestination", "fromDestination"):
+                if leg in transportation and not isinstance(transportation[leg], dict):
+                    del transportation[leg]
+                    coerced.append(f"$.transportation.{leg}")
+
+    if coerced:
+        parse_metrics.record("coerced_fields", n=len(coerced))
+        log.warning("coerced itinerary fields", extra={"fields": coerced})
+    return coerced
+
+
+def parse_itinerary(text: str, num_days: int, first_day: int = 1) -> tuple[dict, list, int | None]:
+    """
+    Model output -> (itinerary_data, usable raw days, next_day).
+    `first_day` = response ka pehla day (continuation ke liye > 1).
+    next_day = pehla missing / invalid day number (continue karna hai), ya None.
+    Top-level shape hi galat ho to json.JSONDecodeError (caller ka purana 500 path).
+    """
+    data, fixes, cut_depth = parse_json_tolerant(text)
+
+    errors = validate_itinerary(data)
+    if errors:
+        parse_metrics.record("schema_invalid")
+        raise json.JSONDecodeError(f"Itinerary schema: {errors[0]}", text[:200], 0)
+    coerce_top_level(data)
+
+    days = usable_days(text, data, fixes, cut_depth, num_days - first_day + 1)
+
+    next_day = first_day + len(days)
+    if next_day > num_days:
+        return data, days, None
+    parse_metrics.record("incomplete")
+    return data, days, next_day
@@ -0,0 +1,126 @@
+"""
+Incremental JSON helpers for streamed model output.
+
+`ArrayItemStreamParser` is fed raw text chunks as they arrive from the model
+and yields every object of a top-level array (e.g. "itinerary") as soon as
+its closing brace arrives, without waiting for the rest of the document.
+"""
+import json
+import logging
+
+log = logging.getLogger("tripmate.json_stream")
+
+
+def _load_item(raw: str):
+    # strict=False => strings ke andar raw newlines/tabs bhi chal jayenge
+    return json.loads(raw, strict=False)
+
+
+class ArrayItemStreamParser:
+    """
+    `loads` = per-item parser (default plain json; itinerary stream
+    itinerary_json.load_stream_item deta hai jo repair bhi karta hai).
+    `position` har closed item ka 1-based array index hai, parse fail hone
+    wale items bhi gine jaate hain (`dropped`), taaki baad ke items ka index na khiske.
+    """
+
+    def __init__(self, key: str, loads=None):
+        self.key = key
+        self.loads = loads or _load_item
+        self.position = 0
+        self.dropped = 0
+        self._chunks: list[str] = []
+        self._text = ""
+        self._pos = 0
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = -1
+        self._last_key = None
+
+        # depth at which items of the target array live (None = not inside it)
+        self._array_depth = None
+        self._item_start = -1
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """Full text received so far."""
+        if self._chunks:
+            self._text += "".join(self._chunks)
+            self._chunks = []
+        return self._text
+
+    def feed(self, chunk: str) -> list:
+        """
+        Chunk add karo; jitne array items is chunk me complete hue
+        unki list (parsed dicts) return hoti hai.
+        """
+        return [item for _, item in self.feed_indexed(chunk)]
+
+    def feed_indexed(self, chunk: str) -> list:
+        """
+        feed() jaisa, par (array position, item) pairs.
+        """
+        self._chunks.append(chunk)
+        text = self.text
+        items = []
+
+        pos = self._pos
+        end = len(text)
+        while pos < end:
+            ch = text[pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    # depth 1 pe string = top-level object ki key (ya value)
+                    if self._depth == 1:
+                        self._last_key = text[self._string_start + 1:pos]
+                pos += 1
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif ch in "{[":
+                if (
+                    ch == "["
+                    and self._depth == 1
+                    and self._array_depth is None
+                    and not self.done
+                    and self._last_key == self.key
+                ):
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and self._depth == self._array_depth:
+                    self._item_start = pos
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if ch == "}" and self._depth == self._array_depth and self._item_start >= 0:
+                        self.position += 1
+                        item = self._load(text[self._item_start:pos + 1])
+                        if item is not None:
+                            items.append((self.position, item))
+                        self._item_start = -1
+                    elif ch == "]" and self._depth == self._array_depth - 1:
+                        self._array_depth = None
+                        self.done = True
+            pos += 1
+
+        self._pos = pos
+        return items
+
+    def _load(self, raw: str):
+        try:
+            return self.loads(raw)
+        except json.JSONDecodeError as e:
+            self.dropped += 1
+            log.warning("skipping unparsable streamed item", extra={"error": str(e), "position": self.position})
+            return None
@@ -0,0 +1,85 @@
+"""
+LLM backend selection for both services (chat-completions endpoint + auth + model).
+
+Pehle dono modules Groq URL/model hardcode karke seedha call karte the, to
+bina network aur paid tokens ke kuch bhi benchmark nahi ho sakta tha. Ab
+LLM_BACKEND choose karta hai:
+
+    groq     (default) Groq cloud; GROQ_API_KEY, GROQ_API_URL / GROQ_MODEL overrides
+    openai   koi bhi OpenAI-compatible server (vLLM, llama.cpp, Ollama, OpenAI...):
+             LLM_BASE_URL (".../v1"), LLM_API_KEY (optional), LLM_MODEL
+    mock     local mock/replay server (bench/mock_llm_server.py), no key:
+             LLM_BASE_URL (default http://127.0.0.1:8090/v1)
+
+Sab OpenAI chat-completions format bolte hain (request body, SSE stream,
+`usage`), isliye call sites same rehti hain; sirf url / headers / model
+yahan se aate hain.
+
+Config (env):
+    LLM_BACKEND    groq | openai | mock (default groq)
+    LLM_BASE_URL   base URL ending in /v1 (openai / mock)
+    LLM_API_KEY    bearer token for the openai backend (optional)
+    LLM_MODEL      model name override (all backends)
+"""
+import os
+
+DEFAULT_MODEL = "llama-3.1-8b-instant"
+GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+MOCK_BASE_URL = "http://127.0.0.1:8090/v1"
+
+
+class LLMBackend:
+    def __init__(self, name: str, url: str, model: str, api_key: str | None = None,
+                 key_env: str | None = None):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        # env var jiske bina backend chal nahi sakta (None = key optional)
+        self.key_env = key_env
+
+    @property
+    def configured(self) -> bool:
+        return self.key_env is None or bool(self.api_key)
+
+    def missing_key_message(self) -> str:
+        return f"{self.key_env} is not set"
+
+    def headers(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def describe(self) -> dict:
+        return {"backend": self.name, "url": self.url, "model": self.model, "configured": self.configured}
+
+
+def chat_completions_url(base_url: str) -> str:
+    base_url = base_url.rstrip("/")
+    if base_url.endswith("/chat/completions"):
+        return base_url
+    return f"{base_url}/chat/completions"
+
+
+def backend_from_env(default_model: str = DEFAULT_MODEL) -> LLMBackend:
+    name = os.getenv("LLM_BACKEND", "groq").lower()
+    model = os.getenv("LLM_MODEL")
+
+    if name == "groq":
+        return LLMBackend(
+            "groq",
+            os.getenv("GROQ_API_URL", GROQ_URL),
+            model or os.getenv("GROQ_MODEL", default_model),
+            os.getenv("GROQ_API_KEY"),
+            key_env="GROQ_API_KEY",
+        )
+    if name == "openai":
+        base_url = os.getenv("LLM_BASE_URL")
+        if not base_url:
+            raise ValueError("LLM_BACKEND=openai needs LLM_BASE_URL (e.g. http://localhost:8000/v1)")
+        return LLMBackend("openai", chat_completions_url(base_url), model or default_model, os.getenv("LLM_API_KEY"))
+    if name == "mock":
+        base_url = os.getenv("LLM_BASE_URL", MOCK_BASE_URL)
+        return LLMBackend("mock", chat_completions_url(base_url), model or default_model)
+    raise ValueError(f"Unknown LLM_BACKEND {name!r} (expected groq, openai or mock)")
@@ -0,0 +1,469 @@
+"""
+Structured logging + Prometheus-style metrics for both services.
+
+Pehle har request pe poora payload, raw Groq response aur final itinerary
+`json.dumps(indent=2)` karke print hota tha -- request thread pe CPU +
+blocking stdout. Ab:
+
+- logging: JSON lines (ya LOG_FORMAT=text), levels, DEBUG records sirf
+  LOG_SAMPLE_RATE fraction me. Handler ek bounded queue hai; formatting /
+  serialization (extra fields ka json.dumps bhi) listener thread me hota hai,
+  aur sirf un records ka jo level + sampling filter paar karein. Queue full ho
+  to record drop (request kabhi log pe block nahi hota), count metrics me.
+- spans: `with span("upstream_wait"):` stage ka time histogram me + current
+  request ke trace me (contextvar, threads aur asyncio tasks dono), jo access
+  log line me "stages" ke roop me aata hai
+- metrics: chhota in-process registry (counters + histograms), GET /metrics
+  Prometheus text format me. LLM token usage Groq ke `usage` field se.
+
+Config (env):
+    LOG_LEVEL         default INFO
+    LOG_FORMAT        json (default) | text
+    LOG_SAMPLE_RATE   fraction of DEBUG records kept (default 0.01, 0 = none)
+    LOG_QUEUE_SIZE    pending records before new ones are dropped (default 10000)
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# setup_logging() set karta hai; metrics ka "service" label
+SERVICE = "tripmate"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+# ================== METRICS ==================
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _labels(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{label}="{_label_value(value)}"' for label, value in zip(self.labels, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in items]
+
+
+class Histogram(Counter):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                labels = self._labels(key, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {running}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Counter] = []
+
+    def counter(self, name: str, help_text: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Request latency until the response (or first byte of a stream) is ready.",
+    ("service", "route", "method", "status"),
+)
+stage_seconds = registry.histogram(
+    "stage_duration_seconds",
+    "Time spent per request stage (parse_input, date_math, prompt_build, upstream_wait, json_parse, normalize, serialize, ...).",
+    ("service", "stage"),
+)
+llm_requests = registry.counter(
+    "llm_requests_total", "Upstream LLM completions that reported usage.", ("service", "model")
+)
+llm_tokens = registry.counter(
+    "llm_tokens_total", "LLM tokens from the upstream `usage` field.", ("service", "model", "kind")
+)
+llm_upstream_seconds = registry.counter(
+    "llm_upstream_seconds_total",
+    "Upstream-reported time per phase (queue, prompt, completion) from `usage`.",
+    ("service", "model", "phase"),
+)
+llm_ttft_seconds = registry.histogram(
+    "llm_time_to_first_token_seconds",
+    "Streamed completions: time from sending the upstream request to the first content token.",
+    ("service", "model"),
+)
+llm_stream_tokens_per_second = registry.histogram(
+    "llm_stream_tokens_per_second",
+    "Streamed completions: completion tokens / (last token - first token).",
+    ("service", "model"),
+    buckets=(5, 10, 25, 50, 100, 200, 400, 800, 1600, 3200),
+)
+llm_streams_cancelled = registry.counter(
+    "llm_streams_cancelled_total", "Streamed completions cut short because the client disconnected.", ("service", "model")
+)
+logs_dropped = registry.counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full.", ("service",)
+)
+
+
+def record_llm_usage(data, model: str) -> None:
+    """
+    Groq response (ya stream ka last chunk, `x_groq.usage`) se token counters.
+    """
+    if not isinstance(data, dict):
+        return
+    usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+    if not usage:
+        return
+    llm_requests.inc(service=SERVICE, model=model)
+    for kind in ("prompt", "completion"):
+        tokens = usage.get(f"{kind}_tokens")
+        if tokens:
+            llm_tokens.inc(tokens, service=SERVICE, model=model, kind=kind)
+    for phase in ("queue", "prompt", "completion"):
+        seconds = usage.get(f"{phase}_time")
+        if seconds:
+            llm_upstream_seconds.inc(seconds, service=SERVICE, model=model, phase=phase)
+
+
+class StreamStats:
+    """
+    Ek streamed completion ka time-to-first-token aur tokens/sec.
+    token() har content delta pe, usage() har chunk pe (last chunk me usage).
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token = None
+        self.last_token = None
+        self.deltas = 0
+        self.completion_tokens = None
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.first_token is None:
+            self.first_token = now
+            llm_ttft_seconds.observe(now - self.started, service=SERVICE, model=self.model)
+        self.last_token = now
+        self.deltas += 1
+
+    def usage(self, data) -> None:
+        if not isinstance(data, dict):
+            return
+        usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+        if usage and usage.get("completion_tokens"):
+            self.completion_tokens = usage["completion_tokens"]
+
+    def cancelled(self) -> None:
+        llm_streams_cancelled.inc(service=SERVICE, model=self.model)
+
+    def finish(self) -> dict:
+        """
+        Report for the client / access log; usage na aaye to deltas ko tokens maan lo.
+        """
+        tokens = self.completion_tokens or self.deltas
+        report = {
+            "ttftMs": round(1000 * (self.first_token - self.started), 1) if self.first_token else None,
+            "totalMs": round(1000 * (time.perf_counter() - self.started), 1),
+            "tokens": tokens,
+            "tokensPerSecond": None,
+        }
+        if self.first_token is not None and self.last_token > self.first_token:
+            rate = tokens / (self.last_token - self.first_token)
+            report["tokensPerSecond"] = round(rate, 1)
+            llm_stream_tokens_per_second.observe(rate, service=SERVICE, model=self.model)
+        return report
+
+
+# ================== SPANS ==================
+
+_trace: ContextVar[dict | None] = ContextVar("trace", default=None)
+_started: ContextVar[float] = ContextVar("request_started", default=0.0)
+
+
+def start_trace() -> None:
+    _started.set(time.perf_counter())
+    _trace.set({})
+
+
+def trace_stages() -> dict:
+    """
+    Current request ke stages, ms me.
+    """
+    return {stage: round(1000 * seconds, 2) for stage, seconds in (_trace.get() or {}).items()}
+
+
+@contextmanager
+def span(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, service=SERVICE, stage=stage)
+        stages = _trace.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+# ================== LOGGING ==================
+
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    `extra={...}` fields record ke saath aate hain; yahan (listener thread me) serialize.
+    """
+
+    def __init__(self, json_lines: bool = True):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = {key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRS}
+        message = record.getMessage()
+        if self.json_lines:
+            event = {
+                "ts": round(record.created, 3),
+                "level": record.levelname,
+                "logger": record.name,
+                "msg": message,
+                **fields,
+            }
+            if record.exc_info:
+                event["exc"] = self.formatException(record.exc_info)
+            return json.dumps(event, ensure_ascii=False, default=str)
+
+        text = f"{self.formatTime(record)} {record.levelname} {record.name} {message}"
+        if fields:
+            text += " " + " ".join(
+                f"{key}={json.dumps(value, ensure_ascii=False, default=str)}" for key, value in fields.items()
+            )
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+class SamplingFilter(logging.Filter):
+    """
+    `level` aur upar sab; neeche (DEBUG payload dumps) sirf `rate` fraction.
+    """
+
+    def __init__(self, level: int, rate: float):
+        super().__init__()
+        self.level = level
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= self.level or random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Record jaisa hai waise queue me (stdlib QueueHandler caller thread me hi
+    format kar deta hai); full queue => drop, block nahi.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            logs_dropped.inc(service=SERVICE)
+
+
+_listener: QueueListener | None = None
+_handler: DeferredQueueHandler | None = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"tripmate.{name}")
+
+
+def setup_logging(service: str) -> logging.Logger:
+    """
+    Process me ek baar: root pe queue handler + stdout listener thread.
+    Returns `tripmate.<service>` logger.
+    """
+    global SERVICE, _listener, _handler
+    SERVICE = service
+    if _listener is None:
+        level = getattr(logging, LOG_LEVEL, logging.INFO)
+        records = queue.Queue(LOG_QUEUE_SIZE)
+        _handler = DeferredQueueHandler(records)
+        _handler.addFilter(SamplingFilter(level, LOG_SAMPLE_RATE))
+
+        out = logging.StreamHandler(sys.stdout)
+        out.setFormatter(StructuredFormatter(json_lines=LOG_FORMAT != "text"))
+        _listener = QueueListener(records, out)
+        _listener.start()
+        atexit.register(_stop_listener)
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(level)
+        # sirf apne loggers DEBUG tak (sampled); libraries LOG_LEVEL pe hi
+        logging.getLogger("tripmate").setLevel(min(level, logging.DEBUG) if LOG_SAMPLE_RATE > 0 else level)
+    return get_logger(service)
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork() -> None:
+    """
+    Pre-fork server (serve.py preload): listener thread fork me nahi aata, to
+    child me nayi queue + naya listener, warna worker ke logs queue me hi pade rehte.
+    """
+    global _listener
+    if _listener is None:
+        return
+    records = queue.Queue(LOG_QUEUE_SIZE)
+    _handler.queue = records
+    _listener = QueueListener(records, *_listener.handlers)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+# ================== APP HOOKS ==================
+
+METRICS_MIMETYPE = "text/plain; version=0.0.4"
+
+
+def _finish_request(request, response, access_log: logging.Logger):
+    elapsed = time.perf_counter() - _started.get()
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    http_seconds.observe(
+        elapsed, service=SERVICE, route=route, method=request.method, status=response.status_code
+    )
+    if route != "/metrics":
+        access_log.info("request", extra={
+            "method": request.method,
+            "route": route,
+            "status": response.status_code,
+            "duration_ms": round(1000 * elapsed, 2),
+            "stages": trace_stages(),
+        })
+    return response
+
+
+def instrument_app(app, request, is_async: bool = False) -> None:
+    """
+    Flask (ya Quart, is_async=True) app pe per-request trace + latency
+    histogram + access log, aur GET /metrics. `request` = framework ka proxy.
+    """
+    access_log = get_logger("access")
+
+    if is_async:
+        @app.before_request
+        async def begin_trace():
+            start_trace()
+
+        @app.after_request
+        async def end_trace(response):
+            return _finish_request(request, response, access_log)
+
+        @app.route("/metrics", methods=["GET"])
+        async def metrics():
+            return app.response_class(registry.render(), mimetype=METRICS_MIMETYPE)
+        return
+
+    @app.before_request
+    def begin_trace():
+        start_trace()
+
+    @app.after_request
+    def end_trace(response):
+        return _finish_request(request, response, access_log)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return app.response_class(registry.render(), mimetype=METRICS_MIMETYPE)
@@ -0,0 +1,84 @@
+"""
+Versioned, precompiled prompt templates (backend/prompts/*.txt).
+
+Pehle har request pe bada f-string user prompt aur system prompt dobara bante
+the, aur trip-specific text prompt ke shuru me tha -- isliye upstream
+prompt/prefix caching (OpenAI-compatible servers) kabhi lag hi nahi paati thi.
+
+- templates process start pe ek baar load + compile hote hain: literal pieces
+  aur `{slot}` names alag; render sirf slots bharta hai ("".join)
+- har template ka version = name@sha256(text)[:10]; cache keys isse bante hain,
+  to template edit karte hi purane cached itineraries apne aap miss ho jaate
+  hain (manual PROMPT_VERSION bump nahi)
+- templates static instructions pehle aur variable trip details end me rakhte
+  hain; `static_prefix` (pehle slot tak ka text) har request pe byte-identical
+  rehta hai. bench/prompt_template_bench.py isko check karta hai.
+
+Syntax: str.format jaisa -- `{name}` slot, literal braces ke liye `{{` / `}}`.
+Format specs / attribute access support nahi (compile pe ValueError).
+
+Config (env):
+    PROMPT_TEMPLATES_DIR   template directory (default backend/prompts)
+"""
+import hashlib
+import os
+from string import Formatter
+
+TEMPLATES_DIR = os.getenv(
+    "PROMPT_TEMPLATES_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+)
+
+
+class PromptTemplate:
+    __slots__ = ("name", "text", "version", "slots", "static_prefix", "_pieces")
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.text = text
+        self.version = f"{name}@{hashlib.sha256(text.encode('utf-8')).hexdigest()[:10]}"
+
+        pieces: list[tuple[str, str | None]] = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (not field.isidentifier() or spec or conversion):
+                raise ValueError(f"{name}: unsupported slot {{{field}}}")
+            pieces.append((literal, field))
+        self._pieces = tuple(pieces)
+        self.slots = tuple(dict.fromkeys(field for _, field in pieces if field))
+        # pehle slot se pehle ka text: har render me same bytes
+        self.static_prefix = pieces[0][0] if pieces else ""
+
+    def render(self, **values) -> str:
+        """
+        Slots bharo; missing slot => KeyError. Values str() hote hain.
+        """
+        parts = []
+        for literal, field in self._pieces:
+            parts.append(literal)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
+
+
+def load_templates(directory: str = TEMPLATES_DIR) -> dict[str, PromptTemplate]:
+    templates = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".txt"):
+            with open(os.path.join(directory, filename), encoding="utf-8") as f:
+                name = filename[:-4]
+                templates[name] = PromptTemplate(name, f.read())
+    return templates
+
+
+TEMPLATES = load_templates()
+
+
+def get(name: str) -> PromptTemplate:
+    return TEMPLATES[name]
+
+
+def version_of(*names: str) -> str:
+    """
+    Kai templates ka combined version (cache key me jata hai).
+    """
+    joined = "+".join(TEMPLATES[name].version for name in names)
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,354 @@
+"""
+Compact, compressed, cache-friendly JSON responses for the itinerary endpoints.
+
+Pehle har view pe poora `{"success", "itinerary": wrapped}` jsonify (stdlib
+json, ensure_ascii => har "₹" 6 bytes) se jata tha: na compression, na
+validator, to Next.js / mobile har baar sau-sau KB dobara download karte the.
+Ab:
+
+- serialize: orjson agar installed ho (`pip install orjson`), warna compact
+  stdlib json; UTF-8 as-is. Cache hit pe stored JSON text seedha envelope me
+  (loads + dumps dono nahi)
+- Accept-Encoding negotiation (q-values): br (`pip install brotli`) > gzip;
+  chhote bodies (RESPONSE_COMPRESS_MIN_BYTES se kam) plain. Compressed bytes ek
+  chhote LRU me (ETag + coding key) -- same itinerary ke repeat views dobara
+  compress nahi hote
+- strong ETag = content hash (coding ke hisaab se alag suffix, RFC 9110);
+  If-None-Match match => 304 bina body. POST pe bhi: client jo ETag pehle se
+  rakhta hai woh bhejta hai, itinerary same ho to sirf headers wapas
+- `?format=compact` (ya body me "format": "compact"): activities field
+  dictionary encoding -- har activity ek array (`fields` order), aur jo fields
+  bahut repeat hote hain (type, time, duration, ...) unki value `dict[field]`
+  me index. `expand_itinerary` wapas normal shape deta hai
+
+Stats: GET /response-stats (bytes raw vs sent, 304s, encodings, timings).
+
+Config (env):
+    RESPONSE_COMPRESS                0 = never compress (default 1)
+    RESPONSE_COMPRESS_MIN_BYTES      bodies smaller than this go uncompressed (default 1024)
+    RESPONSE_GZIP_LEVEL              gzip level 1-9 (default 6)
+    RESPONSE_BROTLI_QUALITY          brotli quality 0-11 (default 5)
+    RESPONSE_COMPRESS_CACHE_BYTES    compressed bodies kept for repeat views (default 8 MB, 0 = off)
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESS = os.getenv("RESPONSE_COMPRESS", "1") != "0"
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+COMPRESS_CACHE_BYTES = int(os.getenv("RESPONSE_COMPRESS_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+# server preference jab client ke q-values barabar hon
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPACT_ENCODING = "fielddict-1"
+COMPACT_FIELDS = ("time", "type", "title", "location", "description", "estimatedCost", "duration")
+CACHE_CONTROL = "private, no-cache"
+
+
+def dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def envelope(raw_itinerary: str | bytes, **fields) -> bytes:
+    """
+    Cache ka stored itinerary JSON -> `{"success": true, ..., "itinerary": <raw>}`
+    bytes, bina parse kiye.
+    """
+    if isinstance(raw_itinerary, str):
+        raw_itinerary = raw_itinerary.encode("utf-8")
+    head = dumps({"success": True, **fields})
+    return head[:-1] + b',"itinerary":' + raw_itinerary + b"}"
+
+
+# ================== FIELD DICTIONARY ==================
+
+def wants_compact(args, data: dict | None = None) -> bool:
+    if args.get("format") == "compact":
+        return True
+    return isinstance(data, dict) and data.get("format") == "compact"
+
+
+def compact_itinerary(wrapped: dict) -> dict:
+    """
+    wrapped -> field-dictionary form. Field tabhi dictionary me jata hai jab
+    uske unique values kul values ke aadhe ya kam hon (warna index + dict mehenga).
+    """
+    days = wrapped.get("itinerary") or []
+    columns = {field: [] for field in COMPACT_FIELDS}
+    for day in days:
+        for act in day.get("activities") or []:
+            for field in COMPACT_FIELDS:
+                columns[field].append(act.get(field, ""))
+
+    dictionary, positions = {}, {}
+    for field, values in columns.items():
+        try:
+            unique = list(dict.fromkeys(values))
+        except TypeError:  # model ne list / object bhej diya: raw hi rehne do
+            continue
+        if values and len(unique) * 2 <= len(values):
+            dictionary[field] = unique
+            positions[field] = {value: i for i, value in enumerate(unique)}
+
+    def row(act: dict) -> list:
+        return [
+            positions[field][act.get(field, "")] if field in positions else act.get(field, "")
+            for field in COMPACT_FIELDS
+        ]
+
+    compact_days = [
+        {**{k: v for k, v in day.items() if k != "activities"},
+         "activities": [row(act) for act in day.get("activities") or []]}
+        for day in days
+    ]
+    return {
+        **{k: v for k, v in wrapped.items() if k != "itinerary"},
+        "encoding": COMPACT_ENCODING,
+        "fields": list(COMPACT_FIELDS),
+        "dict": dictionary,
+        "itinerary": compact_days,
+    }
+
+
+def expand_itinerary(compact: dict) -> dict:
+    """
+    compact_itinerary ka ulta (clients / bench ke liye reference decoder).
+    """
+    fields = compact["fields"]
+    dictionary = compact.get("dict") or {}
+
+    def activity(row: list) -> dict:
+        return {
+            field: dictionary[field][value] if field in dictionary else value
+            for field, value in zip(fields, row)
+        }
+
+    days = [
+        {**{k: v for k, v in day.items() if k != "activities"},
+         "activities": [activity(row) for row in day.get("activities") or []]}
+        for day in compact.get("itinerary") or []
+    ]
+    rest = {k: v for k, v in compact.items() if k not in ("encoding", "fields", "dict", "itinerary")}
+    return {"itinerary": days, **rest}
+
+
+# ================== NEGOTIATION ==================
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    """
+    "gzip, br;q=0.9, *;q=0" -> {"gzip": 1.0, "br": 0.9, "*": 0.0}
+    """
+    weights = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def choose_encoding(header: str, size: int) -> str | None:
+    if not COMPRESS or size < COMPRESS_MIN_BYTES:
+        return None
+    weights = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def content_tag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def etag_for(tag: str, coding: str | None) -> str:
+    return f'"{tag}-{coding}"' if coding else f'"{tag}"'
+
+
+def etag_matches(if_none_match: str, tag: str) -> bool:
+    """
+    If-None-Match weak comparison: W/ prefix aur coding suffix ignore (proxy ne
+    recompress kiya ho to bhi content same hai).
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        for coding in CODINGS:
+            if candidate.endswith(f"-{coding}"):
+                candidate = candidate[: -len(coding) - 1]
+                break
+        if candidate == tag:
+            return True
+    return False
+
+
+def _compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressedCache:
+    """
+    (content tag, coding) -> compressed bytes, total size bounded, LRU.
+    """
+
+    def __init__(self, max_bytes: int = COMPRESS_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: tuple, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= len(dropped)
+
+
+compressed_cache = CompressedCache()
+
+
+# ================== METRICS ==================
+
+class ResponseMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.responses = 0
+        self.not_modified = 0
+        self.compact = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.encodings = Counter()
+        self.compress_cache_hits = 0
+        self.serialize_ms = 0.0
+        self.compress_ms = 0.0
+
+    def record(self, raw: int, sent: int, coding: str | None, compact: bool, not_modified: bool,
+               serialize_ms: float, compress_ms: float, cache_hit: bool) -> None:
+        with self._lock:
+            self.responses += 1
+            self.not_modified += not_modified
+            self.compact += compact
+            self.raw_bytes += raw
+            self.sent_bytes += sent
+            self.encodings[coding or "identity"] += 1
+            self.compress_cache_hits += cache_hit
+            self.serialize_ms += serialize_ms
+            self.compress_ms += compress_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "jsonBackend": JSON_BACKEND,
+                "codings": list(CODINGS),
+                "responses": self.responses,
+                "notModified": self.not_modified,
+                "compact": self.compact,
+                "rawBytes": self.raw_bytes,
+                "sentBytes": self.sent_bytes,
+                "savedRatio": round(1 - self.sent_bytes / self.raw_bytes, 4) if self.raw_bytes else 0.0,
+                "encodings": dict(self.encodings),
+                "compressCacheHits": self.compress_cache_hits,
+                "serializeMs": round(self.serialize_ms, 2),
+                "compressMs": round(self.compress_ms, 2),
+            }
+
+
+metrics = ResponseMetrics()
+
+
+# ================== ENCODE ==================
+
+def encode(payload, status: int = 200, accept_encoding: str = "", if_none_match: str = "",
+           compact: bool = False, headers: dict | None = None) -> tuple[bytes, int, dict]:
+    """
+    payload (dict, ya envelope() ke pre-serialized bytes) -> (body, status, headers).
+    Sirf 200 pe ETag / 304; error bodies bas serialize (+ compress) hote hain.
+    """
+    started = time.perf_counter()
+    if compact and isinstance(payload, dict) and isinstance(payload.get("itinerary"), dict):
+        payload = {**payload, "itinerary": compact_itinerary(payload["itinerary"])}
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    serialize_ms = (time.perf_counter() - started) * 1000
+
+    out = {"Content-Type": "application/json", "Vary": "Accept-Encoding", **(headers or {})}
+    coding = choose_encoding(accept_encoding, len(body))
+    if status == 200:
+        tag = content_tag(body)
+        out["ETag"] = etag_for(tag, coding)
+        out["Cache-Control"] = CACHE_CONTROL
+        if etag_matches(if_none_match, tag):
+            out.pop("Content-Type")
+            metrics.record(len(body), 0, coding, compact, True, serialize_ms, 0.0, False)
+            return b"", 304, out
+    else:
+        tag = None
+
+    compress_ms, cache_hit, raw_size = 0.0, False, len(body)
+    if coding:
+        started = time.perf_counter()
+        cached = compressed_cache.get((tag, coding)) if tag else None
+        if cached is not None:
+            body, cache_hit = cached, True
+        else:
+            body = _compress(body, coding)
+            if tag:
+                compressed_cache.set((tag, coding), body)
+        compress_ms = (time.perf_counter() - started) * 1000
+        out["Content-Encoding"] = coding
+    metrics.record(raw_size, len(body), coding, compact, False, serialize_ms, compress_ms, cache_hit)
+    return body, status, out
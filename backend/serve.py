@@ -0,0 +1,158 @@
+"""
+Production entry point for both services (dev server `python iternary_ai.py`
+single-process, debug reloader, koi graceful shutdown nahi - woh sirf local ke liye).
+
+    cd backend
+    python serve.py itinerary                         # gunicorn, gthread workers
+    python serve.py chat --workers 4 --threads 32
+    python serve.py itinerary --asgi                  # hypercorn + iternary_asgi
+    python itinerary_jobs.py worker                   # async job worker pool (alag process)
+
+Sync mode (gunicorn, Linux/macOS only):
+    preload    app master me ek baar import hota hai (templates, LLM config, disk
+               cache ki nayi entries, destination index build + mmap), phir
+               fork - workers yeh memory copy-on-write
+               share karte hain. gc.freeze() taaki GC preloaded objects ko touch
+               karke pages copy na karwaye.
+    warm-up    har worker traffic lene se pehle upstream connections kholta hai;
+               tab tak /readyz 503.
+    drain      SIGTERM: worker /readyz 503 karta hai, naye connections lena band,
+               aur in-flight requests (LLM calls bhi) SERVE_GRACEFUL_TIMEOUT tak
+               poori hoti hain. Default LLM timeout (itinerary 120s, chat 60s) se thoda upar.
+
+ASGI mode (hypercorn): har worker fresh process (spawn) hai, preload/CoW nahi;
+warm-up app ke before_serving me hota hai, graceful_timeout same env se.
+
+Config (env, CLI flags override):
+    SERVE_WORKERS           worker processes (default 2 * CPUs + 1)
+    SERVE_THREADS           threads per gthread worker (default 16; LLM calls I/O-bound hain)
+    SERVE_BIND              host:port (default per service: 127.0.0.1:5001 / :5000)
+    SERVE_GRACEFUL_TIMEOUT  drain budget, seconds (default per service: 130 / 70)
+    SERVE_TIMEOUT           stuck-worker kill timeout, seconds (default 180)
+    SERVE_BACKLOG           listen backlog (default 2048)
+    SERVE_WARM_CACHE        itinerary disk-cache entries to preload (default 256)
+    SERVE_WARM_CONNECTIONS / SERVE_WARM_TIMEOUT   see serving.py
+"""
+import argparse
+import gc
+import os
+import signal
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+APPS = {
+    "itinerary": {"module": "iternary_ai", "asgi": "iternary_asgi", "dir": BACKEND_DIR,
+                  "bind": "127.0.0.1:5001", "graceful": 130},
+    "chat": {"module": "model", "asgi": "model_asgi", "dir": os.path.join(BACKEND_DIR, "Ai_chat"),
+             "bind": "127.0.0.1:5000", "graceful": 70},
+}
+
+
+def default_workers() -> int:
+    return 2 * (os.cpu_count() or 1) + 1
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=sorted(APPS))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVE_WORKERS", "0")) or default_workers())
+    parser.add_argument("--threads", type=int, default=int(os.getenv("SERVE_THREADS", "16")))
+    parser.add_argument("--bind", default=os.getenv("SERVE_BIND"))
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "0")))
+    parser.add_argument("--timeout", type=int, default=int(os.getenv("SERVE_TIMEOUT", "180")))
+    parser.add_argument("--backlog", type=int, default=int(os.getenv("SERVE_BACKLOG", "2048")))
+    parser.add_argument("--asgi", action="store_true", help="hypercorn + the *_asgi app instead of gunicorn")
+    args = parser.parse_args(argv)
+    spec = APPS[args.service]
+    args.bind = args.bind or spec["bind"]
+    args.graceful_timeout = args.graceful_timeout or spec["graceful"]
+    return args, spec
+
+
+# ================== SYNC (gunicorn) ==================
+
+def gunicorn_application(args, spec):
+    from gunicorn.app.base import BaseApplication
+
+    class PreloadedApplication(BaseApplication):
+        def __init__(self):
+            self.module = None
+            super().__init__()
+
+        def load_config(self):
+            settings = {
+                "bind": [args.bind],
+                "workers": args.workers,
+                "threads": args.threads,
+                "worker_class": "gthread",
+                "preload_app": True,
+                "graceful_timeout": args.graceful_timeout,
+                "timeout": args.timeout,
+                "backlog": args.backlog,
+                "keepalive": 5,
+                "when_ready": when_ready,
+                "post_worker_init": post_worker_init,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # preload_app=True: master me ek hi baar, fork se pehle
+            if self.module is None:
+                self.module = __import__(spec["module"])
+                self.module.preload()
+            return self.module.app
+
+    def when_ready(server):
+        # preload ke objects permanent generation me: workers me GC unhe scan karke
+        # refcount/gc headers nahi likhega, pages parent ke saath shared rehte hain
+        gc.collect()
+        gc.freeze()
+        server.log.info("preloaded %s, frozen %d objects", spec["module"], gc.get_freeze_count())
+
+    def post_worker_init(worker):
+        import serving
+
+        module = sys.modules[spec["module"]]
+        module.warm_up()
+        serving.mark_ready()
+
+        # SIGTERM: pehle readiness 503, phir gunicorn ka normal graceful exit
+        # (listener band, in-flight requests graceful_timeout tak chalti hain)
+        def drain(sig, frame):
+            serving.begin_drain()
+            worker.handle_exit(sig, frame)
+
+        signal.signal(signal.SIGTERM, drain)
+
+    return PreloadedApplication()
+
+
+# ================== ASGI (hypercorn) ==================
+
+def run_hypercorn(args, spec):
+    from hypercorn.config import Config
+    from hypercorn.run import run
+
+    config = Config()
+    config.application_path = f"{spec['asgi']}:app"
+    config.bind = [args.bind]
+    config.workers = args.workers
+    config.graceful_timeout = args.graceful_timeout
+    config.backlog = args.backlog
+    return run(config)
+
+
+def main(argv=None):
+    args, spec = parse_args(argv)
+    # app modules relative imports / prompts ke liye apni directory se chalte hain
+    os.chdir(spec["dir"])
+    sys.path.insert(0, spec["dir"])
+    if args.asgi:
+        return run_hypercorn(args, spec)
+    gunicorn_application(args, spec).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Production serving helpers shared by both services (serve.py, Flask + ASGI apps).
+
+    /healthz   process zinda hai (liveness) - hamesha 200
+    /readyz    traffic le sakta hai (readiness) - 200 sirf jab warm-up ho chuka,
+               drain shuru nahi hua, aur app ke checks (LLM key etc.) pass
+    warm-up    upstream (LLM / trips API) ke keep-alive connections pehle se
+               khol do, taaki pehli user request TCP+TLS handshake na bhare
+    drain      SIGTERM pe readiness 503, naye connections band; in-flight LLM
+               calls graceful timeout tak poori hoti hain (serve.py)
+
+Dev server (`python iternary_ai.py`) bhi yahi routes expose karta hai, bas
+warm-up ke baad seedha ready mark kar deta hai.
+
+Config (env):
+    SERVE_WARM_CONNECTIONS  har upstream host ke liye kitne connections kholne (default 4, 0 = off)
+    SERVE_WARM_TIMEOUT      warm-up ka total budget, seconds (default 5)
+"""
+import asyncio
+import os
+import threading
+import time
+
+import observability
+
+WARM_CONNECTIONS = int(os.getenv("SERVE_WARM_CONNECTIONS", "4"))
+WARM_TIMEOUT = float(os.getenv("SERVE_WARM_TIMEOUT", "5"))
+
+log = observability.get_logger("serving")
+
+
+class Readiness:
+    """
+    Per-process state: warm hua? drain chal raha hai? (fork ke baad har worker ki apni copy)
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.warm = False
+        self.draining = False
+        self.warm_seconds = None
+
+    def mark_ready(self) -> None:
+        if not self.warm:
+            self.warm = True
+            self.warm_seconds = round(time.time() - self.started, 3)
+
+    def begin_drain(self) -> None:
+        self.draining = True
+
+    def snapshot(self, checks: dict) -> tuple[dict, bool]:
+        results = {}
+        for name, check in checks.items():
+            try:
+                results[name] = bool(check())
+            except Exception:
+                results[name] = False
+        ready = self.warm and not self.draining and all(results.values())
+        return {
+            "ready": ready,
+            "warm": self.warm,
+            "draining": self.draining,
+            "checks": results,
+            "pid": os.getpid(),
+            "warmSeconds": self.warm_seconds,
+        }, ready
+
+
+state = Readiness()
+
+
+def _reset_after_fork() -> None:
+    # worker ka uptime / warm-up fork se count ho, master ke preload se nahi
+    global state
+    state = Readiness()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def mark_ready() -> None:
+    state.mark_ready()
+    log.info("ready", extra={"warmSeconds": state.warm_seconds})
+
+
+def begin_drain() -> None:
+    if not state.draining:
+        state.begin_drain()
+        log.info("draining")
+
+
+def add_health_routes(app, checks: dict | None = None, is_async: bool = False) -> None:
+    """
+    GET /healthz + GET /readyz. `checks` = {name: callable -> bool}, sirf readiness pe.
+    """
+    checks = checks or {}
+
+    def healthz_body() -> dict:
+        return {"status": "ok", "pid": os.getpid(), "uptime": round(time.time() - state.started, 3)}
+
+    if is_async:
+        @app.route("/healthz", methods=["GET"])
+        async def healthz():
+            return healthz_body()
+
+        @app.route("/readyz", methods=["GET"])
+        async def readyz():
+            body, ready = state.snapshot(checks)
+            return body, 200 if ready else 503
+        return
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz():
+        return healthz_body()
+
+    @app.route("/readyz", methods=["GET"])
+    def readyz():
+        body, ready = state.snapshot(checks)
+        return body, 200 if ready else 503
+
+
+def models_url(chat_url: str) -> str:
+    # OpenAI-compatible servers pe cheap GET; 404 bhi chalega, connection to khul gaya
+    base = chat_url.rstrip("/")
+    if base.endswith("/chat/completions"):
+        base = base[: -len("/chat/completions")]
+    return base + "/models"
+
+
+def warm_connections(session, targets: list, n: int = WARM_CONNECTIONS) -> int:
+    """
+    targets = [(url, headers)]. Har target pe pehle ek probe, woh chale to n
+    concurrent GETs (probe ka connection inme reuse hota hai), taaki pool me n
+    keep-alive connections pade rahein.
+    Returns kitne requests complete hue. Failures sirf log hote hain - upstream
+    down ho to bhi worker start ho (aur ek hi baar retry/warn kare, n baar nahi).
+    """
+    if n <= 0 or not targets:
+        return 0
+    done = []
+    threads = []
+
+    def hit(url: str, headers: dict) -> bool:
+        try:
+            session.get(url, headers=headers, timeout=WARM_TIMEOUT).close()
+            done.append(url)
+            return True
+        except Exception as e:
+            log.warning("warm-up request failed", extra={"url": url, "error": str(e)})
+            return False
+
+    def fan_out(url: str, headers: dict):
+        if not hit(url, headers):
+            return
+        extra = [threading.Thread(target=hit, args=(url, headers), daemon=True) for _ in range(n)]
+        for t in extra:
+            t.start()
+        threads.extend(extra)
+
+    probes = [threading.Thread(target=fan_out, args=target, daemon=True) for target in targets]
+    for t in probes:
+        t.start()
+    deadline = time.monotonic() + WARM_TIMEOUT
+    for t in probes:
+        t.join(max(deadline - time.monotonic(), 0))
+    for t in list(threads):
+        t.join(max(deadline - time.monotonic(), 0))
+    return len(done)
+
+
+async def warm_connections_async(http, targets: list, n: int = WARM_CONNECTIONS) -> int:
+    """
+    aiohttp version of warm_connections (ASGI apps, before_serving me).
+    """
+    if n <= 0 or not targets:
+        return 0
+
+    async def hit(url: str, headers: dict) -> bool:
+        try:
+            async with http.get(url, headers=headers) as resp:
+                await resp.read()
+            return True
+        except Exception as e:
+            log.warning("warm-up request failed", extra={"url": url, "error": str(e)})
+            return False
+
+    async def fan_out(url: str, headers: dict) -> int:
+        if not await hit(url, headers):
+            return 0
+        return 1 + sum(await asyncio.gather(*(hit(url, headers) for _ in range(n))))
+
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*(fan_out(*t) for t in targets)), WARM_TIMEOUT)
+    except asyncio.TimeoutError:
+        return 0
+    return sum(results)
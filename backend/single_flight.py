@@ -0,0 +1,353 @@
+"""
+Single-flight request coalescing for identical in-flight upstream calls.
+
+Trending destinations pe same /generate-itinerary payload seconds ke andar
+baar baar aata hai; har request apna Groq call karti thi. Yahan:
+
+- same process: pehli request (leader) call karti hai, baaki same key wali
+  requests uska result wait karke wahi return karti hain
+- across worker processes (SINGLE_FLIGHT_DB set ho to): ek SQLite lease table.
+  Leader key ki lease leta hai aur result wahin publish karta hai; dusre
+  process ke followers lease expire / result aane tak poll karte hain.
+
+Results JSON-serializable hone chahiye (views `(body, status)` type tuples
+coalesce karti hain). Cross-process store me sirf `publishable(result)` wale
+results jaate hain (views: status 200), taaki ek upstream 429/5xx
+RESULT_TTL tak baaki workers ko cached error na bane; `reuse=False`
+(e.g. "refresh": true) pehle se published result nahi leta. Leader exception se fail ho (ya uski lease expire ho)
+to followers me se sirf ek naya leader banta hai (lease dobara leta hai) aur
+baaki usi ka wait karte hain -- sab ek saath upstream pe nahi girte.
+
+Config (env):
+    SINGLE_FLIGHT             0 => coalescing off (every request calls upstream)
+    SINGLE_FLIGHT_DB          SQLite lease file shared by workers (unset = in-process only)
+    SINGLE_FLIGHT_LEASE       seconds a leader's lease is valid (default 150, > Groq timeout)
+    SINGLE_FLIGHT_RESULT_TTL  seconds a published result stays readable for late followers (default 15)
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+ENABLED = os.getenv("SINGLE_FLIGHT", "1") == "1"
+LEASE_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE", "150"))
+RESULT_TTL = float(os.getenv("SINGLE_FLIGHT_RESULT_TTL", "15"))
+
+POLL_MIN = 0.05
+POLL_MAX = 0.5
+
+
+class LeaseStore:
+    """
+    Cross-process leases + published results in one SQLite table.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = LEASE_SECONDS, result_ttl: float = RESULT_TTL):
+        self.lease_seconds = lease_seconds
+        self.result_ttl = result_ttl
+        self._path = path
+        self._inherited = []
+        self._connect()
+        self._lock = threading.Lock()
+        after_fork = weakref.WeakMethod(self._reopen_after_fork)
+        os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def _connect(self) -> None:
+        self._db = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS single_flight ("
+            " key TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " lease_until REAL NOT NULL,"
+            " result TEXT,"
+            " result_until REAL NOT NULL DEFAULT 0)"
+        )
+
+    def _reopen_after_fork(self) -> None:
+        # pre-fork workers: har child apna connection (inherited wala close nahi, bas chhod do)
+        self._inherited.append(self._db)
+        self._lock = threading.Lock()
+        self._connect()
+
+    def acquire(self, key: str, owner: str, reuse: bool = True) -> tuple[str, object]:
+        """
+        Returns ("leader", None), ("held", None) ya ("done", result).
+        reuse=False: published result ignore (lease le lo), in-flight lease ka wait.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT lease_until, result, result_until FROM single_flight WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    lease_until, result, result_until = row
+                    if result is not None and result_until > now and reuse:
+                        self._db.execute("COMMIT")
+                        return "done", json.loads(result)
+                    if result is None and lease_until > now:
+                        self._db.execute("COMMIT")
+                        return "held", None
+                self._db.execute(
+                    "INSERT OR REPLACE INTO single_flight (key, owner, lease_until, result, result_until)"
+                    " VALUES (?, ?, ?, NULL, 0)",
+                    (key, owner, now + self.lease_seconds),
+                )
+                self._db.execute("COMMIT")
+                return "leader", None
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def poll(self, key: str) -> tuple[str, object]:
+        """
+        Returns ("done", result), ("held", None) ya ("gone", None) (leader gaya, result nahi).
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT lease_until, result, result_until FROM single_flight WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return "gone", None
+        lease_until, result, result_until = row
+        if result is not None and result_until > now:
+            return "done", json.loads(result)
+        if result is None and lease_until > now:
+            return "held", None
+        return "gone", None
+
+    def publish(self, key: str, owner: str, result) -> None:
+        now = time.time()
+        payload = json.dumps(result, separators=(",", ":"), ensure_ascii=False)
+        with self._lock:
+            self._db.execute(
+                "UPDATE single_flight SET result = ?, result_until = ?, lease_until = 0"
+                " WHERE key = ? AND owner = ?",
+                (payload, now + self.result_ttl, key, owner),
+            )
+            # purane rows saaf
+            self._db.execute(
+                "DELETE FROM single_flight WHERE lease_until < ? AND result_until < ?", (now, now)
+            )
+
+    def release(self, key: str, owner: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM single_flight WHERE key = ? AND owner = ?", (key, owner))
+
+
+class _Call:
+    __slots__ = ("event", "result")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self, name: str, store: LeaseStore | None = None, enabled: bool = ENABLED, publishable=None):
+        """
+        publishable(result) -> bool: kaunse results store me publish hon
+        (None = sab). Baaki pe lease release, remote followers me se ek retry karta hai.
+        """
+        self.name = name
+        self.store = store
+        self.enabled = enabled
+        self.publishable = publishable
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._calls: dict[str, _Call] = {}
+        self._async_calls: dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+        self.leader_calls = 0
+        self.coalesced = 0
+        self.remote_coalesced = 0
+        # follower jo failed / expired leader ki jagah leader bana
+        self.takeovers = 0
+
+    # ---------- threads (Flask) ----------
+
+    def do(self, key: str, fn, reuse: bool = True):
+        """
+        fn() sirf ek baar chalta hai per in-flight key; baaki callers wahi result paate hain.
+        reuse=False: cross-process store ka already-published result nahi lena.
+        """
+        if not self.enabled:
+            self._count("leader_calls")
+            return fn()
+
+        followed = False
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    if followed:
+                        self.takeovers += 1
+            if leader:
+                break
+            call.event.wait()
+            if call.result is not None:
+                self._count("coalesced")
+                return call.result
+            # leader fail hua: jo pehle lock le woh naya leader, baaki uska wait
+            followed = True
+
+        try:
+            call.result = self._lead(key, fn, reuse)
+            return call.result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _lead(self, key: str, fn, reuse: bool = True):
+        if self.store is None:
+            self._count("leader_calls")
+            return fn()
+
+        key = f"{self.name}:{key}"
+        delay = POLL_MIN
+        followed = False
+        while True:
+            state, result = self.store.acquire(key, self.owner, reuse)
+            if state == "done":
+                self._count("remote_coalesced")
+                return result
+            if state == "leader":
+                break
+            # dusre process ka leader chal raha hai: result aane tak poll
+            # ("held" lease_until tak hi rehta hai, to yeh loop bounded hai)
+            followed = True
+            while state == "held":
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_MAX)
+                state, result = self.store.poll(key)
+            if state == "done":
+                self._count("remote_coalesced")
+                return result
+            # "gone": leader fail / lease expire; acquire BEGIN IMMEDIATE me hai,
+            # to sirf ek process leader banta hai, baaki phir "held" pe poll
+
+        if followed:
+            self._count("takeovers")
+        self._count("leader_calls")
+        try:
+            result = fn()
+        except BaseException:
+            self.store.release(key, self.owner)
+            raise
+        if self.publishable is None or self.publishable(result):
+            self.store.publish(key, self.owner, result)
+        else:
+            self.store.release(key, self.owner)
+        return result
+
+    # ---------- asyncio (ASGI) ----------
+
+    async def do_async(self, key: str, fn, reuse: bool = True):
+        """
+        Same as do(), `fn` ek coroutine function hai; lease store calls thread me.
+        """
+        if not self.enabled:
+            self._count("leader_calls")
+            return await fn()
+
+        followed = False
+        while (future := self._async_calls.get(key)) is not None:
+            try:
+                result = await asyncio.shield(future)
+            except Exception:
+                result = None
+            if result is not None:
+                self._count("coalesced")
+                return result
+            # leader fail / cancel hua: pehla jaagne wala follower naya leader
+            followed = True
+
+        if followed:
+            self._count("takeovers")
+        future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await self._lead_async(key, fn, reuse)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("cancelled"))
+            future.exception()  # "exception never retrieved" warning na aaye
+            raise
+        finally:
+            self._async_calls.pop(key, None)
+
+    async def _lead_async(self, key: str, fn, reuse: bool = True):
+        if self.store is None:
+            self._count("leader_calls")
+            return await fn()
+
+        key = f"{self.name}:{key}"
+        delay = POLL_MIN
+        followed = False
+        while True:
+            state, result = await asyncio.to_thread(self.store.acquire, key, self.owner, reuse)
+            if state == "done":
+                self._count("remote_coalesced")
+                return result
+            if state == "leader":
+                break
+            followed = True
+            while state == "held":
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, POLL_MAX)
+                state, result = await asyncio.to_thread(self.store.poll, key)
+            if state == "done":
+                self._count("remote_coalesced")
+                return result
+
+        if followed:
+            self._count("takeovers")
+        self._count("leader_calls")
+        try:
+            result = await fn()
+        except BaseException:
+            await asyncio.to_thread(self.store.release, key, self.owner)
+            raise
+        if self.publishable is None or self.publishable(result):
+            await asyncio.to_thread(self.store.publish, key, self.owner, result)
+        else:
+            await asyncio.to_thread(self.store.release, key, self.owner)
+        return result
+
+    # ---------- metrics ----------
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            saved = self.coalesced + self.remote_coalesced
+            return {
+                "name": self.name,
+                "inFlight": len(self._calls) + len(self._async_calls),
+                "upstreamCalls": self.leader_calls,
+                "coalesced": self.coalesced,
+                "remoteCoalesced": self.remote_coalesced,
+                "takeovers": self.takeovers,
+                "savedUpstreamCalls": saved,
+                "coalesceRate": round(saved / (saved + self.leader_calls), 4) if saved + self.leader_calls else 0.0,
+                "enabled": self.enabled,
+                "crossProcess": self.store is not None,
+            }
+
+
+def flight_from_env(name: str, publishable=None) -> SingleFlight:
+    path = os.getenv("SINGLE_FLIGHT_DB")
+    return SingleFlight(name, LeaseStore(path) if path else None, publishable=publishable)
@@ -0,0 +1,522 @@
+"""
+Admission control for upstream LLM calls (shared by /chat and /generate-itinerary).
+
+Pehle dono services jitne requests aaye utne Groq calls ek saath bhej deti
+thi; load pe 429 ka storm aata tha aur har 429 lambe wait ke baad 500 /
+"API Error" ban jaata tha. Ab har upstream call pehle yahan slot leta hai:
+
+- token buckets: requests/minute (UPSTREAM_RPM) aur tokens/minute
+  (UPSTREAM_TPM). Call ka cost = prompt estimate (chars/4) + max_tokens;
+  response ka `usage` aane pe bacha hua hissa refund. Upstream 429 ka
+  Retry-After poore bucket ko utni der block karta hai.
+- AIMD concurrency: in-flight limit success pe +1/limit badhta hai; 429 pe
+  aadha, aur per-token latency apne baseline (recent p10) se
+  UPSTREAM_LATENCY_TOLERANCE guna ho jaye to x0.9 (har UPSTREAM_AIMD_COOLDOWN
+  me ek hi decrease, taaki ek burst limit ko zero na kar de). Baseline
+  (priority, output size bucket) ke hisaab se alag: 50-token edit / skeleton
+  call aur 4000-token itinerary ek hi class me hon to bhi lamba completion
+  congestion nahi lagta.
+- priority queue with deadlines: chat > itinerary > batch. Queue bhari ho ya
+  estimated wait deadline se zyada ho to turant `Overloaded` (views 503 +
+  Retry-After dete hain); deadline tak slot na mile to bhi `Overloaded`.
+- UPSTREAM_LIMITER_DB set ho to buckets ek SQLite file me: dono services aur
+  saare workers ek hi RPM/TPM budget share karte hain, aur capacity ka
+  UPSTREAM_RESERVE hissa sirf chat le sakta hai -- bulk itinerary generation
+  chat ko starve nahi karta. Concurrency (AIMD) per process rehti hai.
+
+Config (env):
+    UPSTREAM_LIMITER              0 => admission control off
+    UPSTREAM_RPM                  requests/minute budget of the API key (default 0 = unlimited)
+    UPSTREAM_TPM                  tokens/minute budget (default 0 = unlimited)
+    UPSTREAM_RESERVE              fraction of RPM/TPM only chat may use (default 0.2)
+    UPSTREAM_LIMITER_DB           SQLite file shared by services / workers (unset = per process)
+    UPSTREAM_CONCURRENCY          initial in-flight limit per process (default 8)
+    UPSTREAM_CONCURRENCY_MIN      AIMD floor (default 1)
+    UPSTREAM_CONCURRENCY_MAX      AIMD ceiling (default 64)
+    UPSTREAM_LATENCY_TOLERANCE    latency / baseline ratio treated as congestion (default 2.0)
+    UPSTREAM_AIMD_COOLDOWN        min seconds between two decreases (default 1)
+    UPSTREAM_QUEUE_MAX            waiting calls per process before failing fast (default 256)
+    UPSTREAM_DEADLINE_CHAT        max queue wait for chat calls, seconds (default 5)
+    UPSTREAM_DEADLINE_ITINERARY   ... itinerary calls (default 20)
+    UPSTREAM_DEADLINE_BATCH       ... batch precompute calls (default 60)
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+
+ENABLED = os.getenv("UPSTREAM_LIMITER", "1") == "1"
+RPM = float(os.getenv("UPSTREAM_RPM", "0"))
+TPM = float(os.getenv("UPSTREAM_TPM", "0"))
+RESERVE = min(max(float(os.getenv("UPSTREAM_RESERVE", "0.2")), 0.0), 0.9)
+CONCURRENCY = float(os.getenv("UPSTREAM_CONCURRENCY", "8"))
+CONCURRENCY_MIN = max(float(os.getenv("UPSTREAM_CONCURRENCY_MIN", "1")), 1.0)
+CONCURRENCY_MAX = float(os.getenv("UPSTREAM_CONCURRENCY_MAX", "64"))
+LATENCY_TOLERANCE = float(os.getenv("UPSTREAM_LATENCY_TOLERANCE", "2.0"))
+AIMD_COOLDOWN = float(os.getenv("UPSTREAM_AIMD_COOLDOWN", "1"))
+QUEUE_MAX = int(os.getenv("UPSTREAM_QUEUE_MAX", "256"))
+
+PRIORITIES = {"chat": 0, "itinerary": 1, "batch": 2}
+DEADLINES = {
+    name: float(os.getenv(f"UPSTREAM_DEADLINE_{name.upper()}", default))
+    for name, default in (("chat", "5"), ("itinerary", "20"), ("batch", "60"))
+}
+
+CHARS_PER_TOKEN = 4
+LATENCY_SAMPLES = 200
+ASYNC_POLL = 0.05
+
+_priority: ContextVar[str | None] = ContextVar("upstream_priority", default=None)
+
+
+class Overloaded(Exception):
+    """
+    Slot deadline ke andar nahi mil sakta; caller 503 + Retry-After de.
+    """
+
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"upstream overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = max(int(math.ceil(retry_after)), 1)
+
+
+def request_tokens(body: dict) -> int:
+    """
+    Upstream call ka TPM cost estimate: prompt (chars/4) + max_tokens.
+    """
+    chars = sum(len(str(m.get("content") or "")) for m in body.get("messages") or [])
+    return chars // CHARS_PER_TOKEN + int(body.get("max_tokens") or 0)
+
+
+@contextmanager
+def priority(name: str):
+    """
+    Is block ke upstream calls `name` priority pe (e.g. batch precompute).
+    """
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def bind_priority(fn):
+    """
+    Worker threads contextvars inherit nahi karte: current priority fn ke saath bandh do.
+    """
+    name = _priority.get()
+
+    def run(*args, **kwargs):
+        token = _priority.set(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _priority.reset(token)
+
+    return run
+
+
+# ================== TOKEN BUCKETS ==================
+
+class TokenBuckets:
+    """
+    RPM + TPM buckets, refill continuously. take() ya to cost le leta hai
+    (returns 0) ya batata hai kitne seconds baad mil sakta hai.
+    """
+
+    def __init__(self, rpm: float = RPM, tpm: float = TPM, reserve: float = RESERVE):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._state = {"requests": rpm, "tokens": tpm, "updated": time.time(), "blocked_until": 0.0}
+
+    @property
+    def active(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            yield self._state
+
+    def _refill(self, state: dict, now: float) -> None:
+        elapsed = max(now - state["updated"], 0.0)
+        state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+        state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+        state["updated"] = now
+
+    def take(self, tokens: int, rank: int, dry_run: bool = False) -> float:
+        # chat (rank 0) poora bucket use kar sakta hai, baaki reserve ke upar tak hi
+        floor = 0.0 if rank == 0 else self.reserve
+        with self._transaction() as state:
+            now = time.time()
+            self._refill(state, now)
+            wait = max(state["blocked_until"] - now, 0.0)
+            if self.rpm:
+                need = 1 + floor * self.rpm - state["requests"]
+                if need > 0:
+                    wait = max(wait, need * 60 / self.rpm)
+            if self.tpm:
+                # bucket se bada request kabhi fit nahi hoga: usable capacity tak clamp
+                tokens = min(tokens, self.tpm * (1 - floor))
+                need = tokens + floor * self.tpm - state["tokens"]
+                if need > 0:
+                    wait = max(wait, need * 60 / self.tpm)
+            if wait > 0 or dry_run:
+                return wait
+            state["requests"] -= 1 if self.rpm else 0
+            state["tokens"] -= tokens if self.tpm else 0
+            return 0.0
+
+    def refund(self, tokens: int) -> None:
+        if not self.tpm or tokens <= 0:
+            return
+        with self._transaction() as state:
+            state["tokens"] = min(self.tpm, state["tokens"] + tokens)
+
+    def block(self, seconds: float) -> None:
+        with self._transaction() as state:
+            state["blocked_until"] = max(state["blocked_until"], time.time() + seconds)
+
+    def snapshot(self) -> dict:
+        with self._transaction() as state:
+            self._refill(state, time.time())
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "reserve": self.reserve,
+                "requestsAvailable": round(state["requests"], 2),
+                "tokensAvailable": round(state["tokens"]),
+                "blockedFor": round(max(state["blocked_until"] - time.time(), 0.0), 2),
+            }
+
+
+class SharedTokenBuckets(TokenBuckets):
+    """
+    Same buckets, state ek SQLite row me (BEGIN IMMEDIATE = cross-process lock).
+    """
+
+    def __init__(self, path: str, name: str, rpm: float = RPM, tpm: float = TPM, reserve: float = RESERVE):
+        super().__init__(rpm, tpm, reserve)
+        self.name = name
+        self._path = path
+        self._inherited = []
+        self._connect(rpm, tpm)
+        after_fork = weakref.WeakMethod(self._reopen_after_fork)
+        os.register_at_fork(after_in_child=lambda: after_fork() and after_fork()())
+
+    def _connect(self, rpm: float, tpm: float) -> None:
+        self._db = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS upstream_buckets ("
+            " name TEXT PRIMARY KEY,"
+            " requests REAL NOT NULL,"
+            " tokens REAL NOT NULL,"
+            " updated REAL NOT NULL,"
+            " blocked_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._db.execute(
+            "INSERT OR IGNORE INTO upstream_buckets (name, requests, tokens, updated) VALUES (?, ?, ?, ?)",
+            (self.name, rpm, tpm, time.time()),
+        )
+
+    def _reopen_after_fork(self) -> None:
+        # pre-fork workers: child ko apna connection chahiye, inherited wala sirf reference me
+        self._inherited.append(self._db)
+        self._lock = threading.Lock()
+        self._connect(self.rpm, self.tpm)
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT requests, tokens, updated, blocked_until FROM upstream_buckets WHERE name = ?",
+                    (self.name,),
+                ).fetchone()
+                state = dict(zip(("requests", "tokens", "updated", "blocked_until"), row))
+                yield state
+                self._db.execute(
+                    "UPDATE upstream_buckets SET requests = ?, tokens = ?, updated = ?, blocked_until = ?"
+                    " WHERE name = ?",
+                    (state["requests"], state["tokens"], state["updated"], state["blocked_until"], self.name),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+
+# ================== ADMISSION ==================
+
+class Ticket:
+    """
+    Ek admitted upstream call. Caller observe() / record_usage() se result batata hai.
+    """
+    __slots__ = ("priority", "tokens", "output_tokens", "started", "status", "retry_after", "used_tokens", "failed")
+
+    def __init__(self, priority: str, tokens: int, output_tokens: int = 0):
+        self.priority = priority
+        self.tokens = tokens
+        # max_tokens; usage aane pe actual completion_tokens
+        self.output_tokens = output_tokens
+        self.started = time.monotonic()
+        self.status = None
+        self.retry_after = None
+        self.used_tokens = None
+        self.failed = False
+
+    def observe(self, status: int, retry_after: str | None = None) -> None:
+        self.status = status
+        self.retry_after = retry_after
+
+    def record_usage(self, data) -> None:
+        """
+        Response / last stream chunk ka `usage` (ya `x_groq.usage`) -> TPM refund.
+        """
+        if not isinstance(data, dict):
+            return
+        usage = data.get("usage") or (data.get("x_groq") or {}).get("usage")
+        if usage and usage.get("total_tokens"):
+            self.used_tokens = usage["total_tokens"]
+        if usage and usage.get("completion_tokens"):
+            self.output_tokens = usage["completion_tokens"]
+
+
+class UpstreamLimiter:
+    def __init__(self, name: str, buckets: TokenBuckets, default_priority: str = "itinerary",
+                 initial: float = CONCURRENCY, minimum: float = CONCURRENCY_MIN, maximum: float = CONCURRENCY_MAX,
+                 tolerance: float = LATENCY_TOLERANCE, queue_max: int = QUEUE_MAX,
+                 deadlines: dict | None = None, enabled: bool = ENABLED):
+        self.name = name
+        self.buckets = buckets
+        self.default_priority = default_priority
+        self.limit = min(max(initial, minimum), maximum)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.queue_max = queue_max
+        self.deadlines = deadlines or DEADLINES
+        self.enabled = enabled
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        # (priority, output size bucket) -> recent seconds-per-output-token
+        self._latency: dict[tuple, deque] = {}
+        self._avg_latency = 1.0
+        self._last_decrease = 0.0
+        self._counters = dict.fromkeys(
+            ("admitted", "rejected", "deadlineExpired", "throttled", "increases", "decreases"), 0
+        )
+
+    # ---------- queue ----------
+
+    def _priority_name(self) -> str:
+        name = _priority.get() or self.default_priority
+        return name if name in PRIORITIES else self.default_priority
+
+    def _enqueue(self, name: str, tokens: int) -> tuple[list, float]:
+        """
+        Fail fast: queue full, ya estimated wait (buckets / aage wale calls) deadline se zyada.
+        """
+        rank = PRIORITIES[name]
+        deadline = self.deadlines.get(name, 20.0)
+        with self._cond:
+            waiting = sum(1 for entry in self._waiters if entry[2])
+            if waiting >= self.queue_max:
+                self._counters["rejected"] += 1
+                raise Overloaded(self._avg_latency, "queue full")
+            ahead = sum(1 for entry in self._waiters if entry[2] and entry[0] <= rank)
+            queue_wait = max(ahead + self.in_flight + 1 - self.limit, 0) * self._avg_latency / self.limit
+            bucket_wait = self.buckets.take(tokens, rank, dry_run=True) if self.buckets.active else 0.0
+            estimate = max(queue_wait, bucket_wait)
+            if estimate > deadline:
+                self._counters["rejected"] += 1
+                raise Overloaded(estimate, "estimated wait over deadline")
+            entry = [rank, next(self._seq), True]
+            heapq.heappush(self._waiters, entry)
+        return entry, time.monotonic() + deadline
+
+    def _head(self) -> list | None:
+        while self._waiters and not self._waiters[0][2]:
+            heapq.heappop(self._waiters)
+        return self._waiters[0] if self._waiters else None
+
+    def _try_admit(self, entry: list, tokens: int) -> float | None:
+        """
+        Lock ke andar. None = admitted; warna kitni der baad dobara dekhna hai.
+        """
+        if self._head() is not entry or self.in_flight >= int(self.limit):
+            return 1.0
+        if self.buckets.active:
+            wait = self.buckets.take(tokens, entry[0])
+            if wait > 0:
+                return wait
+        heapq.heappop(self._waiters)
+        entry[2] = False
+        self.in_flight += 1
+        self._counters["admitted"] += 1
+        self._cond.notify_all()
+        return None
+
+    def _expire(self, entry: list, name: str) -> Overloaded:
+        entry[2] = False
+        self._counters["deadlineExpired"] += 1
+        self._cond.notify_all()
+        return Overloaded(self._avg_latency, f"{name} queue deadline")
+
+    def acquire(self, tokens: int) -> Ticket:
+        name = self._priority_name()
+        if not self.enabled:
+            return Ticket(name, tokens)
+        entry, deadline = self._enqueue(name, tokens)
+        with self._cond:
+            while True:
+                wait = self._try_admit(entry, tokens)
+                if wait is None:
+                    return Ticket(name, tokens)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._expire(entry, name)
+                self._cond.wait(min(wait, remaining))
+
+    async def acquire_async(self, tokens: int) -> Ticket:
+        """
+        Event loop block nahi hota: har ASYNC_POLL pe dobara try (sync waiters
+        release pe notify hote hain).
+        """
+        name = self._priority_name()
+        if not self.enabled:
+            return Ticket(name, tokens)
+        entry, deadline = self._enqueue(name, tokens)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_admit(entry, tokens)
+                    if wait is None:
+                        return Ticket(name, tokens)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._expire(entry, name)
+                await asyncio.sleep(min(wait, remaining, ASYNC_POLL))
+        except asyncio.CancelledError:
+            with self._cond:
+                if entry[2]:
+                    entry[2] = False
+                    self._cond.notify_all()
+            raise
+
+    # ---------- AIMD ----------
+
+    def _decrease(self, factor: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < AIMD_COOLDOWN:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit * factor)
+        self._counters["decreases"] += 1
+
+    def release(self, ticket: Ticket) -> None:
+        if not self.enabled:
+            return
+        latency = time.monotonic() - ticket.started
+        with self._cond:
+            self.in_flight -= 1
+            status = ticket.status
+            if status == 429:
+                self._counters["throttled"] += 1
+                self._decrease(0.5)
+                try:
+                    block = float(ticket.retry_after) if ticket.retry_after else 1.0
+                except ValueError:
+                    block = 1.0
+                if self.buckets.active:
+                    self.buckets.block(block)
+            elif ticket.failed or (status is not None and status >= 500):
+                # timeout / connection error / 5xx: upstream struggling
+                self._decrease(0.9)
+            elif status is not None and status < 400:
+                tokens = max(ticket.output_tokens, 1)
+                key = (ticket.priority, tokens.bit_length())
+                samples = self._latency.get(key)
+                if samples is None:
+                    samples = self._latency[key] = deque(maxlen=LATENCY_SAMPLES)
+                per_token = latency / tokens
+                baseline = sorted(samples)[len(samples) // 10] if len(samples) >= 20 else None
+                samples.append(per_token)
+                self._avg_latency = 0.9 * self._avg_latency + 0.1 * latency
+                if baseline and per_token > self.tolerance * baseline:
+                    self._decrease(0.9)
+                elif self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                    self._counters["increases"] += 1
+            self._cond.notify_all()
+        if ticket.used_tokens is not None and self.buckets.active:
+            self.buckets.refund(ticket.tokens - ticket.used_tokens)
+
+    @contextmanager
+    def slot(self, body: dict):
+        """
+        with limiter.slot(body) as ticket: call; ticket.observe(status, retry_after)
+        Overloaded raise karta hai agar deadline tak slot na mile.
+        """
+        ticket = self.acquire(request_tokens(body))
+        ticket.output_tokens = int(body.get("max_tokens") or 0)
+        try:
+            yield ticket
+        except Exception:
+            ticket.failed = True
+            raise
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def slot_async(self, body: dict):
+        ticket = await self.acquire_async(request_tokens(body))
+        ticket.output_tokens = int(body.get("max_tokens") or 0)
+        try:
+            yield ticket
+        except Exception:
+            ticket.failed = True
+            raise
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict:
+        with self._cond:
+            waiting = {}
+            for entry in self._waiters:
+                if entry[2]:
+                    name = next(n for n, rank in PRIORITIES.items() if rank == entry[0])
+                    waiting[name] = waiting.get(name, 0) + 1
+            snapshot = {
+                "enabled": self.enabled,
+                "limit": round(self.limit, 2),
+                "inFlight": self.in_flight,
+                "waiting": waiting,
+                "avgLatencyS": round(self._avg_latency, 3),
+                **self._counters,
+            }
+        snapshot["buckets"] = self.buckets.snapshot() if self.buckets.active else None
+        return snapshot
+
+
+def limiter_from_env(default_priority: str, bucket: str = "default") -> UpstreamLimiter:
+    """
+    bucket = budget ka naam (model); UPSTREAM_LIMITER_DB me isi naam ki row share hoti hai.
+    """
+    path = os.getenv("UPSTREAM_LIMITER_DB")
+    buckets = SharedTokenBuckets(path, bucket) if path and (RPM or TPM) else TokenBuckets()
+    return UpstreamLimiter(bucket, buckets, default_priority)
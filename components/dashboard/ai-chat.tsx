@@ -30,6 +30,10 @@ export function AIChat({ trip, activities  }: AIChatProps) {
   ])
   const [inputValue, setInputValue] = useState("")
   const [isLoading, setIsLoading] = useState(false)
+  // 👇 har chat window ka apna session, taaki backend history doosre users se mix na ho
+  const [sessionId] = useState(
+    () => trip?._id || `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  )
 
   const handleSendMessage = async () => {
     if (!inputValue.trim()) return
@@ -51,6 +55,7 @@ export function AIChat({ trip, activities  }: AIChatProps) {
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
           message: inputValue,
+          sessionId,
           // 👇 IMPORTANT: ab yaha se backend ko tripId jaa raha hai
           trip: trip,
           activities: activities,
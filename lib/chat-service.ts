@@ -0,0 +1,20 @@
+import { createHash } from 'crypto';
+
+const CHAT_SERVICE_URL = process.env.CHAT_SERVICE_URL || 'http://127.0.0.1:5000';
+// chat service ke admin routes (trip invalidate) isi token se khulte hain
+const CHAT_ADMIN_TOKEN = process.env.CHAT_ADMIN_TOKEN || '';
+
+// Strong content ETag for a trip document (chat service revalidates with If-None-Match)
+export function tripETag(trip: unknown): string {
+  return '"' + createHash('sha1').update(JSON.stringify(trip)).digest('hex') + '"';
+}
+
+// Trip change hone pe chat service ka cached trip context drop karo (fire-and-forget)
+export function invalidateChatTrip(tripId: string): void {
+  fetch(`${CHAT_SERVICE_URL}/trips/${encodeURIComponent(tripId)}/invalidate`, {
+    method: 'POST',
+    headers: CHAT_ADMIN_TOKEN ? { Authorization: `Bearer ${CHAT_ADMIN_TOKEN}` } : undefined,
+  }).catch((error) => {
+    console.warn('Chat trip cache invalidation failed:', error?.message || error);
+  });
+}